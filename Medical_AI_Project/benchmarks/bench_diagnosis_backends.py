@@ -0,0 +1,57 @@
+import argparse
+import os
+import tempfile
+import torch
+from modules.diagnostics.backends import TorchScriptAIDiagnosis, OnnxAIDiagnosis, infer_input_size
+
+# Запуск: python -m benchmarks.bench_diagnosis_backends --model-path models/final/diagnosis_model.pth
+
+
+def eager_benchmark(model: torch.nn.Module, input_size: int, batch_size: int, iterations: int) -> float:
+    """ Mean eager forward latency in milliseconds. """
+    import time
+
+    inputs = torch.randn(batch_size, input_size)
+    with torch.no_grad():
+        model(inputs)
+        started = time.perf_counter()
+        for _ in range(iterations):
+            model(inputs)
+    return (time.perf_counter() - started) / iterations * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare eager, TorchScript and ONNX Runtime diagnosis backends.")
+    parser.add_argument("--model-path", help="Eager model saved with torch.save (a synthetic MLP is used by default)")
+    parser.add_argument("--batch-sizes", default="1,8,32,128")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=None, help="intra-op threads for all backends")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.model_path:
+            eager_model = torch.load(args.model_path, map_location="cpu", weights_only=False).eval()
+        else:
+            eager_model = torch.nn.Sequential(
+                torch.nn.Linear(104, 256), torch.nn.ReLU(), torch.nn.Linear(256, 256), torch.nn.ReLU(),
+                torch.nn.Linear(256, 5),
+            ).eval()
+        # Export into a temporary directory so the benchmark never leaves artifacts behind
+        model_path = os.path.join(tmp_dir, "diagnosis_model.pth")
+        input_size = infer_input_size(eager_model)
+
+        backends = [
+            backend(model_path, eager_model=eager_model, input_size=input_size, intra_op_threads=args.threads)
+            for backend in (TorchScriptAIDiagnosis, OnnxAIDiagnosis)
+        ]
+        for backend in backends:
+            print(backend.check_parity())
+
+        print(f"{'batch':>6} {'eager ms':>10} " + " ".join(f"{b.BACKEND_NAME + ' ms':>16}" for b in backends))
+        for batch_size in map(int, args.batch_sizes.split(",")):
+            eager_ms = eager_benchmark(eager_model, input_size, batch_size, args.iterations)
+            backend_ms = [b.benchmark(batch_size, args.iterations)["mean_latency_ms"] for b in backends]
+            print(f"{batch_size:>6} {eager_ms:>10.3f} " + " ".join(f"{ms:>16.3f}" for ms in backend_ms))
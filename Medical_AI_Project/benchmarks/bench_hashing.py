@@ -0,0 +1,40 @@
+import argparse
+import random
+import time
+from sklearn.feature_extraction.text import HashingVectorizer
+from modules.nlp.nlp_model import HashingNLPModel, TfidfNLPModel
+from modules.nlp.symptom_embeddings import DEFAULT_SYMPTOMS
+
+# Запуск: python -m benchmarks.bench_hashing --texts 100000
+
+
+def symptom_texts(count: int, seed: int = 0) -> list:
+    """ Joined symptom lists of 1-3 symptoms, as DiagnosePatient vectorizes them. """
+    random.seed(seed)
+    return [" ".join(random.sample(DEFAULT_SYMPTOMS, k=random.randint(1, 3))) for _ in range(count)]
+
+
+def measure(name: str, transform, texts: list, repeats: int):
+    """ Best of several runs, in texts per second. """
+    best = min(timed(transform, texts) for _ in range(repeats))
+    print(f"{name:<22} {best:.3f} s ({len(texts) / best:,.0f} texts/s)")
+
+
+def timed(transform, texts: list) -> float:
+    started = time.perf_counter()
+    transform(texts)
+    return time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of batched symptom vectorizers on one core.")
+    parser.add_argument("--texts", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = symptom_texts(args.texts)
+    print(f"texts: {args.texts}")
+    measure("hashing", HashingNLPModel().texts_to_matrix, texts, args.repeats)
+    measure("hashing (unigrams)", HashingNLPModel(ngram_range=(1, 1)).texts_to_matrix, texts, args.repeats)
+    measure("sklearn HashingVect.", HashingVectorizer(n_features=100, ngram_range=(1, 2)).transform, texts, args.repeats)
+    measure("tfidf", TfidfNLPModel().texts_to_matrix, texts, args.repeats)
@@ -0,0 +1,66 @@
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+# Запуск: python -m benchmarks.bench_logger --calls 100000
+
+
+def legacy_logger(log_dir: str, console) -> logging.Logger:
+    """ The previous backend: synchronous FileHandler and StreamHandler attached to each logger. """
+    logger = logging.getLogger("bench.legacy")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    file_handler = logging.FileHandler(os.path.join(log_dir, "legacy.log"), mode="a", encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    console_handler = logging.StreamHandler(console)
+    console_handler.setFormatter(logging.Formatter("%(name)s - %(levelname)s - %(message)s"))
+    logger.addHandler(file_handler)
+    logger.addHandler(console_handler)
+    return logger
+
+
+def per_call_us(log_call, calls: int, drain=None) -> float:
+    """ Mean time spent in the calling thread; drain() then empties the queue so runs do not overlap. """
+    started = time.perf_counter()
+    for i in range(calls):
+        log_call(i)
+    elapsed = time.perf_counter() - started
+    if drain is not None:
+        drain()
+    return elapsed / calls * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-call overhead of the synchronous and queue-based logging backends.")
+    parser.add_argument("--calls", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as log_dir, open(os.devnull, "w") as console:
+        # The new backend reads its settings at import: write into the temporary directory, console to devnull
+        os.environ["LOG_DIR"] = log_dir
+        from modules.common import logger as logger_module
+
+        legacy = legacy_logger(log_dir, console)
+        backend = logger_module.get_backend(log_dir)
+        for handler in backend.handlers:
+            if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler):
+                handler.setStream(console)
+        queued = logger_module.Logger("bench.queued")
+        sampled = logger_module.Logger("bench.sampled", rate_limit=1000)
+
+        diagnosis, confidence = "Flu", 0.8731
+        results = {
+            "legacy f-string INFO": per_call_us(lambda i: legacy.info(f"Diagnosis: {diagnosis}, Confidence: {confidence:.2f}"), args.calls),
+            "queued lazy INFO": per_call_us(lambda i: queued.info("Diagnosis: %s, Confidence: %.2f", diagnosis, confidence), args.calls, logger_module.flush_logs),
+            "queued lazy INFO + fields": per_call_us(lambda i: queued.info("Diagnosis: %s", diagnosis, patient_id=i), args.calls, logger_module.flush_logs),
+            "queued rate-limited INFO": per_call_us(lambda i: sampled.info("Diagnosis: %s", diagnosis), args.calls, logger_module.flush_logs),
+            "legacy f-string DEBUG (disabled)": per_call_us(lambda i: legacy.debug(f"Diagnosis: {diagnosis}, Confidence: {confidence:.2f}"), args.calls),
+            "queued lazy DEBUG (disabled)": per_call_us(lambda i: queued.debug("Diagnosis: %s, Confidence: %.2f", diagnosis, confidence), args.calls, logger_module.flush_logs),
+        }
+
+        backend.stop()
+
+        for name, value in results.items():
+            print(f"{name:<36} {value:8.2f} us/call")
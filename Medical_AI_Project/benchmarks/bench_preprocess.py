@@ -0,0 +1,56 @@
+import argparse
+import random
+import time
+import pandas as pd
+from core.use_cases.data_preprocessor import DataPreprocessor
+from data.raw.data_raw import DataRawGenerator
+
+# Запуск: python -m benchmarks.bench_preprocess --rows 1000000
+
+
+def generate_frame(rows: int, unique_cases: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Builds a frame of raw cases. Faker is slow, so unique_cases cases are generated and repeated up to rows,
+    with patient ids, ages and dates resampled per row.
+    """
+    random.seed(seed)
+    generator = DataRawGenerator()
+    base = [generator.generate_random_case() for _ in range(min(rows, unique_cases))]
+    frame = pd.DataFrame([base[i % len(base)] for i in range(rows)])
+    frame["patient_id"] = range(rows)
+    frame["age"] = [random.choice([random.randint(0, 120), None, -5, 200]) for _ in range(rows)]
+    frame["last_visit"] = [generator.random_date() for _ in range(rows)]
+    return frame
+
+
+def records(frame: pd.DataFrame) -> list:
+    """ Records as the per-record path receives them: missing values are absent keys. """
+    rows = frame.astype(object).where(frame.notna(), None).to_dict("records")
+    return [{key: value for key, value in row.items() if value is not None} for row in rows]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-record and columnar DataPreprocessor paths.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--unique-cases", type=int, default=20_000, help="distinct Faker cases repeated up to --rows")
+    args = parser.parse_args()
+
+    frame = generate_frame(args.rows, args.unique_cases)
+    raw_records = records(frame)
+
+    started = time.perf_counter()
+    expected = [DataPreprocessor.preprocess_medical_case(record) for record in raw_records]
+    per_record_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = DataPreprocessor.preprocess_batch(frame)
+    batch_s = time.perf_counter() - started
+
+    sample = random.sample(range(args.rows), min(args.rows, 10_000))
+    batch_records = batch.to_dict("records")
+    mismatches = sum(batch_records[i] != expected[i] for i in sample)
+
+    print(f"rows: {args.rows}")
+    print(f"per-record: {per_record_s:.2f} s ({args.rows / per_record_s:,.0f} rows/s)")
+    print(f"batch:      {batch_s:.2f} s ({args.rows / batch_s:,.0f} rows/s)")
+    print(f"speedup:    {per_record_s / batch_s:.1f}x, mismatches in {len(sample)} sampled rows: {mismatches}")
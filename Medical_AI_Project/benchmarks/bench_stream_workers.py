@@ -0,0 +1,94 @@
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from infrastructure.streams.diagnosis_stream import DiagnosisPublisher, SQLiteStreamBackend
+from infrastructure.streams.worker import SQLiteResultSink, StreamWorker
+
+# Запуск: python -m benchmarks.bench_stream_workers --messages 384 --workers 1,4 [--model cpu]
+#
+# По умолчанию (--model sleep) инференс заменён time.sleep: процесс ждёт, не занимая CPU, как при удалённой модели
+# или GPU. Такой замер показывает накладные расходы потока и масштабирование по числу воркеров, но не CPU-инференс:
+# с --model cpu каждый воркер считает настоящий DiagnosePatient (TF-IDF + MLP) на CPU, и ускорение ограничено
+# числом ядер.
+
+CASE = {"patient_id": 1, "full_name": "John Doe", "age": 35, "gender": "male", "symptoms": ["fever", "cough"]}
+
+
+class FixedLatencyUseCase:
+    """ DiagnosePatient с фиксированным временем инференса на пачку (как у удалённой модели или GPU). """
+
+    def __init__(self, seconds_per_batch: float):
+        self.seconds_per_batch = seconds_per_batch
+
+    def execute_batch(self, medical_cases):
+        time.sleep(self.seconds_per_batch)
+        return [{"patient_id": case.patient_id, "diagnosis": "Flu", "confidence": 0.9} for case in medical_cases]
+
+
+def cpu_use_case():
+    """ Настоящий DiagnosePatient на CPU: словарь TF-IDF из репозитория и синтетическая MLP (по одному потоку). """
+    import torch
+    from core.use_cases.diagnose_patient import DiagnosePatient
+    from modules.diagnostics.ai_diagnosis import TorchAIDiagnosis
+    from modules.nlp.nlp_model import TfidfNLPModel
+
+    torch.set_num_threads(1)
+    torch.manual_seed(0)
+    ai_model = TorchAIDiagnosis("models/final/diagnosis_model.pth")
+    ai_model.model = torch.nn.Sequential(
+        torch.nn.Linear(104, 256), torch.nn.ReLU(), torch.nn.Linear(256, 256), torch.nn.ReLU(), torch.nn.Linear(256, 5),
+    ).eval()
+    return DiagnosePatient(ai_model, TfidfNLPModel())
+
+
+def consume(stream_path: str, sink_path: str, consumer: str, model: str, seconds_per_batch: float, batch_size: int):
+    """ Процесс-воркер: обрабатывает поток до конца. """
+    use_case = cpu_use_case() if model == "cpu" else FixedLatencyUseCase(seconds_per_batch)
+    worker = StreamWorker(
+        SQLiteStreamBackend(stream_path), "diagnosis", "inference", consumer,
+        use_case, SQLiteResultSink(sink_path), batch_size=batch_size,
+    )
+    worker.drain()
+
+
+def run(directory: str, workers: int, messages: int, model: str, seconds_per_batch: float, batch_size: int) -> float:
+    """ Время обработки messages сообщений заданным числом процессов-воркеров, секунды. """
+    stream_path = os.path.join(directory, f"streams-{workers}.sqlite3")
+    sink_path = os.path.join(directory, f"results-{workers}.sqlite3")
+    publisher = DiagnosisPublisher(SQLiteStreamBackend(stream_path))
+    for i in range(messages):
+        publisher.publish(dict(CASE, patient_id=i))
+    SQLiteResultSink(sink_path)
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=consume, args=(stream_path, sink_path, f"worker-{i}", model, seconds_per_batch, batch_size))
+        for i in range(workers)
+    ]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    assert SQLiteResultSink(sink_path).count() == messages
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of stream workers by number of processes.")
+    parser.add_argument("--messages", type=int, default=384)
+    parser.add_argument("--workers", default="1,4", help="comma-separated numbers of worker processes")
+    parser.add_argument("--model", choices=("sleep", "cpu"), default="sleep",
+                        help="sleep: fixed latency without CPU load; cpu: real TF-IDF + MLP inference")
+    parser.add_argument("--seconds-per-batch", type=float, default=0.04, help="latency of --model sleep")
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        baseline = None
+        for workers in (int(value) for value in args.workers.split(",")):
+            elapsed = run(directory, workers, args.messages, args.model, args.seconds_per_batch, args.batch_size)
+            baseline = baseline or elapsed
+            print(f"{workers} workers: {elapsed:.2f} s ({args.messages / elapsed:,.0f} msg/s, speedup x{baseline / elapsed:.2f})")
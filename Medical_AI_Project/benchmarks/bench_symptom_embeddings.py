@@ -0,0 +1,45 @@
+import argparse
+import random
+import time
+from modules.nlp.nlp_model import NLPModelFactory
+from modules.nlp.symptom_embeddings import DEFAULT_SYMPTOMS, SymptomEmbeddingTable
+from modules.nlp.vector_cache import VectorCache
+
+# Запуск: python -m benchmarks.bench_symptom_embeddings --model-type bert --lists 2000
+
+
+def symptom_lists(count: int, seed: int = 0) -> list:
+    """ Random symptom lists of 1-3 symptoms, as produced by DataRawGenerator. """
+    random.seed(seed)
+    return [random.sample(DEFAULT_SYMPTOMS, k=random.randint(1, 3)) for _ in range(count)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare full-text encoding with symptom table lookup.")
+    parser.add_argument("--model-type", default="bert")
+    parser.add_argument("--lists", type=int, default=2000)
+    args = parser.parse_args()
+
+    # Caching is disabled so the encoder path measures real forward passes
+    model = NLPModelFactory.get_model(args.model_type, cache=VectorCache(max_entries=0))
+    table = SymptomEmbeddingTable.build(model, source=model.embedding_source)
+    lists = symptom_lists(args.lists)
+
+    started = time.perf_counter()
+    for symptoms in lists:
+        model.text_to_vector(" ".join(symptoms))
+    encoder_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for symptoms in lists:
+        table.encode(symptoms, fallback=model)
+    lookup_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    table.encode_batch(lists, fallback=model)
+    batch_s = time.perf_counter() - started
+
+    print(f"lists: {args.lists}")
+    print(f"encoder: {encoder_s / args.lists * 1e6:,.1f} us/list")
+    print(f"lookup:  {lookup_s / args.lists * 1e6:,.1f} us/list ({encoder_s / lookup_s:,.0f}x)")
+    print(f"batch:   {batch_s / args.lists * 1e6:,.2f} us/list")
@@ -36,6 +36,20 @@ class MedicalCase:
         """
         self.gender = self.gender.lower()
 
+    def model_input_key(self) -> tuple:
+        """
+        Canonical form of exactly what the diagnosis model consumes (see DiagnosePatient._model_input and
+        TorchAIDiagnosis.build_feature_vector): age, gender, the symptom texts in order, and the numbers of
+        chronic conditions and medications. Cases with equal keys always get the same diagnosis.
+        """
+        return (
+            self.age,
+            self.gender,
+            tuple(" ".join(str(symptom).lower().split()) for symptom in self.symptoms),
+            len(self.chronic_conditions or []),
+            len(self.medications or []),
+        )
+
     def to_dict(self) -> dict:
         """
         Convert the medical case to a dictionary representation.
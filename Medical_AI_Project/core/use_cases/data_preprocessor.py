@@ -1,6 +1,23 @@
 import re
 from datetime import datetime
-from typing import List, Optional
+from itertools import repeat
+from typing import Any, Callable, List, Optional
+import numpy as np
+import pandas as pd
+
+# Column order of a preprocessed medical case (same keys as preprocess_medical_case)
+TEXT_COLUMNS = [
+    "full_name", "address", "email", "medical_history", "attending_physician", "preferred_language",
+    "interaction_history_summary", "study_notes",
+]
+LIST_COLUMNS = ["symptoms", "chatbot_interactions", "allergies", "chronic_conditions", "medications", "references"]
+PASSTHROUGH_COLUMNS = ["patient_id", "passport_id", "blood_type"]
+OUTPUT_COLUMNS = [
+    "patient_id", "full_name", "passport_id", "phone_number", "address", "email", "age", "gender", "symptoms",
+    "medical_history", "attending_physician", "last_visit", "chatbot_interactions", "blood_type", "allergies",
+    "chronic_conditions", "medications", "preferred_language", "interaction_history_summary", "study_notes",
+    "references",
+]
 
 
 class DataPreprocessor:
@@ -118,6 +135,143 @@ class DataPreprocessor:
             "references": DataPreprocessor.validate_list(data.get("references")),
         }
 
+    @staticmethod
+    def preprocess_batch(data: Any) -> pd.DataFrame:
+        """
+        Cleans and preprocesses a batch of medical cases stored column-wise.
+
+        Produces the same values as preprocess_medical_case applied to every row, but works per column:
+        text columns are factorized so each distinct value is cleaned once with vectorized string methods,
+        ages are clamped with numpy, and dates are parsed with pandas (values pandas cannot parse fall back
+        to format_date). Missing columns and missing values (None/NaN) behave like absent dictionary keys.
+        Passthrough columns and ages keep the Python types of the per-record path: pandas stores integer
+        columns with missing values as float64, so whole floats in such columns are converted back to int.
+
+        :param data: pandas DataFrame or pyarrow Table with one medical case per row
+        :return: DataFrame with the columns of preprocess_medical_case, in the same order
+        """
+        frame = DataPreprocessor._to_frame(data)
+
+        def column(name: str) -> pd.Series:
+            if name in frame.columns:
+                return frame[name].astype(object).where(frame[name].notna(), None)
+            return pd.Series([None] * len(frame), index=frame.index, dtype=object)
+
+        result = {}
+        for name in PASSTHROUGH_COLUMNS:
+            result[name] = DataPreprocessor._native_column(frame[name], "Unknown") if name in frame.columns else "Unknown"
+        for name in TEXT_COLUMNS:
+            result[name] = DataPreprocessor._clean_text_column(column(name))
+        for name in LIST_COLUMNS:
+            result[name] = DataPreprocessor._validate_list_column(column(name))
+
+        result["phone_number"] = DataPreprocessor._validate_phone_column(column("phone_number"))
+        result["age"] = DataPreprocessor._validate_age_column(frame["age"] if "age" in frame.columns else column("age"))
+        gender = DataPreprocessor._clean_text_column(column("gender"))
+        result["gender"] = gender.where(gender.isin(["male", "female", "other"]), "other")
+        result["last_visit"] = DataPreprocessor._format_date_column(column("last_visit"))
+
+        return pd.DataFrame(result, index=frame.index)[OUTPUT_COLUMNS]
+
+    @staticmethod
+    def _to_frame(data: Any) -> pd.DataFrame:
+        """
+        Converts the input to a DataFrame. Arrow list columns become Python lists, as in the per-record path.
+        """
+        if isinstance(data, pd.DataFrame):
+            return data
+        if hasattr(data, "column_names") and hasattr(data, "to_pandas"):
+            import pyarrow as pa
+
+            columns = {}
+            for name in data.column_names:
+                values = data.column(name)
+                is_list = pa.types.is_list(values.type) or pa.types.is_large_list(values.type)
+                columns[name] = pd.Series(values.to_pylist(), dtype=object) if is_list else values.to_pandas()
+            return pd.DataFrame(columns)
+        raise TypeError(f"Unsupported batch type: {type(data).__name__}")
+
+    @staticmethod
+    def _map_unique(series: pd.Series, transform: Callable[[pd.Series], pd.Series], missing: Any) -> pd.Series:
+        """
+        Applies a vectorized transform to the distinct values of a column and broadcasts the result back.
+
+        :param series: Input column
+        :param transform: Function mapping a Series of distinct non-missing values to their results
+        :param missing: Result for missing values
+        :return: Transformed column with object dtype
+        """
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        mapped = np.empty(len(uniques) + 1, dtype=object)
+        mapped[:-1] = transform(pd.Series(uniques, dtype=object)).to_numpy(dtype=object)
+        mapped[-1] = missing  # code -1 marks a missing value
+        return pd.Series(mapped[codes], index=series.index, dtype=object)
+
+    @staticmethod
+    def _native_column(series: pd.Series, missing: Any) -> pd.Series:
+        """
+        Converts a column to Python values as they appear in the raw records: numpy scalars become Python
+        numbers, whole numbers in float columns become int and missing values become missing.
+        """
+        if pd.api.types.is_float_dtype(series):
+            numbers = series.to_numpy(dtype=float)
+            values = series.to_numpy(dtype=object, copy=True)
+            whole = np.isfinite(numbers) & (np.mod(numbers, 1) == 0)
+            values[whole] = numbers[whole].astype(np.int64).tolist()
+            values[np.isnan(numbers)] = missing
+            return pd.Series(values, index=series.index, dtype=object)
+        values = pd.Series(series.tolist(), index=series.index, dtype=object)
+        return values.where(series.notna(), missing)
+
+    @staticmethod
+    def _clean_text_column(series: pd.Series) -> pd.Series:
+        """ Vectorized clean_text. """
+        def transform(values: pd.Series) -> pd.Series:
+            cleaned = values.str.strip().str.lower().str.replace(r"\s+", " ", regex=True)
+            return cleaned.where(values != "", "N/A")
+
+        return DataPreprocessor._map_unique(series, transform, "N/A")
+
+    @staticmethod
+    def _validate_list_column(series: pd.Series) -> pd.Series:
+        """ Vectorized validate_list: only the (usually few) non-list cells are replaced. """
+        values = series.to_numpy(dtype=object, copy=True)
+        is_list = np.fromiter(map(isinstance, values, repeat(list)), dtype=bool, count=len(values))
+        for index in np.flatnonzero(~is_list):
+            values[index] = []
+        return pd.Series(values, index=series.index, dtype=object)
+
+    @staticmethod
+    def _validate_phone_column(series: pd.Series) -> pd.Series:
+        """ Vectorized validate_phone_number. """
+        series = series.astype(object)
+        valid = series.str.fullmatch(r"\d{10,15}").fillna(False).astype(bool)
+        return series.where(valid, "Invalid")
+
+    @staticmethod
+    def _validate_age_column(series: pd.Series) -> pd.Series:
+        """ Vectorized validate_age. Non-numeric columns fall back to the scalar rule. """
+        if not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+            return series.map(lambda age: DataPreprocessor.validate_age(None if pd.isna(age) else age)).astype(object)
+        values = series.to_numpy()
+        invalid = pd.isna(values) | (values <= 0) | (values > 120)
+        return DataPreprocessor._native_column(series, -1).where(~invalid, -1)
+
+    @staticmethod
+    def _format_date_column(series: pd.Series) -> pd.Series:
+        """
+        Vectorized format_date. Values pandas does not parse, or parses to years the platform strftime
+        formats differently (before 1000), are formatted with the scalar format_date.
+        """
+        def transform(values: pd.Series) -> pd.Series:
+            parsed = pd.to_datetime(values, format="%Y-%m-%d", errors="coerce")
+            trusted = parsed.notna() & (parsed.dt.year >= 1000)
+            formatted = parsed.dt.strftime("%Y-%m-%d").astype(object)
+            fallback = values[~trusted].map(DataPreprocessor.format_date)
+            return formatted.where(trusted, fallback)
+
+        return DataPreprocessor._map_unique(series, transform, "Unknown")
+
 
 # Example Usage
 if __name__ == "__main__":
@@ -146,3 +300,5 @@ if __name__ == "__main__":
 
     cleaned_data = DataPreprocessor.preprocess_medical_case(raw_data)
     print(cleaned_data)
+
+    print(DataPreprocessor.preprocess_batch(pd.DataFrame([raw_data])).iloc[0].to_dict())
@@ -1,16 +1,31 @@
+import time
+from typing import List, Optional, Tuple
+import numpy as np
 from core.entities.medical_case import MedicalCase
-from modules.diagnostics.ai_diagnosis import IAIDiagnosis
+from modules.diagnostics.ai_diagnosis import ERROR_DIAGNOSIS, IAIDiagnosis
 from modules.nlp.nlp_model import INLPModel
 from modules.common.logger import Logger
+from modules.common.single_flight import SingleFlight
 
 class DiagnosePatient:
     """
     Use case для диагностики пациента на основе медицинских данных.
     """
 
-    def __init__(self, ai_model: IAIDiagnosis, nlp_model: INLPModel):
+    def __init__(self, ai_model: IAIDiagnosis, nlp_model: INLPModel, result_cache=None, cascade=None):
+        """
+        :param ai_model: AI-модель диагностики.
+        :param nlp_model: NLP-модель для векторизации симптомов.
+        :param result_cache: Кэш результатов (DiagnosisCache) или None.
+        :param cascade: Каскад с быстрой моделью (DiagnosisCascade) или None: полная модель
+            запускается только для случаев, в которых быстрая модель не уверена.
+        """
         self.ai_model = ai_model
         self.nlp_model = nlp_model
+        self.result_cache = result_cache
+        self.cascade = cascade
+        # Одинаковые диагностики, выполняющиеся одновременно, считаются один раз
+        self.single_flight = SingleFlight("diagnosis")
         self.logger = Logger("DiagnosePatient")
 
     def execute(self, medical_case: MedicalCase) -> dict:
@@ -20,14 +35,120 @@ class DiagnosePatient:
         :param medical_case: Данные пациента.
         :return: Словарь с диагнозом и уровнем уверенности.
         """
-        self.logger.info(f"Начало диагностики для пациента {medical_case.patient_id}")
+        self.logger.debug("Начало диагностики для пациента %s", medical_case.patient_id)
+
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = self.result_cache.key_for(medical_case)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return self._result(medical_case, cached["diagnosis"], cached["confidence"])
+
+        diagnosis, confidence = self.single_flight.do(
+            self.flight_key(medical_case), lambda: self._diagnose(medical_case, cache_key)
+        )
+
+        self.logger.info(
+            "Диагноз поставлен: %s (Уверенность: %.2f)", diagnosis, confidence, patient_id=medical_case.patient_id
+        )
+
+        return self._result(medical_case, diagnosis, confidence)
+
+    def _diagnose(self, medical_case: MedicalCase, cache_key: Optional[str]) -> Tuple[str, float]:
+        """ Прогоняет случай через NLP и AI-модель и сохраняет результат в кэш. """
+        started = time.perf_counter()
+        if self.cascade is not None:
+            diagnosis, confidence = self.cascade.predict(medical_case, self._model_input, self._predict)
+        else:
+            diagnosis, confidence = self._predict(medical_case)
 
+        # Ошибка модели не кэшируется: иначе сбой остался бы в ответах до истечения TTL
+        if cache_key is not None and diagnosis != ERROR_DIAGNOSIS:
+            self.result_cache.put(cache_key, diagnosis, confidence, time.perf_counter() - started)
+        return diagnosis, confidence
+
+    def _predict(self, medical_case: MedicalCase) -> Tuple[str, float]:
+        """ Диагностика полной моделью. """
         # NLP обработка симптомов
-        symptoms_text = " ".join(medical_case.symptoms)
-        symptoms_vector = self.nlp_model.text_to_vector(symptoms_text)
+        symptoms_vector = self.nlp_model.symptoms_to_vector(medical_case.symptoms)
+
+        # Получаем диагноз от AI-модели
+        return self.ai_model.predict(self._model_input(medical_case, symptoms_vector))
+
+    def _predict_batch(self, medical_cases: List[MedicalCase]) -> List[Tuple[str, float]]:
+        """ Пакетная диагностика полной моделью: один батч NLP и один проход AI-модели. """
+        vectors = self.nlp_model.symptoms_to_vectors([case.symptoms for case in medical_cases])
+        return self.ai_model.predict_batch(
+            [self._model_input(case, vector) for case, vector in zip(medical_cases, vectors)]
+        )
+
+    @staticmethod
+    def flight_key(medical_case: MedicalCase) -> tuple:
+        """
+        Ключ для объединения одинаковых одновременных запросов: только входные данные модели, без patient_id.
+        """
+        return medical_case.model_input_key()
 
-        # Формируем входные данные для AI-модели
-        model_input = {
+    def execute_batch(self, medical_cases: List[MedicalCase]) -> List[dict]:
+        """
+        Выполняет диагностику пакета пациентов: один батч NLP и один проход AI-модели на весь пакет.
+
+        Если пакетная обработка падает, каждый случай диагностируется отдельно, чтобы ошибка одного
+        пациента не ломала весь пакет: для него возвращается словарь с ключом "error".
+
+        :param medical_cases: Данные пациентов.
+        :return: Результаты в порядке входных данных.
+        """
+        if not medical_cases:
+            return []
+        self.logger.info("Начало пакетной диагностики для %d пациентов", len(medical_cases))
+
+        # Случаи, найденные в кэше, в пакет модели не попадают
+        results: List[dict] = [None] * len(medical_cases)
+        keys = [None] * len(medical_cases)
+        if self.result_cache is not None:
+            for i, case in enumerate(medical_cases):
+                keys[i] = self.result_cache.key_for(case)
+                cached = self.result_cache.get(keys[i])
+                if cached is not None:
+                    results[i] = self._result(case, cached["diagnosis"], cached["confidence"])
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+        pending_cases = [medical_cases[i] for i in pending]
+
+        started = time.perf_counter()
+        try:
+            if self.cascade is not None:
+                predictions = self.cascade.predict_batch(pending_cases, self._model_input, self._predict_batch)
+            else:
+                predictions = self._predict_batch(pending_cases)
+        except Exception as e:
+            self.logger.warning("Пакетная диагностика не удалась (%s), диагностируем по одному", e)
+            for i in pending:
+                results[i] = self._execute_isolated(medical_cases[i])
+            return results
+
+        # Время пакета делится поровну: это оценка того, сколько стоил бы один случай
+        latency = (time.perf_counter() - started) / len(pending)
+        for i, (diagnosis, confidence) in zip(pending, predictions):
+            results[i] = self._result(medical_cases[i], diagnosis, confidence)
+            if keys[i] is not None and diagnosis != ERROR_DIAGNOSIS:
+                self.result_cache.put(keys[i], diagnosis, confidence, latency)
+        return results
+
+    def _execute_isolated(self, medical_case: MedicalCase) -> dict:
+        """ Диагностика одного случая с ошибкой в результате вместо исключения. """
+        try:
+            return self.execute(medical_case)
+        except Exception as e:
+            self.logger.error("Ошибка диагностики пациента %s: %s", medical_case.patient_id, e)
+            return {"patient_id": medical_case.patient_id, "error": str(e)}
+
+    @staticmethod
+    def _model_input(medical_case: MedicalCase, symptoms_vector: np.ndarray) -> dict:
+        """ Формирует входные данные для AI-модели. """
+        return {
             "age": medical_case.age,
             "gender": medical_case.gender,
             "symptoms_vector": symptoms_vector,
@@ -35,11 +156,8 @@ class DiagnosePatient:
             "medications": medical_case.medications
         }
 
-        # Получаем диагноз от AI-модели
-        diagnosis, confidence = self.ai_model.predict(model_input)
-
-        self.logger.info(f"Диагноз поставлен: {diagnosis} (Уверенность: {confidence:.2f})")
-
+    @staticmethod
+    def _result(medical_case: MedicalCase, diagnosis: str, confidence: float) -> dict:
         return {
             "patient_id": medical_case.patient_id,
             "diagnosis": diagnosis,
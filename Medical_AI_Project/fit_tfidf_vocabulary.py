@@ -0,0 +1,40 @@
+import argparse
+from data.raw.data_raw import DataRawGenerator
+from modules.nlp.nlp_model import TfidfNLPModel
+
+
+def build_corpus(num_cases: int) -> list:
+    """
+    Builds a symptoms corpus from generated raw medical cases.
+
+    :param num_cases: Number of cases to generate.
+    :return: List of documents, one per case.
+    """
+    generator = DataRawGenerator()
+    corpus = []
+    for case in generator.generate_bulk_cases(num_cases):
+        parts = case["symptoms"] + case["chronic_conditions"] + case["medications"]
+        if case["medical_history"]:
+            parts.append(case["medical_history"])
+        corpus.append(" ".join(parts))
+    return corpus
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit the TF-IDF vocabulary used by TfidfNLPModel.")
+    parser.add_argument("--cases", type=int, default=5000, help="Number of generated cases in the corpus")
+    parser.add_argument("--corpus", help="Optional text file with one document per line (replaces generated cases)")
+    parser.add_argument("--output", default=TfidfNLPModel.DEFAULT_VOCABULARY_PATH)
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as f:
+            corpus = [line.strip() for line in f if line.strip()]
+    else:
+        corpus = build_corpus(args.cases)
+
+    model = TfidfNLPModel(vocabulary_path=args.output)
+    model.fit(corpus)
+    model.save_vocabulary()
+
+    print(f"✅ TF-IDF vocabulary ({len(model.vocabulary.terms)} terms) saved in {args.output}")
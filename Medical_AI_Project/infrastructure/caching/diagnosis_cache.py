@@ -0,0 +1,257 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from core.entities.medical_case import MedicalCase
+from modules.common.logger import Logger
+from modules.nlp.vector_cache import VectorCache
+
+# Настройки кэша результатов диагностики
+DIAGNOSIS_CACHE = os.getenv("DIAGNOSIS_CACHE", "memory")  # off | memory | mongo | redis
+DIAGNOSIS_CACHE_TTL_SECONDS = int(os.getenv("DIAGNOSIS_CACHE_TTL_SECONDS", str(24 * 3600)))
+DIAGNOSIS_CACHE_MAX_ENTRIES = int(os.getenv("DIAGNOSIS_CACHE_MAX_ENTRIES", "10000"))
+DIAGNOSIS_MODEL_VERSION = os.getenv("DIAGNOSIS_MODEL_VERSION", "")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+def diagnosis_cache_key(medical_case: MedicalCase, model_version: str) -> str:
+    """
+    Канонический хэш входных данных модели.
+
+    Учитывается ровно то, что получает модель (MedicalCase.model_input_key): возраст, пол, симптомы
+    (порядок сохраняется, он важен для текста NLP-модели), число хронических заболеваний и лекарств,
+    а также версия модели.
+
+    :param medical_case: Данные пациента.
+    :param model_version: Версия модели.
+    :return: SHA-256 в hex.
+    """
+    payload = json.dumps([model_version, *medical_case.model_input_key()], separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def default_model_version(
+    ai_model_type: str, ai_model_path: str, nlp_model, cascade=None, quantized: bool = False
+) -> str:
+    """
+    Версия модели для ключей кэша. Меняется при смене всего, от чего зависит ответ: бэкенда и режима
+    квантования AI-модели, файла весов (DIAGNOSIS_MODEL_VERSION или время изменения), источника векторов
+    NLP-модели (кодировщик, точность, таблица симптомов) и каскада (порог и веса быстрой модели).
+    С новой версией старые записи кэша перестают находиться.
+
+    :param ai_model_type: Бэкенд AI-модели ("pytorch", "torchscript", "onnx").
+    :param ai_model_path: Файл весов.
+    :param nlp_model: NLP-модель полного уровня.
+    :param cascade: DiagnosisCascade или None.
+    :param quantized: Используется ли int8-квантование AI-модели.
+    """
+    if DIAGNOSIS_MODEL_VERSION:
+        weights = DIAGNOSIS_MODEL_VERSION
+    else:
+        mtime = int(os.path.getmtime(ai_model_path)) if os.path.exists(ai_model_path) else 0
+        weights = f"{os.path.basename(ai_model_path)}:{mtime}"
+    version = f"{ai_model_type}{':int8' if quantized else ''}:{weights}:{nlp_model.vector_version}"
+    if cascade is not None:
+        version += f":{cascade.version}"
+    return version
+
+
+class MongoResultStore:
+    """
+    Общий кэш результатов в коллекции MongoDB (cache_collection).
+    Записи удаляются TTL-индексом по полю expires_at (см. migrations.py).
+    """
+
+    def __init__(self, collection=None, ttl_seconds: int = DIAGNOSIS_CACHE_TTL_SECONDS):
+        """
+        :param collection: Коллекция или функция, возвращающая её (по умолчанию mongo_client.cache_collection).
+        :param ttl_seconds: Время жизни записи.
+        """
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+
+    def _collection(self):
+        if self.collection is None:
+            from infrastructure.database import mongo_client
+            return mongo_client.cache_collection
+        return self.collection() if callable(self.collection) else self.collection
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        document = self._collection().find_one({"_id": key}, {"_id": 0, "value": 1, "expires_at": 1})
+        if document is None:
+            return None
+        # TTL-монитор удаляет записи раз в минуту: просроченную запись не используем
+        expires_at = document.get("expires_at")
+        if expires_at is not None and expires_at.replace(tzinfo=timezone.utc) <= datetime.now(timezone.utc):
+            return None
+        return document["value"]
+
+    def put(self, key: str, value: Dict[str, Any]):
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+        self._collection().replace_one(
+            {"_id": key}, {"_id": key, "value": value, "expires_at": expires_at}, upsert=True
+        )
+
+
+class RedisResultStore:
+    """
+    Общий кэш результатов в Redis: JSON-значения с истечением по TTL.
+    """
+
+    PREFIX = "diagnosis:"
+
+    def __init__(self, client=None, ttl_seconds: int = DIAGNOSIS_CACHE_TTL_SECONDS):
+        """
+        :param client: Клиент Redis (по умолчанию создаётся из REDIS_URL при первом обращении).
+        :param ttl_seconds: Время жизни записи.
+        """
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+
+    def _client(self):
+        if self.client is None:
+            import redis
+            self.client = redis.Redis.from_url(REDIS_URL, socket_timeout=0.5)
+        return self.client
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = self._client().get(self.PREFIX + key)
+        return json.loads(raw) if raw is not None else None
+
+    def put(self, key: str, value: Dict[str, Any]):
+        self._client().set(self.PREFIX + key, json.dumps(value), ex=self.ttl_seconds)
+
+
+class DiagnosisCache:
+    """
+    Двухуровневый кэш результатов диагностики: LRU в процессе перед общим хранилищем (Redis или MongoDB).
+
+    Ключ — хэш входных данных модели и версии модели, поэтому после смены версии старые результаты
+    не используются. Ошибки общего хранилища не ломают диагностику: они считаются и кэш пропускается.
+    """
+
+    def __init__(
+        self,
+        model_version: str,
+        store=None,
+        max_entries: int = DIAGNOSIS_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = DIAGNOSIS_CACHE_TTL_SECONDS,
+    ):
+        """
+        :param model_version: Версия модели, входит в каждый ключ.
+        :param store: Общее хранилище с методами get(key) и put(key, value); None — только LRU.
+        :param max_entries: Размер LRU в процессе.
+        :param ttl_seconds: Время жизни записи в LRU.
+        """
+        self.model_version = model_version
+        self.store = store
+        self.local = VectorCache(max_entries=max_entries, max_bytes=0, ttl_seconds=ttl_seconds, namespace="diagnosis")
+        self.logger = Logger("DiagnosisCache")
+        self._lock = threading.Lock()
+        self._counters = {"local_hits": 0, "store_hits": 0, "misses": 0, "store_errors": 0}
+        self._saved_seconds = 0.0
+        self._miss_seconds = 0.0
+
+    def key_for(self, medical_case: MedicalCase) -> str:
+        """ Ключ кэша для входных данных пациента. """
+        return diagnosis_cache_key(medical_case, self.model_version)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Ищет результат сначала в LRU, затем в общем хранилище.
+
+        :param key: Ключ из key_for.
+        :return: Словарь с diagnosis, confidence и latency (время исходного вычисления) или None.
+        """
+        value = self.local.get(key)
+        if value is not None:
+            self._record_hit("local_hits", value)
+            return value
+        if self.store is not None:
+            try:
+                value = self.store.get(key)
+            except Exception as e:
+                self._record_store_error("get", e)
+                value = None
+            if value is not None:
+                self.local.put(key, value)
+                self._record_hit("store_hits", value)
+                return value
+        with self._lock:
+            self._counters["misses"] += 1
+        return None
+
+    def put(self, key: str, diagnosis: str, confidence: float, latency: float):
+        """
+        Сохраняет результат в оба уровня.
+
+        :param key: Ключ из key_for.
+        :param diagnosis: Диагноз.
+        :param confidence: Уверенность.
+        :param latency: Время вычисления результата в секундах (для метрики сэкономленного времени).
+        """
+        value = {"diagnosis": diagnosis, "confidence": float(confidence), "latency": latency}
+        self.local.put(key, value)
+        with self._lock:
+            self._miss_seconds += latency
+        if self.store is not None:
+            try:
+                self.store.put(key, value)
+            except Exception as e:
+                self._record_store_error("put", e)
+
+    def set_model_version(self, model_version: str):
+        """ Меняет версию модели и очищает LRU; записи общего хранилища со старой версией истекут по TTL. """
+        self.model_version = model_version
+        self.local.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Возвращает счётчики кэша.
+
+        :return: Словарь с попаданиями по уровням, долей попаданий и сэкономленным временем.
+        """
+        with self._lock:
+            hits = self._counters["local_hits"] + self._counters["store_hits"]
+            misses = self._counters["misses"]
+            lookups = hits + misses
+            return dict(
+                self._counters,
+                model_version=self.model_version,
+                hit_ratio=hits / lookups if lookups else 0.0,
+                saved_ms=round(self._saved_seconds * 1000, 3),
+                avg_miss_ms=round(self._miss_seconds / misses * 1000, 3) if misses else 0.0,
+                local_entries=len(self.local),
+            )
+
+    def _record_hit(self, counter: str, value: Dict[str, Any]):
+        with self._lock:
+            self._counters[counter] += 1
+            self._saved_seconds += value.get("latency", 0.0)
+
+    def _record_store_error(self, operation: str, error: Exception):
+        with self._lock:
+            self._counters["store_errors"] += 1
+        self.logger.warning("Ошибка общего кэша (%s): %s", operation, error)
+
+
+def create_diagnosis_cache(model_version: str, backend: str = DIAGNOSIS_CACHE) -> Optional[DiagnosisCache]:
+    """
+    Создаёт кэш по настройке DIAGNOSIS_CACHE.
+
+    :param model_version: Версия модели.
+    :param backend: off | memory | mongo | redis.
+    :return: DiagnosisCache или None, если кэш выключен.
+    """
+    if backend == "off":
+        return None
+    if backend == "memory":
+        return DiagnosisCache(model_version)
+    if backend == "mongo":
+        return DiagnosisCache(model_version, store=MongoResultStore())
+    if backend == "redis":
+        return DiagnosisCache(model_version, store=RedisResultStore())
+    raise ValueError(f"Unsupported diagnosis cache backend: {backend}")
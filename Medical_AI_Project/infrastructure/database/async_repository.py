@@ -0,0 +1,42 @@
+import os
+from typing import Optional
+from infrastructure.database import mongo_client
+from modules.common.executors import BoundedExecutor
+
+# Число одновременных запросов к MongoDB из обработчиков API (не больше размера пула соединений)
+MONGO_EXECUTOR_WORKERS = int(os.getenv("MONGO_EXECUTOR_WORKERS", "8"))
+
+# pymongo синхронный: вызовы выполняются в ограниченном пуле потоков, а не в event loop
+db_executor = BoundedExecutor("mongo", MONGO_EXECUTOR_WORKERS)
+
+
+class AsyncPatientRepository:
+    """
+    Асинхронный репозиторий пациентов для обработчиков FastAPI.
+    Каждый запрос к MongoDB выполняется в db_executor, поэтому медленная БД не блокирует event loop.
+    """
+
+    @staticmethod
+    async def find(patient_id: int, projection: Optional[dict] = None) -> Optional[dict]:
+        """ Возвращает запись пациента или None. """
+        return await db_executor.run(
+            lambda: mongo_client.patients_collection.find_one({"patient_id": patient_id}, projection)
+        )
+
+    @staticmethod
+    async def insert(patient_data: dict):
+        """ Добавляет запись пациента. """
+        return await db_executor.run(lambda: mongo_client.patients_collection.insert_one(patient_data))
+
+    @staticmethod
+    async def update(patient_id: int, updates: dict):
+        """ Обновляет поля пациента. Возвращает UpdateResult. """
+        return await db_executor.run(
+            lambda: mongo_client.patients_collection.update_one({"patient_id": patient_id}, {"$set": updates})
+        )
+
+    @staticmethod
+    async def delete(patient_id: int):
+        """ Удаляет пациента. Возвращает DeleteResult. """
+        return await db_executor.run(lambda: mongo_client.patients_collection.delete_one({"patient_id": patient_id}))
+
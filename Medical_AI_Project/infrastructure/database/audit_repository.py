@@ -1,4 +1,4 @@
-from mongo_client import audit_logs_collection
+from infrastructure.database.audit_sink import get_audit_sink
 from datetime import datetime
 
 
@@ -10,12 +10,11 @@ class AuditRepository:
     @staticmethod
     def log_operation(action: str, details: str):
         """
-        Логирует операцию в MongoDB.
+        Логирует операцию в MongoDB (через буфер: запись выполняется пачками в фоновом потоке).
         """
         log_entry = {
             "action": action,
             "details": details,
             "timestamp": datetime.utcnow(),
         }
-        audit_logs_collection.insert_one(log_entry)
-        print(f"🔍 Log recorded: {action}")
+        get_audit_sink("audit_logs_collection").emit(log_entry)
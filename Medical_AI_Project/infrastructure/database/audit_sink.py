@@ -0,0 +1,259 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+from modules.common.logger import Logger
+
+# Настройки по умолчанию (переопределяются через переменные окружения)
+AUDIT_SINK_BATCH_SIZE = int(os.getenv("AUDIT_SINK_BATCH_SIZE", "500"))
+AUDIT_SINK_FLUSH_INTERVAL = float(os.getenv("AUDIT_SINK_FLUSH_INTERVAL", "1.0"))
+AUDIT_SINK_CAPACITY = int(os.getenv("AUDIT_SINK_CAPACITY", "10000"))
+AUDIT_SINK_OVERFLOW = os.getenv("AUDIT_SINK_OVERFLOW", "block")  # block | drop | spill
+AUDIT_SINK_SPILL_DIR = os.getenv("AUDIT_SINK_SPILL_DIR", "logs")
+
+OVERFLOW_POLICIES = ("block", "drop", "spill")
+
+
+class BufferedAuditSink:
+    """
+    Буферизованная запись журналов операций в MongoDB.
+
+    emit() кладёт запись в кольцевой буфер в памяти и сразу возвращает управление. Фоновый поток
+    записывает буфер пачками через insert_many, когда набирается batch_size записей или проходит
+    flush_interval секунд. При переполнении буфера действует overflow:
+    - "block": emit ждёт, пока поток освободит место (не дольше block_timeout, затем запись отбрасывается);
+    - "drop": отбрасывается самая старая запись буфера;
+    - "spill": запись дописывается в локальный JSONL-файл spill_path.
+    Пачки, которые не удалось записать после повторов, тоже сбрасываются в spill_path (если он задан).
+    """
+
+    def __init__(
+        self,
+        collection: Any,
+        batch_size: int = AUDIT_SINK_BATCH_SIZE,
+        flush_interval: float = AUDIT_SINK_FLUSH_INTERVAL,
+        capacity: int = AUDIT_SINK_CAPACITY,
+        overflow: str = AUDIT_SINK_OVERFLOW,
+        spill_path: Optional[str] = None,
+        block_timeout: Optional[float] = 5.0,
+        max_retries: int = 3,
+        retry_backoff: float = 0.1,
+    ):
+        """
+        :param collection: Коллекция pymongo (или функция, возвращающая её при первой записи).
+        :param batch_size: Записей в одном insert_many.
+        :param flush_interval: Максимальное время ожидания записи в буфере, секунды.
+        :param capacity: Размер кольцевого буфера.
+        :param overflow: Политика переполнения: block, drop или spill.
+        :param spill_path: JSONL-файл для политики spill и для пачек, которые не удалось записать.
+        :param block_timeout: Максимальное ожидание места в буфере для политики block, секунды.
+        :param max_retries: Число повторов insert_many при ошибке.
+        :param retry_backoff: Начальная задержка между повторами, секунды (удваивается).
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        if overflow == "spill" and not spill_path:
+            raise ValueError("The spill overflow policy requires spill_path.")
+
+        self._collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.capacity = capacity
+        self.overflow = overflow
+        self.spill_path = spill_path
+        self.block_timeout = block_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.logger = Logger("BufferedAuditSink")
+
+        self._buffer = deque()
+        self._condition = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._flushing = 0
+        self._closed = False
+        self._flush_requested = False
+        self._metrics = {"emitted": 0, "written": 0, "batches": 0, "dropped": 0, "spilled": 0, "retries": 0}
+
+        self._thread = threading.Thread(target=self._run, name="AuditSinkFlusher", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def collection(self):
+        if callable(self._collection) and not hasattr(self._collection, "insert_many"):
+            self._collection = self._collection()
+        return self._collection
+
+    def emit(self, entry: Dict[str, Any]):
+        """
+        Добавляет запись журнала в буфер.
+
+        :param entry: Документ для вставки.
+        """
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("BufferedAuditSink is closed.")
+            self._metrics["emitted"] += 1
+
+            if len(self._buffer) >= self.capacity:
+                if self.overflow == "spill":
+                    self._condition.release()
+                    try:
+                        self._spill([entry])
+                    finally:
+                        self._condition.acquire()
+                    return
+                if self.overflow == "drop":
+                    self._buffer.popleft()
+                    self._metrics["dropped"] += 1
+                else:
+                    self._flush_requested = True
+                    self._condition.notify_all()
+                    if not self._condition.wait_for(lambda: len(self._buffer) < self.capacity, self.block_timeout):
+                        self._metrics["dropped"] += 1
+                        return
+
+            self._buffer.append(entry)
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Ждёт, пока все записи из буфера будут записаны.
+
+        :param timeout: Максимальное время ожидания, секунды.
+        :return: True, если буфер пуст.
+        """
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            return self._condition.wait_for(lambda: not self._buffer and not self._flushing, timeout)
+
+    def close(self):
+        """ Записывает оставшиеся записи и останавливает фоновый поток. """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        atexit.unregister(self.close)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Возвращает счётчики буфера.
+
+        :return: Словарь с глубиной очереди, числом записанных, отброшенных и сброшенных в файл записей.
+        """
+        with self._condition:
+            return dict(self._metrics, queue_depth=len(self._buffer), capacity=self.capacity, overflow=self.overflow)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._closed or self._flush_requested or len(self._buffer) >= self.batch_size,
+                    self.flush_interval,
+                )
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                if not self._buffer:
+                    self._flush_requested = False
+                self._flushing = len(batch)
+                closed = self._closed
+                self._condition.notify_all()  # освободилось место для emit
+
+            if batch:
+                self._write(batch)
+            with self._condition:
+                self._flushing = 0
+                self._condition.notify_all()
+                if closed and not self._buffer:
+                    return
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        """
+        Записывает пачку с повторами; после последней неудачи сбрасывает её остаток в spill_path.
+
+        Повторяются только записи, завершившиеся ошибкой. insert_many проставляет _id документам, поэтому
+        ошибка дубликата ключа (11000) при повторе означает, что запись уже есть в коллекции.
+        """
+        from pymongo.errors import BulkWriteError, PyMongoError
+
+        pending = batch
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.collection.insert_many(pending, ordered=False)
+                failed = []
+            except BulkWriteError as e:
+                if e.details.get("writeConcernErrors"):
+                    # Подтверждение записи не получено: повторяется вся пачка, уже записанное даст 11000
+                    failed = pending
+                else:
+                    failed = [
+                        pending[error["index"]] for error in e.details.get("writeErrors", []) if error.get("code") != 11000
+                    ]
+                error = e
+            except PyMongoError as e:
+                failed = pending
+                error = e
+
+            with self._condition:
+                self._metrics["written"] += len(pending) - len(failed)
+                self._metrics["batches"] += 1
+            if not failed:
+                return
+            pending = failed
+            if attempt < self.max_retries:
+                with self._condition:
+                    self._metrics["retries"] += 1
+                time.sleep(self.retry_backoff * (2 ** attempt))
+
+        self.logger.error(f"Could not write {len(pending)} audit entries: {error}")
+        if self.spill_path:
+            self._spill(pending)
+        else:
+            with self._condition:
+                self._metrics["dropped"] += len(pending)
+
+    def _spill(self, entries: List[Dict[str, Any]]):
+        """ Дописывает записи в локальный JSONL-файл. """
+        with self._spill_lock:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(entry, default=str) + "\n" for entry in entries)
+        with self._condition:
+            self._metrics["spilled"] += len(entries)
+
+
+_sinks: Dict[str, BufferedAuditSink] = {}
+_sinks_lock = threading.Lock()
+
+
+def get_audit_sink(collection_key: str) -> BufferedAuditSink:
+    """
+    Возвращает общий буфер для коллекции из mongo_client.COLLECTIONS, создавая его при первом вызове.
+
+    :param collection_key: Ключ коллекции (например, "logs_collection").
+    """
+    if collection_key not in _sinks:
+        with _sinks_lock:
+            if collection_key not in _sinks:
+                from infrastructure.database import mongo_client
+
+                _sinks[collection_key] = BufferedAuditSink(
+                    lambda: getattr(mongo_client, collection_key),
+                    spill_path=os.path.join(AUDIT_SINK_SPILL_DIR, f"{collection_key}_spill.jsonl"),
+                )
+    return _sinks[collection_key]
+
+
+def set_audit_sink(collection_key: str, sink: Optional[BufferedAuditSink]):
+    """ Подменяет буфер коллекции (например, в тестах). None удаляет его. """
+    with _sinks_lock:
+        previous = _sinks.pop(collection_key, None)
+        if sink is not None:
+            _sinks[collection_key] = sink
+    if previous is not None and previous is not sink:
+        previous.close()
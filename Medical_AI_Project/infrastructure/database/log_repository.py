@@ -1,4 +1,4 @@
-from .mongo_client import logs_collection
+from infrastructure.database.audit_sink import get_audit_sink
 from datetime import datetime
 
 class LogRepository:
@@ -9,12 +9,11 @@ class LogRepository:
     @staticmethod
     def log_operation(action: str, details: str):
         """
-        Логирует операцию в MongoDB.
+        Логирует операцию в MongoDB (через буфер: запись выполняется пачками в фоновом потоке).
         """
         log_entry = {
             "action": action,
             "details": details,
             "timestamp": datetime.utcnow(),
         }
-        logs_collection.insert_one(log_entry)
-        print(f"🔍 Log recorded: {action}")
+        get_audit_sink("logs_collection").emit(log_entry)
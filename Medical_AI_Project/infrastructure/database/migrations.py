@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+from typing import Callable, List, Tuple
+from infrastructure.database.mongo_client import COLLECTIONS
+
+# Коллекция, в которой хранятся применённые версии миграций
+MIGRATIONS_COLLECTION = "schema_migrations"
+
+
+def _patients_patient_id_index(db):
+    db[COLLECTIONS["patients_collection"]].create_index("patient_id", unique=True)
+
+
+def _audit_logs_timestamp_index(db):
+    db[COLLECTIONS["audit_logs_collection"]].create_index("timestamp")
+    db[COLLECTIONS["logs_collection"]].create_index("timestamp")
+
+
+def _cache_ttl_index(db):
+    # Документ удаляется, когда наступает его expires_at
+    db[COLLECTIONS["cache_collection"]].create_index("expires_at", expireAfterSeconds=0)
+
+
+# Миграции применяются по порядку; уже применённая версия не выполняется повторно.
+# Новые миграции добавляются только в конец списка.
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "unique index on patient_records.patient_id", _patients_patient_id_index),
+    (2, "timestamp index on audit_logs and logs", _audit_logs_timestamp_index),
+    (3, "TTL index on cache.expires_at", _cache_ttl_index),
+]
+
+
+def run_migrations(db, migrations: List[Tuple[int, str, Callable]] = None) -> List[int]:
+    """
+    Применяет миграции, которых ещё нет в коллекции schema_migrations.
+
+    :param db: База данных MongoDB.
+    :param migrations: Список (версия, описание, функция); по умолчанию MIGRATIONS.
+    :return: Список применённых в этом запуске версий.
+    """
+    migrations = MIGRATIONS if migrations is None else migrations
+    history = db[MIGRATIONS_COLLECTION]
+    applied_versions = {doc["_id"] for doc in history.find({}, {"_id": 1})}
+
+    applied = []
+    for version, description, migrate in sorted(migrations, key=lambda migration: migration[0]):
+        if version in applied_versions:
+            continue
+        migrate(db)
+        history.insert_one({"_id": version, "description": description, "applied_at": datetime.now(timezone.utc)})
+        applied.append(version)
+    return applied
+
+
+# Запуск: python -m infrastructure.database.migrations
+if __name__ == "__main__":
+    from infrastructure.database.mongo_client import get_db
+
+    versions = run_migrations(get_db())
+    print(f"✅ Applied migrations: {versions}" if versions else "✅ Database schema is up to date.")
@@ -1,21 +1,124 @@
-from pymongo import MongoClient
 import os
+import threading
 
-# Подключение к MongoDB
+# Подключение к MongoDB (ленивое: клиент создаётся при первом обращении к коллекции)
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-client = MongoClient(MONGO_URI)
-db = client["medical_db"]
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "medical_db")
+
+# Пул соединений и таймауты (на один процесс; при N рабочих процессах на сервер приходит до N * MONGO_MAX_POOL_SIZE соединений)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "0"))  # 0 = без таймаута
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0"))  # 0 = ждать свободное соединение без ограничения
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+MONGO_WRITE_CONCERN_W = os.getenv("MONGO_WRITE_CONCERN_W", "1")
+MONGO_WRITE_CONCERN_J = os.getenv("MONGO_WRITE_CONCERN_J", "")  # "1"/"0", пусто = по умолчанию сервера
 
 # Коллекции в MongoDB
-patients_collection = db["patient_records"]
-diagnoses_collection = db["diagnoses"]
-doctors_collection = db["doctors"]
-appointments_collection = db["appointments"]
-chatbot_interactions_collection = db["chatbot_interactions"]
-medical_notes_collection = db["medical_notes"]
-references_collection = db["references"]
-audit_logs_collection = db["audit_logs"]
-cache_collection = db["cache"]
-
-# Индексы
-patients_collection.create_index("patient_id", unique=True)
+COLLECTIONS = {
+    "patients_collection": "patient_records",
+    "diagnoses_collection": "diagnoses",
+    "doctors_collection": "doctors",
+    "appointments_collection": "appointments",
+    "chatbot_interactions_collection": "chatbot_interactions",
+    "medical_notes_collection": "medical_notes",
+    "references_collection": "references",
+    "audit_logs_collection": "audit_logs",
+    "logs_collection": "logs",
+    "cache_collection": "cache",
+}
+
+_client = None
+_pool_metrics = None
+_client_lock = threading.Lock()
+
+
+def get_client_options() -> dict:
+    """
+    Собирает параметры MongoClient из конфигурации.
+
+    :return: Именованные аргументы для MongoClient.
+    """
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "readPreference": MONGO_READ_PREFERENCE,
+        "w": int(MONGO_WRITE_CONCERN_W) if MONGO_WRITE_CONCERN_W.isdigit() else MONGO_WRITE_CONCERN_W,
+    }
+    if MONGO_SOCKET_TIMEOUT_MS > 0:
+        options["socketTimeoutMS"] = MONGO_SOCKET_TIMEOUT_MS
+    if MONGO_WAIT_QUEUE_TIMEOUT_MS > 0:
+        options["waitQueueTimeoutMS"] = MONGO_WAIT_QUEUE_TIMEOUT_MS
+    if MONGO_WRITE_CONCERN_J:
+        options["journal"] = MONGO_WRITE_CONCERN_J == "1"
+    return options
+
+
+def get_client():
+    """
+    Возвращает общий MongoClient, создавая его при первом вызове.
+    pymongo импортируется тоже только здесь. Соединения открываются при первом запросе (connect=False).
+    """
+    global _client, _pool_metrics
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from pymongo import MongoClient
+                from infrastructure.database.pool_metrics import PoolMetricsListener
+                _pool_metrics = PoolMetricsListener()
+                _client = MongoClient(MONGO_URI, connect=False, event_listeners=[_pool_metrics], **get_client_options())
+    return _client
+
+
+def get_pool_metrics() -> dict:
+    """
+    Метрики пула соединений: выдачи, время ожидания соединения, занятые соединения.
+    Клиент при этом не создаётся.
+
+    :return: Словарь метрик (пустой, если клиент ещё не создан).
+    """
+    if _pool_metrics is None:
+        return {}
+    return dict(_pool_metrics.get_metrics(), max_pool_size=MONGO_MAX_POOL_SIZE)
+
+
+def get_db():
+    """ Возвращает базу данных приложения. """
+    return get_client()[MONGO_DB_NAME]
+
+
+def get_collection(name: str):
+    """
+    Возвращает коллекцию по имени в MongoDB.
+
+    :param name: Имя коллекции (например, "patient_records").
+    """
+    return get_db()[name]
+
+
+def init_db():
+    """
+    Применяет миграции схемы (индексы). Вызывается явно при развёртывании, а не при импорте модуля
+    или старте каждого процесса.
+
+    :return: Список применённых версий миграций.
+    """
+    from infrastructure.database.migrations import run_migrations
+    return run_migrations(get_db())
+
+
+def __getattr__(name: str):
+    """ Ленивый доступ к коллекциям: `from mongo_client import patients_collection` продолжает работать. """
+    if name == "client":
+        return get_client()
+    if name == "db":
+        return get_db()
+    if name in COLLECTIONS:
+        return get_collection(COLLECTIONS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
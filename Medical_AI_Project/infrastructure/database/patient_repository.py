@@ -1,21 +1,50 @@
+import os
+import threading
 from infrastructure.database.mongo_client import patients_collection
-from datetime import datetime
+from infrastructure.database.write_behind import WriteBehindBuffer, diagnosis_fields
 from pymongo.errors import PyMongoError
 
 class PatientRepository:
     """ Репозиторий для работы с пациентами в MongoDB. """
 
-    @staticmethod
-    def save_diagnosis(patient_id, diagnosis, confidence):
-        """ Сохраняет диагноз пациента в БД. """
+    # "sync" — update_one на каждый диагноз, "write_behind" — отложенная пакетная запись
+    WRITE_MODE = os.getenv("DIAGNOSIS_WRITE_MODE", "sync")
+    _write_behind = None
+    _write_behind_lock = threading.Lock()
+
+    @classmethod
+    def configure_write_behind(cls, enabled: bool = True, collection=None, **options):
+        """
+        Включает или выключает отложенную запись диагнозов. Предыдущий буфер сбрасывается в БД.
+
+        :param enabled: Включить write-behind.
+        :param collection: Коллекция (по умолчанию patients_collection).
+        :param options: Параметры WriteBehindBuffer (max_batch_size, flush_interval, ...).
+        :return: Буфер или None.
+        """
+        if cls._write_behind is not None:
+            cls._write_behind.close()
+            cls._write_behind = None
+        if enabled:
+            cls._write_behind = WriteBehindBuffer(collection if collection is not None else patients_collection, **options)
+        cls.WRITE_MODE = "write_behind" if enabled else "sync"
+        return cls._write_behind
+
+    @classmethod
+    def save_diagnosis(cls, patient_id, diagnosis, confidence):
+        """ Сохраняет диагноз пациента в БД (в режиме write_behind — через буфер, без ожидания MongoDB). """
+        if cls.WRITE_MODE == "write_behind":
+            if cls._write_behind is None:
+                with cls._write_behind_lock:
+                    if cls._write_behind is None:
+                        cls.configure_write_behind()
+            cls._write_behind.enqueue(patient_id, diagnosis_fields(diagnosis, confidence))
+            return
+
         try:
             patients_collection.update_one(
                 {"patient_id": patient_id},
-                {"$set": {
-                    "diagnosis": diagnosis,
-                    "confidence": confidence,
-                    "updated_at": datetime.utcnow()
-                }},
+                {"$set": diagnosis_fields(diagnosis, confidence)},
                 upsert=True
             )
         except PyMongoError as e:
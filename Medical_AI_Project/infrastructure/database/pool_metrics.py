@@ -0,0 +1,86 @@
+import threading
+from typing import Any, Dict
+from pymongo import monitoring
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """
+    Счётчики пула соединений MongoDB: выдачи соединений, время ожидания соединения и число занятых соединений.
+    Помогают подобрать размер пула на один рабочий процесс.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {
+            "checkouts": 0,
+            "checkout_failures": 0,
+            "checkins": 0,
+            "connections_created": 0,
+            "connections_closed": 0,
+            "pool_clears": 0,
+        }
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._in_use = 0
+        self._max_in_use = 0
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self._counters["checkouts"] += 1
+            self._in_use += 1
+            self._max_in_use = max(self._max_in_use, self._in_use)
+            if event.duration is not None:
+                self._wait_total += event.duration
+                self._wait_max = max(self._wait_max, event.duration)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._counters["checkout_failures"] += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._counters["checkins"] += 1
+            self._in_use -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self._counters["connections_created"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self._counters["connections_closed"] += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._counters["pool_clears"] += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Возвращает счётчики пула.
+
+        :return: Словарь с числом выдач, средним и максимальным ожиданием (мс) и занятыми соединениями.
+        """
+        with self._lock:
+            checkouts = self._counters["checkouts"]
+            return dict(
+                self._counters,
+                in_use=self._in_use,
+                max_in_use=self._max_in_use,
+                avg_wait_ms=round(self._wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+                max_wait_ms=round(self._wait_max * 1000, 3),
+            )
@@ -0,0 +1,213 @@
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from modules.common.logger import Logger
+
+# Настройки по умолчанию (переопределяются через переменные окружения)
+WRITE_BEHIND_MAX_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_MAX_BATCH_SIZE", "500"))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.5"))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))
+WRITE_BEHIND_MAX_RETRIES = int(os.getenv("WRITE_BEHIND_MAX_RETRIES", "5"))
+
+
+class WriteBehindBuffer:
+    """
+    Отложенная запись upsert'ов в коллекцию MongoDB.
+
+    enqueue() только кладёт изменения в буфер и сразу возвращает управление. Фоновый поток сбрасывает
+    буфер неупорядоченным bulk_write, когда набирается max_batch_size документов или проходит
+    flush_interval секунд. Несколько обновлений одного ключа внутри окна объединяются в одно
+    (более поздние поля побеждают). Неудачные операции повторяются с экспоненциальной задержкой,
+    при остановке буфер сбрасывается полностью.
+    """
+
+    def __init__(
+        self,
+        collection: Any,
+        key_field: str = "patient_id",
+        max_batch_size: int = WRITE_BEHIND_MAX_BATCH_SIZE,
+        flush_interval: float = WRITE_BEHIND_FLUSH_INTERVAL,
+        max_pending: int = WRITE_BEHIND_MAX_PENDING,
+        max_retries: int = WRITE_BEHIND_MAX_RETRIES,
+        retry_backoff: float = 0.1,
+    ):
+        """
+        :param collection: Коллекция pymongo (или функция, возвращающая её при первом сбросе).
+        :param key_field: Поле, по которому выполняется upsert и объединение обновлений.
+        :param max_batch_size: Размер пачки, при котором буфер сбрасывается сразу.
+        :param flush_interval: Максимальное время ожидания записи в буфере, секунды.
+        :param max_pending: Максимум различных ключей в буфере; при переполнении enqueue ждёт сброса.
+        :param max_retries: Число повторов пачки при ошибке.
+        :param retry_backoff: Начальная задержка между повторами, секунды (удваивается).
+        """
+        self._collection = collection
+        self.key_field = key_field
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.logger = Logger("WriteBehindBuffer")
+
+        self._pending: Dict[Any, Dict[str, Any]] = {}
+        self._condition = threading.Condition()
+        self._flushing = 0  # документов в пачке, которая сейчас записывается
+        self._closed = False
+        self._flush_requested = False
+        self._metrics = {"enqueued": 0, "coalesced": 0, "written": 0, "batches": 0, "retries": 0, "failed": 0}
+
+        self._thread = threading.Thread(target=self._run, name="WriteBehindFlusher", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def collection(self):
+        if callable(self._collection) and not hasattr(self._collection, "bulk_write"):
+            self._collection = self._collection()
+        return self._collection
+
+    def enqueue(self, key: Any, fields: Dict[str, Any]):
+        """
+        Добавляет upsert {key_field: key} -> {"$set": fields} в буфер.
+
+        :param key: Значение ключевого поля (patient_id).
+        :param fields: Поля для $set.
+        """
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("WriteBehindBuffer is closed.")
+            while key not in self._pending and len(self._pending) >= self.max_pending:
+                self._flush_requested = True
+                self._condition.notify_all()
+                self._condition.wait()
+            if key in self._pending:
+                self._pending[key].update(fields)
+                self._metrics["coalesced"] += 1
+            else:
+                self._pending[key] = dict(fields)
+            self._metrics["enqueued"] += 1
+            if len(self._pending) >= self.max_batch_size:
+                self._condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Ждёт, пока все накопленные обновления будут записаны.
+
+        :param timeout: Максимальное время ожидания, секунды.
+        :return: True, если буфер пуст.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending or self._flushing:
+                self._flush_requested = True
+                self._condition.notify_all()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self):
+        """ Записывает оставшиеся обновления и останавливает фоновый поток. """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        atexit.unregister(self.close)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Возвращает счётчики буфера.
+
+        :return: Словарь с числом поставленных, объединённых, записанных и потерянных обновлений.
+        """
+        with self._condition:
+            return dict(self._metrics, pending=len(self._pending), flushing=self._flushing)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._closed and not self._flush_requested and len(self._pending) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch, self._pending = self._pending, {}
+                self._flush_requested = False
+                self._flushing = len(batch)
+                closed = self._closed
+                self._condition.notify_all()  # освободилось место для enqueue
+
+            if batch:
+                self._write(batch)
+            with self._condition:
+                self._flushing = 0
+                self._condition.notify_all()
+                if closed and not self._pending:
+                    return
+
+    def _write(self, batch: Dict[Any, Dict[str, Any]]):
+        """ Записывает пачку с повторами: повторяются только операции, завершившиеся ошибкой. """
+        from pymongo import UpdateOne
+        from pymongo.errors import BulkWriteError, PyMongoError
+
+        keys: List[Any] = list(batch)
+        for size in range(0, len(keys), self.max_batch_size):
+            chunk = keys[size:size + self.max_batch_size]
+            attempt = 0
+            while chunk:
+                operations = [
+                    UpdateOne({self.key_field: key}, {"$set": batch[key]}, upsert=True) for key in chunk
+                ]
+                try:
+                    self.collection.bulk_write(operations, ordered=False)
+                    failed = []
+                except BulkWriteError as e:
+                    if e.details.get("writeConcernErrors"):
+                        # Запись не подтверждена: повторяется вся часть, upsert с $set идемпотентен
+                        failed = chunk
+                    else:
+                        failed = [chunk[error["index"]] for error in e.details.get("writeErrors", [])]
+                    error_message = str(e)
+                except PyMongoError as e:
+                    failed = chunk
+                    error_message = str(e)
+
+                with self._condition:
+                    self._metrics["written"] += len(chunk) - len(failed)
+                    self._metrics["batches"] += 1
+                if not failed:
+                    break
+                if attempt >= self.max_retries:
+                    self.logger.error(f"Dropping {len(failed)} writes after {attempt} retries: {error_message}")
+                    with self._condition:
+                        self._metrics["failed"] += len(failed)
+                    break
+
+                time.sleep(self.retry_backoff * (2 ** attempt))
+                attempt += 1
+                with self._condition:
+                    self._metrics["retries"] += 1
+                chunk = failed
+
+
+def diagnosis_fields(diagnosis: str, confidence: float) -> Dict[str, Any]:
+    """ Поля $set для сохранения диагноза. """
+    return {"diagnosis": diagnosis, "confidence": confidence, "updated_at": datetime.utcnow()}
+
+
+# Example Usage
+if __name__ == "__main__":
+    from infrastructure.database import mongo_client
+
+    buffer = WriteBehindBuffer(lambda: mongo_client.patients_collection)
+    for i in range(10):
+        buffer.enqueue(i % 3, diagnosis_fields("Flu", 0.9))
+    buffer.close()
+    print(buffer.get_metrics())
@@ -0,0 +1,406 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# Настройки очереди заданий
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "sqlite")  # sqlite | redis | memory
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "data/jobs.sqlite3")
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))  # задание возвращается в очередь, если воркер не ответил
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RESULT_TTL_SECONDS = int(os.getenv("JOB_RESULT_TTL_SECONDS", str(7 * 24 * 3600)))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Статусы заданий
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+LEASE_EXPIRED_ERROR = "Lease expired after the last attempt"  # ошибка задания, воркер которого не ответил max_attempts раз
+
+
+class Job:
+    """ Задание, выданное воркеру. """
+
+    __slots__ = ("job_id", "payload", "attempts")
+
+    def __init__(self, job_id: str, payload: Dict[str, Any], attempts: int):
+        self.job_id = job_id
+        self.payload = payload
+        self.attempts = attempts
+
+
+class IJobQueue(ABC):
+    """
+    Долговременная очередь заданий диагностики.
+
+    Доставка at-least-once: выданное задание арендуется на lease_seconds. Если воркер не завершил его
+    за это время (упал или завис), задание снова выдаётся, пока не исчерпаны max_attempts; после этого
+    при следующей выдаче оно помечается failed с ошибкой LEASE_EXPIRED_ERROR.
+    """
+
+    def __init__(self, lease_seconds: float = JOB_LEASE_SECONDS, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    @staticmethod
+    def new_job_id() -> str:
+        return uuid.uuid4().hex
+
+    @abstractmethod
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        """ Ставит задание в очередь и возвращает его идентификатор. """
+        pass
+
+    @abstractmethod
+    def claim(self, max_jobs: int) -> List[Job]:
+        """ Выдаёт до max_jobs заданий в порядке постановки, арендуя их на lease_seconds. """
+        pass
+
+    @abstractmethod
+    def complete(self, job_id: str, result: Any):
+        """ Сохраняет результат задания. """
+        pass
+
+    @abstractmethod
+    def fail(self, job_id: str, error: str):
+        """ Возвращает задание в очередь или помечает его ошибочным, если попытки исчерпаны. """
+        pass
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """ Состояние задания: status, result, error, attempts, created_at, updated_at; None, если его нет. """
+        pass
+
+    @abstractmethod
+    def depth(self) -> int:
+        """ Число заданий, ожидающих выдачи. """
+        pass
+
+
+class InMemoryJobQueue(IJobQueue):
+    """ Очередь в памяти процесса для тестов и локального запуска без внешних сервисов. """
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        job_id = self.new_job_id()
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = {
+                "job_id": job_id, "status": QUEUED, "payload": payload, "result": None, "error": None,
+                "attempts": 0, "created_at": now, "updated_at": now, "lease_until": None,
+            }
+        return job_id
+
+    def claim(self, max_jobs: int) -> List[Job]:
+        now = time.time()
+        claimed = []
+        with self._lock:
+            for job in self._jobs.values():
+                if len(claimed) >= max_jobs:
+                    break
+                expired = job["status"] == RUNNING and job["lease_until"] < now
+                if expired and job["attempts"] >= self.max_attempts:
+                    job.update(status=FAILED, error=LEASE_EXPIRED_ERROR, lease_until=None, updated_at=now)
+                elif job["status"] == QUEUED or expired:
+                    job.update(status=RUNNING, lease_until=now + self.lease_seconds, updated_at=now)
+                    job["attempts"] += 1
+                    claimed.append(Job(job["job_id"], job["payload"], job["attempts"]))
+        return claimed
+
+    def complete(self, job_id: str, result: Any):
+        with self._lock:
+            self._jobs[job_id].update(status=DONE, result=result, lease_until=None, updated_at=time.time())
+
+    def fail(self, job_id: str, error: str):
+        with self._lock:
+            job = self._jobs[job_id]
+            status = FAILED if job["attempts"] >= self.max_attempts else QUEUED
+            job.update(status=status, error=error, lease_until=None, updated_at=time.time())
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {key: job[key] for key in ("job_id", "status", "result", "error", "attempts", "created_at", "updated_at")}
+
+    def depth(self) -> int:
+        with self._lock:
+            return sum(job["status"] == QUEUED for job in self._jobs.values())
+
+
+class SQLiteJobQueue(IJobQueue):
+    """
+    Очередь в файле SQLite. Файл могут одновременно использовать веб-процессы и воркеры на одной машине:
+    выдача заданий идёт в транзакции BEGIN IMMEDIATE, поэтому одно задание не достаётся двум воркерам.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            result TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            lease_until REAL
+        );
+        CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_PATH, **options):
+        """
+        :param path: Файл базы данных.
+        """
+        super().__init__(**options)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """ Соединение своё у каждого потока и процесса (после fork соединение родителя не используется). """
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        job_id = self.new_job_id()
+        now = time.time()
+        self._connection().execute(
+            "INSERT INTO jobs (job_id, status, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, QUEUED, json.dumps(payload), now, now),
+        )
+        return job_id
+
+    def claim(self, max_jobs: int) -> List[Job]:
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_until = NULL, updated_at = ?"
+                " WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (FAILED, LEASE_EXPIRED_ERROR, now, RUNNING, now, self.max_attempts),
+            )
+            rows = connection.execute(
+                "SELECT job_id, payload, attempts FROM jobs"
+                " WHERE status = ? OR (status = ? AND lease_until < ?) ORDER BY created_at LIMIT ?",
+                (QUEUED, RUNNING, now, max_jobs),
+            ).fetchall()
+            connection.executemany(
+                "UPDATE jobs SET status = ?, lease_until = ?, attempts = attempts + 1, updated_at = ? WHERE job_id = ?",
+                [(RUNNING, now + self.lease_seconds, now, row[0]) for row in rows],
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return [Job(job_id, json.loads(payload), attempts + 1) for job_id, payload, attempts in rows]
+
+    def complete(self, job_id: str, result: Any):
+        self._connection().execute(
+            "UPDATE jobs SET status = ?, result = ?, lease_until = NULL, updated_at = ? WHERE job_id = ?",
+            (DONE, json.dumps(result), time.time(), job_id),
+        )
+
+    def fail(self, job_id: str, error: str):
+        self._connection().execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, error = ?, lease_until = NULL,"
+            " updated_at = ? WHERE job_id = ?",
+            (self.max_attempts, FAILED, QUEUED, error, time.time(), job_id),
+        )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT job_id, status, result, error, attempts, created_at, updated_at FROM jobs WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(("job_id", "status", "result", "error", "attempts", "created_at", "updated_at"), row))
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def depth(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+
+
+class RedisJobQueue(IJobQueue):
+    """
+    Очередь в Redis для нескольких машин: список jobs:queue с идентификаторами, список jobs:processing
+    с выданными заданиями и хэш job:<id> с состоянием. Выдача и возврат просроченных аренд выполняются
+    Lua-скриптами: перенос между списками и запись аренды атомарны, поэтому падение воркера между ними
+    не оставляет задание в jobs:processing без аренды. Просроченные аренды возвращаются в очередь при
+    следующей выдаче, а исчерпавшие max_attempts помечаются failed.
+    """
+
+    QUEUE_KEY = "jobs:queue"
+    PROCESSING_KEY = "jobs:processing"
+    JOB_KEY_PREFIX = "job:"
+
+    # KEYS: очередь, выданные; ARGV: префикс хэшей, статус, время, срок аренды, максимум заданий
+    CLAIM_SCRIPT = """
+        local claimed = {}
+        for _ = 1, tonumber(ARGV[5]) do
+            local job_id = redis.call('LMOVE', KEYS[1], KEYS[2], 'RIGHT', 'LEFT')
+            if not job_id then
+                break
+            end
+            local key = ARGV[1] .. job_id
+            local attempts = redis.call('HINCRBY', key, 'attempts', 1)
+            redis.call('HSET', key, 'status', ARGV[2], 'lease_until', tonumber(ARGV[3]) + tonumber(ARGV[4]),
+                'updated_at', ARGV[3])
+            table.insert(claimed, job_id)
+            table.insert(claimed, attempts)
+            table.insert(claimed, redis.call('HGET', key, 'payload'))
+        end
+        return claimed
+    """
+
+    # KEYS: выданные, очередь; ARGV: префикс хэшей, время, максимум попыток, статус и ошибка исчерпанного
+    # задания, срок хранения результата. Задание без аренды тоже считается просроченным.
+    REQUEUE_SCRIPT = """
+        local requeued = 0
+        for _, job_id in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+            local key = ARGV[1] .. job_id
+            local lease_until = redis.call('HGET', key, 'lease_until')
+            if (not lease_until or tonumber(lease_until) < tonumber(ARGV[2]))
+                    and redis.call('LREM', KEYS[1], 1, job_id) > 0 then
+                if tonumber(redis.call('HGET', key, 'attempts') or 0) >= tonumber(ARGV[3]) then
+                    redis.call('HSET', key, 'status', ARGV[4], 'error', ARGV[5], 'updated_at', ARGV[2])
+                    redis.call('HDEL', key, 'lease_until')
+                    redis.call('EXPIRE', key, ARGV[6])
+                else
+                    redis.call('RPUSH', KEYS[2], job_id)
+                    requeued = requeued + 1
+                end
+            end
+        end
+        return requeued
+    """
+
+    def __init__(self, client=None, result_ttl: int = JOB_RESULT_TTL_SECONDS, **options):
+        """
+        :param client: Клиент Redis (по умолчанию создаётся из REDIS_URL при первом обращении).
+        :param result_ttl: Сколько секунд хранится завершённое задание.
+        """
+        super().__init__(**options)
+        self.client = client
+        self.result_ttl = result_ttl
+        self._claim_script = None
+        self._requeue_script = None
+
+    def _client(self):
+        if self.client is None:
+            import redis
+            self.client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+        if self._claim_script is None:
+            self._claim_script = self.client.register_script(self.CLAIM_SCRIPT)
+            self._requeue_script = self.client.register_script(self.REQUEUE_SCRIPT)
+        return self.client
+
+    @classmethod
+    def _job_key(cls, job_id: str) -> str:
+        return f"{cls.JOB_KEY_PREFIX}{job_id}"
+
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        job_id = self.new_job_id()
+        now = time.time()
+        pipe = self._client().pipeline()
+        pipe.hset(self._job_key(job_id), mapping={
+            "status": QUEUED, "payload": json.dumps(payload), "attempts": 0, "created_at": now, "updated_at": now,
+        })
+        pipe.lpush(self.QUEUE_KEY, job_id)
+        pipe.execute()
+        return job_id
+
+    def requeue_expired(self):
+        """ Возвращает в очередь задания, аренда которых истекла или не была записана; исчерпавшие попытки — failed. """
+        self._client()
+        self._requeue_script(
+            keys=[self.PROCESSING_KEY, self.QUEUE_KEY],
+            args=[self.JOB_KEY_PREFIX, time.time(), self.max_attempts, FAILED, LEASE_EXPIRED_ERROR, self.result_ttl],
+        )
+
+    def claim(self, max_jobs: int) -> List[Job]:
+        self.requeue_expired()
+        response = self._claim_script(
+            keys=[self.QUEUE_KEY, self.PROCESSING_KEY],
+            args=[self.JOB_KEY_PREFIX, RUNNING, time.time(), self.lease_seconds, max_jobs],
+        )
+        return [
+            Job(response[i], json.loads(response[i + 2]), int(response[i + 1])) for i in range(0, len(response), 3)
+        ]
+
+    def complete(self, job_id: str, result: Any):
+        key = self._job_key(job_id)
+        pipe = self._client().pipeline()
+        pipe.hset(key, mapping={"status": DONE, "result": json.dumps(result), "updated_at": time.time()})
+        pipe.hdel(key, "lease_until")
+        pipe.lrem(self.PROCESSING_KEY, 1, job_id)
+        pipe.expire(key, self.result_ttl)
+        pipe.execute()
+
+    def fail(self, job_id: str, error: str):
+        client = self._client()
+        key = self._job_key(job_id)
+        attempts = int(client.hget(key, "attempts") or 0)
+        status = FAILED if attempts >= self.max_attempts else QUEUED
+        pipe = client.pipeline()
+        pipe.hset(key, mapping={"status": status, "error": error, "updated_at": time.time()})
+        pipe.hdel(key, "lease_until")
+        pipe.lrem(self.PROCESSING_KEY, 1, job_id)
+        if status == QUEUED:
+            pipe.rpush(self.QUEUE_KEY, job_id)
+        else:
+            pipe.expire(key, self.result_ttl)
+        pipe.execute()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._client().hgetall(self._job_key(job_id))
+        if not job:
+            return None
+        return {
+            "job_id": job_id,
+            "status": job["status"],
+            "result": json.loads(job["result"]) if job.get("result") else None,
+            "error": job.get("error"),
+            "attempts": int(job.get("attempts", 0)),
+            "created_at": float(job["created_at"]),
+            "updated_at": float(job["updated_at"]),
+        }
+
+    def depth(self) -> int:
+        return self._client().llen(self.QUEUE_KEY)
+
+
+def create_job_queue(backend: str = JOB_QUEUE_BACKEND) -> IJobQueue:
+    """
+    Создаёт очередь заданий по настройке JOB_QUEUE_BACKEND.
+
+    :param backend: sqlite | redis | memory.
+    """
+    if backend == "sqlite":
+        return SQLiteJobQueue()
+    if backend == "redis":
+        return RedisJobQueue()
+    if backend == "memory":
+        return InMemoryJobQueue()
+    raise ValueError(f"Unsupported job queue backend: {backend}")
@@ -0,0 +1,120 @@
+import ipaddress
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+from modules.common.logger import Logger
+
+# Webhook получает диагнозы пациентов, поэтому отправляется только на явно разрешённые хосты:
+# список через запятую, ".example.com" разрешает и поддомены. Пустой список отключает webhook.
+WEBHOOK_ALLOWED_HOSTS = os.getenv("WEBHOOK_ALLOWED_HOSTS", "")
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "5"))
+WEBHOOK_RETRIES = int(os.getenv("WEBHOOK_RETRIES", "3"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))  # webhook, ожидающих отправки
+
+
+def parse_allowed_hosts(spec: str) -> tuple:
+    return tuple(host.strip().lower() for host in spec.split(",") if host.strip())
+
+
+def validate_callback_url(url: str, allowed_hosts: Optional[tuple] = None) -> str:
+    """
+    Проверяет адрес webhook: схема http(s) и хост из списка разрешённых. Адреса loopback, частных
+    и служебных сетей разрешаются только явным указанием IP в списке.
+
+    :return: Тот же url.
+    :raises ValueError: Адрес не разрешён.
+    """
+    allowed_hosts = parse_allowed_hosts(WEBHOOK_ALLOWED_HOSTS) if allowed_hosts is None else allowed_hosts
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in ("http", "https") or not host:
+        raise ValueError(f"Unsupported callback URL: {url}")
+    if parts.username or parts.password:
+        raise ValueError("Callback URL must not contain credentials")
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        address = None
+    if address is not None:
+        if host in allowed_hosts:
+            return url
+        if not address.is_global:
+            raise ValueError(f"Callback host is not allowed: {host}")
+    if not any(host == allowed or (allowed.startswith(".") and host.endswith(allowed)) for allowed in allowed_hosts):
+        raise ValueError(f"Callback host is not allowed: {host}")
+    return url
+
+
+class WebhookNotifier:
+    """
+    Отправка webhook в отдельном потоке: повторы с паузами не задерживают выдачу и обработку заданий.
+    Очередь ограничена WEBHOOK_QUEUE_SIZE; при переполнении webhook отбрасывается (результат остаётся в задании).
+    """
+
+    def __init__(self, http_client=None, max_pending: int = WEBHOOK_QUEUE_SIZE, retries: int = WEBHOOK_RETRIES):
+        """
+        :param http_client: Клиент с методом post(url, json=..., timeout=...) (по умолчанию httpx).
+        :param max_pending: Максимум webhook в очереди.
+        :param retries: Попыток отправки одного webhook.
+        """
+        self.http_client = http_client
+        self.retries = retries
+        self.logger = Logger("WebhookNotifier")
+        self.dropped = 0
+        self._pending: "queue.Queue" = queue.Queue(max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, url: str, body: Dict[str, Any]):
+        """ Ставит webhook в очередь отправки, не блокируя вызывающий поток. """
+        self._ensure_thread()
+        try:
+            self._pending.put_nowait((url, body))
+        except queue.Full:
+            self.dropped += 1
+            self.logger.error("Очередь webhook переполнена, webhook %s для задания %s отброшен", url, body.get("job_id"))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """ Ждёт отправки всех webhook из очереди; False, если не успели за timeout секунд. """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._pending.all_tasks_done:
+            while self._pending.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._pending.all_tasks_done.wait(remaining)
+        return True
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="WebhookNotifier", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            url, body = self._pending.get()
+            try:
+                self._deliver(url, body)
+            except Exception as e:
+                self.logger.error("Webhook %s не отправлен: %s", url, e)
+            finally:
+                self._pending.task_done()
+
+    def _deliver(self, url: str, body: Dict[str, Any]):
+        if self.http_client is None:
+            import httpx
+            self.http_client = httpx.Client(follow_redirects=False)
+        for attempt in range(self.retries):
+            try:
+                response = self.http_client.post(url, json=body, timeout=WEBHOOK_TIMEOUT)
+                if response.status_code < 500:
+                    return
+            except Exception as e:
+                self.logger.warning("Webhook %s для задания %s не доставлен: %s", url, body.get("job_id"), e)
+            if attempt + 1 < self.retries:
+                time.sleep(0.5 * 2 ** attempt)
+        self.logger.error("Webhook %s для задания %s не доставлен после %d попыток", url, body.get("job_id"), self.retries)
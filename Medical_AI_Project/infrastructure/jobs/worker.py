@@ -0,0 +1,166 @@
+import argparse
+import multiprocessing
+import os
+import threading
+from typing import Any, Dict, List, Optional
+from core.entities.medical_case import MedicalCase
+from infrastructure.jobs.job_queue import DONE, FAILED, IJobQueue, Job, create_job_queue
+from infrastructure.jobs.webhooks import WebhookNotifier, validate_callback_url
+from modules.common.logger import Logger
+
+# Запуск (отдельно от API, масштабируется независимо):
+#   python -m infrastructure.jobs.worker --processes 4 --batch-size 32
+
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "32"))  # заданий, забираемых из очереди за раз
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+
+
+def to_medical_case(case: Dict[str, Any]) -> MedicalCase:
+    """ Создание объекта медицинского случая из данных задания. """
+    return MedicalCase(
+        patient_id=case["patient_id"],
+        full_name=case["full_name"],
+        passport_id="N/A",
+        phone_number="N/A",
+        address="N/A",
+        email="N/A",
+        age=case["age"],
+        gender=case["gender"],
+        symptoms=case["symptoms"],
+        chronic_conditions=case.get("chronic_conditions") or [],
+        medications=case.get("medications") or [],
+        preferred_language=case.get("preferred_language") or "English",
+    )
+
+
+class JobWorker:
+    """
+    Воркер очереди заданий: забирает пачку заданий, диагностирует все их случаи одним вызовом
+    DiagnosePatient.execute_batch, сохраняет результаты и ставит webhook (если он указан) в очередь
+    WebhookNotifier — отправка идёт в отдельном потоке и не задерживает следующую пачку.
+    """
+
+    def __init__(
+        self,
+        queue: IJobQueue,
+        use_case,
+        batch_size: int = JOB_BATCH_SIZE,
+        poll_interval: float = JOB_POLL_INTERVAL,
+        http_client=None,
+        notifier: Optional[WebhookNotifier] = None,
+    ):
+        """
+        :param queue: Очередь заданий.
+        :param use_case: DiagnosePatient.
+        :param batch_size: Максимум заданий в одной пачке.
+        :param poll_interval: Пауза при пустой очереди, в секундах.
+        :param http_client: Клиент с методом post(url, json=..., timeout=...) для webhook (по умолчанию httpx).
+        :param notifier: Отправитель webhook (по умолчанию создаётся с http_client).
+        """
+        self.queue = queue
+        self.use_case = use_case
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.notifier = notifier or WebhookNotifier(http_client)
+        self.logger = Logger("JobWorker")
+        self.processed = 0
+
+    def run_once(self) -> int:
+        """
+        Обрабатывает одну пачку заданий.
+
+        :return: Число обработанных заданий.
+        """
+        jobs = self.queue.claim(self.batch_size)
+        if not jobs:
+            return 0
+
+        # Случаи всех заданий пачки идут в модель одним пакетом; valid хранит задания с корректными данными
+        cases, valid = [], []
+        for job in jobs:
+            try:
+                job_cases = [to_medical_case(case) for case in job.payload["cases"]]
+            except (KeyError, TypeError) as e:
+                self._fail(job, f"Invalid job payload: {e}")
+                continue
+            valid.append((job, len(cases), len(job_cases)))
+            cases.extend(job_cases)
+
+        try:
+            results = self.use_case.execute_batch(cases)
+        except Exception as e:
+            self.logger.error("Пакет из %d заданий не обработан: %s", len(valid), e)
+            for job, _, _ in valid:
+                self._fail(job, str(e))
+            return len(jobs)
+
+        for job, start, count in valid:
+            job_results = results[start:start + count]
+            self.queue.complete(job.job_id, job_results)
+            self._notify(job, {"job_id": job.job_id, "status": DONE, "result": job_results})
+        self.processed += len(jobs)
+        self.logger.info("Обработано заданий: %d (случаев: %d)", len(jobs), len(cases))
+        return len(jobs)
+
+    def run(self, stop: Optional[threading.Event] = None):
+        """ Обрабатывает задания, пока не установлен stop. """
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            if self.run_once() == 0:
+                stop.wait(self.poll_interval)
+
+    def _fail(self, job: Job, error: str):
+        self.queue.fail(job.job_id, error)
+        state = self.queue.get(job.job_id)
+        if state is not None and state["status"] == FAILED:
+            self._notify(job, {"job_id": job.job_id, "status": FAILED, "error": error})
+
+    def _notify(self, job: Job, body: Dict[str, Any]):
+        """ Ставит результат в очередь отправки на callback_url задания; ошибки доставки не влияют на задание. """
+        url = job.payload.get("callback_url")
+        if not url:
+            return
+        try:
+            # Повторная проверка: задание могло попасть в очередь в обход API или до изменения списка хостов
+            validate_callback_url(url)
+        except ValueError as e:
+            self.logger.error("Webhook для задания %s не отправлен: %s", job.job_id, e)
+            return
+        self.notifier.submit(url, body)
+
+
+def _run_worker(args: argparse.Namespace):
+    """ Точка входа процесса воркера: модели загружаются в каждом процессе. """
+    from core.use_cases.diagnose_patient import DiagnosePatient
+    from modules.diagnostics.ai_diagnosis import AIDiagnosisFactory
+    from modules.nlp.nlp_model import NLPModelFactory
+
+    use_case = DiagnosePatient(
+        AIDiagnosisFactory.get_model(args.ai_model_type, args.ai_model_path),
+        NLPModelFactory.get_model(args.nlp_model_type),
+    )
+    JobWorker(create_job_queue(args.backend), use_case, batch_size=args.batch_size).run()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run diagnosis job workers.")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=JOB_BATCH_SIZE)
+    parser.add_argument("--backend", default=os.getenv("JOB_QUEUE_BACKEND", "sqlite"), help="sqlite | redis")
+    parser.add_argument("--ai-model-type", default=os.getenv("AI_MODEL_TYPE", "pytorch"))
+    parser.add_argument("--ai-model-path", default=os.getenv("AI_MODEL_PATH", "models/final/diagnosis_model.pth"))
+    parser.add_argument("--nlp-model-type", default=os.getenv("NLP_MODEL_TYPE", "bert"))
+    args = parser.parse_args(argv)
+
+    if args.processes == 1:
+        _run_worker(args)
+        return
+    processes = [multiprocessing.Process(target=_run_worker, args=(args,), name=f"JobWorker-{i}") for i in range(args.processes)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ from interfaces.api import app
 from infrastructure.database.mongo_client import init_db
 
 if __name__ == "__main__":
-    print("✅ Initializing the database...")
-    init_db()
-    print("✅ Database initialized successfully.")
+    print("✅ Applying database migrations...")
+    applied = init_db()
+    print(f"✅ Database is up to date (applied: {applied}).")
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
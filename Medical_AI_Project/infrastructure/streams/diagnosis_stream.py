@@ -0,0 +1,357 @@
+import bisect
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Настройки потока заданий диагностики
+STREAM_BACKEND = os.getenv("STREAM_BACKEND", "redis")  # redis | sqlite
+STREAM_NAME = os.getenv("STREAM_NAME", "diagnosis")
+STREAM_GROUP = os.getenv("STREAM_GROUP", "inference")
+STREAM_MAXLEN = int(os.getenv("STREAM_MAXLEN", "1000000"))  # приблизительная длина потока в Redis
+STREAM_SQLITE_PATH = os.getenv("STREAM_SQLITE_PATH", "data/streams.sqlite3")
+STREAM_NODES = os.getenv("STREAM_NODES", "")  # узлы для маршрутизации по patient_id, через запятую; пусто = общий поток
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Сообщение потока: (идентификатор, данные)
+Message = Tuple[str, Dict[str, Any]]
+
+
+class HashRing:
+    """
+    Консистентное хэширование ключей по узлам с виртуальными узлами.
+    При добавлении или удалении узла переезжает только около 1/N ключей, остальные пациенты
+    остаются на своих узлах вместе с их кэшами.
+    """
+
+    def __init__(self, nodes: Iterable[str], replicas: int = 100):
+        """
+        :param nodes: Имена узлов.
+        :param replicas: Виртуальных узлов на один узел (больше — равномернее распределение).
+        """
+        self.replicas = replicas
+        self._hashes: List[int] = []
+        self._nodes: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def add(self, node: str):
+        for i in range(self.replicas):
+            point = self._hash(f"{node}#{i}")
+            position = bisect.bisect(self._hashes, point)
+            self._hashes.insert(position, point)
+            self._nodes.insert(position, node)
+
+    def remove(self, node: str):
+        keep = [(h, n) for h, n in zip(self._hashes, self._nodes) if n != node]
+        self._hashes = [h for h, _ in keep]
+        self._nodes = [n for _, n in keep]
+
+    def node_for(self, key: Any) -> str:
+        """ Узел, отвечающий за ключ. """
+        if not self._hashes:
+            raise ValueError("Hash ring has no nodes")
+        position = bisect.bisect(self._hashes, self._hash(str(key))) % len(self._hashes)
+        return self._nodes[position]
+
+
+class IStreamBackend(ABC):
+    """
+    Поток сообщений с группами потребителей (семантика Redis Streams).
+
+    Каждая группа получает все сообщения потока, внутри группы сообщение достаётся одному потребителю.
+    Сообщение остаётся в списке ожидающих, пока его не подтвердят (ack); сообщения упавшего потребителя
+    забирает другой через claim_stale. Доставка at-least-once.
+    """
+
+    @abstractmethod
+    def add(self, stream: str, payload: Dict[str, Any]) -> str:
+        """ Публикует сообщение и возвращает его идентификатор. """
+        pass
+
+    @abstractmethod
+    def ensure_group(self, stream: str, group: str):
+        """ Создаёт группу потребителей (с начала потока), если её ещё нет. """
+        pass
+
+    @abstractmethod
+    def read_group(self, stream: str, group: str, consumer: str, count: int, block_ms: int = 0) -> List[Message]:
+        """ Выдаёт потребителю до count новых сообщений, ожидая до block_ms, если их нет. """
+        pass
+
+    @abstractmethod
+    def ack(self, stream: str, group: str, message_ids: List[str]):
+        """ Подтверждает обработку сообщений. """
+        pass
+
+    @abstractmethod
+    def claim_stale(self, stream: str, group: str, consumer: str, min_idle_ms: int, count: int) -> List[Message]:
+        """ Передаёт потребителю сообщения, не подтверждённые дольше min_idle_ms. """
+        pass
+
+    @abstractmethod
+    def pending_count(self, stream: str, group: str) -> int:
+        """ Число выданных, но не подтверждённых сообщений. """
+        pass
+
+    @abstractmethod
+    def delivery_counts(self, stream: str, group: str, message_ids: List[str]) -> Dict[str, int]:
+        """ Сколько раз ожидающие сообщения выдавались потребителям (для отправки в dead-letter). """
+        pass
+
+
+class RedisStreamBackend(IStreamBackend):
+    """ Redis Streams: XADD, XREADGROUP, XACK и XAUTOCLAIM. """
+
+    def __init__(self, client=None, maxlen: int = STREAM_MAXLEN):
+        """
+        :param client: Клиент Redis (по умолчанию создаётся из REDIS_URL при первом обращении).
+        :param maxlen: Приблизительная максимальная длина потока.
+        """
+        self.client = client
+        self.maxlen = maxlen
+
+    def _client(self):
+        if self.client is None:
+            import redis
+            self.client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+        return self.client
+
+    def add(self, stream: str, payload: Dict[str, Any]) -> str:
+        return self._client().xadd(stream, {"payload": json.dumps(payload)}, maxlen=self.maxlen, approximate=True)
+
+    def ensure_group(self, stream: str, group: str):
+        import redis
+        try:
+            self._client().xgroup_create(stream, group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def read_group(self, stream: str, group: str, consumer: str, count: int, block_ms: int = 0) -> List[Message]:
+        response = self._client().xreadgroup(group, consumer, {stream: ">"}, count=count, block=block_ms or None)
+        return [(message_id, json.loads(fields["payload"])) for _, messages in response or [] for message_id, fields in messages]
+
+    def ack(self, stream: str, group: str, message_ids: List[str]):
+        if message_ids:
+            self._client().xack(stream, group, *message_ids)
+
+    def claim_stale(self, stream: str, group: str, consumer: str, min_idle_ms: int, count: int) -> List[Message]:
+        response = self._client().xautoclaim(stream, group, consumer, min_idle_ms, start_id="0-0", count=count)
+        return [(message_id, json.loads(fields["payload"])) for message_id, fields in response[1] if fields]
+
+    def pending_count(self, stream: str, group: str) -> int:
+        return self._client().xpending(stream, group)["pending"]
+
+    def delivery_counts(self, stream: str, group: str, message_ids: List[str]) -> Dict[str, int]:
+        pipeline = self._client().pipeline(transaction=False)
+        for message_id in message_ids:
+            pipeline.xpending_range(stream, group, min=message_id, max=message_id, count=1)
+        return {
+            entry["message_id"]: entry["times_delivered"] for entries in pipeline.execute() for entry in entries
+        }
+
+
+class SQLiteStreamBackend(IStreamBackend):
+    """
+    Локальная замена Redis Streams в файле SQLite для разработки и тестов: процессы на одной машине
+    работают с одним файлом, выдача сообщений идёт в транзакциях BEGIN IMMEDIATE.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            stream TEXT NOT NULL,
+            payload TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS messages_stream ON messages (stream, id);
+        CREATE TABLE IF NOT EXISTS groups (
+            stream TEXT NOT NULL,
+            name TEXT NOT NULL,
+            last_id INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (stream, name)
+        );
+        CREATE TABLE IF NOT EXISTS pending (
+            stream TEXT NOT NULL,
+            name TEXT NOT NULL,
+            message_id INTEGER NOT NULL,
+            consumer TEXT NOT NULL,
+            delivered_at REAL NOT NULL,
+            deliveries INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (stream, name, message_id)
+        );
+    """
+
+    POLL_INTERVAL = 0.01
+
+    def __init__(self, path: str = STREAM_SQLITE_PATH):
+        """
+        :param path: Файл базы данных.
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """ Соединение своё у каждого потока и процесса. """
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def _transaction(self, fn):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(connection)
+            connection.execute("COMMIT")
+            return result
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def add(self, stream: str, payload: Dict[str, Any]) -> str:
+        cursor = self._connection().execute(
+            "INSERT INTO messages (stream, payload) VALUES (?, ?)", (stream, json.dumps(payload))
+        )
+        return str(cursor.lastrowid)
+
+    def ensure_group(self, stream: str, group: str):
+        self._connection().execute("INSERT OR IGNORE INTO groups (stream, name) VALUES (?, ?)", (stream, group))
+
+    def read_group(self, stream: str, group: str, consumer: str, count: int, block_ms: int = 0) -> List[Message]:
+        def read(connection):
+            (last_id,) = connection.execute(
+                "SELECT last_id FROM groups WHERE stream = ? AND name = ?", (stream, group)
+            ).fetchone()
+            rows = connection.execute(
+                "SELECT id, payload FROM messages WHERE stream = ? AND id > ? ORDER BY id LIMIT ?", (stream, last_id, count)
+            ).fetchall()
+            if rows:
+                now = time.time()
+                connection.executemany(
+                    "INSERT INTO pending (stream, name, message_id, consumer, delivered_at) VALUES (?, ?, ?, ?, ?)",
+                    [(stream, group, message_id, consumer, now) for message_id, _ in rows],
+                )
+                connection.execute(
+                    "UPDATE groups SET last_id = ? WHERE stream = ? AND name = ?", (rows[-1][0], stream, group)
+                )
+            return [(str(message_id), json.loads(payload)) for message_id, payload in rows]
+
+        deadline = time.monotonic() + block_ms / 1000
+        while True:
+            messages = self._transaction(read)
+            if messages or time.monotonic() >= deadline:
+                return messages
+            time.sleep(self.POLL_INTERVAL)
+
+    def ack(self, stream: str, group: str, message_ids: List[str]):
+        self._connection().executemany(
+            "DELETE FROM pending WHERE stream = ? AND name = ? AND message_id = ?",
+            [(stream, group, int(message_id)) for message_id in message_ids],
+        )
+
+    def claim_stale(self, stream: str, group: str, consumer: str, min_idle_ms: int, count: int) -> List[Message]:
+        def claim(connection):
+            now = time.time()
+            rows = connection.execute(
+                "SELECT m.id, m.payload FROM pending p JOIN messages m ON m.id = p.message_id"
+                " WHERE p.stream = ? AND p.name = ? AND p.delivered_at <= ? ORDER BY m.id LIMIT ?",
+                (stream, group, now - min_idle_ms / 1000, count),
+            ).fetchall()
+            connection.executemany(
+                "UPDATE pending SET consumer = ?, delivered_at = ?, deliveries = deliveries + 1"
+                " WHERE stream = ? AND name = ? AND message_id = ?",
+                [(consumer, now, stream, group, message_id) for message_id, _ in rows],
+            )
+            return [(str(message_id), json.loads(payload)) for message_id, payload in rows]
+
+        return self._transaction(claim)
+
+    def pending_count(self, stream: str, group: str) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM pending WHERE stream = ? AND name = ?", (stream, group)
+        ).fetchone()[0]
+
+    def delivery_counts(self, stream: str, group: str, message_ids: List[str]) -> Dict[str, int]:
+        connection = self._connection()
+        counts = {}
+        for message_id in message_ids:
+            row = connection.execute(
+                "SELECT deliveries FROM pending WHERE stream = ? AND name = ? AND message_id = ?",
+                (stream, group, int(message_id)),
+            ).fetchone()
+            if row is not None:
+                counts[message_id] = row[0]
+        return counts
+
+
+def create_stream_backend(backend: str = STREAM_BACKEND) -> IStreamBackend:
+    """
+    Создаёт бэкенд потока по настройке STREAM_BACKEND.
+
+    :param backend: redis | sqlite.
+    """
+    if backend == "redis":
+        return RedisStreamBackend()
+    if backend == "sqlite":
+        return SQLiteStreamBackend()
+    raise ValueError(f"Unsupported stream backend: {backend}")
+
+
+def message_version(message_id: str) -> str:
+    """
+    Версия результата по идентификатору сообщения: строки сравниваются в порядке публикации
+    (Redis "<ms>-<seq>" и целочисленные идентификаторы SQLite).
+    """
+    milliseconds, _, sequence = str(message_id).partition("-")
+    return f"{int(milliseconds):020d}-{int(sequence or 0):010d}"
+
+
+def stream_for_node(node: Optional[str], base: str = STREAM_NAME) -> str:
+    """ Имя потока узла при маршрутизации по пациентам или общий поток. """
+    return f"{base}:{node}" if node else base
+
+
+class DiagnosisPublisher:
+    """
+    Публикует случаи для диагностики в поток. Если задано кольцо узлов, случай пациента всегда попадает
+    в поток одного узла (patient affinity), и кэши этого пациента на узле остаются тёплыми.
+    """
+
+    def __init__(self, backend: IStreamBackend, base: str = STREAM_NAME, ring: Optional[HashRing] = None):
+        """
+        :param backend: Бэкенд потока.
+        :param base: Имя потока (с маршрутизацией — префикс потоков узлов).
+        :param ring: Кольцо узлов; None — общий поток для всех воркеров.
+        """
+        self.backend = backend
+        self.base = base
+        self.ring = ring
+
+    def stream_for(self, patient_id: Any) -> str:
+        """ Поток, в который попадает случай пациента. """
+        return stream_for_node(self.ring.node_for(patient_id) if self.ring is not None else None, self.base)
+
+    def publish(self, case: Dict[str, Any]) -> str:
+        """
+        Публикует случай.
+
+        :param case: Данные случая (как в запросе /diagnosis).
+        :return: Идентификатор сообщения.
+        """
+        return self.backend.add(self.stream_for(case["patient_id"]), case)
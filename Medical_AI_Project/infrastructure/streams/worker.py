@@ -0,0 +1,288 @@
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+from infrastructure.jobs.worker import to_medical_case
+from infrastructure.streams.diagnosis_stream import (
+    STREAM_GROUP, STREAM_NAME, STREAM_NODES, STREAM_SQLITE_PATH, DiagnosisPublisher, HashRing, IStreamBackend,
+    create_stream_backend, message_version, stream_for_node,
+)
+from modules.common.logger import Logger
+
+# Запуск воркеров узла (без маршрутизации --node не нужен):
+#   python -m infrastructure.streams.worker consume --node node-a --processes 4
+# Публикация случаев из JSONL:
+#   python -m infrastructure.streams.worker publish data/raw/cases.jsonl
+
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "32"))
+STREAM_BLOCK_MS = int(os.getenv("STREAM_BLOCK_MS", "1000"))
+STREAM_CLAIM_IDLE_MS = int(os.getenv("STREAM_CLAIM_IDLE_MS", "60000"))  # сообщения упавшего воркера забираются через это время
+STREAM_MAX_DELIVERIES = int(os.getenv("STREAM_MAX_DELIVERIES", "5"))  # после стольких неудачных доставок — в dead-letter
+STREAM_MAX_BACKOFF = float(os.getenv("STREAM_MAX_BACKOFF", "30"))  # максимальная пауза после ошибки пачки, секунды
+
+
+class SQLiteResultSink:
+    """
+    Локальный приёмник результатов: upsert по patient_id с версией (message_version) сообщения, поэтому
+    повторная доставка не создаёт дубликатов, а запоздавшее более старое сообщение не затирает более новый
+    диагноз. В рабочем режиме используется MongoSink (тот же условный upsert по patient_id).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        connection = self._connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS diagnoses ("
+            " patient_id INTEGER PRIMARY KEY, diagnosis TEXT NOT NULL, confidence REAL NOT NULL, updated_at TEXT NOT NULL,"
+            " version TEXT)"
+        )
+        if "version" not in {row[1] for row in connection.execute("PRAGMA table_info(diagnoses)")}:
+            connection.execute("ALTER TABLE diagnoses ADD COLUMN version TEXT")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def write(self, results: List[dict], versions: Optional[List[str]] = None):
+        """
+        :param results: Результаты execute_batch (ошибки пропускаются).
+        :param versions: Версии результатов; запись с меньшей версией, чем сохранённая, не применяется.
+        """
+        now = datetime.utcnow().isoformat()
+        versions = versions or [None] * len(results)
+        self._connection().executemany(
+            "INSERT INTO diagnoses (patient_id, diagnosis, confidence, updated_at, version) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (patient_id) DO UPDATE SET"
+            " diagnosis = excluded.diagnosis, confidence = excluded.confidence, updated_at = excluded.updated_at,"
+            " version = excluded.version"
+            " WHERE excluded.version IS NULL OR diagnoses.version IS NULL OR excluded.version >= diagnoses.version",
+            [
+                (r["patient_id"], r["diagnosis"], r["confidence"], now, version)
+                for r, version in zip(results, versions) if "error" not in r
+            ],
+        )
+
+    def get(self, patient_id: int) -> Optional[dict]:
+        row = self._connection().execute(
+            "SELECT diagnosis, confidence, version FROM diagnoses WHERE patient_id = ?", (patient_id,)
+        ).fetchone()
+        return dict(zip(("diagnosis", "confidence", "version"), row)) if row else None
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM diagnoses").fetchone()[0]
+
+    def close(self):
+        pass
+
+
+class StreamWorker:
+    """
+    Потребитель потока диагностики в группе: читает пачку сообщений, диагностирует её одним вызовом
+    execute_batch, записывает результаты (идемпотентно, по patient_id) и только после записи подтверждает
+    сообщения. Если воркер упадёт до подтверждения, сообщения заберёт другой потребитель группы.
+
+    Сообщения, диагностика которых завершилась ошибкой, не подтверждаются и доставляются повторно; после
+    max_deliveries доставок (и сразу — некорректные сообщения) они переносятся в поток "<stream>:dead".
+    """
+
+    def __init__(
+        self,
+        backend: IStreamBackend,
+        stream: str,
+        group: str,
+        consumer: str,
+        use_case,
+        sink,
+        batch_size: int = STREAM_BATCH_SIZE,
+        block_ms: int = STREAM_BLOCK_MS,
+        claim_idle_ms: int = STREAM_CLAIM_IDLE_MS,
+        max_deliveries: int = STREAM_MAX_DELIVERIES,
+        max_backoff: float = STREAM_MAX_BACKOFF,
+    ):
+        """
+        :param backend: Бэкенд потока.
+        :param stream: Поток (общий или поток узла).
+        :param group: Группа потребителей.
+        :param consumer: Уникальное имя потребителя.
+        :param use_case: DiagnosePatient.
+        :param sink: Приёмник результатов с методом write(results).
+        :param batch_size: Сообщений в пачке.
+        :param block_ms: Ожидание новых сообщений при пустом потоке.
+        :param claim_idle_ms: Через сколько неподтверждённые сообщения других потребителей забираются.
+        :param max_deliveries: Число доставок сообщения с ошибкой, после которого оно уходит в dead-letter.
+        :param max_backoff: Максимальная пауза после ошибки пачки в run(), секунды.
+        """
+        self.backend = backend
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer
+        self.use_case = use_case
+        self.sink = sink
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries
+        self.max_backoff = max_backoff
+        self.dead_letter_stream = f"{stream}:dead"
+        self.logger = Logger("StreamWorker")
+        self.processed = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self._next_claim = 0.0
+        backend.ensure_group(stream, group)
+
+    def run_once(self, block_ms: Optional[int] = None) -> int:
+        """
+        Обрабатывает одну пачку сообщений.
+
+        :return: Число обработанных сообщений.
+        """
+        messages = []
+        if time.monotonic() >= self._next_claim:
+            messages = self.backend.claim_stale(self.stream, self.group, self.consumer, self.claim_idle_ms, self.batch_size)
+            self._next_claim = time.monotonic() + self.claim_idle_ms / 1000
+        if len(messages) < self.batch_size:
+            messages += self.backend.read_group(
+                self.stream, self.group, self.consumer, self.batch_size - len(messages),
+                self.block_ms if block_ms is None else block_ms,
+            )
+        if not messages:
+            return 0
+
+        cases, case_messages, invalid = [], [], []
+        for message_id, payload in messages:
+            try:
+                cases.append(to_medical_case(payload))
+                case_messages.append((message_id, payload))
+            except Exception as e:
+                # Некорректное сообщение (нет поля, null вместо строки и т. п.) не станет корректным при повторе
+                # и не должно задерживать остальные сообщения пачки: сразу в dead-letter
+                self.logger.error("Некорректное сообщение %s: %s", message_id, e)
+                invalid.append((message_id, payload, f"Invalid message: {e}"))
+
+        results = self.use_case.execute_batch(cases)
+        self.sink.write(results, [message_version(message_id) for message_id, _ in case_messages])
+        done = [message_id for (message_id, _), result in zip(case_messages, results) if "error" not in result]
+        failed = [
+            (message_id, payload, result["error"])
+            for (message_id, payload), result in zip(case_messages, results) if "error" in result
+        ]
+        if failed:
+            deliveries = self.backend.delivery_counts(self.stream, self.group, [message_id for message_id, _, _ in failed])
+            exhausted = [entry for entry in failed if deliveries.get(entry[0], 1) >= self.max_deliveries]
+            invalid += exhausted
+            # Остальные остаются неподтверждёнными и вернутся через claim_stale
+            self.retried += len(failed) - len(exhausted)
+        for message_id, payload, error in invalid:
+            self.backend.add(self.dead_letter_stream, {"message_id": message_id, "payload": payload, "error": error})
+            done.append(message_id)
+        self.dead_lettered += len(invalid)
+
+        self.backend.ack(self.stream, self.group, done)
+        self.processed += len(done)
+        return len(messages)
+
+    def run(self, stop: Optional[threading.Event] = None):
+        """
+        Обрабатывает сообщения, пока не установлен stop.
+
+        Ошибка пачки (модель, приёмник, бэкенд потока) не останавливает воркер: она записывается в журнал,
+        сообщения пачки остаются неподтверждёнными, а следующая попытка выполняется после паузы,
+        удваивающейся до max_backoff.
+        """
+        stop = stop or threading.Event()
+        backoff = 0.0
+        while not stop.is_set():
+            try:
+                self.run_once()
+                backoff = 0.0
+            except Exception as e:
+                backoff = min(max(backoff * 2, 0.1), self.max_backoff)
+                self.logger.error("Ошибка обработки пачки, повтор через %.1f с: %s", backoff, e)
+                stop.wait(backoff)
+
+    def drain(self) -> int:
+        """ Обрабатывает сообщения, пока поток не опустеет; возвращает их число. """
+        total = 0
+        while True:
+            processed = self.run_once(block_ms=0)
+            if processed == 0:
+                return total
+            total += processed
+
+
+def _create_sink(spec: str):
+    """ Приёмник по строке из командной строки: "sqlite:<путь>" или "mongo". """
+    if spec.startswith("sqlite:"):
+        return SQLiteResultSink(spec[len("sqlite:"):])
+    if spec == "mongo":
+        from infrastructure.database import mongo_client
+        from interfaces.cli.diagnose_pipeline import MongoSink
+        return MongoSink(mongo_client.patients_collection)
+    raise ValueError(f"Unknown sink: {spec}")
+
+
+def _consume(args: argparse.Namespace, index: int):
+    """ Точка входа процесса воркера: модели загружаются в каждом процессе. """
+    from core.use_cases.diagnose_patient import DiagnosePatient
+    from modules.diagnostics.ai_diagnosis import AIDiagnosisFactory
+    from modules.nlp.nlp_model import NLPModelFactory
+
+    use_case = DiagnosePatient(
+        AIDiagnosisFactory.get_model(args.ai_model_type, args.ai_model_path),
+        NLPModelFactory.get_model(args.nlp_model_type),
+    )
+    consumer = f"{args.node or socket.gethostname()}-{os.getpid()}-{index}"
+    StreamWorker(
+        create_stream_backend(args.backend), stream_for_node(args.node, args.stream), args.group, consumer,
+        use_case, _create_sink(args.sink), batch_size=args.batch_size,
+    ).run()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Distributed diagnosis workers on a stream with consumer groups.")
+    parser.add_argument("command", choices=["consume", "publish"])
+    parser.add_argument("input", nargs="?", help="JSONL file with cases (publish)")
+    parser.add_argument("--backend", default=os.getenv("STREAM_BACKEND", "redis"), help="redis | sqlite")
+    parser.add_argument("--stream", default=STREAM_NAME)
+    parser.add_argument("--group", default=STREAM_GROUP)
+    parser.add_argument("--node", help="node name when routing by patient (consume)")
+    parser.add_argument("--nodes", default=STREAM_NODES, help="comma-separated nodes for patient affinity (publish)")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=STREAM_BATCH_SIZE)
+    parser.add_argument("--sink", default=f"sqlite:{os.path.splitext(STREAM_SQLITE_PATH)[0]}-results.sqlite3")
+    parser.add_argument("--ai-model-type", default=os.getenv("AI_MODEL_TYPE", "pytorch"))
+    parser.add_argument("--ai-model-path", default=os.getenv("AI_MODEL_PATH", "models/final/diagnosis_model.pth"))
+    parser.add_argument("--nlp-model-type", default=os.getenv("NLP_MODEL_TYPE", "bert"))
+    args = parser.parse_args(argv)
+
+    if args.command == "publish":
+        ring = HashRing(args.nodes.split(",")) if args.nodes else None
+        publisher = DiagnosisPublisher(create_stream_backend(args.backend), args.stream, ring)
+        with open(args.input, encoding="utf-8") as f:
+            count = sum(1 for line in f if line.strip() and publisher.publish(json.loads(line)))
+        print(f"✅ Published {count} cases")
+        return
+
+    processes = [
+        multiprocessing.Process(target=_consume, args=(args, i), name=f"StreamWorker-{i}") for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from infrastructure.database.audit_repository import AuditRepository
+from infrastructure.database.audit_sink import get_audit_sink
 
 
 class LogOperationUseCase:
@@ -8,6 +9,13 @@ class LogOperationUseCase:
 
     def execute(self, action: str, details: str):
         """
-        Выполняет запись лога в БД.
+        Выполняет запись лога в БД (не ждёт MongoDB: запись попадает в буфер BufferedAuditSink).
         """
         AuditRepository.log_operation(action, details)
+
+    @staticmethod
+    def get_metrics() -> dict:
+        """
+        Возвращает метрики буфера журнала: глубину очереди и число отброшенных записей.
+        """
+        return get_audit_sink("audit_logs_collection").get_metrics()
@@ -0,0 +1,208 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+
+class AdmissionRejected(Exception):
+    """
+    Запрос не допущен к инференсу: очередь полосы переполнена (429) или истёк дедлайн ожидания (503).
+    """
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """ Запрос, ожидающий слот в очереди полосы. """
+
+    __slots__ = ("future", "deadline", "enqueued_at", "granted")
+
+    def __init__(self, future: asyncio.Future, deadline: float, enqueued_at: float):
+        self.future = future
+        self.deadline = deadline
+        self.enqueued_at = enqueued_at
+        self.granted = False
+
+
+def parse_lanes(spec: str) -> Dict[str, int]:
+    """
+    Разбирает описание полос вида "urgent:64,routine:256,background:1024".
+    Порядок полос задаёт приоритет: первая обслуживается первой.
+
+    :param spec: Строка с парами имя:размер очереди.
+    :return: Упорядоченный словарь полоса -> максимальная длина очереди.
+    """
+    lanes = OrderedDict()
+    for item in spec.split(","):
+        name, _, size = item.strip().partition(":")
+        lanes[name] = int(size)
+    return lanes
+
+
+class AdmissionController:
+    """
+    Контроль допуска перед инференсом: ограниченное число одновременных диагностик и ограниченная
+    очередь на каждую полосу приоритета.
+
+    Свободный слот отдаётся первому ожидающему из самой приоритетной непустой полосы. Запрос, которому
+    не хватило места в очереди, сразу получает отказ (429), а не ждёт до таймаута клиента. Запрос,
+    чей дедлайн истёк в очереди, снимается с неё (503), поэтому очередь не заполняется работой, результат
+    которой уже никто не ждёт. Работает в одном event loop и не требует блокировок.
+    """
+
+    WAIT_SAMPLES = 1000  # Последних ожиданий на полосу для перцентилей
+
+    def __init__(
+        self, max_concurrent: int, lanes: Dict[str, int], default_deadline: float = 30.0, default_lane: Optional[str] = None
+    ):
+        """
+        :param max_concurrent: Максимум одновременно выполняющихся диагностик.
+        :param lanes: Полоса -> максимальная длина очереди, в порядке убывания приоритета.
+        :param default_deadline: Дедлайн ожидания в очереди по умолчанию, в секундах.
+        :param default_lane: Полоса запросов без явного приоритета; по умолчанию routine, если она есть,
+            иначе средняя по приоритету.
+        :raises ValueError: default_lane не входит в lanes.
+        """
+        self.max_concurrent = max_concurrent
+        self.default_deadline = default_deadline
+        self.lane_limits = OrderedDict(lanes)
+        if default_lane is None:
+            names = list(self.lane_limits)
+            default_lane = "routine" if "routine" in self.lane_limits else names[len(names) // 2]
+        if default_lane not in self.lane_limits:
+            raise ValueError(f"Default lane {default_lane!r} is not one of the configured lanes: {', '.join(self.lane_limits)}")
+        self.default_lane = default_lane
+        self._queues = {lane: deque() for lane in lanes}
+        self._stats = {
+            lane: {"admitted": 0, "rejected": 0, "expired": 0, "waits": deque(maxlen=self.WAIT_SAMPLES)}
+            for lane in lanes
+        }
+        self._in_use = 0
+        self._service_time = 0.0  # Экспоненциальное среднее времени выполнения, с
+
+    @asynccontextmanager
+    async def slot(self, lane: str, deadline: Optional[float] = None):
+        """
+        Занимает слот на время выполнения блока.
+
+        :param lane: Полоса приоритета.
+        :param deadline: Сколько секунд запрос готов ждать в очереди (по умолчанию default_deadline).
+        :raises AdmissionRejected: Очередь переполнена или дедлайн истёк.
+        """
+        await self.acquire(lane, deadline)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self._service_time = elapsed if self._service_time == 0 else 0.9 * self._service_time + 0.1 * elapsed
+            self.release()
+
+    async def acquire(self, lane: str, deadline: Optional[float] = None):
+        """
+        Ждёт свободный слот в очереди полосы.
+
+        :param lane: Полоса приоритета.
+        :param deadline: Максимальное ожидание в секундах.
+        :raises ValueError: Неизвестная полоса.
+        :raises AdmissionRejected: Очередь переполнена или дедлайн истёк.
+        """
+        if lane not in self._queues:
+            raise ValueError(f"Unknown priority lane: {lane}")
+        stats = self._stats[lane]
+        if self._in_use < self.max_concurrent and not self.queued():
+            self._in_use += 1
+            stats["admitted"] += 1
+            stats["waits"].append(0.0)
+            return
+
+        queue = self._queues[lane]
+        if len(queue) >= self.lane_limits[lane]:
+            stats["rejected"] += 1
+            raise AdmissionRejected(429, f"Queue of lane '{lane}' is full", self.retry_after())
+
+        now = time.monotonic()
+        timeout = self.default_deadline if deadline is None else deadline
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), now + timeout, now)
+        queue.append(waiter)
+        try:
+            await asyncio.wait_for(waiter.future, timeout=max(timeout, 0))
+        except asyncio.TimeoutError:
+            self._abandon(lane, waiter)
+            stats["expired"] += 1
+            raise AdmissionRejected(503, "Deadline exceeded while queued", self.retry_after())
+        except BaseException:
+            # Клиент ушёл: запрос снимается с очереди, выданный ему слот передаётся дальше
+            self._abandon(lane, waiter)
+            raise
+        stats["admitted"] += 1
+        stats["waits"].append(time.monotonic() - waiter.enqueued_at)
+
+    def release(self):
+        """ Освобождает слот, передавая его первому живому ожидающему из самой приоритетной полосы. """
+        now = time.monotonic()
+        for lane, queue in self._queues.items():
+            while queue:
+                waiter = queue.popleft()
+                if waiter.future.done():
+                    continue
+                if waiter.deadline <= now:
+                    self._stats[lane]["expired"] += 1
+                    waiter.future.set_exception(
+                        AdmissionRejected(503, "Deadline exceeded while queued", self.retry_after())
+                    )
+                    continue
+                waiter.granted = True
+                waiter.future.set_result(None)
+                return
+        self._in_use -= 1
+
+    def _abandon(self, lane: str, waiter: _Waiter):
+        if waiter.granted:
+            self.release()
+            return
+        try:
+            self._queues[lane].remove(waiter)
+        except ValueError:
+            pass
+
+    def queued(self) -> int:
+        """ Число запросов во всех очередях. """
+        return sum(len(queue) for queue in self._queues.values())
+
+    def retry_after(self) -> int:
+        """ Оценка в секундах, через сколько стоит повторить запрос: время разбора текущей очереди. """
+        estimate = (self.queued() + 1) * self._service_time / max(self.max_concurrent, 1)
+        return min(max(math.ceil(estimate), 1), 60)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Возвращает состояние допуска.
+
+        :return: Словарь с занятыми слотами и по каждой полосе: глубина очереди, счётчики и ожидание (мс).
+        """
+        lanes = {}
+        for lane, stats in self._stats.items():
+            waits = sorted(stats["waits"])
+            lanes[lane] = {
+                "depth": len(self._queues[lane]),
+                "max_queue": self.lane_limits[lane],
+                "admitted": stats["admitted"],
+                "rejected": stats["rejected"],
+                "expired": stats["expired"],
+                "wait_p50_ms": round(waits[len(waits) // 2] * 1000, 3) if waits else 0.0,
+                "wait_p99_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.99))] * 1000, 3) if waits else 0.0,
+            }
+        return {
+            "max_concurrent": self.max_concurrent,
+            "in_use": self._in_use,
+            "queued": self.queued(),
+            "service_time_ms": round(self._service_time * 1000, 3),
+            "lanes": lanes,
+        }
@@ -1,22 +1,105 @@
-from fastapi import FastAPI, HTTPException
+import codecs
+import json
+import os
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, AsyncIterator, List, Optional, Tuple
 from core.entities.medical_case import MedicalCase
-from core.use_cases.diagnose_patient import DiagnosePatient
-from modules.diagnostics.ai_diagnosis import AIDiagnosisFactory
-from modules.nlp.nlp_model import NLPModelFactory
+from infrastructure.jobs.webhooks import validate_callback_url
 from infrastructure.logging.logger import Logger
+from interfaces.api.admission import AdmissionController, AdmissionRejected, parse_lanes
+from modules.common.executors import BoundedExecutor
+from modules.common.startup import ReadinessRegistry, timed_import
+
+# Настройки моделей
+AI_MODEL_TYPE = os.getenv("AI_MODEL_TYPE", "pytorch")
+AI_MODEL_PATH = os.getenv("AI_MODEL_PATH", "models/final/diagnosis_model.pth")
+NLP_MODEL_TYPE = os.getenv("NLP_MODEL_TYPE", "bert")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))  # 0 = инференс в процессе API
+INFERENCE_CONCURRENCY = int(os.getenv("INFERENCE_CONCURRENCY", "2"))  # одновременных диагностик в процессе API
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "64"))  # случаев в одном проходе пакетной диагностики
+BATCH_MAX_ITEM_BYTES = int(os.getenv("BATCH_MAX_ITEM_BYTES", str(1024 * 1024)))  # предел строки NDJSON / элемента массива
+# Контроль допуска: одновременных диагностик, очереди полос приоритета (по убыванию приоритета), дедлайн ожидания
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", str(max(INFERENCE_WORKERS, INFERENCE_CONCURRENCY))))
+ADMISSION_LANES = os.getenv("ADMISSION_LANES", "urgent:64,routine:256,background:1024")
+ADMISSION_DEADLINE_MS = int(os.getenv("ADMISSION_DEADLINE_MS", "30000"))
+ADMISSION_DEFAULT_LANE = os.getenv("ADMISSION_DEFAULT_LANE") or None  # полоса без X-Priority (по умолчанию routine или средняя)
+BATCH_PRIORITY = os.getenv("BATCH_PRIORITY", "background")  # полоса, через которую проходят части /diagnosis/batch
 
-# Инициализация FastAPI
-app = FastAPI(title="Medical Diagnosis API", version="1.0")
 logger = Logger("API")
+readiness = ReadinessRegistry(["ai_model", "nlp_model", "cascade", "warmup"])
+# Инференс синхронный и тяжёлый: выполняется в отдельном пуле потоков, event loop остаётся свободным
+inference_executor = BoundedExecutor("inference", INFERENCE_CONCURRENCY)
+# Постановка заданий в очередь (SQLite/Redis) — блокирующий ввод-вывод, тоже вне event loop
+job_executor = BoundedExecutor("jobs", 4)
+# При перегрузке запросы получают быстрый отказ вместо бесконечного роста очереди
+admission = AdmissionController(
+    ADMISSION_MAX_CONCURRENT, parse_lanes(ADMISSION_LANES), ADMISSION_DEADLINE_MS / 1000, ADMISSION_DEFAULT_LANE
+)
+
+
+def load_models(app: FastAPI):
+    """
+    Загружает модели и прогревает их. Выполняется в фоновом потоке при старте приложения.
+    Тяжёлые модули (torch, transformers, sklearn) импортируются только здесь.
+    """
+    try:
+        ai_diagnosis = timed_import("modules.diagnostics.ai_diagnosis")
+        nlp = timed_import("modules.nlp.nlp_model")
+        diagnose_patient = timed_import("core.use_cases.diagnose_patient")
+        diagnosis_cache = timed_import("infrastructure.caching.diagnosis_cache")
+        cascade = timed_import("modules.diagnostics.cascade")
+
+        ai_model = readiness.run("ai_model", lambda: ai_diagnosis.AIDiagnosisFactory.get_model(AI_MODEL_TYPE, AI_MODEL_PATH))
+        nlp_model = readiness.run("nlp_model", lambda: nlp.NLPModelFactory.get_model(NLP_MODEL_TYPE))
+        diagnosis_cascade = readiness.run("cascade", lambda: cascade.create_cascade())
+        # Ответы каскада и таблицы симптомов отличаются от ответов полной модели, поэтому входят в версию кэша
+        result_cache = diagnosis_cache.create_diagnosis_cache(
+            diagnosis_cache.default_model_version(AI_MODEL_TYPE, AI_MODEL_PATH, nlp_model, diagnosis_cascade)
+        )
+        use_case = diagnose_patient.DiagnosePatient(ai_model, nlp_model, cascade=diagnosis_cascade)
+
+        readiness.run("warmup", lambda: warmup(use_case))
+        # Кэш подключается после прогрева, чтобы прогревочные вызовы действительно прошли через модели
+        use_case.result_cache = result_cache
+        if INFERENCE_WORKERS > 0:
+            inference_pool = timed_import("interfaces.api.inference_pool")
+            app.state.inference_pool = inference_pool.PreforkInferencePool(use_case, INFERENCE_WORKERS).start()
+        app.state.diagnose_use_case = use_case
+        logger.info(f"Модели готовы: {readiness.get_report()}")
+    except Exception as e:
+        logger.error(f"Ошибка загрузки моделей: {e}")
+
+
+def warmup(use_case):
+    """ Прогревочные вызовы, чтобы первый реальный запрос не платил за ленивую инициализацию. """
+    sample = MedicalCase(
+        patient_id=0, full_name="warmup", passport_id="N/A", phone_number="N/A", address="N/A", email="N/A",
+        age=30, gender="other", symptoms=["fever", "cough"],
+    )
+    for _ in range(2):
+        use_case.execute(sample)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """ Запускает загрузку моделей в фоне: порт открывается сразу, готовность видна в /readyz. """
+    loader = threading.Thread(target=load_models, args=(app,), name="ModelLoader", daemon=True)
+    loader.start()
+    yield
+    if app.state.inference_pool is not None:
+        app.state.inference_pool.shutdown()
+
 
-# Загрузка моделей
-ai_model = AIDiagnosisFactory.get_model("pytorch", "models/final/diagnosis_model.pth")
-nlp_model = NLPModelFactory.get_model("bert")
+# Инициализация FastAPI
+app = FastAPI(title="Medical Diagnosis API", version="1.0", lifespan=lifespan)
+app.state.diagnose_use_case = None
+app.state.inference_pool = None
+app.state.job_queue = None
 
-# Подключение use-case для диагностики
-diagnose_use_case = DiagnosePatient(ai_model, nlp_model)
 
 class MedicalCaseRequest(BaseModel):
     patient_id: int
@@ -33,29 +116,329 @@ class DiagnosisResponse(BaseModel):
     diagnosis: str
     confidence: float
 
+class DiagnosisJobRequest(BaseModel):
+    cases: List[MedicalCaseRequest]
+    callback_url: Optional[str] = None
+
+
+def to_medical_case(request: MedicalCaseRequest) -> MedicalCase:
+    """ Создание объекта медицинского случая из запроса. """
+    return MedicalCase(
+        patient_id=request.patient_id,
+        full_name=request.full_name,
+        passport_id="N/A",
+        phone_number="N/A",
+        address="N/A",
+        email="N/A",
+        age=request.age,
+        gender=request.gender,
+        symptoms=request.symptoms,
+        chronic_conditions=request.chronic_conditions,
+        medications=request.medications,
+        preferred_language=request.preferred_language
+    )
+
+
+@app.get("/healthz")
+async def healthz():
+    """ Liveness: процесс жив и обрабатывает запросы. """
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """ Readiness: готовность каждого компонента и время импорта тяжёлых модулей. """
+    report = readiness.get_report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+
+@app.get("/metrics")
+async def metrics():
+    """ Загрузка пулов инференса и кэш результатов. """
+    pool = app.state.inference_pool
+    use_case = app.state.diagnose_use_case
+    result_cache = getattr(use_case, "result_cache", None)
+    return {
+        "inference_executor": inference_executor.get_metrics(),
+        "admission": admission.get_metrics(),
+        "job_queue_depth": await job_executor.run(app.state.job_queue.depth) if app.state.job_queue is not None else None,
+        "inference_pool": pool.get_metrics() if pool is not None else None,
+        "diagnosis_cache": result_cache.get_metrics() if result_cache is not None else None,
+        "single_flight": use_case.single_flight.get_metrics() if use_case is not None else None,
+        "cascade": use_case.cascade.get_metrics() if use_case is not None and use_case.cascade is not None else None,
+    }
+
+
 @app.post("/diagnosis", response_model=DiagnosisResponse)
-async def diagnosis_patient(request: MedicalCaseRequest):
-    """ API для диагностики пациента. """
+async def diagnosis_patient(
+    request: MedicalCaseRequest,
+    x_priority: Optional[str] = Header(None),
+    x_deadline_ms: Optional[int] = Header(None),
+):
+    """
+    API для диагностики пациента.
+
+    Заголовок X-Priority выбирает полосу приоритета (urgent, routine, background; без заголовка —
+    полоса по умолчанию из ADMISSION_DEFAULT_LANE), X-Deadline-Ms — сколько
+    клиент готов ждать в очереди. При переполнении очереди возвращается 429, при истёкшем дедлайне — 503,
+    оба с Retry-After.
+    """
+    diagnose_use_case = app.state.diagnose_use_case
+    if diagnose_use_case is None:
+        raise HTTPException(status_code=503, detail="Models are still loading", headers={"Retry-After": "5"})
+    x_priority = x_priority or admission.default_lane
+    if x_priority not in admission.lane_limits:
+        raise HTTPException(status_code=400, detail=f"Unknown priority lane: {x_priority}")
+    deadline = x_deadline_ms / 1000 if x_deadline_ms is not None else None
+
     try:
         logger.info(f"Получен запрос на диагностику: {request.patient_id}")
 
         # Создание объекта медицинского случая
-        medical_case = MedicalCase(
-            patient_id=request.patient_id,
-            full_name=request.full_name,
-            age=request.age,
-            gender=request.gender,
-            symptoms=request.symptoms,
-            chronic_conditions=request.chronic_conditions,
-            medications=request.medications,
-            preferred_language=request.preferred_language
-        )
+        medical_case = to_medical_case(request)
 
-        # Выполнение диагностики
-        result = diagnose_use_case.execute(medical_case)
+        # Выполнение диагностики вне event loop: в пуле процессов, если он запущен, иначе в пуле потоков.
+        # Допуск проходит каждый запрос в своей полосе и со своим дедлайном, и только затем присоединяется
+        # к вычислению: одинаковые одновременные запросы ждут одно вычисление и не занимают пул повторно.
+        async def run():
+            if app.state.inference_pool is not None:
+                return await app.state.inference_pool.execute_async(medical_case)
+            return await inference_executor.run(diagnose_use_case.execute, medical_case)
 
-        return DiagnosisResponse(**result)
+        async with admission.slot(x_priority, deadline):
+            result = await diagnose_use_case.single_flight.do_async(diagnose_use_case.flight_key(medical_case), run)
+
+        return DiagnosisResponse(**dict(result, patient_id=medical_case.patient_id))
+
+    except AdmissionRejected as e:
+        logger.info(f"Запрос {request.patient_id} не допущен: {e.reason}")
+        raise HTTPException(status_code=e.status_code, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
 
     except Exception as e:
         logger.error(f"Ошибка в API: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+
+def get_job_queue():
+    """ Очередь заданий, создаётся при первом обращении (JOB_QUEUE_BACKEND). """
+    if app.state.job_queue is None:
+        from infrastructure.jobs.job_queue import create_job_queue
+        app.state.job_queue = create_job_queue()
+    return app.state.job_queue
+
+
+@app.post("/diagnosis/jobs", status_code=202)
+async def create_diagnosis_job(request: DiagnosisJobRequest):
+    """
+    Ставит диагностику в очередь и сразу возвращает идентификатор задания.
+    Задание выполняют воркеры (python -m infrastructure.jobs.worker); результат доступен через
+    GET /diagnosis/jobs/{job_id} и, если указан callback_url, отправляется webhook
+    (только на хосты из WEBHOOK_ALLOWED_HOSTS).
+    """
+    if not request.cases:
+        raise HTTPException(status_code=400, detail="Job has no cases")
+    if request.callback_url is not None:
+        try:
+            validate_callback_url(request.callback_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    job_queue = get_job_queue()
+    job_id = await job_executor.run(job_queue.enqueue, request.model_dump())
+    logger.info(f"Задание {job_id} поставлено в очередь: {len(request.cases)} случаев")
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/diagnosis/jobs/{job_id}")
+async def get_diagnosis_job(job_id: str):
+    """ Состояние задания и, когда оно выполнено, результаты диагностики. """
+    job = await job_executor.run(get_job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+async def read_ndjson(prefix: bytes, stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[Any, Optional[str]]]:
+    """
+    Построчно разбирает NDJSON из тела запроса, не читая его целиком. Возвращает пары (объект, ошибка).
+    Строка длиннее BATCH_MAX_ITEM_BYTES не накапливается: она пропускается до перевода строки с ошибкой.
+    """
+    too_long = f"Line exceeds {BATCH_MAX_ITEM_BYTES} bytes"
+    buffer, skipping = prefix, False
+    while True:
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if skipping:
+                skipping = False
+            elif len(line) > BATCH_MAX_ITEM_BYTES:
+                yield None, too_long
+            elif line.strip():
+                try:
+                    yield json.loads(line), None
+                except ValueError as e:
+                    yield None, f"Invalid JSON: {e}"
+        if len(buffer) > BATCH_MAX_ITEM_BYTES:
+            if not skipping:
+                yield None, too_long
+            buffer, skipping = b"", True
+        chunk = await anext(stream, None)
+        if chunk is None:
+            break
+        buffer += chunk
+    if buffer.strip() and not skipping:
+        try:
+            yield json.loads(buffer), None
+        except ValueError as e:
+            yield None, f"Invalid JSON: {e}"
+
+
+async def read_json_array(prefix: bytes, stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[Any, Optional[str]]]:
+    """
+    Разбирает JSON-массив из тела запроса по элементам, не читая его целиком: в памяти только текущий
+    элемент (не больше BATCH_MAX_ITEM_BYTES). Возвращает пары (объект, ошибка); после синтаксической
+    ошибки продолжить разбор массива нельзя, поэтому она возвращается последней.
+    """
+    too_big = f"Item exceeds {BATCH_MAX_ITEM_BYTES} bytes"
+    decoder = json.JSONDecoder()
+    decode = codecs.getincrementaldecoder("utf-8")(errors="replace").decode
+    buffer, position, finished = decode(prefix), 0, False
+    state = "open"  # open -> first (элемент или "]") -> separator ("," или "]") -> value -> separator ...
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n":
+            position += 1
+        if position < len(buffer):
+            char = buffer[position]
+            if state == "open" and char == "[":
+                state, position = "first", position + 1
+                continue
+            if state in ("first", "separator") and char == "]":
+                return
+            if state == "separator" and char == ",":
+                state, position = "value", position + 1
+                continue
+            if state not in ("first", "value"):
+                yield None, f"Invalid JSON: unexpected {char!r}"
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+                error = None
+            except ValueError as e:
+                item, end, error = None, None, e
+            # Значение в самом конце буфера может продолжиться в следующей части тела (например, число)
+            if error is None and (end < len(buffer) or finished):
+                yield (item, None) if end - position <= BATCH_MAX_ITEM_BYTES else (None, too_big)
+                buffer, position, state = buffer[end:], 0, "separator"
+                continue
+            if finished:
+                yield None, f"Invalid JSON: {error}"
+                return
+            if len(buffer) - position > BATCH_MAX_ITEM_BYTES:
+                yield None, too_big
+                return
+        elif finished:
+            yield None, "Invalid JSON: unterminated array"
+            return
+        chunk = await anext(stream, None)
+        if chunk is None:
+            finished = True
+            buffer += decode(b"", final=True)
+        else:
+            buffer += decode(chunk)
+
+
+async def prepend(first: Tuple[Any, Optional[str]], items: AsyncIterator[Tuple[Any, Optional[str]]]):
+    yield first
+    async for item in items:
+        yield item
+
+
+async def iterate_items(items: List[Any]) -> AsyncIterator[Tuple[Any, Optional[str]]]:
+    for item in items:
+        yield item, None
+
+
+async def diagnose_chunk(use_case, start: int, chunk: List[Tuple[Any, Optional[str]]]) -> List[dict]:
+    """
+    Диагностирует часть пакета: валидные случаи идут одним вызовом execute_batch,
+    для невалидных возвращается строка с ошибкой.
+    """
+    rows: List[Optional[dict]] = [None] * len(chunk)
+    cases, positions = [], []
+    for position, (item, error) in enumerate(chunk):
+        if error is None:
+            try:
+                cases.append(to_medical_case(MedicalCaseRequest(**item)))
+                positions.append(position)
+                continue
+            except Exception as e:
+                error = str(e)
+        patient_id = item.get("patient_id") if isinstance(item, dict) else None
+        rows[position] = {"index": start + position, "patient_id": patient_id, "error": error}
+
+    if cases:
+        # Пакет проходит допуск по частям в фоновой полосе и не вытесняет интерактивные запросы
+        try:
+            async with admission.slot(BATCH_PRIORITY):
+                if app.state.inference_pool is not None:
+                    results = await app.state.inference_pool.execute_batch_async(cases)
+                else:
+                    results = await inference_executor.run(use_case.execute_batch, cases)
+        except AdmissionRejected as e:
+            logger.info(f"Часть пакета с позиции {start} не допущена: {e.reason}")
+            results = [{"patient_id": case.patient_id, "error": e.reason} for case in cases]
+        for position, result in zip(positions, results):
+            if "error" in result:
+                rows[position] = {"index": start + position, **result}
+            else:
+                rows[position] = DiagnosisResponse(**result).model_dump()
+    return rows
+
+
+async def diagnose_stream(use_case, items: AsyncIterator[Tuple[Any, Optional[str]]]) -> AsyncIterator[bytes]:
+    """ Собирает элементы в части по BATCH_CHUNK_SIZE и отдаёт результаты каждой части, как только она готова. """
+    chunk, start = [], 0
+    async for item in items:
+        chunk.append(item)
+        if len(chunk) >= BATCH_CHUNK_SIZE:
+            for row in await diagnose_chunk(use_case, start, chunk):
+                yield (json.dumps(row) + "\n").encode()
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        for row in await diagnose_chunk(use_case, start, chunk):
+            yield (json.dumps(row) + "\n").encode()
+
+
+@app.post("/diagnosis/batch")
+async def diagnosis_batch(request: Request):
+    """
+    Пакетная диагностика. Принимает JSON-массив или NDJSON из MedicalCaseRequest и возвращает NDJSON
+    с DiagnosisResponse (или {"index", "patient_id", "error"}) в порядке входных данных.
+
+    Оба формата читаются потоково, поэтому память ограничена размером части, а не размером запроса.
+    Ошибка синтаксиса JSON-массива до первого элемента даёт 400, после него — строку с ошибкой в конце ответа.
+    """
+    use_case = app.state.diagnose_use_case
+    if use_case is None:
+        raise HTTPException(status_code=503, detail="Models are still loading", headers={"Retry-After": "5"})
+
+    stream = request.stream()
+    prefix = b""
+    async for chunk in stream:
+        prefix += chunk
+        if prefix.strip():
+            break
+
+    if prefix.lstrip().startswith(b"["):
+        items = read_json_array(prefix, stream)
+        first = await anext(items, None)
+        if first is None:
+            items = iterate_items([])
+        elif first[1] is not None:
+            raise HTTPException(status_code=400, detail=first[1])
+        else:
+            items = prepend(first, items)
+    else:
+        items = read_ndjson(prefix, stream)
+
+    logger.info("Получен запрос на пакетную диагностику")
+    return StreamingResponse(diagnose_stream(use_case, items), media_type="application/x-ndjson")
@@ -0,0 +1,266 @@
+import asyncio
+import gc
+import multiprocessing
+import os
+import threading
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, List, Optional
+from core.entities.medical_case import MedicalCase
+from modules.common.logger import Logger
+
+# Use case, унаследованный рабочими процессами от родителя при fork (copy-on-write)
+_worker_use_case = None
+
+
+def _init_worker(threads_per_worker: int):
+    """ Инициализация рабочего процесса: ограничиваем потоки torch, чтобы процессы не конкурировали за ядра. """
+    import torch
+    torch.set_num_threads(threads_per_worker)
+
+
+def _execute(medical_case: MedicalCase) -> dict:
+    """ Выполняется в рабочем процессе. """
+    return _worker_use_case.execute(medical_case)
+
+
+def _execute_batch(medical_cases: List[MedicalCase]) -> List[dict]:
+    """ Пакетная диагностика в рабочем процессе. """
+    return _worker_use_case.execute_batch(medical_cases)
+
+
+def _noop(_):
+    return None
+
+
+def _copy_outcome(source: Future, target: Future):
+    """ Переносит результат или ошибку завершённого Future в target. """
+    if source.cancelled():
+        target.set_exception(CancelledError())
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+def _shared_memory_modules(use_case) -> List[Any]:
+    """ Находит torch-модули моделей use case, чьи веса нужно разделить между процессами. """
+    import torch
+
+    modules = []
+    for component in (getattr(use_case, "ai_model", None), getattr(use_case, "nlp_model", None)):
+        model = getattr(component, "model", None)
+        if isinstance(model, torch.nn.Module):
+            modules.append(model)
+    return modules
+
+
+def _memory_usage(pid: int) -> Optional[Dict[str, int]]:
+    """ RSS и PSS процесса в байтах (Linux, /proc/<pid>/smaps_rollup). """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+            values = {}
+            for line in f:
+                parts = line.split()
+                if parts[0] in ("Rss:", "Pss:", "Shared_Clean:", "Shared_Dirty:"):
+                    values[parts[0][:-1].lower()] = int(parts[1]) * 1024
+            return values
+    except OSError:
+        return None
+
+
+class PreforkInferencePool:
+    """
+    Пул процессов инференса с моделями, загруженными один раз в родительском процессе.
+
+    Модели загружаются в родителе, их тензоры переносятся в разделяемую память, после чего
+    запускаются N рабочих процессов через fork. Веса не копируются в каждый процесс, поэтому
+    пропускная способность растёт с числом ядер, а RSS не умножается на N.
+
+    Если рабочий процесс погиб (OOM killer, сбой в нативном коде), пул становится неработоспособным
+    (BrokenProcessPool). Запросы, выполнявшиеся в этот момент, завершаются ошибкой, а следующий запрос
+    запускает пересоздание пула из тех же моделей родителя в фоновом потоке: fork и запуск процессов
+    не выполняются в вызывающем потоке (event loop в execute_async). Запросы на время пересоздания
+    ставятся в ожидание и уходят в новый пул; число пересозданий видно в метриках (restarts).
+    """
+
+    def __init__(self, use_case, workers: int, threads_per_worker: int = 1, share_memory: bool = True):
+        """
+        :param use_case: Загруженный DiagnosePatient.
+        :param workers: Количество рабочих процессов.
+        :param threads_per_worker: Потоков torch на процесс.
+        :param share_memory: Перенести веса в разделяемую память (иначе только copy-on-write).
+        """
+        if "fork" not in multiprocessing.get_all_start_methods():
+            raise RuntimeError("PreforkInferencePool requires the 'fork' start method.")
+
+        self.use_case = use_case
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.share_memory = share_memory
+        self.logger = Logger("PreforkInferencePool")
+        self.executor = None
+        self.worker_pids = []
+        self.restarts = 0
+        self._restart_lock = threading.Lock()
+        self._restarting: Optional[Future] = None  # Future с новым пулом, пока идёт пересоздание
+
+    def start(self) -> "PreforkInferencePool":
+        """
+        Переносит веса в разделяемую память и запускает рабочие процессы.
+
+        :return: self
+        """
+        global _worker_use_case
+        _worker_use_case = self.use_case
+
+        if self.share_memory:
+            for module in _shared_memory_modules(self.use_case):
+                module.share_memory()
+
+        # Объекты, созданные до fork, исключаются из сборки мусора: GC не будет трогать их заголовки
+        # в дочерних процессах, и страницы останутся общими
+        gc.collect()
+        gc.freeze()
+
+        self._spawn()
+        return self
+
+    def _spawn(self):
+        """ Создаёт пул рабочих процессов и сразу запускает их. """
+        children_before = {process.pid for process in multiprocessing.active_children()}
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+            initargs=(self.threads_per_worker,),
+        )
+        # С fork все процессы создаются при первой задаче: запускаем их сразу, а не на первом запросе
+        list(self.executor.map(_noop, range(self.workers)))
+        self.worker_pids = sorted(
+            process.pid for process in multiprocessing.active_children() if process.pid not in children_before
+        )
+        self.logger.info(f"Started {self.workers} inference workers: {self.worker_pids}")
+
+    def _restart(self, broken: ProcessPoolExecutor) -> Future:
+        """
+        Запускает пересоздание пула после гибели рабочего процесса в фоновом потоке.
+
+        :param broken: Пул, на котором получен BrokenProcessPool (если его уже пересоздал или пересоздаёт
+            другой поток, новое пересоздание не запускается).
+        :return: Future, который завершается работающим пулом.
+        """
+        with self._restart_lock:
+            if self._restarting is not None:
+                return self._restarting
+            if self.executor is not broken:
+                ready = Future()
+                ready.set_result(self.executor)
+                return ready
+            self.logger.error(f"Inference worker died, restarting the pool (workers were {self.worker_pids})")
+            self._restarting = restarting = Future()
+        thread = threading.Thread(target=self._respawn, args=(broken, restarting), name="InferencePoolRestart", daemon=True)
+        thread.start()
+        return restarting
+
+    def _respawn(self, broken: ProcessPoolExecutor, restarting: Future):
+        """ Выполняется в фоновом потоке: останавливает сломанный пул и запускает новый. """
+        try:
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._spawn()
+            self.restarts += 1
+        except Exception as e:
+            self.logger.error(f"Failed to restart inference workers: {e}")
+            with self._restart_lock:
+                self._restarting = None
+            restarting.set_exception(e)
+            return
+        with self._restart_lock:
+            self._restarting = None
+        restarting.set_result(self.executor)
+
+    def _submit(self, fn, argument) -> Future:
+        with self._restart_lock:
+            restarting = self._restarting
+        if restarting is None:
+            executor = self.executor
+            if executor is None:
+                raise RuntimeError("PreforkInferencePool is not started.")
+            try:
+                return executor.submit(fn, argument)
+            except BrokenProcessPool:
+                restarting = self._restart(executor)
+
+        # Пул пересоздаётся: задача отправляется в новый пул, когда он запустится
+        result = Future()
+
+        def forward(completed: Future):
+            if not result.set_running_or_notify_cancel():
+                return
+            try:
+                inner = completed.result().submit(fn, argument)
+            except BaseException as e:
+                result.set_exception(e)
+                return
+            inner.add_done_callback(lambda done: _copy_outcome(done, result))
+
+        restarting.add_done_callback(forward)
+        return result
+
+    def submit(self, medical_case: MedicalCase) -> Future:
+        """
+        Отправляет диагностику в рабочий процесс.
+
+        :param medical_case: Данные пациента.
+        :return: Future с результатом DiagnosePatient.execute.
+        """
+        return self._submit(_execute, medical_case)
+
+    def execute(self, medical_case: MedicalCase) -> dict:
+        """ Синхронная диагностика в рабочем процессе. """
+        return self.submit(medical_case).result()
+
+    async def execute_async(self, medical_case: MedicalCase) -> dict:
+        """ Асинхронная диагностика в рабочем процессе (для обработчиков FastAPI). """
+        return await asyncio.wrap_future(self.submit(medical_case))
+
+    def submit_batch(self, medical_cases: List[MedicalCase]) -> Future:
+        """
+        Отправляет пакетную диагностику в рабочий процесс.
+
+        :param medical_cases: Данные пациентов.
+        :return: Future с результатом DiagnosePatient.execute_batch.
+        """
+        return self._submit(_execute_batch, medical_cases)
+
+    async def execute_batch_async(self, medical_cases: List[MedicalCase]) -> List[dict]:
+        """ Асинхронная пакетная диагностика в рабочем процессе. """
+        return await asyncio.wrap_future(self.submit_batch(medical_cases))
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Возвращает число процессов, число пересозданий пула и потребление памяти родителем и рабочими процессами.
+
+        :return: Словарь с RSS/PSS по процессам.
+        """
+        return {
+            "workers": self.workers,
+            "threads_per_worker": self.threads_per_worker,
+            "restarts": self.restarts,
+            "parent_memory": _memory_usage(os.getpid()),
+            "worker_memory": {pid: _memory_usage(pid) for pid in self.worker_pids},
+        }
+
+    def shutdown(self):
+        """ Останавливает рабочие процессы. """
+        restarting = self._restarting
+        if restarting is not None:
+            try:
+                restarting.result(timeout=60)
+            except Exception:
+                pass
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        gc.unfreeze()
+        self.logger.info("Inference workers stopped.")
@@ -2,13 +2,11 @@ from fastapi import FastAPI, HTTPException
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
-from pymongo import MongoClient
+from infrastructure.database.async_repository import AsyncPatientRepository, db_executor
+from infrastructure.database.mongo_client import get_pool_metrics
 
-# Подключение к MongoDB
-MONGO_URI = "mongodb://localhost:27017/"
-client = MongoClient(MONGO_URI)
-db = client["medical_db"]
-patients_collection = db["patient_records"]
+# Подключение к MongoDB: общий ленивый клиент из mongo_client (соединение при первом запросе).
+# Запросы выполняются через AsyncPatientRepository в пуле потоков и не блокируют event loop.
 
 # Инициализация FastAPI
 app = FastAPI(title="Medical Diagnosis API", version="1.0")
@@ -31,18 +29,18 @@ class PatientRequest(BaseModel):
 #  1. **Добавление пациента**
 @app.post("/patients/", response_model=dict)
 async def add_patient(request: PatientRequest):
-    if patients_collection.find_one({"patient_id": request.patient_id}):
+    if await AsyncPatientRepository.find(request.patient_id):
         raise HTTPException(status_code=400, detail="Patient already exists")
 
     patient_data = request.dict()
-    patients_collection.insert_one(patient_data)
+    await AsyncPatientRepository.insert(patient_data)
     return {"message": f"Patient {request.full_name} added successfully!"}
 
 
 #  2. **Получение пациента по ID**
 @app.get("/patients/{patient_id}", response_model=dict)
 async def get_patient(patient_id: int):
-    patient = patients_collection.find_one({"patient_id": patient_id})
+    patient = await AsyncPatientRepository.find(patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
 
@@ -52,7 +50,7 @@ async def get_patient(patient_id: int):
 #  3. **Обновление данных пациента**
 @app.put("/patients/update/{patient_id}", response_model=dict)
 async def update_patient(patient_id: int, updates: dict):
-    result = patients_collection.update_one({"patient_id": patient_id}, {"$set": updates})
+    result = await AsyncPatientRepository.update(patient_id, updates)
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Patient not found")
 
@@ -62,7 +60,7 @@ async def update_patient(patient_id: int, updates: dict):
 #  4. **Удаление пациента**
 @app.delete("/patients/delete/{patient_id}", response_model=dict)
 async def delete_patient(patient_id: int):
-    result = patients_collection.delete_one({"patient_id": patient_id})
+    result = await AsyncPatientRepository.delete(patient_id)
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Patient not found")
 
@@ -72,24 +70,30 @@ async def delete_patient(patient_id: int):
 #  Эндпоинт для добавления пациента
 @app.post("/patients/", status_code=201)
 async def add_patient(patient: PatientRequest):
-    if patients_collection.find_one({"patient_id": patient.patient_id}):
+    if await AsyncPatientRepository.find(patient.patient_id):
         raise HTTPException(status_code=400, detail="Patient already exists")
 
     patient_data = patient.dict()
     patient_data["created_at"] = datetime.utcnow()
-    patients_collection.insert_one(patient_data)
+    await AsyncPatientRepository.insert(patient_data)
     return {"message": "Patient added successfully", "patient": patient_data}
 
 
 #  Эндпоинт для получения пациента по ID
 @app.get("/patients/{patient_id}")
 async def get_patient(patient_id: int):
-    patient = patients_collection.find_one({"patient_id": patient_id}, {"_id": 0})
+    patient = await AsyncPatientRepository.find(patient_id, {"_id": 0})
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     return patient
 
 
+@app.get("/healthz")
+async def healthz():
+    """ Liveness, загрузка пула запросов и пула соединений MongoDB. """
+    return {"status": "ok", "db_executor": db_executor.get_metrics(), "mongo_pool": get_pool_metrics()}
+
+
 # Запуск FastAPI
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,366 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import pandas as pd
+from core.entities.medical_case import MedicalCase
+from core.use_cases.data_preprocessor import DataPreprocessor, LIST_COLUMNS
+from modules.common.logger import Logger
+
+# Запуск:
+#   python -m interfaces.cli.diagnose_pipeline data/raw/cases.jsonl --sink file:diagnoses.jsonl \
+#       --checkpoint diagnoses.checkpoint.json --workers 4
+
+logger = Logger("DiagnosePipeline")
+
+# Часть входных данных: (смещение строки после части, данные)
+Chunk = Tuple[int, Any]
+
+
+class StageStats:
+    """ Счётчики одной стадии конвейера: строки и время работы. """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.busy_seconds = 0.0
+
+    def add(self, rows: int, seconds: float):
+        self.rows += rows
+        self.busy_seconds += seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "rows_per_second": round(self.rows / self.busy_seconds, 1) if self.busy_seconds else None,
+        }
+
+
+class Checkpoint:
+    """
+    Смещение последней записанной строки входного файла. Сохраняется атомарно после каждой части,
+    поэтому повторный запуск продолжает с места остановки (доставка at-least-once: часть, записанная
+    в приёмник, но не отмеченная в контрольной точке, будет обработана повторно).
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+
+    def load(self) -> int:
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)["offset"]
+
+    def save(self, offset: int):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"offset": offset, "updated_at": datetime.utcnow().isoformat()}, f)
+        os.replace(tmp_path, self.path)
+
+
+class FileSink:
+    """ Приёмник результатов в JSONL-файл (дописывает в конец). """
+
+    def __init__(self, path: str):
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, results: List[dict]):
+        self.file.writelines(json.dumps(result) + "\n" for result in results)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class MongoSink:
+    """
+    Приёмник результатов в коллекцию пациентов: один неупорядоченный bulk_write с upsert по patient_id на часть.
+    Подходит любая коллекция с интерфейсом pymongo (в том числе локальный mongod для разработки).
+
+    С версиями (воркеры потока передают версию сообщения) upsert условный: документ с большей версией
+    не перезаписывается. Такой upsert не находит документ и пытается вставить новый, что отклоняет
+    уникальный индекс по patient_id (ошибка 11000) — это устаревшая запись, она пропускается.
+    """
+
+    VERSION_FIELD = "stream_version"
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def write(self, results: List[dict], versions: Optional[List[str]] = None):
+        from pymongo import UpdateOne
+        from pymongo.errors import BulkWriteError
+
+        now = datetime.utcnow()
+        operations = []
+        for result, version in zip(results, versions or [None] * len(results)):
+            if "error" in result:
+                continue
+            query = {"patient_id": result["patient_id"]}
+            fields = {"diagnosis": result["diagnosis"], "confidence": result["confidence"], "updated_at": now}
+            if version is not None:
+                query["$or"] = [{self.VERSION_FIELD: {"$lte": version}}, {self.VERSION_FIELD: {"$exists": False}}]
+                fields[self.VERSION_FIELD] = version
+            operations.append(UpdateOne(query, {"$set": fields}, upsert=True))
+        if not operations:
+            return
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            if e.details.get("writeConcernErrors") or any(
+                error.get("code") != 11000 for error in e.details.get("writeErrors", [])
+            ):
+                raise
+
+    def close(self):
+        pass
+
+
+def detect_format(path: str) -> str:
+    """ Формат входного файла по расширению: jsonl, csv или parquet. """
+    extension = os.path.splitext(path)[1].lower()
+    formats = {".jsonl": "jsonl", ".ndjson": "jsonl", ".csv": "csv", ".parquet": "parquet"}
+    if extension not in formats:
+        raise ValueError(f"Unsupported input format: {extension}")
+    return formats[extension]
+
+
+def _decode_csv_lists(frame: pd.DataFrame) -> pd.DataFrame:
+    """ В CSV списки хранятся как JSON-строки ("[\"fever\", \"cough\"]"). """
+    for name in LIST_COLUMNS:
+        if name in frame.columns:
+            frame[name] = frame[name].map(lambda value: json.loads(value) if isinstance(value, str) and value.startswith("[") else value)
+    return frame
+
+
+def read_chunks(path: str, chunk_size: int, offset: int = 0) -> Iterator[Chunk]:
+    """
+    Читает входной файл частями по chunk_size строк, пропуская первые offset строк.
+    Пустые строки JSONL пропускаются и не становятся записями.
+
+    :param path: Файл JSONL, CSV или Parquet.
+    :param chunk_size: Строк в части.
+    :param offset: Смещение из контрольной точки.
+    :return: Генератор (смещение после части, DataFrame или pyarrow.Table).
+    """
+    input_format = detect_format(path)
+    position = offset
+
+    if input_format == "jsonl":
+        with open(path, encoding="utf-8") as f:
+            records = []
+            for line_number, line in enumerate(f):
+                if line_number < offset:
+                    continue
+                position = line_number + 1  # смещение считается в строках файла, включая пустые
+                if not line.strip():
+                    continue  # пустые строки пропускаются, как в read_ndjson API
+                records.append(json.loads(line))
+                if len(records) == chunk_size:
+                    yield position, pd.DataFrame(records)
+                    records = []
+            if records:
+                yield position, pd.DataFrame(records)
+
+    elif input_format == "csv":
+        for frame in pd.read_csv(path, chunksize=chunk_size, skiprows=range(1, offset + 1)):
+            position += len(frame)
+            yield position, _decode_csv_lists(frame)
+
+    else:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        skip = offset
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            if skip >= batch.num_rows:
+                skip -= batch.num_rows
+                continue
+            batch, skip = batch.slice(skip), 0
+            position += batch.num_rows
+            yield position, pa.Table.from_batches([batch])
+
+
+def preprocess_chunk(data: Any) -> List[dict]:
+    """ Стадия очистки данных. """
+    return DataPreprocessor.preprocess_batch(data).to_dict("records")
+
+
+def timed(fn: Callable, *args) -> Tuple[Any, float]:
+    """ Выполняет стадию и возвращает результат вместе со временем работы (в том числе в рабочем процессе). """
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def bounded_map(chunks: Iterator[Chunk], submit: Callable[[Any], Future], max_in_flight: int) -> Iterator[Chunk]:
+    """
+    Упорядоченный map с ограничением числа частей в работе: следующая часть читается из входного
+    генератора только когда освобождается место, поэтому память не зависит от размера файла.
+    """
+    pending = deque()
+    for offset, data in chunks:
+        pending.append((offset, submit(data)))
+        if len(pending) >= max_in_flight:
+            offset, future = pending.popleft()
+            yield offset, future.result()
+    while pending:
+        offset, future = pending.popleft()
+        yield offset, future.result()
+
+
+def _completed(result: Any) -> Future:
+    """ Готовый Future для режима без пулов процессов. """
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def run_pipeline(
+    path: str,
+    use_case,
+    sink,
+    checkpoint: Optional[Checkpoint] = None,
+    chunk_size: int = 1000,
+    workers: int = 0,
+    max_in_flight: int = 4,
+    report_every: float = 10.0,
+) -> Dict[str, Any]:
+    """
+    Конвейер: чтение -> DataPreprocessor -> NLP + модель (DiagnosePatient.execute_batch) -> приёмник.
+
+    Очистка и диагностика выполняются в пулах из workers процессов (fork после загрузки моделей),
+    при workers=0 всё выполняется в текущем процессе.
+
+    :param path: Входной файл JSONL, CSV или Parquet.
+    :param use_case: Загруженный DiagnosePatient.
+    :param sink: FileSink или MongoSink.
+    :param checkpoint: Контрольная точка для продолжения после остановки.
+    :param chunk_size: Строк в части.
+    :param workers: Процессов на CPU-стадию.
+    :param max_in_flight: Частей в работе на стадию.
+    :param report_every: Период вывода статистики в секундах.
+    :return: Статистика по стадиям.
+    """
+    checkpoint = checkpoint or Checkpoint(None)
+    start_offset = checkpoint.load()
+    stats = {name: StageStats(name) for name in ("read", "preprocess", "diagnose", "sink")}
+    logger.info(f"Starting pipeline on {path} from offset {start_offset} with {workers} workers per stage")
+
+    preprocess_pool, inference_pool = None, None
+    if workers > 0:
+        from interfaces.api.inference_pool import PreforkInferencePool, _execute_batch
+
+        inference_pool = PreforkInferencePool(use_case, workers).start()
+        preprocess_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+
+    def timed_read() -> Iterator[Chunk]:
+        chunks = read_chunks(path, chunk_size, start_offset)
+        while True:
+            started = time.perf_counter()
+            chunk = next(chunks, None)
+            if chunk is None:
+                return
+            stats["read"].add(len(chunk[1]), time.perf_counter() - started)
+            yield chunk
+
+    def submit_preprocess(data) -> Future:
+        if preprocess_pool is not None:
+            return preprocess_pool.submit(timed, preprocess_chunk, data)
+        return _completed(timed(preprocess_chunk, data))
+
+    def submit_diagnose(records: List[dict]) -> Future:
+        cases = [MedicalCase(**record) for record in records]
+        if inference_pool is not None:
+            # _execute_batch использует use case, унаследованный рабочим процессом при fork
+            return inference_pool.executor.submit(timed, _execute_batch, cases)
+        return _completed(timed(use_case.execute_batch, cases))
+
+    def timed_preprocess() -> Iterator[Chunk]:
+        for offset, (records, seconds) in bounded_map(timed_read(), submit_preprocess, max_in_flight):
+            stats["preprocess"].add(len(records), seconds)
+            yield offset, records
+
+    started = time.perf_counter()
+    last_report = started
+    offset = start_offset
+    try:
+        for offset, (results, seconds) in bounded_map(timed_preprocess(), submit_diagnose, max_in_flight):
+            stats["diagnose"].add(len(results), seconds)
+
+            sink_started = time.perf_counter()
+            sink.write(results)
+            checkpoint.save(offset)
+            stats["sink"].add(len(results), time.perf_counter() - sink_started)
+
+            if time.perf_counter() - last_report >= report_every:
+                last_report = time.perf_counter()
+                logger.info(f"Offset {offset}: {json.dumps({name: s.to_dict() for name, s in stats.items()})}")
+    finally:
+        sink.close()
+        if preprocess_pool is not None:
+            preprocess_pool.shutdown(wait=True, cancel_futures=True)
+        if inference_pool is not None:
+            inference_pool.shutdown()
+
+    elapsed = time.perf_counter() - started
+    report = {
+        "offset": offset,
+        "rows": offset - start_offset,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round((offset - start_offset) / elapsed, 1) if elapsed else None,
+        "stages": {name: s.to_dict() for name, s in stats.items()},
+    }
+    logger.info(f"Pipeline finished: {json.dumps(report)}")
+    return report
+
+
+def create_sink(spec: str):
+    """ Приёмник по строке из командной строки: "file:<путь>" или "mongo". """
+    if spec.startswith("file:"):
+        return FileSink(spec[len("file:"):])
+    if spec == "mongo":
+        from infrastructure.database import mongo_client
+        return MongoSink(mongo_client.patients_collection)
+    raise ValueError(f"Unknown sink: {spec}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Stream raw medical cases through preprocessing and diagnosis.")
+    parser.add_argument("input", help="JSONL, CSV or Parquet file with raw cases")
+    parser.add_argument("--sink", default="file:diagnoses.jsonl", help="file:<path> or mongo (uses MONGO_URI)")
+    parser.add_argument("--checkpoint", help="checkpoint file used to resume the job")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=0, help="processes per CPU-heavy stage (0 = in process)")
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    parser.add_argument("--ai-model-type", default=os.getenv("AI_MODEL_TYPE", "pytorch"))
+    parser.add_argument("--ai-model-path", default=os.getenv("AI_MODEL_PATH", "models/final/diagnosis_model.pth"))
+    parser.add_argument("--nlp-model-type", default=os.getenv("NLP_MODEL_TYPE", "tfidf"))
+    args = parser.parse_args(argv)
+
+    from core.use_cases.diagnose_patient import DiagnosePatient
+    from modules.diagnostics.ai_diagnosis import AIDiagnosisFactory
+    from modules.nlp.nlp_model import NLPModelFactory
+
+    use_case = DiagnosePatient(
+        AIDiagnosisFactory.get_model(args.ai_model_type, args.ai_model_path),
+        NLPModelFactory.get_model(args.nlp_model_type),
+    )
+    report = run_pipeline(
+        args.input, use_case, create_sink(args.sink), Checkpoint(args.checkpoint),
+        chunk_size=args.chunk_size, workers=args.workers, max_in_flight=args.max_in_flight,
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
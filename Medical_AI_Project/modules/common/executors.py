@@ -0,0 +1,74 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class BoundedExecutor:
+    """
+    Thread pool with a fixed concurrency used to run blocking calls off the asyncio event loop.
+
+    Blocking work (pymongo queries, torch inference) submitted through run() never executes on the
+    event loop thread, so one slow call cannot stall the other requests of the worker.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        """
+        :param name: Name used for the worker threads and metrics.
+        :param max_workers: Maximum number of calls running at the same time.
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Runs a blocking function in the pool and awaits its result.
+
+        :param fn: Blocking function.
+        :return: The function result.
+        """
+        with self._lock:
+            self._submitted += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(self._call, fn, *args, **kwargs))
+
+    def _call(self, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            self._running += 1
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+        return result
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Returns executor counters.
+
+        :return: Dictionary with running, queued and completed calls.
+        """
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "running": self._running,
+                "queued": self._submitted - self._completed - self._running,
+                "completed": self._completed,
+                "failed": self._failed,
+            }
+
+    def shutdown(self, wait: bool = True):
+        """ Stops the worker threads. """
+        self._executor.shutdown(wait=wait)
@@ -1,64 +1,425 @@
+import atexit
+import glob
+import gzip
+import json
 import logging
 import os
+import queue
+import random
+import shutil
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
+from logging.handlers import BaseRotatingHandler, QueueHandler, QueueListener
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: rotation is not locked between processes
+    fcntl = None
+
+# Backend settings (overridable through environment variables)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # file output: json | text
+LOG_CONSOLE = os.getenv("LOG_CONSOLE", "1") == "1"
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_ROTATE_SECONDS = int(os.getenv("LOG_ROTATE_SECONDS", str(24 * 3600)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "14"))
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_RATE_LIMIT = float(os.getenv("LOG_RATE_LIMIT", "0"))  # INFO/DEBUG records per second per logger, 0 = unlimited
+LOG_FILE_PER_PROCESS = os.getenv("LOG_FILE_PER_PROCESS", "0") == "1"  # <name>.<pid>.log instead of a shared <name>.log
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line. Keyword fields passed to Logger methods are added as keys.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def _gzip_rotator(source: str, dest: str):
+    """ Compresses a rotated log file and removes the original. """
+    with open(source, "rb") as src, gzip.open(f"{dest}.gz", "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+class CompressingRotatingFileHandler(BaseRotatingHandler):
+    """
+    File handler rotating by size or by time, whichever comes first. Rotated files are gzip-compressed
+    and only the newest backup_count archives are kept.
+
+    Several processes may write the same file: like WatchedFileHandler, the handler reopens the file when
+    it has been renamed or removed under it. Writes hold a shared and rotation an exclusive lock on
+    <file>.lock, so no process writes into a file being rotated, and only the process still holding the
+    current file rotates it while the others switch to the new one.
+    """
+
+    def __init__(self, filename: str, max_bytes: int, interval_seconds: int, backup_count: int):
+        """
+        :param filename: Active log file.
+        :param max_bytes: Rotate when the file would exceed this size (0 disables size rotation).
+        :param interval_seconds: Rotate when the file is older than this (0 disables time rotation).
+        :param backup_count: Number of compressed archives to keep.
+        """
+        super().__init__(filename, "a", encoding="utf-8", delay=True)
+        self.max_bytes = max_bytes
+        self.interval_seconds = interval_seconds
+        self.backup_count = backup_count
+        self.rotator = _gzip_rotator
+        self.rollover_at = time.time() + interval_seconds if interval_seconds else None
+        self.lock_stream = None
+
+    @contextmanager
+    def file_lock(self, operation: int):
+        """ Advisory lock on <file>.lock shared with other processes (no-op without fcntl). """
+        if fcntl is None:
+            yield
+            return
+        if self.lock_stream is None:
+            self.lock_stream = open(f"{self.baseFilename}.lock", "a")
+        fcntl.flock(self.lock_stream, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.lock_stream, fcntl.LOCK_UN)
+
+    def shouldRollover(self, record: logging.LogRecord, pending: int = 0) -> bool:
+        """
+        Checks the rotation interval and the current stream position; the record itself is not formatted.
+
+        :param record: Record about to be written.
+        :param pending: Length of the already formatted record.
+        """
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        if self.max_bytes > 0:
+            if self.stream is None:
+                self.stream = self._open()
+            return self.stream.tell() + pending > self.max_bytes
+        return False
+
+    def reopen_if_moved(self) -> bool:
+        """
+        Reopens the file if it was rotated (renamed or removed) by another process.
+
+        :return: True if the stream was reopened.
+        """
+        if self.stream is None:
+            return False
+        try:
+            current, opened = os.stat(self.baseFilename), os.fstat(self.stream.fileno())
+            moved = (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino)
+        except FileNotFoundError:
+            moved = True
+        if moved:
+            self.stream.close()
+            self.stream = self._open()
+        return moved
+
+    def emit(self, record: logging.LogRecord):
+        """ Formats the record once, rotates first if it would not fit, then writes it. """
+        try:
+            message = self.format(record) + self.terminator
+            self.reopen_if_moved()
+            if self.shouldRollover(record, len(message)):
+                self.doRollover()
+            with self.file_lock(fcntl.LOCK_SH if fcntl else 0):
+                if self.stream is None:
+                    self.stream = self._open()
+                else:
+                    self.reopen_if_moved()
+                self.stream.write(message)
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def doRollover(self):
+        """ Renames the current file under the exclusive lock, then compresses it without holding the lock. """
+        rotated = None
+        with self.file_lock(fcntl.LOCK_EX if fcntl else 0):
+            # If another process has just rotated the file, write to the new one instead of rotating it again
+            if not self.reopen_if_moved():
+                if self.stream:
+                    self.stream.close()
+                    self.stream = None
+                if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+                    rotated = self._archive_name()
+                    os.rename(self.baseFilename, rotated)
+            if self.interval_seconds:
+                self.rollover_at = time.time() + self.interval_seconds
+        if rotated is not None:
+            self.rotate(rotated, rotated)
+            archives = sorted(glob.glob(f"{glob.escape(self.baseFilename)}.*.gz"), key=os.path.getmtime)
+            for archive in archives[:-self.backup_count or None]:
+                try:
+                    os.remove(archive)
+                except FileNotFoundError:
+                    pass  # removed by another process
+
+    def _archive_name(self) -> str:
+        """ Unused name for a rotated file (compressed to <name>.gz). """
+        dest = f"{self.baseFilename}.{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        suffix = 1
+        while os.path.exists(dest) or os.path.exists(f"{dest}.gz"):
+            dest = f"{self.baseFilename}.{datetime.now().strftime('%Y%m%d-%H%M%S')}-{suffix}"
+            suffix += 1
+        return dest
+
+    def close(self):
+        super().close()
+        if self.lock_stream is not None:
+            self.lock_stream.close()
+            self.lock_stream = None
+
+
+class _PerLoggerFileHandler(logging.Handler):
+    """
+    Routes each record to the rotating file of its logger (logs/<name>.log). Used only by the writer thread.
+
+    Separately started processes share logs/<name>.log (rotation is coordinated by the file handler). Forked
+    workers, or every process with LOG_FILE_PER_PROCESS, write logs/<name>.<pid>.log instead.
+    """
+
+    def __init__(self, log_dir: str, per_process: bool = LOG_FILE_PER_PROCESS):
+        super().__init__()
+        self.log_dir = log_dir
+        self.per_process = per_process
+        self.handlers: Dict[str, CompressingRotatingFileHandler] = {}
+
+    def filename(self, name: str) -> str:
+        """ Active log file of a logger in this process. """
+        return os.path.join(self.log_dir, f"{name}.{os.getpid()}.log" if self.per_process else f"{name}.log")
+
+    def emit(self, record: logging.LogRecord):
+        handler = self.handlers.get(record.name)
+        if handler is None:
+            handler = CompressingRotatingFileHandler(
+                self.filename(record.name), LOG_MAX_BYTES, LOG_ROTATE_SECONDS, LOG_BACKUP_COUNT
+            )
+            handler.setFormatter(self.formatter)
+            self.handlers[record.name] = handler
+        handler.handle(record)
+
+    def close(self):
+        for handler in self.handlers.values():
+            handler.close()
+        super().close()
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Enqueues records without formatting them: message interpolation happens in the writer thread.
+    Arguments must therefore not be mutated after the logging call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class Sampler:
+    """
+    Per-logger sampling and rate limiting for high-frequency INFO/DEBUG records. Warnings and errors always pass.
+    Checked before a record is created, so suppressed calls cost almost nothing.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, rate_limit: float = 0.0):
+        """
+        :param sample_rate: Fraction of records kept (1.0 keeps everything).
+        :param rate_limit: Maximum records per second (0 disables the limit).
+        """
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit
+        self.tokens = rate_limit
+        self.last_refill = time.monotonic()
+        self.suppressed = 0
+        self.lock = threading.Lock()
+
+    def allow(self, level: int) -> bool:
+        if level >= logging.WARNING:
+            return True
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            with self.lock:
+                self.suppressed += 1
+            return False
+        if self.rate_limit > 0:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate_limit, self.tokens + (now - self.last_refill) * self.rate_limit)
+                self.last_refill = now
+                if self.tokens < 1:
+                    self.suppressed += 1
+                    return False
+                self.tokens -= 1
+        return True
+
+
+class _LogBackend:
+    """ Process-wide queue and single writer thread shared by every Logger. """
+
+    def __init__(self, log_dir: str):
+        self.queue = queue.SimpleQueue()
+        self.handler = _DeferredQueueHandler(self.queue)
+
+        file_handler = self.file_handler = _PerLoggerFileHandler(log_dir)
+        if LOG_FORMAT == "json":
+            file_handler.setFormatter(JsonFormatter())
+        else:
+            file_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+        handlers = [file_handler]
+        if LOG_CONSOLE:
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(logging.Formatter("%(name)s - %(levelname)s - %(message)s"))
+            handlers.append(console_handler)
+        self.handlers = handlers
+        self.listener = None
+        self.start()
+
+    def start(self):
+        self.listener = QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        """ Writes the queued records and stops the writer thread. """
+        if self.listener is None:
+            return
+        self.listener.stop()
+        self.listener = None
+        for handler in self.handlers:
+            handler.flush()
+
+    def after_fork_in_child(self):
+        """
+        The writer thread does not survive fork: the child gets a fresh queue and its own writer.
+        It also switches to per-process files, leaving the parent's files (and their rotation) to the parent.
+        """
+        self.file_handler.handlers = {}
+        self.file_handler.per_process = True
+        self.queue = queue.SimpleQueue()
+        self.handler.queue = self.queue
+        self.start()
+
+
+_backend: Optional[_LogBackend] = None
+_backend_lock = threading.Lock()
+_samplers: Dict[str, Sampler] = {}
+
+
+def get_backend(log_dir: str) -> _LogBackend:
+    """ Returns the shared logging backend, starting the writer thread on first use. """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _LogBackend(log_dir)
+                atexit.register(_backend.stop)
+                if hasattr(os, "register_at_fork"):
+                    os.register_at_fork(after_in_child=lambda: _backend.after_fork_in_child())
+    return _backend
 
 
 class Logger:
     """
     A custom logger for handling logs across the application.
+
+    Records are put on a queue and written by a single background thread, so logging calls never block
+    on file or console I/O. Messages support lazy %-style arguments and structured keyword fields:
+    logger.info("Diagnosis %s (%.2f)", diagnosis, confidence, patient_id=42)
     """
 
-    LOG_DIR = "logs"
+    LOG_DIR = os.getenv("LOG_DIR", "logs")
 
     if not os.path.exists(LOG_DIR):
         os.makedirs(LOG_DIR)
 
-    def __init__(self, name: str, log_level=logging.INFO):
+    def __init__(
+        self,
+        name: str,
+        log_level=logging.INFO,
+        sample_rate: float = LOG_SAMPLE_RATE,
+        rate_limit: float = LOG_RATE_LIMIT,
+    ):
         """
         Initializes a logger instance.
 
         :param name: The name of the logger.
         :param log_level: Logging level (default is INFO).
+        :param sample_rate: Fraction of INFO/DEBUG records kept for this logger.
+        :param rate_limit: Maximum INFO/DEBUG records per second for this logger (0 = unlimited).
         """
         self.logger = logging.getLogger(name)
         self.logger.setLevel(log_level)
 
         # Avoid duplicate handlers
         if not self.logger.hasHandlers():
-            log_filename = os.path.join(self.LOG_DIR, f"{name}_{datetime.now().strftime('%Y-%m-%d')}.log")
+            self.logger.addHandler(get_backend(self.LOG_DIR).handler)
 
-            # File handler
-            file_handler = logging.FileHandler(log_filename, mode="a", encoding="utf-8")
-            file_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+        self.sampler = None
+        if sample_rate < 1.0 or rate_limit > 0:
+            with _backend_lock:
+                self.sampler = _samplers.setdefault(name, Sampler(sample_rate, rate_limit))
 
-            # Console handler
-            console_handler = logging.StreamHandler()
-            console_handler.setFormatter(logging.Formatter("%(name)s - %(levelname)s - %(message)s"))
+    def _log(self, level: int, message: str, args: tuple, fields: dict):
+        if not self.logger.isEnabledFor(level):
+            return
+        if self.sampler is not None and not self.sampler.allow(level):
+            return
+        # The caller's file and line are not part of the output: skip findCaller and build the record directly
+        record = self.logger.makeRecord(
+            self.logger.name, level, "(unknown file)", 0, message, args, None,
+            extra={"fields": fields} if fields else None,
+        )
+        self.logger.handle(record)
 
-            self.logger.addHandler(file_handler)
-            self.logger.addHandler(console_handler)
-
-    def info(self, message: str):
+    def info(self, message: str, *args, **fields):
         """ Logs an informational message. """
-        self.logger.info(message)
+        self._log(logging.INFO, message, args, fields)
 
-    def warning(self, message: str):
+    def warning(self, message: str, *args, **fields):
         """ Logs a warning message. """
-        self.logger.warning(message)
+        self._log(logging.WARNING, message, args, fields)
 
-    def error(self, message: str):
+    def error(self, message: str, *args, **fields):
         """ Logs an error message. """
-        self.logger.error(message)
+        self._log(logging.ERROR, message, args, fields)
 
-    def debug(self, message: str):
+    def debug(self, message: str, *args, **fields):
         """ Logs a debug message. """
-        self.logger.debug(message)
+        self._log(logging.DEBUG, message, args, fields)
+
+    def get_suppressed(self) -> int:
+        """ Number of records dropped by sampling or rate limiting. """
+        return self.sampler.suppressed if self.sampler is not None else 0
+
+
+def flush_logs():
+    """ Blocks until every queued record has been written (used by tests and before exit). """
+    if _backend is not None:
+        _backend.stop()
+        _backend.start()
 
 
 # Example Usage
 if __name__ == "__main__":
     logger = Logger("TestLogger")
     logger.info("This is an informational log.")
+    logger.info("Diagnosis %s with confidence %.2f", "Flu", 0.87, patient_id=42)
     logger.warning("This is a warning log.")
     logger.error("This is an error log.")
     logger.debug("This is a debug log.")
+    flush_logs()
@@ -0,0 +1,161 @@
+import hashlib
+import io
+import os
+import time
+import warnings
+import numpy as np
+import torch
+from typing import Callable, Dict, Any, Tuple
+
+
+def quantize_linear_layers(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    Applies dynamic int8 quantization to all Linear layers of a model.
+
+    Weights are stored as int8, activations are quantized on the fly, so no calibration data is needed.
+
+    :param model: fp32 PyTorch model.
+    :return: Quantized copy of the model in eval mode.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # torch.ao eager quantization emits migration notices
+        from torch.ao.quantization import quantize_dynamic
+        return quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def source_fingerprint(path: str) -> str:
+    """
+    Short fingerprint of model weights on disk, used to notice that a derived artifact is stale.
+
+    Built from the size and modification time of the file, or of every file of a model directory,
+    so the weights are never read.
+
+    :param path: Weights file or model directory.
+    :return: 12 hex characters, or an empty string if path is not on disk (e.g. a Hugging Face model name).
+    """
+    if os.path.isfile(path):
+        files = [path]
+    elif os.path.isdir(path):
+        files = sorted(
+            os.path.join(root, name) for root, _, names in os.walk(path) for name in names
+        )
+    else:
+        return ""
+    digest = hashlib.sha256()
+    for file_path in files:
+        stat = os.stat(file_path)
+        digest.update(f"{os.path.relpath(file_path, path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
+
+
+def load_or_quantize(
+    cache_path: str,
+    load_fp32_model: Callable[[], torch.nn.Module]
+) -> torch.nn.Module:
+    """
+    Loads a cached quantized model, or quantizes the fp32 model and caches the result.
+
+    On a cache hit the fp32 weights are never loaded, which also keeps peak memory low at startup.
+
+    :param cache_path: Path of the cached quantized model.
+    :param load_fp32_model: Function returning the fp32 model (called on a cache miss only).
+    :return: Quantized model in eval mode.
+    """
+    if os.path.exists(cache_path):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return torch.load(cache_path, map_location=torch.device("cpu"), weights_only=False).eval()
+
+    quantized_model = quantize_linear_layers(load_fp32_model())
+    directory = os.path.dirname(cache_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Saved under a temporary name and renamed, so an interrupted save never leaves a truncated cache entry
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        torch.save(quantized_model, tmp_path)
+        os.replace(tmp_path, cache_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return quantized_model
+
+
+def model_size_bytes(model: torch.nn.Module) -> int:
+    """
+    Size of the serialized weights of a model.
+
+    :param model: PyTorch model.
+    :return: Number of bytes of its state_dict.
+    """
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+
+def quantization_report(
+    fp32_model: torch.nn.Module,
+    quantized_model: torch.nn.Module,
+    run: Callable[[torch.nn.Module, Any], np.ndarray],
+    inputs: Any,
+    iterations: int = 10
+) -> Dict[str, Any]:
+    """
+    Compares a quantized model with its fp32 original.
+
+    :param fp32_model: Original model.
+    :param quantized_model: Quantized model.
+    :param run: Function running a model on the inputs and returning a 2D output matrix.
+    :param inputs: Inputs passed to run().
+    :param iterations: Number of timed runs per model.
+    :return: Latency, memory and output drift statistics.
+    """
+    def timed(model: torch.nn.Module) -> Tuple[np.ndarray, float]:
+        with torch.inference_mode():
+            outputs = run(model, inputs)  # Warmup
+            started = time.perf_counter()
+            for _ in range(iterations):
+                run(model, inputs)
+        return np.asarray(outputs, dtype=np.float32), (time.perf_counter() - started) / iterations * 1000
+
+    fp32_outputs, fp32_latency = timed(fp32_model)
+    quantized_outputs, quantized_latency = timed(quantized_model)
+
+    norms = np.linalg.norm(fp32_outputs, axis=1) * np.linalg.norm(quantized_outputs, axis=1)
+    cosine = np.sum(fp32_outputs * quantized_outputs, axis=1) / np.maximum(norms, 1e-12)
+    fp32_size = model_size_bytes(fp32_model)
+    quantized_size = model_size_bytes(quantized_model)
+
+    return {
+        "fp32_latency_ms": fp32_latency,
+        "int8_latency_ms": quantized_latency,
+        "speedup": fp32_latency / quantized_latency if quantized_latency else 0.0,
+        "fp32_size_bytes": fp32_size,
+        "int8_size_bytes": quantized_size,
+        "size_ratio": quantized_size / fp32_size if fp32_size else 0.0,
+        "mean_cosine_similarity": float(cosine.mean()),
+        "min_cosine_similarity": float(cosine.min()),
+        "max_abs_diff": float(np.abs(fp32_outputs - quantized_outputs).max()),
+        "same_argmax_ratio": float(np.mean(fp32_outputs.argmax(axis=1) == quantized_outputs.argmax(axis=1))),
+    }
+
+
+def cached_model_path(cache_dir: str, model_name: str, suffix: str = "int8", source_path: str = "") -> str:
+    """
+    Builds the path of a cached quantized model.
+
+    The fingerprint of the source weights is part of the file name, so new weights get a new cache entry
+    instead of the stale quantized copy of the old ones.
+
+    :param cache_dir: Directory of quantized artifacts.
+    :param model_name: Model name or path of the fp32 model.
+    :param suffix: Artifact suffix.
+    :param source_path: Weights file or model directory the artifact is built from (model_name by default).
+    :return: File path inside cache_dir.
+    """
+    safe_name = model_name.strip("/").replace("/", "_").replace("\\", "_").replace(":", "_")
+    fingerprint = source_fingerprint(source_path or model_name)
+    if fingerprint:
+        safe_name = f"{safe_name}-{fingerprint}"
+    return os.path.join(cache_dir, f"{safe_name}-{suffix}.pt")
+
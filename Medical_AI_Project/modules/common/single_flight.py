@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Request coalescing: while a computation for a key is in flight, later callers with the same key wait for
+    its result instead of starting a duplicate. Nothing is cached once the computation finishes.
+
+    do() serves threads (executors, worker pools); do_async() serves coroutines on an event loop.
+    Exceptions are propagated to every waiting caller. The result object is shared, so callers must not mutate it.
+    """
+
+    def __init__(self, name: str = ""):
+        """
+        :param name: Name used in metrics.
+        """
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self._tasks: Dict[Hashable, asyncio.Future] = {}
+        self._executions = 0
+        self._deduplicated = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Runs fn() once per key among concurrent callers in different threads.
+
+        :param key: Normalized key of the computation.
+        :param fn: Function computing the value.
+        :return: The value computed by the first caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+                self._executions += 1
+            else:
+                self._deduplicated += 1
+        if not leader:
+            return call.result()
+
+        try:
+            value = fn()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Awaits fn() once per key among concurrent coroutines of the running event loop.
+
+        The computation runs as a separate task: a cancelled caller does not cancel it for the others.
+
+        :param key: Normalized key of the computation.
+        :param fn: Function returning an awaitable of the value.
+        :return: The value computed for the first caller.
+        """
+        flight_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            task = self._tasks.get(flight_key)
+            if task is not None:
+                self._deduplicated += 1
+            else:
+                task = self._tasks[flight_key] = asyncio.ensure_future(fn())
+                self._executions += 1
+                task.add_done_callback(lambda _: self._forget(flight_key))
+        return await asyncio.shield(task)
+
+    def _forget(self, flight_key: Hashable):
+        with self._lock:
+            self._tasks.pop(flight_key, None)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Returns coalescing counters.
+
+        :return: Dictionary with executed and deduplicated calls and the number of keys in flight.
+        """
+        with self._lock:
+            calls = self._executions + self._deduplicated
+            return {
+                "name": self.name,
+                "executions": self._executions,
+                "deduplicated": self._deduplicated,
+                "dedup_ratio": self._deduplicated / calls if calls else 0.0,
+                "in_flight": len(self._calls) + len(self._tasks),
+            }
@@ -0,0 +1,106 @@
+import importlib
+import sys
+import threading
+import time
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterable, Optional
+
+_import_report = {}
+_import_lock = threading.Lock()
+_process_started = time.perf_counter()
+
+
+def timed_import(module_name: str) -> ModuleType:
+    """
+    Imports a module and records how long the import took.
+
+    Only the first (cold) import of a module is recorded; later calls are free.
+
+    :param module_name: Dotted module name.
+    :return: The imported module.
+    """
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    with _import_lock:
+        _import_report.setdefault(module_name, time.perf_counter() - started)
+    return module
+
+
+def get_import_report() -> Dict[str, float]:
+    """
+    Returns the recorded import durations.
+
+    :return: Dictionary of module name -> seconds, slowest first.
+    """
+    with _import_lock:
+        return dict(sorted(_import_report.items(), key=lambda item: item[1], reverse=True))
+
+
+class ReadinessRegistry:
+    """
+    Tracks the loading state of the components a service needs before it can take traffic.
+
+    Each component goes through "pending" -> "loading" -> "ready" (or "failed").
+    """
+
+    def __init__(self, components: Iterable[str]):
+        """
+        :param components: Names of the components that must be ready.
+        """
+        self._lock = threading.Lock()
+        self._components = {name: {"status": "pending"} for name in components}
+
+    def run(self, name: str, load: Callable[[], Any]) -> Any:
+        """
+        Runs the loading function of a component and records its outcome.
+
+        :param name: Component name.
+        :param load: Function loading the component.
+        :return: Whatever load() returns; exceptions are recorded and re-raised.
+        """
+        self._set(name, status="loading")
+        started = time.perf_counter()
+        try:
+            result = load()
+        except Exception as e:
+            self._set(name, status="failed", error=str(e), seconds=time.perf_counter() - started)
+            raise
+        self._set(name, status="ready", seconds=time.perf_counter() - started)
+        return result
+
+    def mark_ready(self, name: str):
+        """ Marks a component as ready without a loading step. """
+        self._set(name, status="ready")
+
+    def _set(self, name: str, **state):
+        with self._lock:
+            self._components[name] = state
+
+    def is_ready(self, name: Optional[str] = None) -> bool:
+        """
+        Whether a component (or every component) is ready.
+
+        :param name: Component name; None checks all components.
+        """
+        with self._lock:
+            if name is not None:
+                return self._components.get(name, {}).get("status") == "ready"
+            return all(state["status"] == "ready" for state in self._components.values())
+
+    def get_report(self) -> Dict[str, Any]:
+        """
+        Returns the per-component readiness, the import-time report and the process uptime.
+
+        :return: Dictionary ready to be serialized as JSON.
+        """
+        with self._lock:
+            components = {name: dict(state) for name, state in self._components.items()}
+        return {
+            "ready": all(state["status"] == "ready" for state in components.values()),
+            "components": components,
+            "imports": get_import_report(),
+            "uptime_seconds": time.perf_counter() - _process_started,
+        }
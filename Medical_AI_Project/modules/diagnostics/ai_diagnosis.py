@@ -1,9 +1,12 @@
 import torch
 import numpy as np
 from abc import ABC, abstractmethod
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, List, Optional
 from modules.common.logger import Logger
 
+# Diagnosis returned by predict()/predict_batch() when the model fails; it is not a result and must not be reused
+ERROR_DIAGNOSIS = "Error in Diagnosis"
+
 
 class IAIDiagnosis(ABC):
     """
@@ -20,12 +23,31 @@ class IAIDiagnosis(ABC):
         """ Performs a diagnosis prediction. """
         pass
 
+    def predict_batch(self, batch: List[Dict[str, Any]]) -> List[Tuple[str, float]]:
+        """
+        Performs diagnosis predictions for several inputs.
+
+        Models that can run a single forward pass over the whole batch should override this.
+
+        :param batch: List of dictionaries containing patient information.
+        :return: List of (diagnosis, confidence) pairs in input order.
+        """
+        return [self.predict(data) for data in batch]
+
 
 class TorchAIDiagnosis(IAIDiagnosis):
     """
     PyTorch-based AI diagnosis model.
     """
 
+    DIAGNOSIS_MAPPING = {
+        0: "Common Cold",
+        1: "Flu",
+        2: "Pneumonia",
+        3: "COVID-19",
+        4: "Hypertension Complications"
+    }
+
     def __init__(self, model_path: str):
         self.logger = Logger("TorchAIDiagnosis")
         self.logger.info("Loading PyTorch model...")
@@ -42,29 +64,63 @@ class TorchAIDiagnosis(IAIDiagnosis):
         :return: Loaded PyTorch model.
         """
         try:
-            model = torch.load(model_path, map_location=torch.device("cpu"))
+            model = torch.load(model_path, map_location=torch.device("cpu"), weights_only=False)
             model.eval()
             return model
         except Exception as e:
             self.logger.error(f"Failed to load model: {e}")
             raise RuntimeError("Could not load AI model.")
 
-    def preprocess_input(self, data: Dict[str, Any]) -> torch.Tensor:
+    @staticmethod
+    def build_feature_vector(data: Dict[str, Any]) -> np.ndarray:
         """
-        Prepares input data for the model.
+        Builds the flat feature vector for a single patient.
 
         :param data: Dictionary containing patient information.
-        :return: PyTorch tensor with processed input features.
+        :return: NumPy array with processed input features.
         """
         age = data.get("age", 0)
         gender = 1 if data.get("gender") == "male" else 0  # 1 = male, 0 = female/other
-        symptoms_vector = np.array(data.get("symptoms_vector", [0] * 100))  # NLP feature vector
+        symptoms_vector = np.asarray(data.get("symptoms_vector", [0] * 100))  # NLP feature vector
         chronic_conditions = len(data.get("chronic_conditions", []))  # Number of chronic conditions
         medications = len(data.get("medications", []))  # Number of medications
 
-        input_vector = np.concatenate(([age, gender, chronic_conditions, medications], symptoms_vector))
+        return np.concatenate(([age, gender, chronic_conditions, medications], symptoms_vector))
+
+    def preprocess_input(self, data: Dict[str, Any]) -> torch.Tensor:
+        """
+        Prepares input data for the model.
+
+        :param data: Dictionary containing patient information.
+        :return: PyTorch tensor with processed input features.
+        """
+        input_vector = self.build_feature_vector(data)
         return torch.tensor(input_vector, dtype=torch.float32).unsqueeze(0)  # Batch size of 1
 
+    def preprocess_batch(self, batch: List[Dict[str, Any]]) -> torch.Tensor:
+        """
+        Prepares a batch of inputs for a single forward pass.
+
+        :param batch: List of dictionaries containing patient information.
+        :return: PyTorch tensor of shape (len(batch), n_features).
+        """
+        matrix = np.stack([self.build_feature_vector(data) for data in batch]).astype(np.float32, copy=False)
+        return torch.from_numpy(matrix)
+
+    def postprocess_output(self, output: torch.Tensor) -> List[Tuple[str, float]]:
+        """
+        Converts raw model logits into (diagnosis, confidence) pairs.
+
+        :param output: Model output of shape (batch_size, n_classes).
+        :return: List of (diagnosis, confidence) pairs, one per row.
+        """
+        probabilities = torch.nn.functional.softmax(output, dim=1)
+        confidences, predicted_classes = torch.max(probabilities, dim=1)
+        return [
+            (self.DIAGNOSIS_MAPPING.get(predicted_class, "Unknown Condition"), confidence)
+            for predicted_class, confidence in zip(predicted_classes.tolist(), confidences.tolist())
+        ]
+
     def predict(self, data: Dict[str, Any]) -> Tuple[str, float]:
         """
         Predicts a medical diagnosis based on input data.
@@ -72,28 +128,38 @@ class TorchAIDiagnosis(IAIDiagnosis):
         :param data: Dictionary containing patient information.
         :return: Predicted diagnosis and confidence score.
         """
-        self.logger.info("Generating diagnosis prediction...")
+        self.logger.debug("Generating diagnosis prediction...")
         try:
             input_tensor = self.preprocess_input(data)
             with torch.no_grad():
                 output = self.model(input_tensor)
-            predicted_class = torch.argmax(output, dim=1).item()
-            confidence = torch.max(torch.nn.functional.softmax(output, dim=1)).item()
-
-            diagnosis_mapping = {
-                0: "Common Cold",
-                1: "Flu",
-                2: "Pneumonia",
-                3: "COVID-19",
-                4: "Hypertension Complications"
-            }
-            diagnosis = diagnosis_mapping.get(predicted_class, "Unknown Condition")
-
-            self.logger.info(f"Diagnosis: {diagnosis}, Confidence: {confidence:.2f}")
+            diagnosis, confidence = self.postprocess_output(output)[0]
+
+            self.logger.info("Diagnosis: %s, Confidence: %.2f", diagnosis, confidence)
             return diagnosis, confidence
         except Exception as e:
-            self.logger.error(f"Prediction failed: {e}")
-            return "Error in Diagnosis", 0.0
+            self.logger.error("Prediction failed: %s", e)
+            return ERROR_DIAGNOSIS, 0.0
+
+    def predict_batch(self, batch: List[Dict[str, Any]]) -> List[Tuple[str, float]]:
+        """
+        Predicts diagnoses for several patients with a single forward pass.
+
+        :param batch: List of dictionaries containing patient information.
+        :return: List of (diagnosis, confidence) pairs in input order.
+        """
+        if not batch:
+            return []
+
+        self.logger.debug("Generating diagnosis predictions for a batch of %d...", len(batch))
+        try:
+            input_tensor = self.preprocess_batch(batch)
+            with torch.no_grad():
+                output = self.model(input_tensor)
+            return self.postprocess_output(output)
+        except Exception as e:
+            self.logger.error("Batch prediction failed: %s", e)
+            return [(ERROR_DIAGNOSIS, 0.0)] * len(batch)
 
 
 class AIDiagnosisFactory:
@@ -102,19 +168,48 @@ class AIDiagnosisFactory:
     """
 
     @staticmethod
-    def get_model(model_type: str, model_path: str) -> IAIDiagnosis:
+    def get_model(
+        model_type: str,
+        model_path: str,
+        batching: bool = False,
+        quantized: bool = False,
+        intra_op_threads: Optional[int] = None,
+        inter_op_threads: Optional[int] = None,
+        **batcher_options
+    ) -> IAIDiagnosis:
         """
         Creates an AI diagnosis model based on the specified type.
 
-        :param model_type: Type of the model (e.g., "pytorch").
+        :param model_type: Type of the model ("pytorch", "torchscript" or "onnx").
         :param model_path: Path to the model file.
+        :param batching: Wrap the model into a background MicroBatcher.
+        :param quantized: Use dynamic int8 quantization ("pytorch" model type only).
+        :param intra_op_threads: CPU threads per operator (torchscript and onnx backends).
+        :param inter_op_threads: CPU threads across operators (torchscript and onnx backends).
+        :param batcher_options: MicroBatcher settings (max_batch_size, max_wait_ms, max_queue_size).
         :return: An instance of the AI diagnosis model.
         """
-        if model_type == "pytorch":
-            return TorchAIDiagnosis(model_path)
+        if model_type == "pytorch" and quantized:
+            from modules.diagnostics.backends import QuantizedAIDiagnosis
+            model = QuantizedAIDiagnosis(model_path)
+        elif model_type == "pytorch":
+            model = TorchAIDiagnosis(model_path)
+        elif model_type == "torchscript":
+            from modules.diagnostics.backends import TorchScriptAIDiagnosis
+            model = TorchScriptAIDiagnosis(
+                model_path, intra_op_threads=intra_op_threads, inter_op_threads=inter_op_threads
+            )
+        elif model_type == "onnx":
+            from modules.diagnostics.backends import OnnxAIDiagnosis
+            model = OnnxAIDiagnosis(model_path, intra_op_threads=intra_op_threads, inter_op_threads=inter_op_threads)
         else:
             raise ValueError(f"Unknown model type: {model_type}")
 
+        if batching:
+            from modules.diagnostics.batching import MicroBatcher
+            return MicroBatcher(model, **batcher_options)
+        return model
+
 
 # Example Usage
 if __name__ == "__main__":
@@ -0,0 +1,335 @@
+import os
+import time
+from abc import abstractmethod
+import numpy as np
+import torch
+from typing import Callable, Dict, Any, Optional
+from modules.diagnostics.ai_diagnosis import TorchAIDiagnosis
+from modules.common.quantization import load_or_quantize, cached_model_path, quantization_report, source_fingerprint
+
+
+def infer_input_size(model: torch.nn.Module) -> int:
+    """
+    Infers the number of input features of a model from its first Linear layer.
+
+    :param model: Eager PyTorch model.
+    :return: Number of input features.
+    """
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear):
+            return module.in_features
+    raise ValueError("Cannot infer the model input size, pass input_size explicitly.")
+
+
+def configure_torch_threads(intra_op_threads: Optional[int] = None, inter_op_threads: Optional[int] = None):
+    """
+    Sets the PyTorch CPU thread pools.
+
+    :param intra_op_threads: Threads used inside a single operator.
+    :param inter_op_threads: Threads used to run independent operators in parallel.
+    """
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError:
+            pass  # Can only be set once, before any parallel work has started
+
+
+def _write_text(path: str, text: str):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+class OptimizedAIDiagnosis(TorchAIDiagnosis):
+    """
+    Base class for diagnosis backends that serve an exported copy of the eager model.
+
+    The eager model is exported next to model_path (ARTIFACT_SUFFIX) and the exported artifact is
+    loaded directly on later starts. The fingerprint of the weights it was exported from is stored
+    beside it (SOURCE_SUFFIX); when model_path changes the artifact is exported again.
+    Both files are written to a temporary file and renamed into place, so an interrupted export never
+    leaves a truncated artifact behind. Every export is verified with check_parity().
+    """
+
+    ARTIFACT_SUFFIX = ""
+    BACKEND_NAME = ""
+    SOURCE_SUFFIX = ".source"
+
+    def __init__(
+        self,
+        model_path: str,
+        eager_model: Optional[torch.nn.Module] = None,
+        input_size: Optional[int] = None,
+        intra_op_threads: Optional[int] = None,
+        inter_op_threads: Optional[int] = None,
+        parity_atol: float = 1e-4
+    ):
+        """
+        Loads the exported model, exporting it first if needed.
+
+        :param model_path: Path to the eager PyTorch model.
+        :param eager_model: Already loaded eager model (loaded from model_path when missing).
+        :param input_size: Number of input features (inferred from the first Linear layer by default).
+        :param intra_op_threads: Threads used inside a single operator.
+        :param inter_op_threads: Threads used to run independent operators in parallel.
+        :param parity_atol: Maximum absolute difference of logits tolerated by the parity check.
+        """
+        super().__init__(model_path)
+        self.model_path = model_path
+        self.artifact_path = os.path.splitext(model_path)[0] + self.ARTIFACT_SUFFIX
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.parity_atol = parity_atol
+        self.eager_model = eager_model
+        self.input_size = input_size
+
+        fingerprint = source_fingerprint(model_path)
+        if self.artifact_is_stale(fingerprint):
+            if self.eager_model is None:
+                self.eager_model = super().load_model(model_path)
+            self.input_size = self.input_size or infer_input_size(self.eager_model)
+            self.logger.info(f"Exporting {self.BACKEND_NAME} model to {self.artifact_path}...")
+            self.write_atomically(self.artifact_path, lambda path: self.export(self.eager_model, path))
+            self.write_atomically(self.artifact_path + self.SOURCE_SUFFIX, lambda path: _write_text(path, fingerprint))
+
+        self.model = self.load_model(self.artifact_path)
+        self.logger.info(f"{self.BACKEND_NAME} model loaded from {self.artifact_path}.")
+
+        if self.eager_model is not None:
+            parity = self.check_parity()
+            if not parity["passed"]:
+                raise RuntimeError(
+                    f"{self.BACKEND_NAME} model differs from the eager model (max diff {parity['max_abs_diff']:.2e})."
+                )
+
+    def artifact_is_stale(self, fingerprint: str) -> bool:
+        """
+        Checks whether the artifact has to be exported again.
+
+        :param fingerprint: Current fingerprint of model_path.
+        :return: True if the artifact is missing or was exported from other weights.
+        """
+        if not os.path.exists(self.artifact_path):
+            return True
+        if not fingerprint:
+            return False  # Only the artifact is deployed, there is nothing to compare with
+        try:
+            with open(self.artifact_path + self.SOURCE_SUFFIX) as source_file:
+                return source_file.read().strip() != fingerprint
+        except FileNotFoundError:
+            # Exported before fingerprints were recorded: trust it only if it is newer than the weights
+            return os.path.getmtime(self.model_path) > os.path.getmtime(self.artifact_path)
+
+    @staticmethod
+    def write_atomically(path: str, write: Callable[[str], None]):
+        """
+        Writes a file through a temporary file in the same directory and renames it into place.
+
+        :param path: Final path.
+        :param write: Function writing the file to the path it is given.
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @abstractmethod
+    def export(self, eager_model: torch.nn.Module, artifact_path: str):
+        """ Exports the eager model into artifact_path. """
+        pass
+
+    def check_parity(self, eager_model: Optional[torch.nn.Module] = None, samples: int = 32) -> Dict[str, Any]:
+        """
+        Compares the backend logits with the eager model on random inputs.
+
+        :param eager_model: Reference eager model (defaults to the one used for the export).
+        :param samples: Number of random inputs.
+        :return: Dictionary with the maximum absolute difference and the verdict.
+        """
+        eager_model = eager_model or self.eager_model
+        if eager_model is None:
+            raise ValueError("An eager model is required for the parity check.")
+
+        input_size = self.input_size or infer_input_size(eager_model)
+        inputs = torch.randn(samples, input_size, generator=torch.Generator().manual_seed(0))
+        with torch.no_grad():
+            expected = eager_model(inputs)
+            actual = self.model(inputs)
+        max_abs_diff = (expected - actual).abs().max().item()
+        same_class = bool((expected.argmax(dim=1) == actual.argmax(dim=1)).all())
+        return {
+            "backend": self.BACKEND_NAME,
+            "max_abs_diff": max_abs_diff,
+            "same_predictions": same_class,
+            "passed": max_abs_diff <= self.parity_atol and same_class,
+        }
+
+    def benchmark(self, batch_size: int = 1, iterations: int = 100) -> Dict[str, Any]:
+        """
+        Measures the forward pass latency of the backend.
+
+        :param batch_size: Number of inputs per forward pass.
+        :param iterations: Number of timed forward passes.
+        :return: Dictionary with mean latency and throughput.
+        """
+        inputs = torch.randn(batch_size, self.input_size or 104)
+        with torch.no_grad():
+            self.model(inputs)  # Warmup
+            started = time.perf_counter()
+            for _ in range(iterations):
+                self.model(inputs)
+        elapsed = time.perf_counter() - started
+        return {
+            "backend": self.BACKEND_NAME,
+            "batch_size": batch_size,
+            "mean_latency_ms": elapsed / iterations * 1000,
+            "rows_per_second": batch_size * iterations / elapsed,
+        }
+
+
+class TorchScriptAIDiagnosis(OptimizedAIDiagnosis):
+    """
+    Diagnosis model served as a frozen TorchScript graph optimized for inference.
+    """
+
+    ARTIFACT_SUFFIX = ".torchscript.pt"
+    BACKEND_NAME = "torchscript"
+
+    def export(self, eager_model: torch.nn.Module, artifact_path: str):
+        example = torch.zeros(1, self.input_size)
+        traced = torch.jit.trace(eager_model.eval(), example)
+        torch.jit.save(traced, artifact_path)
+
+    def load_model(self, model_path: str) -> torch.nn.Module:
+        """
+        Loads the TorchScript artifact, freezes it and applies operator fusion.
+
+        :param model_path: Path to the TorchScript file.
+        :return: Optimized TorchScript module.
+        """
+        configure_torch_threads(self.intra_op_threads, self.inter_op_threads)
+        try:
+            scripted = torch.jit.load(model_path, map_location=torch.device("cpu")).eval()
+            return torch.jit.optimize_for_inference(torch.jit.freeze(scripted))
+        except Exception as e:
+            self.logger.error(f"Failed to load TorchScript model: {e}")
+            raise RuntimeError("Could not load TorchScript model.")
+
+
+class OnnxRuntimeModel:
+    """
+    Callable wrapper that runs an ONNX Runtime session with the torch tensor interface of an nn.Module.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+
+    def __call__(self, inputs: torch.Tensor) -> torch.Tensor:
+        outputs = self.session.run(None, {self.input_name: inputs.numpy().astype(np.float32, copy=False)})
+        return torch.from_numpy(outputs[0])
+
+    def eval(self):
+        return self
+
+
+class OnnxAIDiagnosis(OptimizedAIDiagnosis):
+    """
+    Diagnosis model served through ONNX Runtime with all graph optimizations enabled.
+    """
+
+    ARTIFACT_SUFFIX = ".onnx"
+    BACKEND_NAME = "onnx"
+
+    def export(self, eager_model: torch.nn.Module, artifact_path: str):
+        example = torch.zeros(1, self.input_size)
+        torch.onnx.export(
+            eager_model.eval(),
+            (example,),
+            artifact_path,
+            input_names=["input"],
+            output_names=["logits"],
+            dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+            dynamo=False,
+        )
+
+    def load_model(self, model_path: str) -> OnnxRuntimeModel:
+        """
+        Creates an ONNX Runtime CPU session for the exported model.
+
+        :param model_path: Path to the ONNX file.
+        :return: Callable model wrapper.
+        """
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("onnxruntime is required for the 'onnx' model type.")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.intra_op_threads:
+            options.intra_op_num_threads = self.intra_op_threads
+        if self.inter_op_threads:
+            options.inter_op_num_threads = self.inter_op_threads
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        try:
+            session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        except Exception as e:
+            self.logger.error(f"Failed to load ONNX model: {e}")
+            raise RuntimeError("Could not load ONNX model.")
+        return OnnxRuntimeModel(session)
+
+
+class QuantizedAIDiagnosis(TorchAIDiagnosis):
+    """
+    Diagnosis model with dynamic int8 quantization of its Linear layers.
+
+    The quantized model is cached on disk, so later starts never load the fp32 weights.
+    """
+
+    QUANTIZED_CACHE_DIR = os.getenv("QUANTIZED_MODELS_DIR", "models/quantized")
+
+    def __init__(
+        self,
+        model_path: str,
+        eager_model: Optional[torch.nn.Module] = None,
+        quantized_cache_dir: Optional[str] = None
+    ):
+        """
+        :param model_path: Path to the eager PyTorch model.
+        :param eager_model: Already loaded eager model (loaded from model_path when needed).
+        :param quantized_cache_dir: Directory where the quantized model is cached.
+        """
+        super().__init__(model_path)
+        self.model_path = model_path
+        self.eager_model = eager_model
+        model_name = os.path.splitext(os.path.basename(model_path))[0]
+        self.quantized_path = cached_model_path(
+            quantized_cache_dir or self.QUANTIZED_CACHE_DIR, model_name, source_path=model_path
+        )
+        self.model = load_or_quantize(self.quantized_path, self.load_fp32_model)
+        self.logger.info(f"Using int8 quantized diagnosis model ({self.quantized_path}).")
+
+    def load_fp32_model(self) -> torch.nn.Module:
+        """ Returns the eager fp32 model, loading it from model_path if needed. """
+        if self.eager_model is None:
+            self.eager_model = super().load_model(self.model_path)
+        return self.eager_model
+
+    def quantization_report(self, samples: int = 256, iterations: int = 10) -> Dict[str, Any]:
+        """
+        Compares the int8 model with the fp32 one on random inputs.
+
+        :param samples: Number of random inputs per batch.
+        :param iterations: Number of timed batches per model.
+        :return: Latency, weights size and logits drift statistics.
+        """
+        fp32_model = self.load_fp32_model()
+        inputs = torch.randn(samples, infer_input_size(fp32_model), generator=torch.Generator().manual_seed(0))
+        run = lambda model, batch: model(batch).float().numpy()
+        return quantization_report(fp32_model, self.model, run, inputs, iterations)
@@ -0,0 +1,242 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Tuple, Dict, Any, List, Optional
+from modules.common.logger import Logger
+from modules.diagnostics.ai_diagnosis import IAIDiagnosis
+
+
+class BatchQueueFullError(RuntimeError):
+    """
+    Raised when the batcher queue is saturated and cannot accept new requests.
+    """
+
+
+class MicroBatcher(IAIDiagnosis):
+    """
+    Dynamic micro-batching wrapper around an AI diagnosis model.
+
+    Concurrent predict() calls are queued and a background thread groups them into batches
+    of up to max_batch_size requests, waiting at most max_wait_ms for a batch to fill up.
+    Each batch runs through a single predict_batch() call of the wrapped model.
+    """
+
+    DEFAULT_MAX_BATCH_SIZE = int(os.getenv("BATCHER_MAX_BATCH_SIZE", "32"))
+    DEFAULT_MAX_WAIT_MS = float(os.getenv("BATCHER_MAX_WAIT_MS", "5"))
+    DEFAULT_MAX_QUEUE_SIZE = int(os.getenv("BATCHER_MAX_QUEUE_SIZE", "1024"))
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        model: IAIDiagnosis,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        max_queue_size: Optional[int] = None
+    ):
+        """
+        Starts the background batching thread.
+
+        :param model: The diagnosis model used to run batches.
+        :param max_batch_size: Maximum number of requests per forward pass.
+        :param max_wait_ms: Maximum time to wait for a batch to fill up after the first request.
+        :param max_queue_size: Maximum number of pending requests (0 means unbounded).
+        """
+        self.model = model
+        self.max_batch_size = max_batch_size or self.DEFAULT_MAX_BATCH_SIZE
+        self.max_wait = (self.DEFAULT_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000.0
+        self.max_queue_size = self.DEFAULT_MAX_QUEUE_SIZE if max_queue_size is None else max_queue_size
+        self.logger = Logger("MicroBatcher")
+
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._metrics_lock = threading.Lock()
+        self._requests = 0
+        self._rejected = 0
+        self._batches = 0
+        self._batched_items = 0
+        self._largest_batch = 0
+        self._queue_wait_total = 0.0
+        self._inference_time_total = 0.0
+
+        # Guards _closed so that no request is enqueued after close() has queued the stop marker
+        self._state_lock = threading.Lock()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="MicroBatcher", daemon=True)
+        self._worker.start()
+        self.logger.info(
+            f"Micro-batcher started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait * 1000:.1f}, max_queue_size={self.max_queue_size})"
+        )
+
+    def load_model(self, model_path: str):
+        """ Delegates model loading to the wrapped model. """
+        return self.model.load_model(model_path)
+
+    def submit(self, data: Dict[str, Any]) -> Future:
+        """
+        Enqueues a prediction request without waiting for the result.
+
+        :param data: Dictionary containing patient information.
+        :return: Future resolved with the (diagnosis, confidence) pair.
+        """
+        future = Future()
+        with self._state_lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed.")
+            try:
+                self._queue.put_nowait((data, future, time.perf_counter()))
+            except queue.Full:
+                with self._metrics_lock:
+                    self._rejected += 1
+                raise BatchQueueFullError(f"Batch queue is full ({self.max_queue_size} pending requests).")
+
+        with self._metrics_lock:
+            self._requests += 1
+        return future
+
+    def predict(self, data: Dict[str, Any], timeout: Optional[float] = None) -> Tuple[str, float]:
+        """
+        Predicts a diagnosis, sharing the forward pass with concurrent callers.
+
+        :param data: Dictionary containing patient information.
+        :param timeout: Maximum time in seconds to wait for the result.
+        :return: Predicted diagnosis and confidence score.
+        """
+        return self.submit(data).result(timeout=timeout)
+
+    async def predict_async(self, data: Dict[str, Any]) -> Tuple[str, float]:
+        """
+        Awaitable variant of predict() for asyncio handlers.
+
+        :param data: Dictionary containing patient information.
+        :return: Predicted diagnosis and confidence score.
+        """
+        return await asyncio.wrap_future(self.submit(data))
+
+    def predict_batch(self, batch: List[Dict[str, Any]]) -> List[Tuple[str, float]]:
+        """ Runs an already assembled batch directly on the wrapped model. """
+        return self.model.predict_batch(batch)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Returns batcher counters.
+
+        :return: Dictionary with request, batch and latency statistics.
+        """
+        with self._metrics_lock:
+            batches = self._batches
+            return {
+                "requests": self._requests,
+                "rejected": self._rejected,
+                "batches": batches,
+                "queue_depth": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "largest_batch": self._largest_batch,
+                "avg_batch_size": self._batched_items / batches if batches else 0.0,
+                "avg_queue_wait_ms": self._queue_wait_total / self._batched_items * 1000 if self._batched_items else 0.0,
+                "avg_inference_ms": self._inference_time_total / batches * 1000 if batches else 0.0,
+            }
+
+    def close(self, timeout: Optional[float] = None):
+        """
+        Stops the background thread after the queued requests have been processed.
+
+        :param timeout: Maximum time in seconds to wait for the thread to finish.
+        """
+        with self._state_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(self._STOP)
+        self._worker.join(timeout)
+        self.logger.info("Micro-batcher stopped.")
+
+    def _collect_batch(self, first_item) -> Tuple[list, bool]:
+        """
+        Collects requests following first_item until the batch is full or max_wait elapses.
+
+        :return: The batch and a flag telling whether a stop request was received.
+        """
+        batch = [first_item]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        """ Background loop: waits for requests and runs them in batches. """
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is self._STOP:
+                break
+            batch, stopping = self._collect_batch(item)
+            self._process_batch(batch)
+
+        # Drain whatever was enqueued before close() was called
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not self._STOP:
+                leftover.append(item)
+        for start in range(0, len(leftover), self.max_batch_size):
+            self._process_batch(leftover[start:start + self.max_batch_size])
+
+    def _process_batch(self, batch: list):
+        """ Runs one forward pass and resolves the futures of the batch. """
+        started = time.perf_counter()
+        try:
+            results = self.model.predict_batch([data for data, _, _ in batch])
+        except Exception as e:
+            self.logger.error("Batch inference failed: %s", e)
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        finished = time.perf_counter()
+
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+        if len(results) < len(batch):
+            self.logger.error("Model returned %d results for a batch of %d requests", len(results), len(batch))
+            error = RuntimeError(f"Model returned {len(results)} results for a batch of {len(batch)} requests.")
+            for _, future, _ in batch[len(results):]:
+                future.set_exception(error)
+
+        with self._metrics_lock:
+            self._batches += 1
+            self._batched_items += len(batch)
+            self._largest_batch = max(self._largest_batch, len(batch))
+            self._queue_wait_total += sum(started - enqueued_at for _, _, enqueued_at in batch)
+            self._inference_time_total += finished - started
+
+
+# Example Usage
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+    from modules.diagnostics.ai_diagnosis import AIDiagnosisFactory
+
+    batcher = AIDiagnosisFactory.get_model(
+        "pytorch", "models/final/diagnosis_model.pth", batching=True, max_batch_size=16, max_wait_ms=2
+    )
+    requests = [
+        {"age": 40, "gender": "male", "symptoms_vector": [0.0] * 100, "chronic_conditions": [], "medications": []}
+        for _ in range(64)
+    ]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        print(list(pool.map(batcher.predict, requests))[:3])
+    print(batcher.get_metrics())
+    batcher.close()
@@ -0,0 +1,334 @@
+import argparse
+import hashlib
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from modules.common.logger import Logger
+from modules.diagnostics.ai_diagnosis import ERROR_DIAGNOSIS, IAIDiagnosis, TorchAIDiagnosis
+
+DIAGNOSIS_CASCADE = os.getenv("DIAGNOSIS_CASCADE", "off")  # off | on
+CASCADE_MODEL_PATH = os.getenv("CASCADE_MODEL_PATH", "models/final/cascade_model.npz")
+CASCADE_NLP_MODEL_TYPE = os.getenv("CASCADE_NLP_MODEL_TYPE", "tfidf")
+CASCADE_THRESHOLD = float(os.getenv("CASCADE_THRESHOLD", "0.9"))
+# Share of confidently answered cases also sent to the full model to measure agreement
+CASCADE_SHADOW_RATE = float(os.getenv("CASCADE_SHADOW_RATE", "0.01"))
+
+# Fast-tier confidence buckets for agreement statistics: [0.0, 0.1), ..., [0.9, 1.0]
+CONFIDENCE_BUCKETS = 10
+
+
+class SoftmaxDiagnosisModel(IAIDiagnosis):
+    """
+    Multinomial logistic regression over the TorchAIDiagnosis feature vector, evaluated with NumPy.
+
+    A single prediction is one small matrix product, so it costs microseconds instead of a framework call.
+    The fitted weights and feature scaling are persisted as a small .npz file.
+    """
+
+    def __init__(self, model_path: Optional[str] = None):
+        """
+        :param model_path: Saved model to load (the model must be fitted before use otherwise).
+        """
+        self.logger = Logger("SoftmaxDiagnosisModel")
+        self.classes: List[str] = []
+        self.weights = None
+        self.bias = None
+        self.mean = None
+        self.scale = None
+        if model_path is not None:
+            self.load_model(model_path)
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.weights is not None
+
+    @property
+    def fingerprint(self) -> str:
+        """Short content hash of the fitted parameters: changes whenever the model is refitted."""
+        if not self.is_fitted:
+            return "unfitted"
+        digest = hashlib.sha256("\n".join(self.classes).encode("utf-8"))
+        for array in (self.weights, self.bias, self.mean, self.scale):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()[:12]
+
+    def fit(self, batch: List[Dict[str, Any]], labels: Sequence[str], regularization: float = 1.0) -> "SoftmaxDiagnosisModel":
+        """
+        Fits the classifier.
+
+        :param batch: Model inputs in the DiagnosePatient format.
+        :param labels: Diagnosis per input (e.g. predictions of the full model).
+        :param regularization: Inverse L2 regularization strength.
+        :return: self
+        """
+        from sklearn.linear_model import LogisticRegression
+
+        features = self._features(batch)
+        self.mean = features.mean(axis=0)
+        self.scale = features.std(axis=0)
+        self.scale[self.scale == 0] = 1.0
+        classifier = LogisticRegression(C=regularization, max_iter=1000)
+        classifier.fit((features - self.mean) / self.scale, list(labels))
+
+        self.classes = [str(label) for label in classifier.classes_]
+        weights, bias = classifier.coef_, classifier.intercept_
+        if len(self.classes) == 2:
+            # Binary models keep one weight row; softmax over [-z/2, z/2] equals the logistic sigmoid of z
+            weights, bias = np.vstack([-weights, weights]) / 2, np.array([-bias[0], bias[0]]) / 2
+        self.weights = np.ascontiguousarray(weights.T, dtype=np.float32)
+        self.bias = bias.astype(np.float32)
+        return self
+
+    def save(self, path: str):
+        """
+        Saves the fitted model.
+
+        :param path: Destination .npz file.
+        """
+        if not self.is_fitted:
+            raise RuntimeError("Cannot save an unfitted cascade model.")
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez(
+            path, classes=np.array(self.classes, dtype=str), weights=self.weights, bias=self.bias,
+            mean=self.mean, scale=self.scale,
+        )
+
+    def load_model(self, model_path: str) -> "SoftmaxDiagnosisModel":
+        """
+        Loads a model saved with save().
+
+        :param model_path: Source .npz file.
+        :return: self
+        """
+        with np.load(model_path, allow_pickle=False) as data:
+            self.classes = data["classes"].tolist()
+            self.weights, self.bias = data["weights"], data["bias"]
+            self.mean, self.scale = data["mean"], data["scale"]
+        return self
+
+    def predict_proba(self, batch: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Class probabilities.
+
+        :param batch: Model inputs.
+        :return: Matrix of shape (len(batch), len(classes)).
+        """
+        if not self.is_fitted:
+            raise RuntimeError("Cascade model is not fitted. Fit it or load a saved one.")
+
+        logits = ((self._features(batch) - self.mean) / self.scale).astype(np.float32) @ self.weights + self.bias
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+    def predict(self, data: Dict[str, Any]) -> Tuple[str, float]:
+        return self.predict_batch([data])[0]
+
+    def predict_batch(self, batch: List[Dict[str, Any]]) -> List[Tuple[str, float]]:
+        if not batch:
+            return []
+        probabilities = self.predict_proba(batch)
+        predicted = probabilities.argmax(axis=1)
+        return [(self.classes[i], float(p[i])) for i, p in zip(predicted, probabilities)]
+
+    @staticmethod
+    def _features(batch: List[Dict[str, Any]]) -> np.ndarray:
+        return np.stack([TorchAIDiagnosis.build_feature_vector(data) for data in batch]).astype(np.float64)
+
+
+class DiagnosisCascade:
+    """
+    Confidence-gated cascade: a cheap NLP model and classifier answer first, and the case is escalated to the
+    full model only when the cheap tier's confidence is below the threshold.
+
+    Agreement with the full model is measured on escalated cases (both tiers ran anyway) and on a small
+    shadow sample of confidently answered cases, grouped by fast-tier confidence, so the threshold can be
+    tuned against accuracy from the metrics.
+    """
+
+    def __init__(
+        self,
+        nlp_model,
+        ai_model: IAIDiagnosis,
+        threshold: float = CASCADE_THRESHOLD,
+        shadow_rate: float = CASCADE_SHADOW_RATE,
+    ):
+        """
+        :param nlp_model: Cheap NLP model of the fast tier (e.g. TF-IDF).
+        :param ai_model: Classifier of the fast tier (e.g. SoftmaxDiagnosisModel).
+        :param threshold: Minimum fast-tier confidence to answer without the full model.
+        :param shadow_rate: Share of confident answers additionally checked against the full model.
+        """
+        self.nlp_model = nlp_model
+        self.ai_model = ai_model
+        self.threshold = threshold
+        self.shadow_rate = shadow_rate
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "fast_hits": 0, "escalations": 0, "shadowed": 0}
+        self._seconds = {"fast": 0.0, "full": 0.0}
+        self._full_calls = 0
+        self._compared = [0] * CONFIDENCE_BUCKETS
+        self._agreed = [0] * CONFIDENCE_BUCKETS
+
+    @property
+    def version(self) -> str:
+        """Identifies cascade answers for the result-cache version: threshold, fast-tier vectors and weights."""
+        fast_model = getattr(self.ai_model, "fingerprint", type(self.ai_model).__name__)
+        return f"cascade@{self.threshold}:{self.nlp_model.vector_version}:{fast_model}"
+
+    def predict(self, case, build_input: Callable, full_tier: Callable) -> Tuple[str, float]:
+        """
+        Diagnoses one case.
+
+        :param case: MedicalCase.
+        :param build_input: Function (case, symptoms_vector) -> model input.
+        :param full_tier: Function case -> (diagnosis, confidence) of the full model.
+        :return: (diagnosis, confidence).
+        """
+        return self.predict_batch([case], build_input, lambda cases: [full_tier(cases[0])])[0]
+
+    def predict_batch(self, cases: List, build_input: Callable, full_tier: Callable) -> List[Tuple[str, float]]:
+        """
+        Diagnoses a batch: the fast tier runs over the whole batch, the full tier over the uncertain cases only.
+
+        :param cases: MedicalCase list.
+        :param build_input: Function (case, symptoms_vector) -> model input.
+        :param full_tier: Function List[case] -> List[(diagnosis, confidence)] of the full model.
+        :return: (diagnosis, confidence) per case in input order.
+        """
+        started = time.perf_counter()
+        vectors = self.nlp_model.symptoms_to_vectors([case.symptoms for case in cases])
+        fast = self.ai_model.predict_batch([build_input(case, vector) for case, vector in zip(cases, vectors)])
+        fast_seconds = time.perf_counter() - started
+
+        escalated = [i for i, (_, confidence) in enumerate(fast) if confidence < self.threshold]
+        shadowed = [i for i, (_, confidence) in enumerate(fast) if confidence >= self.threshold and random.random() < self.shadow_rate]
+        checked = sorted(escalated + shadowed)
+        full, full_seconds = [], 0.0
+        if checked:
+            started = time.perf_counter()
+            full = full_tier([cases[i] for i in checked])
+            full_seconds = time.perf_counter() - started
+
+        results = list(fast)
+        comparisons = []
+        for i, full_result in zip(checked, full):
+            # A failed full-tier call says nothing about agreement
+            if full_result[0] != ERROR_DIAGNOSIS:
+                comparisons.append((fast[i][1], fast[i][0] == full_result[0]))
+            if fast[i][1] < self.threshold:
+                results[i] = full_result
+        self._record(len(cases), len(escalated), len(shadowed), fast_seconds, full_seconds, comparisons)
+        return results
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Returns cascade statistics.
+
+        :return: Tier hit rates, latencies and agreement with the full model overall and per confidence bucket.
+        """
+        with self._lock:
+            requests = self._counters["requests"]
+            compared, agreed = sum(self._compared), sum(self._agreed)
+            return dict(
+                self._counters,
+                threshold=self.threshold,
+                fast_hit_rate=self._counters["fast_hits"] / requests if requests else 0.0,
+                escalation_rate=self._counters["escalations"] / requests if requests else 0.0,
+                avg_fast_ms=round(self._seconds["fast"] / requests * 1000, 3) if requests else 0.0,
+                avg_full_ms=round(self._seconds["full"] / self._full_calls * 1000, 3) if self._full_calls else 0.0,
+                agreement=agreed / compared if compared else None,
+                agreement_by_confidence={
+                    f"{bucket / CONFIDENCE_BUCKETS:.1f}": {
+                        "compared": self._compared[bucket],
+                        "agreement": self._agreed[bucket] / self._compared[bucket],
+                    }
+                    for bucket in range(CONFIDENCE_BUCKETS) if self._compared[bucket]
+                },
+            )
+
+    def _record(self, requests: int, escalations: int, shadowed: int, fast_seconds: float, full_seconds: float, comparisons):
+        with self._lock:
+            self._counters["requests"] += requests
+            self._counters["fast_hits"] += requests - escalations
+            self._counters["escalations"] += escalations
+            self._counters["shadowed"] += shadowed
+            self._seconds["fast"] += fast_seconds
+            self._seconds["full"] += full_seconds
+            self._full_calls += escalations + shadowed
+            for confidence, agreed in comparisons:
+                bucket = min(int(confidence * CONFIDENCE_BUCKETS), CONFIDENCE_BUCKETS - 1)
+                self._compared[bucket] += 1
+                self._agreed[bucket] += agreed
+
+
+def create_cascade(mode: str = DIAGNOSIS_CASCADE, model_path: str = CASCADE_MODEL_PATH) -> Optional[DiagnosisCascade]:
+    """
+    Creates the cascade from the environment settings.
+
+    :param mode: "on" enables the cascade, "off" disables it.
+    :param model_path: Fitted SoftmaxDiagnosisModel.
+    :return: DiagnosisCascade or None when disabled.
+    """
+    if mode == "off":
+        return None
+    if mode != "on":
+        raise ValueError(f"Unknown cascade mode: {mode}")
+
+    from modules.nlp.nlp_model import NLPModelFactory
+    return DiagnosisCascade(NLPModelFactory.get_model(CASCADE_NLP_MODEL_TYPE), SoftmaxDiagnosisModel(model_path))
+
+
+# Fit the fast tier on cases labeled by the full model:
+#   python -m modules.diagnostics.cascade --cases 20000 --nlp-model-type bert
+if __name__ == "__main__":
+    from core.use_cases.data_preprocessor import DataPreprocessor
+    from core.use_cases.diagnose_patient import DiagnosePatient
+    from data.raw.data_raw import DataRawGenerator
+    from infrastructure.jobs.worker import to_medical_case
+    from modules.diagnostics.ai_diagnosis import AIDiagnosisFactory
+    from modules.nlp.nlp_model import NLPModelFactory
+
+    parser = argparse.ArgumentParser(description="Fit the fast cascade tier to mimic the full diagnosis model.")
+    parser.add_argument("--cases", type=int, default=20000)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--output", default=CASCADE_MODEL_PATH)
+    parser.add_argument("--ai-model-type", default=os.getenv("AI_MODEL_TYPE", "pytorch"))
+    parser.add_argument("--ai-model-path", default=os.getenv("AI_MODEL_PATH", "models/final/diagnosis_model.pth"))
+    parser.add_argument("--nlp-model-type", default=os.getenv("NLP_MODEL_TYPE", "bert"))
+    parser.add_argument("--fast-nlp-model-type", default=CASCADE_NLP_MODEL_TYPE)
+    args = parser.parse_args()
+
+    generator = DataRawGenerator()
+    records = [DataPreprocessor.preprocess_medical_case(generator.generate_random_case()) for _ in range(args.cases)]
+    cases = [to_medical_case(dict(record, patient_id=i)) for i, record in enumerate(records)]
+    full = DiagnosePatient(
+        AIDiagnosisFactory.get_model(args.ai_model_type, args.ai_model_path), NLPModelFactory.get_model(args.nlp_model_type)
+    )
+    # Cases the full model failed on have no label to learn from
+    labeled = [(case, result["diagnosis"]) for case, result in zip(cases, full.execute_batch(cases))
+               if result.get("diagnosis", ERROR_DIAGNOSIS) != ERROR_DIAGNOSIS]
+    print(f"Labeled {len(labeled)} of {len(cases)} cases")
+    cases = [case for case, _ in labeled]
+    labels = [label for _, label in labeled]
+
+    fast_nlp = NLPModelFactory.get_model(args.fast_nlp_model_type)
+    vectors = fast_nlp.symptoms_to_vectors([case.symptoms for case in cases])
+    inputs = [DiagnosePatient._model_input(case, vector) for case, vector in zip(cases, vectors)]
+    split = int(len(cases) * (1 - args.holdout))
+    model = SoftmaxDiagnosisModel().fit(inputs[:split], labels[:split])
+    model.save(args.output)
+
+    # Coverage and agreement on the holdout for candidate thresholds
+    predictions = model.predict_batch(inputs[split:])
+    print(f"Saved cascade model to {args.output}; holdout of {len(predictions)} cases:")
+    for threshold in (0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99):
+        accepted = [(diagnosis, label) for (diagnosis, confidence), label in zip(predictions, labels[split:]) if confidence >= threshold]
+        agreement = sum(diagnosis == label for diagnosis, label in accepted) / len(accepted) if accepted else float("nan")
+        print(f"  threshold {threshold:.2f}: fast tier answers {len(accepted) / len(predictions):.1%}, agreement {agreement:.1%}")
@@ -1,11 +1,13 @@
+import os
 import re
 import numpy as np
 import torch
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
-from sklearn.feature_extraction.text import TfidfVectorizer
+from typing import List, Dict, Any, Iterable, Optional
+from scipy import sparse
 from transformers import BertTokenizer, BertModel
 from modules.common.logger import Logger
+from modules.nlp.tfidf_vocabulary import TfidfVocabulary
 
 
 class INLPModel(ABC):
@@ -26,15 +28,48 @@ class INLPModel(ABC):
 
 class TfidfNLPModel(INLPModel):
     """
-    NLP model based on TF-IDF.
+    NLP model based on a pre-fitted TF-IDF vocabulary.
     """
 
-    def __init__(self):
+    DEFAULT_VOCABULARY_PATH = os.getenv("TFIDF_VOCABULARY_PATH", "models/final/tfidf_vocabulary.npz")
+
+    def __init__(self, vocabulary_path: Optional[str] = None, max_features: int = 100):
+        """
+        Loads the fitted vocabulary if it exists.
+
+        :param vocabulary_path: Path to a vocabulary saved with save_vocabulary().
+        :param max_features: Output dimension used when fitting a new vocabulary.
+        """
         self.logger = Logger("TfidfNLPModel")
         self.logger.info("Initializing TF-IDF NLP model...")
-        self.vectorizer = TfidfVectorizer(max_features=100)
+        self.vocabulary_path = vocabulary_path or self.DEFAULT_VOCABULARY_PATH
+
+        if os.path.exists(self.vocabulary_path):
+            self.vocabulary = TfidfVocabulary.load(self.vocabulary_path)
+            self.logger.info(f"TF-IDF vocabulary loaded from {self.vocabulary_path}.")
+        else:
+            self.vocabulary = TfidfVocabulary(max_features=max_features)
+            self.logger.warning(f"TF-IDF vocabulary not found at {self.vocabulary_path}, call fit() before use.")
         self.logger.info("TF-IDF model initialized.")
 
+    def fit(self, corpus: Iterable[str]) -> "TfidfNLPModel":
+        """
+        Fits the vocabulary and IDF weights over a corpus.
+
+        :param corpus: Iterable of raw texts.
+        :return: self
+        """
+        self.vocabulary.fit(self.preprocess_text(text) for text in corpus)
+        return self
+
+    def save_vocabulary(self, path: Optional[str] = None):
+        """
+        Persists the fitted vocabulary.
+
+        :param path: Destination file (defaults to the path the model was created with).
+        """
+        self.vocabulary.save(path or self.vocabulary_path)
+
     def preprocess_text(self, text: str) -> str:
         """
         Cleans and normalizes text.
@@ -46,6 +81,15 @@ class TfidfNLPModel(INLPModel):
         text = re.sub(r"[^a-zA-Zа-яА-Я0-9\s]", "", text)
         return text.strip()
 
+    def texts_to_matrix(self, texts: List[str]) -> sparse.csr_matrix:
+        """
+        Converts a batch of texts into TF-IDF vectors.
+
+        :param texts: Raw input texts.
+        :return: Sparse matrix of shape (len(texts), max_features).
+        """
+        return self.vocabulary.transform([self.preprocess_text(text) for text in texts])
+
     def text_to_vector(self, text: str) -> np.ndarray:
         """
         Converts text into a TF-IDF vector.
@@ -53,9 +97,7 @@ class TfidfNLPModel(INLPModel):
         :param text: Raw input text.
         :return: Vector representation of the text.
         """
-        cleaned_text = self.preprocess_text(text)
-        vector = self.vectorizer.fit_transform([cleaned_text]).toarray()
-        return vector[0] if len(vector) > 0 else np.zeros(100)
+        return self.texts_to_matrix([text]).toarray()[0]
 
 
 class BertNLPModel(INLPModel):
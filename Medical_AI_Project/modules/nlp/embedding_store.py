@@ -0,0 +1,189 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+from modules.common.logger import Logger
+from modules.nlp.vector_cache import VectorCache
+
+
+class EmbeddingStore:
+    """
+    Persistent, append-only store of text embeddings shared between processes.
+
+    The store is made of three files next to each other:
+    - <path>.vectors: raw rows of float32/float16 values, memory-mapped read-only by readers;
+    - <path>.keys: one 16-byte digest per row (hash of the encoder version and the normalized text);
+    - <path>.meta.json: dimension and dtype. The encoder version is not stored there: it is part of every
+      key, so rows of an older encoder version are simply never found by a newer one.
+
+    Writers append under an exclusive file lock and write the vector before its key, so a reader
+    never sees a key without its data. Readers pick up rows appended by other processes lazily.
+    The vectors file grows by GROWTH_ROWS rows at a time and readers remap it only when it grows,
+    not on every refresh, so returned views do not pin a separate mapping per refresh.
+    """
+
+    KEY_SIZE = 16
+    GROWTH_ROWS = 1024
+
+    def __init__(self, path: str, dimension: int, encoder_version: str, dtype: str = "float32"):
+        """
+        Opens (or creates) the store.
+
+        :param path: Path prefix of the store files.
+        :param dimension: Size of the stored vectors.
+        :param encoder_version: Identifier of the encoder; vectors from other versions are never returned.
+        :param dtype: Storage dtype, "float32" or "float16".
+        """
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported embedding store dtype: {dtype}")
+
+        self.logger = Logger("EmbeddingStore")
+        self.path = path
+        self.dimension = dimension
+        self.encoder_version = encoder_version
+        self.dtype = np.dtype(dtype)
+        self.row_size = self.dimension * self.dtype.itemsize
+
+        self.vectors_path = f"{path}.vectors"
+        self.keys_path = f"{path}.keys"
+        self.meta_path = f"{path}.meta.json"
+
+        self._lock = threading.Lock()
+        self._index = {}  # key digest -> row
+        self._keys_offset = 0
+        self._vectors = None
+
+        self._init_files()
+        self.refresh()
+        self.logger.info(f"Embedding store {path} opened with {len(self._index)} vectors.")
+
+    def _init_files(self):
+        """ Creates the store files or validates the metadata of an existing store. """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        meta = {"dimension": self.dimension, "dtype": self.dtype.name}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding="utf-8") as f:
+                stored_meta = json.load(f)
+            if stored_meta != meta:
+                raise ValueError(f"Embedding store {self.path} was created with {stored_meta}, not {meta}.")
+        else:
+            with open(self.meta_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+
+        for file_path in (self.vectors_path, self.keys_path):
+            open(file_path, "ab").close()
+
+    def make_key(self, text: str) -> bytes:
+        """
+        Builds the store key of a text.
+
+        :param text: Raw text.
+        :return: 16-byte digest of the encoder version and the normalized text.
+        """
+        normalized = f"{self.encoder_version}\x00{VectorCache.normalize(text)}"
+        return hashlib.blake2b(normalized.encode("utf-8"), digest_size=self.KEY_SIZE).digest()
+
+    def refresh(self):
+        """ Loads keys appended since the last refresh and remaps the vectors file. """
+        with self._lock:
+            self._refresh_locked()
+
+    def _refresh_locked(self):
+        keys_size = os.path.getsize(self.keys_path)
+        if keys_size - keys_size % self.KEY_SIZE == self._keys_offset:
+            return
+
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read(keys_size - self._keys_offset)
+        complete = len(data) - len(data) % self.KEY_SIZE
+        row = self._keys_offset // self.KEY_SIZE
+        new_rows = {}
+        for start in range(0, complete, self.KEY_SIZE):
+            new_rows.setdefault(data[start:start + self.KEY_SIZE], row)
+            row += 1
+
+        # Map the new rows before publishing their keys, so lock-free readers never index past the map
+        if self._vectors is None or row > self._vectors.shape[0]:
+            capacity = os.path.getsize(self.vectors_path) // self.row_size
+            self._vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(capacity, self.dimension))
+        for key, key_row in new_rows.items():
+            self._index.setdefault(key, key_row)
+        self._keys_offset += complete
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """
+        Returns the stored vector of a text without copying it.
+
+        :param text: Raw text.
+        :return: Read-only vector view, or None if the text is not stored.
+        """
+        key = self.make_key(text)
+        row = self._index.get(key)
+        if row is None:
+            self.refresh()  # Another process may have added it
+            row = self._index.get(key)
+            if row is None:
+                return None
+        return self._vectors[row]
+
+    def put(self, text: str, vector: np.ndarray):
+        """
+        Appends the vector of a text unless it is already stored.
+
+        :param text: Raw text.
+        :param vector: Vector of size dimension.
+        """
+        vector = np.ascontiguousarray(vector, dtype=self.dtype).reshape(-1)
+        if vector.shape[0] != self.dimension:
+            raise ValueError(f"Expected a vector of size {self.dimension}, got {vector.shape[0]}.")
+
+        key = self.make_key(text)
+        with self._lock, open(self.keys_path, "ab") as keys_file:
+            fcntl.flock(keys_file, fcntl.LOCK_EX)
+            try:
+                self._refresh_locked()
+                if key in self._index:
+                    return
+
+                row = self._keys_offset // self.KEY_SIZE
+                # Write at the row offset: leftovers of an interrupted write are overwritten
+                with open(self.vectors_path, "r+b") as vectors_file:
+                    if os.fstat(vectors_file.fileno()).st_size < (row + 1) * self.row_size:
+                        vectors_file.truncate((row + self.GROWTH_ROWS) * self.row_size)
+                    vectors_file.seek(row * self.row_size)
+                    vectors_file.write(vector.tobytes())
+                    vectors_file.flush()
+                keys_file.write(key)
+                keys_file.flush()
+            finally:
+                fcntl.flock(keys_file, fcntl.LOCK_UN)
+            self._refresh_locked()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Returns store statistics.
+
+        :return: Dictionary with the number of vectors and the size of the vectors file (including reserved rows).
+        """
+        return {
+            "vectors": len(self._index),
+            "bytes": os.path.getsize(self.vectors_path),
+            "dimension": self.dimension,
+            "dtype": self.dtype.name,
+            "encoder_version": self.encoder_version,
+        }
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, text: str) -> bool:
+        return self.get(text) is not None
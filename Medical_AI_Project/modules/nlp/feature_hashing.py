@@ -0,0 +1,120 @@
+import re
+import zlib
+from itertools import chain
+from typing import List, Optional, Tuple
+import numpy as np
+from scipy import sparse
+
+# Same characters TfidfNLPModel.preprocess_text keeps, applied to lowercased text
+TOKEN_PATTERN = re.compile(r"[a-zа-яё0-9]+")
+# Multiplier combining token hashes into n-gram hashes (golden ratio, odd)
+NGRAM_MULTIPLIER = np.uint64(0x9E3779B1)
+UINT32_MASK = np.uint64(0xFFFFFFFF)
+
+
+def fmix32(hashes: np.ndarray) -> np.ndarray:
+    """
+    MurmurHash3 finalizer: spreads every input bit over the whole 32-bit output, so both the column
+    (low bits modulo n_features) and the sign (top bit) are well mixed.
+
+    :param hashes: uint64 array holding 32-bit values.
+    :return: uint64 array of mixed 32-bit values.
+    """
+    hashes = hashes ^ (hashes >> np.uint64(16))
+    hashes = (hashes * np.uint64(0x85EBCA6B)) & UINT32_MASK
+    hashes ^= hashes >> np.uint64(13)
+    hashes = (hashes * np.uint64(0xC2B2AE35)) & UINT32_MASK
+    return hashes ^ (hashes >> np.uint64(16))
+
+
+class TextHasher:
+    """
+    Stateless feature hashing of token and word n-gram counts into a fixed number of columns.
+
+    Nothing is fitted and nothing changes after construction, so one instance can be shared by threads and
+    inherited by forked workers. Hashes are stable across processes (CRC32 plus a mixing finalizer, not the
+    randomized built-in hash). Each distinct token of a batch is hashed once in Python; n-gram hashes,
+    columns, signs, term-frequency scaling and normalization are computed with NumPy over the whole batch.
+    """
+
+    def __init__(
+        self,
+        n_features: int = 100,
+        ngram_range: Tuple[int, int] = (1, 2),
+        signed: bool = True,
+        sublinear_tf: bool = True,
+        norm: Optional[str] = "l2",
+    ):
+        """
+        :param n_features: Number of output columns.
+        :param ngram_range: Smallest and largest word n-gram length.
+        :param signed: Give every feature a hash-derived sign, so collisions cancel out instead of piling up.
+        :param sublinear_tf: Replace a count c with 1 + log(c).
+        :param norm: "l2" to normalize rows to unit length, None to keep raw values.
+        """
+        if n_features <= 0:
+            raise ValueError("n_features must be positive")
+        if not 1 <= ngram_range[0] <= ngram_range[1]:
+            raise ValueError(f"Invalid ngram_range: {ngram_range}")
+        if norm not in ("l2", None):
+            raise ValueError(f"Unknown norm: {norm}")
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+        self.signed = signed
+        self.sublinear_tf = sublinear_tf
+        self.norm = norm
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """ Lowercases text and splits it into word tokens. """
+        return TOKEN_PATTERN.findall(text.lower())
+
+    def transform(self, texts: List[str]) -> sparse.csr_matrix:
+        """
+        Hashes texts into a sparse matrix.
+
+        :param texts: Raw texts.
+        :return: Float32 CSR matrix of shape (len(texts), n_features).
+        """
+        token_lists = [TOKEN_PATTERN.findall(text.lower()) for text in texts]
+        lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=len(token_lists))
+        rows = np.repeat(np.arange(len(token_lists)), lengths)
+
+        # Each distinct token is hashed once; positions refer to it by index
+        token_ids = {}
+        positions = np.fromiter(
+            (token_ids.setdefault(token, len(token_ids)) for token in chain.from_iterable(token_lists)),
+            dtype=np.int64, count=len(rows),
+        )
+        distinct = np.fromiter((zlib.crc32(token.encode()) for token in token_ids), dtype=np.uint64, count=len(token_ids))
+        token_hashes = fmix32(distinct)[positions]
+
+        feature_rows, feature_hashes = [], []
+        ngram_hashes = token_hashes
+        for n in range(1, self.ngram_range[1] + 1):
+            if n > 1:
+                # An n-gram starting at i combines the (n-1)-gram at i with the token at i+n-1, within one text
+                ngram_hashes = fmix32(((ngram_hashes[:-1] * NGRAM_MULTIPLIER) + token_hashes[n - 1:]) & UINT32_MASK)
+            if n >= self.ngram_range[0]:
+                starts = rows[:len(ngram_hashes)]
+                same_text = starts == rows[n - 1:n - 1 + len(ngram_hashes)]
+                feature_rows.append(starts[same_text])
+                feature_hashes.append(ngram_hashes[same_text])
+        feature_rows, feature_hashes = np.concatenate(feature_rows), np.concatenate(feature_hashes)
+
+        columns = (feature_hashes % np.uint64(self.n_features)).astype(np.int64)
+        values = np.ones(len(columns), dtype=np.float32)
+        if self.signed:
+            values[(feature_hashes >> np.uint64(31)).astype(bool)] = -1.0
+
+        # COO -> CSR sums duplicate (row, column) pairs into counts
+        matrix = sparse.csr_matrix((values, (feature_rows, columns)), shape=(len(texts), self.n_features))
+        matrix.sum_duplicates()
+        matrix.eliminate_zeros()
+        if self.sublinear_tf:
+            matrix.data = np.sign(matrix.data) * (1 + np.log(np.abs(matrix.data)))
+        if self.norm == "l2":
+            norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+            norms[norms == 0] = 1.0
+            matrix.data /= np.repeat(norms, np.diff(matrix.indptr)).astype(np.float32)
+        return matrix
@@ -4,17 +4,26 @@ import torch
 import sys
 import os
 from abc import ABC, abstractmethod
-from typing import Dict, Any
-from modules.common.logger import Logger
-from sklearn.feature_extraction.text import TfidfVectorizer
-from transformers import BertTokenizer, BertModel
+from typing import Dict, Any, Iterable, List, Optional
+from scipy import sparse
+from transformers import BertTokenizerFast, BertModel
 from modules.common.logger import Logger
+from modules.common.single_flight import SingleFlight
+from modules.nlp.tfidf_vocabulary import TfidfVocabulary
+from modules.nlp.feature_hashing import TextHasher
+from modules.nlp.vector_cache import VectorCache
+from modules.nlp.embedding_store import EmbeddingStore
+from modules.nlp.symptom_embeddings import SymptomEmbeddingTable
+from modules.common.quantization import load_or_quantize, cached_model_path, quantization_report, source_fingerprint
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
 class INLPModel(ABC):
     """Interface for all NLP models handling medical text processing."""
 
+    # Optional per-symptom lookup table used by symptoms_to_vector(s) instead of encoding the joined text
+    symptom_table: Optional[SymptomEmbeddingTable] = None
+
     @abstractmethod
     def preprocess_text(self, text: str) -> str:
         """Cleans and normalizes the input text."""
@@ -25,70 +34,379 @@ class INLPModel(ABC):
         """Converts text into a numerical vector representation."""
         pass
 
+    def texts_to_vectors(self, texts: List[str]) -> np.ndarray:
+        """Converts a batch of texts into a matrix of shape (len(texts), dimension). Models with a batched encoder override this."""
+        return np.stack([self.text_to_vector(text) for text in texts])
+
+    @property
+    def embedding_source(self) -> str:
+        """Identifies the vectors this model produces (stored with symptom tables built from it)."""
+        return type(self).__name__
+
+    @property
+    def vector_version(self) -> str:
+        """Identifies the vectors symptoms_to_vector(s) returns: the encoder and the active symptom table."""
+        if self.symptom_table is None:
+            return self.embedding_source
+        return f"{self.embedding_source}+table:{self.symptom_table.source}:{self.symptom_table.fingerprint}"
+
+    def symptoms_to_vector(self, symptoms: List[str]) -> np.ndarray:
+        """Encodes a symptom list: table lookup with pooling when a symptom table is set, otherwise the joined text."""
+        if self.symptom_table is not None:
+            return self.symptom_table.encode(symptoms, fallback=self)
+        return self.text_to_vector(" ".join(symptoms))
+
+    def symptoms_to_vectors(self, symptom_lists: List[List[str]]) -> np.ndarray:
+        """Batched symptoms_to_vector: matrix of shape (len(symptom_lists), dimension)."""
+        if self.symptom_table is not None:
+            return self.symptom_table.encode_batch(symptom_lists, fallback=self)
+        return self.texts_to_vectors([" ".join(symptoms) for symptoms in symptom_lists])
+
 
 class TfidfNLPModel(INLPModel):
-    """NLP model based on TF-IDF with caching."""
+    """NLP model based on a pre-fitted TF-IDF vocabulary with caching."""
+
+    DEFAULT_VOCABULARY_PATH = os.getenv("TFIDF_VOCABULARY_PATH", "models/final/tfidf_vocabulary.npz")
+
+    def __init__(
+        self,
+        vocabulary_path: Optional[str] = None,
+        max_features: int = 100,
+        cache: Optional[VectorCache] = None,
+        embedding_store: Optional[EmbeddingStore] = None
+    ):
+        """
+        Loads the fitted vocabulary if it exists.
 
-    def __init__(self):
+        :param vocabulary_path: Path to a vocabulary saved with save_vocabulary().
+        :param max_features: Output dimension used when fitting a new vocabulary.
+        :param cache: Vector cache (a bounded LRU cache is created by default).
+        :param embedding_store: Optional persistent store consulted after the cache.
+        """
         self.logger = Logger("TfidfNLPModel")
         self.logger.info("Initializing TF-IDF NLP model...")
-        self.vectorizer = TfidfVectorizer(max_features=100)
-        self.text_cache = {}  # Caching text vectors
+        self.vocabulary_path = vocabulary_path or self.DEFAULT_VOCABULARY_PATH
+        self.text_cache = cache if cache is not None else VectorCache(namespace="tfidf")
+        self.embedding_store = embedding_store
+        self.single_flight = SingleFlight("tfidf")
+
+        if os.path.exists(self.vocabulary_path):
+            self.vocabulary = TfidfVocabulary.load(self.vocabulary_path)
+            self.logger.info(f"TF-IDF vocabulary loaded from {self.vocabulary_path}.")
+        else:
+            self.vocabulary = TfidfVocabulary(max_features=max_features)
+            self.logger.warning(f"TF-IDF vocabulary not found at {self.vocabulary_path}, call fit() before use.")
         self.logger.info("TF-IDF model initialized.")
 
+    @property
+    def dimension(self) -> int:
+        """Size of the produced vectors."""
+        return self.vocabulary.max_features
+
+    def fit(self, corpus: Iterable[str]) -> "TfidfNLPModel":
+        """Fits the vocabulary and IDF weights over a corpus of raw texts."""
+        self.vocabulary.fit(self.preprocess_text(text) for text in corpus)
+        self.text_cache.clear()
+        return self
+
+    def save_vocabulary(self, path: Optional[str] = None):
+        """Persists the fitted vocabulary (defaults to the path the model was created with)."""
+        self.vocabulary.save(path or self.vocabulary_path)
+
     def preprocess_text(self, text: str) -> str:
         """Cleans and normalizes text."""
         text = text.lower()
         text = re.sub(r"[^a-zA-Zа-яА-Я0-9\s]", "", text)
         return text.strip()
 
+    def texts_to_matrix(self, texts: List[str]) -> sparse.csr_matrix:
+        """Converts a batch of texts into a sparse TF-IDF matrix of shape (len(texts), dimension)."""
+        return self.vocabulary.transform([self.preprocess_text(text) for text in texts])
+
     def text_to_vector(self, text: str) -> np.ndarray:
         """Converts text into a TF-IDF vector (with caching)."""
         cleaned_text = self.preprocess_text(text)
-        if cleaned_text in self.text_cache:
-            return self.text_cache[cleaned_text]  # Return cached vector
+        vector = self.text_cache.get(cleaned_text)
+        if vector is not None:
+            return vector  # Return cached vector
+        # Concurrent misses for the same text wait for a single computation
+        return self.single_flight.do(cleaned_text, lambda: self._compute_vector(cleaned_text))
 
-        vector = self.vectorizer.fit_transform([cleaned_text]).toarray()
-        vector = vector[0] if len(vector) > 0 else np.zeros(100)
-        self.text_cache[cleaned_text] = vector  # Store in cache
+    def _compute_vector(self, cleaned_text: str) -> np.ndarray:
+        """Looks the text up in the embedding store or transforms it, filling the cache."""
+        if self.embedding_store is not None:
+            vector = self.embedding_store.get(cleaned_text)
+            if vector is not None:
+                self.text_cache.put(cleaned_text, vector)
+                return vector
+
+        vector = self.vocabulary.transform([cleaned_text]).toarray()[0]
+        self.text_cache.put(cleaned_text, vector)  # Store in cache
+        if self.embedding_store is not None:
+            self.embedding_store.put(cleaned_text, vector)
         return vector
 
 
+class HashingNLPModel(INLPModel):
+    """
+    Stateless NLP model based on feature hashing of tokens and word n-grams.
+
+    Needs no fitting and keeps no cache (hashing is cheaper than a cache lookup), so it is thread-safe and
+    fork-friendly. The default dimension matches the symptom vector of the diagnosis model.
+    """
+
+    DEFAULT_N_FEATURES = int(os.getenv("HASHING_N_FEATURES", "100"))
+
+    def __init__(
+        self,
+        n_features: Optional[int] = None,
+        ngram_range: tuple = (1, 2),
+        signed: bool = True,
+        sublinear_tf: bool = True
+    ):
+        """
+        :param n_features: Output dimension (HASHING_N_FEATURES by default).
+        :param ngram_range: Smallest and largest word n-gram length.
+        :param signed: Use signed hashing, so colliding features cancel out on average.
+        :param sublinear_tf: Scale term counts as 1 + log(count).
+        """
+        self.hasher = TextHasher(n_features or self.DEFAULT_N_FEATURES, ngram_range, signed, sublinear_tf)
+
+    @property
+    def dimension(self) -> int:
+        """Size of the produced vectors."""
+        return self.hasher.n_features
+
+    @property
+    def embedding_source(self) -> str:
+        hasher = self.hasher
+        options = f"ngrams={hasher.ngram_range[0]}-{hasher.ngram_range[1]},signed={hasher.signed},sublinear={hasher.sublinear_tf}"
+        return f"hashing:{hasher.n_features}:{options}"
+
+    def preprocess_text(self, text: str) -> str:
+        """Lowercases text and keeps only the tokens that are hashed."""
+        return " ".join(self.hasher.tokenize(text))
+
+    def texts_to_matrix(self, texts: List[str]) -> sparse.csr_matrix:
+        """Converts a batch of texts into a sparse float32 matrix of shape (len(texts), dimension)."""
+        return self.hasher.transform(texts)
+
+    def texts_to_vectors(self, texts: List[str]) -> np.ndarray:
+        return self.hasher.transform(texts).toarray()
+
+    def text_to_vector(self, text: str) -> np.ndarray:
+        """Converts text into a hashed feature vector."""
+        return self.hasher.transform([text]).toarray()[0]
+
+
 class BertNLPModel(INLPModel):
-    """NLP model based on BERT."""
+    """NLP model based on BERT with caching, batched encoding and optional int8 quantization."""
+
+    QUANTIZED_CACHE_DIR = os.getenv("QUANTIZED_MODELS_DIR", "models/quantized")
+    # Opt-in: the diagnosis network must be trained on mean-pooled symptom vectors before a table is enabled
+    SYMPTOM_EMBEDDINGS_PATH = os.getenv("SYMPTOM_EMBEDDINGS_PATH", "")
 
-    def __init__(self):
+    def __init__(
+        self,
+        cache: Optional[VectorCache] = None,
+        model_name: str = "bert-base-uncased",
+        max_length: int = 50,
+        batch_size: int = 32,
+        embedding_store: Optional[EmbeddingStore] = None,
+        quantized: bool = False,
+        quantized_cache_dir: Optional[str] = None,
+        symptom_table: Optional[SymptomEmbeddingTable] = None
+    ):
+        """
+        :param cache: Vector cache (a bounded LRU cache is created by default).
+        :param model_name: Hugging Face model name or local directory.
+        :param max_length: Maximum number of tokens per text.
+        :param batch_size: Maximum number of texts per forward pass.
+        :param embedding_store: Optional persistent store consulted after the cache.
+        :param quantized: Use dynamic int8 quantization of the Linear layers.
+        :param quantized_cache_dir: Directory where the quantized encoder is cached.
+        :param symptom_table: Per-symptom embeddings (by default loaded from SYMPTOM_EMBEDDINGS_PATH if it is set).
+        """
         self.logger = Logger("BertNLPModel")
         self.logger.info("Loading BERT model...")
-        self.tokenizer = BertTokenizer.from_pretrained("bert-base-uncased")
-        self.model = BertModel.from_pretrained("bert-base-uncased")
+        self.model_name = model_name
+        self.quantized = quantized
+        self.tokenizer = BertTokenizerFast.from_pretrained(model_name)
+        if quantized:
+            self.quantized_path = cached_model_path(quantized_cache_dir or self.QUANTIZED_CACHE_DIR, model_name)
+            self.model = load_or_quantize(self.quantized_path, self.load_fp32_model)
+            self.logger.info(f"Using int8 quantized BERT ({self.quantized_path}).")
+        else:
+            self.model = self.load_fp32_model()
+        self.max_length = max_length
+        self.batch_size = batch_size
+        default_namespace = "bert-int8" if quantized else "bert"
+        self.text_cache = cache if cache is not None else VectorCache(namespace=default_namespace)
+        self.embedding_store = embedding_store
+        self.single_flight = SingleFlight("bert")
+        self.symptom_table = symptom_table if symptom_table is not None else self.load_symptom_table()
         self.logger.info("BERT model loaded successfully.")
 
+    @property
+    def embedding_source(self) -> str:
+        return f"{self.model_name}:{'int8' if self.quantized else 'fp32'}"
+
+    def load_symptom_table(self) -> Optional[SymptomEmbeddingTable]:
+        """Loads the table configured in SYMPTOM_EMBEDDINGS_PATH if it was built from this encoder."""
+        if not self.SYMPTOM_EMBEDDINGS_PATH:
+            return None
+        if not os.path.exists(self.SYMPTOM_EMBEDDINGS_PATH):
+            self.logger.warning(f"Symptom table {self.SYMPTOM_EMBEDDINGS_PATH} not found; encoding symptoms with BERT.")
+            return None
+        table = SymptomEmbeddingTable.load(self.SYMPTOM_EMBEDDINGS_PATH)
+        if table.source != self.embedding_source:
+            self.logger.warning(
+                f"Symptom table {self.SYMPTOM_EMBEDDINGS_PATH} was built from {table.source}, not {self.embedding_source}; ignoring it."
+            )
+            return None
+        self.logger.info(f"Symptom table loaded: {len(table.symptoms)} symptoms.")
+        return table
+
+    def load_fp32_model(self) -> BertModel:
+        """Loads the full precision encoder."""
+        model = BertModel.from_pretrained(self.model_name)
+        model.eval()
+        return model
+
+    @property
+    def dimension(self) -> int:
+        """Size of the produced embeddings."""
+        return self.model.config.hidden_size
+
+    def quantization_report(self, texts: List[str], iterations: int = 10) -> Dict[str, Any]:
+        """
+        Compares the int8 encoder with the fp32 one on sample texts.
+
+        :param texts: Sample texts (e.g. typical symptom lists).
+        :param iterations: Number of timed batches per model.
+        :return: Latency, weights size and embedding drift (cosine similarity) statistics.
+        """
+        if not self.quantized:
+            raise RuntimeError("quantization_report() requires a model created with quantized=True.")
+
+        inputs = self.tokenizer(
+            [self.preprocess_text(text) for text in texts],
+            return_tensors="pt", truncation=True, padding=True, max_length=self.max_length,
+        )
+        run = lambda model, batch: model(**batch).last_hidden_state[:, 0, :].float().numpy()
+        return quantization_report(self.load_fp32_model(), self.model, run, inputs, iterations)
+
     def preprocess_text(self, text: str) -> str:
         """Cleans the input text before BERT processing."""
         return text.lower().strip()
 
     def text_to_vector(self, text: str) -> np.ndarray:
-        """Converts text into a BERT embedding."""
+        """Converts text into a BERT embedding (with caching). Concurrent misses for the same text run the encoder once."""
         cleaned_text = self.preprocess_text(text)
-        inputs = self.tokenizer(cleaned_text, return_tensors="pt", truncation=True, padding=True, max_length=50)
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-        return outputs.last_hidden_state[:, 0, :].numpy().flatten()
+        vector = self.text_cache.get(cleaned_text)
+        if vector is not None:
+            return vector
+        return self.single_flight.do(cleaned_text, lambda: self.texts_to_vectors([cleaned_text])[0])
+
+    def texts_to_vectors(self, texts: List[str]) -> np.ndarray:
+        """
+        Converts a batch of texts into BERT [CLS] embeddings.
+
+        Texts found in the cache or in the embedding store skip the encoder. The remaining texts are sorted by token length and encoded
+        in buckets of batch_size, so each forward pass only pads up to the longest text of its bucket.
+
+        :param texts: Raw input texts.
+        :return: C-contiguous float32 matrix of shape (len(texts), dimension) in input order.
+        """
+        result = np.empty((len(texts), self.dimension), dtype=np.float32)
+        pending = {}  # cleaned text -> row indices waiting for it
+        for row, text in enumerate(texts):
+            cleaned_text = self.preprocess_text(text)
+            vector = self.text_cache.get(cleaned_text)
+            if vector is None and self.embedding_store is not None and cleaned_text not in pending:
+                vector = self.embedding_store.get(cleaned_text)
+                if vector is not None:
+                    self.text_cache.put(cleaned_text, vector)
+            if vector is not None:
+                result[row] = vector  # Repeated symptom sets skip the encoder
+            else:
+                pending.setdefault(cleaned_text, []).append(row)
+
+        if pending:
+            unique_texts = list(pending)
+            for cleaned_text, vector in zip(unique_texts, self._encode(unique_texts)):
+                result[pending[cleaned_text]] = vector
+                self.text_cache.put(cleaned_text, vector.copy())
+                if self.embedding_store is not None:
+                    self.embedding_store.put(cleaned_text, vector)
+        return result
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Runs the encoder over cleaned texts using length buckets."""
+        encoded = self.tokenizer(texts, truncation=True, max_length=self.max_length, return_attention_mask=False)
+        token_ids = encoded["input_ids"]
+        order = sorted(range(len(texts)), key=lambda i: len(token_ids[i]))
+        pad_token_id = self.tokenizer.pad_token_id or 0
+
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        with torch.inference_mode():
+            for start in range(0, len(order), self.batch_size):
+                bucket = order[start:start + self.batch_size]
+                width = len(token_ids[bucket[-1]])
+                input_ids = np.full((len(bucket), width), pad_token_id, dtype=np.int64)
+                attention_mask = np.zeros((len(bucket), width), dtype=np.int64)
+                for position, index in enumerate(bucket):
+                    ids = token_ids[index]
+                    input_ids[position, :len(ids)] = ids
+                    attention_mask[position, :len(ids)] = 1
+
+                outputs = self.model(
+                    input_ids=torch.from_numpy(input_ids), attention_mask=torch.from_numpy(attention_mask)
+                )
+                vectors[bucket] = outputs.last_hidden_state[:, 0, :].float().numpy()
+        return vectors
 
 
 class NLPModelFactory:
     """Factory for creating NLP models."""
 
+    # Directory of persistent embedding stores shared by all processes on the host ("" disables them)
+    EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", "")
+
     @staticmethod
-    def get_model(model_type: str) -> INLPModel:
-        """Creates an NLP model instance."""
+    def get_model(
+        model_type: str,
+        cache: Optional[VectorCache] = None,
+        embedding_store: Optional[EmbeddingStore] = None,
+        quantized: bool = False
+    ) -> INLPModel:
+        """
+        Creates an NLP model instance ("tfidf", "bert" or "hashing"), optionally with a custom vector cache and
+        a persistent embedding store (the stateless "hashing" model uses neither). Without an explicit store,
+        one is opened in EMBEDDING_STORE_DIR when it is set.
+        """
         if model_type == "tfidf":
-            return TfidfNLPModel()
+            model = TfidfNLPModel(cache=cache, embedding_store=embedding_store)
         elif model_type == "bert":
-            return BertNLPModel()
+            model = BertNLPModel(cache=cache, embedding_store=embedding_store, quantized=quantized)
+        elif model_type == "hashing":
+            return HashingNLPModel()
         else:
             raise ValueError(f"Unknown NLP model type: {model_type}")
+        if embedding_store is None and NLPModelFactory.EMBEDDING_STORE_DIR:
+            model.embedding_store = NLPModelFactory.open_embedding_store(model, NLPModelFactory.EMBEDDING_STORE_DIR)
+        return model
+
+    @staticmethod
+    def open_embedding_store(model: INLPModel, directory: str) -> EmbeddingStore:
+        """
+        Opens the embedding store of a model in directory: one store per encoder and dimension, keyed by
+        the encoder and the fingerprint of its files on disk (TF-IDF vocabulary or local BERT directory).
+        """
+        weights_path = model.vocabulary_path if isinstance(model, TfidfNLPModel) else model.model_name
+        encoder_version = f"{model.embedding_source}:{source_fingerprint(weights_path)}"
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model.embedding_source)
+        return EmbeddingStore(os.path.join(directory, f"{name}-{model.dimension}"), model.dimension, encoder_version)
 
 
 # Example Usage
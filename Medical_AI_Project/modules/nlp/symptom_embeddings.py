@@ -0,0 +1,153 @@
+import argparse
+import hashlib
+import os
+from typing import Dict, Sequence
+import numpy as np
+from scipy import sparse
+
+# Symptoms produced by DataRawGenerator plus other frequent complaints
+DEFAULT_SYMPTOMS = [
+    "fever", "cough", "headache", "fatigue", "nausea",
+    "sore throat", "shortness of breath", "chills", "dizziness", "vomiting", "diarrhea", "chest pain",
+    "muscle pain", "runny nose", "rash", "abdominal pain", "loss of smell", "loss of taste", "back pain", "insomnia",
+]
+
+
+def normalize_symptom(symptom: str) -> str:
+    """Lowercases a symptom and collapses whitespace."""
+    return " ".join(symptom.lower().split())
+
+
+class SymptomEmbeddingTable:
+    """
+    Precomputed embeddings of individual symptoms.
+
+    A symptom list is encoded by looking up each symptom and mean-pooling the rows, which replaces a transformer
+    forward pass with a gather. Symptoms missing from the table are encoded by a fallback NLP model (usually the
+    BERT model the table was built from) and pooled together with the known ones.
+    """
+
+    def __init__(self, symptoms: Sequence[str], vectors: np.ndarray, source: str = ""):
+        """
+        :param symptoms: Normalized symptom phrases, one per row of vectors.
+        :param vectors: Matrix of shape (len(symptoms), dimension).
+        :param source: Identifier of the model that produced the vectors (checked when loading).
+        """
+        self.symptoms = list(symptoms)
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.vectors.setflags(write=False)
+        self.source = source
+        self.index: Dict[str, int] = {symptom: i for i, symptom in enumerate(self.symptoms)}
+
+    @property
+    def dimension(self) -> int:
+        return self.vectors.shape[1]
+
+    @property
+    def fingerprint(self) -> str:
+        """Short content hash: changes whenever the vocabulary or the vectors change."""
+        digest = hashlib.sha256("\n".join(self.symptoms).encode("utf-8"))
+        digest.update(self.vectors.tobytes())
+        return digest.hexdigest()[:12]
+
+    @classmethod
+    def build(cls, nlp_model, symptoms: Sequence[str] = DEFAULT_SYMPTOMS, source: str = "") -> "SymptomEmbeddingTable":
+        """
+        Encodes every symptom with the NLP model in one batch.
+
+        :param nlp_model: Model used at build time (e.g. BertNLPModel).
+        :param symptoms: Symptom vocabulary.
+        :param source: Identifier of the model stored with the table.
+        :return: New table.
+        """
+        unique = list(dict.fromkeys(normalize_symptom(symptom) for symptom in symptoms))
+        return cls(unique, nlp_model.texts_to_vectors(unique), source)
+
+    def save(self, path: str, dtype=np.float16):
+        """
+        Saves the table as a compressed .npz file.
+
+        :param path: Output file.
+        :param dtype: Storage precision (float16 halves the size; values are restored as float32).
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez_compressed(
+            path, symptoms=np.array(self.symptoms), vectors=self.vectors.astype(dtype), source=np.array(self.source)
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "SymptomEmbeddingTable":
+        """Loads a table saved with save()."""
+        with np.load(path) as data:
+            return cls(data["symptoms"].tolist(), data["vectors"], str(data["source"]))
+
+    def encode(self, symptoms: Sequence[str], fallback=None) -> np.ndarray:
+        """
+        Encodes one symptom list by lookup and mean pooling.
+
+        :param symptoms: Raw symptoms.
+        :param fallback: NLP model for symptoms missing from the table (ignored when None).
+        :return: Float32 vector of the table dimension (zeros when nothing could be encoded).
+        """
+        indices = [self.index.get(normalize_symptom(symptom)) for symptom in symptoms]
+        if None not in indices:
+            if not indices:
+                return np.zeros(self.dimension, dtype=np.float32)
+            return self.vectors[indices].mean(axis=0)
+        return self.encode_batch([symptoms], fallback)[0]
+
+    def encode_batch(self, symptom_lists: Sequence[Sequence[str]], fallback=None) -> np.ndarray:
+        """
+        Encodes many symptom lists with one sparse pooling product.
+
+        Out-of-vocabulary phrases of the whole batch are encoded by the fallback in a single call.
+
+        :param symptom_lists: Raw symptom lists.
+        :param fallback: NLP model for symptoms missing from the table (ignored when None).
+        :return: Float32 matrix of shape (len(symptom_lists), dimension).
+        """
+        columns, indptr = [], [0]
+        unknown: Dict[str, int] = {}
+        for symptoms in symptom_lists:
+            for symptom in symptoms:
+                normalized = normalize_symptom(symptom)
+                column = self.index.get(normalized)
+                if column is None and fallback is not None:
+                    column = unknown.setdefault(normalized, len(self.symptoms) + len(unknown))
+                if column is not None:
+                    columns.append(column)
+            indptr.append(len(columns))
+
+        matrix = self.vectors
+        if unknown:
+            extra = np.asarray(fallback.texts_to_vectors(list(unknown)), dtype=np.float32)
+            matrix = np.vstack([self.vectors, extra])
+
+        counts = np.diff(indptr)
+        weights = np.repeat(1.0 / np.maximum(counts, 1), counts).astype(np.float32)
+        pooling = sparse.csr_matrix((weights, columns, indptr), shape=(len(symptom_lists), matrix.shape[0]))
+        return np.ascontiguousarray(pooling @ matrix, dtype=np.float32)
+
+
+# Build: python -m modules.nlp.symptom_embeddings --output models/final/symptom_embeddings.npz
+# Building does not enable the table: BertNLPModel uses it only when SYMPTOM_EMBEDDINGS_PATH points to it.
+if __name__ == "__main__":
+    from modules.nlp.nlp_model import NLPModelFactory
+
+    parser = argparse.ArgumentParser(description="Build the symptom embedding table from an NLP model.")
+    parser.add_argument("--output", default="models/final/symptom_embeddings.npz")
+    parser.add_argument("--model-type", default="bert")
+    parser.add_argument("--quantized", action="store_true")
+    parser.add_argument("--symptoms", help="text file with one symptom per line (defaults to DEFAULT_SYMPTOMS)")
+    args = parser.parse_args()
+
+    vocabulary = DEFAULT_SYMPTOMS
+    if args.symptoms:
+        with open(args.symptoms, encoding="utf-8") as f:
+            vocabulary = [line.strip() for line in f if line.strip()]
+    model = NLPModelFactory.get_model(args.model_type, quantized=args.quantized)
+    table = SymptomEmbeddingTable.build(model, vocabulary, source=model.embedding_source)
+    table.save(args.output)
+    print(f"Saved {len(table.symptoms)} symptom embeddings ({table.dimension}d) to {args.output}")
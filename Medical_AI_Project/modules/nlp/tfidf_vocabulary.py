@@ -0,0 +1,101 @@
+import os
+import numpy as np
+from typing import Iterable, List
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+
+class TfidfVocabulary:
+    """
+    TF-IDF vocabulary fitted once over a corpus and reused for transform-only vectorization.
+
+    The fitted state (terms and IDF weights) is persisted as a small .npz file, so serving
+    processes load it in milliseconds instead of refitting.
+    """
+
+    def __init__(self, max_features: int = 100):
+        """
+        :param max_features: Maximum vocabulary size, also the fixed output dimension.
+        """
+        self.max_features = max_features
+        self.vectorizer = None
+
+    @property
+    def is_fitted(self) -> bool:
+        """ Whether a vocabulary has been fitted or loaded. """
+        return self.vectorizer is not None
+
+    @property
+    def terms(self) -> List[str]:
+        """ Vocabulary terms ordered by column index. """
+        if not self.is_fitted:
+            return []
+        return self.vectorizer.get_feature_names_out().tolist()
+
+    def fit(self, corpus: Iterable[str]) -> "TfidfVocabulary":
+        """
+        Fits the vocabulary and IDF weights over a corpus of (already cleaned) texts.
+
+        :param corpus: Iterable of documents.
+        :return: self
+        """
+        vectorizer = TfidfVectorizer(max_features=self.max_features)
+        vectorizer.fit(corpus)
+        self.vectorizer = vectorizer
+        return self
+
+    def transform(self, texts: List[str]) -> sparse.csr_matrix:
+        """
+        Vectorizes texts with the fitted vocabulary.
+
+        :param texts: List of (already cleaned) texts.
+        :return: Sparse matrix of shape (len(texts), max_features).
+        """
+        if not self.is_fitted:
+            raise RuntimeError("TF-IDF vocabulary is not fitted. Fit it over a corpus or load a saved one.")
+
+        matrix = self.vectorizer.transform(texts).tocsr()
+        if matrix.shape[1] != self.max_features:
+            # Vocabulary may be smaller than max_features: pad with empty columns to keep a fixed dimension
+            matrix = sparse.csr_matrix(
+                (matrix.data, matrix.indices, matrix.indptr), shape=(matrix.shape[0], self.max_features)
+            )
+        return matrix
+
+    def save(self, path: str):
+        """
+        Saves the fitted vocabulary and IDF weights.
+
+        :param path: Destination .npz file.
+        """
+        if not self.is_fitted:
+            raise RuntimeError("Cannot save an unfitted TF-IDF vocabulary.")
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez(
+            path,
+            terms=np.array(self.terms, dtype=str),
+            idf=self.vectorizer.idf_.astype(np.float64),
+            max_features=np.array(self.max_features),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "TfidfVocabulary":
+        """
+        Loads a vocabulary saved with save().
+
+        :param path: Source .npz file.
+        :return: A fitted TfidfVocabulary.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            terms = data["terms"].tolist()
+            idf = data["idf"]
+            max_features = int(data["max_features"])
+
+        vocabulary = cls(max_features=max_features)
+        vectorizer = TfidfVectorizer(vocabulary={term: index for index, term in enumerate(terms)})
+        vectorizer.idf_ = idf
+        vocabulary.vectorizer = vectorizer
+        return vocabulary
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+
+class VectorCache:
+    """
+    Thread-safe LRU cache for text vectors with an entry limit, a byte budget and an optional TTL.
+
+    Keys are hashes of the normalized text (lowercased, whitespace collapsed), so the cache holds
+    a fixed-size digest per entry instead of the original strings.
+    """
+
+    DEFAULT_MAX_ENTRIES = int(os.getenv("VECTOR_CACHE_MAX_ENTRIES", "10000"))
+    DEFAULT_MAX_BYTES = int(os.getenv("VECTOR_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    DEFAULT_TTL_SECONDS = float(os.getenv("VECTOR_CACHE_TTL_SECONDS", "0")) or None
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        namespace: str = ""
+    ):
+        """
+        :param max_entries: Maximum number of cached entries (0 disables the limit).
+        :param max_bytes: Maximum total size of cached values in bytes (0 disables the limit).
+        :param ttl_seconds: Time-to-live of an entry; None keeps entries until evicted.
+        :param namespace: Prefix mixed into every key, so different models never share entries.
+        """
+        self.max_entries = self.DEFAULT_MAX_ENTRIES if max_entries is None else max_entries
+        self.max_bytes = self.DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+        self.ttl_seconds = self.DEFAULT_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.namespace = namespace
+
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """
+        Normalizes text so that trivially different spellings share one entry.
+
+        :param text: Raw text.
+        :return: Lowercased text with collapsed whitespace.
+        """
+        return re.sub(r"\s+", " ", text.strip().lower())
+
+    def make_key(self, text: str) -> bytes:
+        """
+        Builds the cache key of a text.
+
+        :param text: Raw text.
+        :return: 16-byte digest of the namespace and the normalized text.
+        """
+        normalized = f"{self.namespace}\x00{self.normalize(text)}"
+        return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+
+    @staticmethod
+    def size_of(value: Any) -> int:
+        """ Approximate memory footprint of a cached value in bytes. """
+        if isinstance(value, np.ndarray):
+            return value.nbytes
+        return sys.getsizeof(value)
+
+    def get(self, text: str) -> Optional[Any]:
+        """
+        Returns the cached value of a text, or None on a miss.
+
+        :param text: Raw text.
+        :return: Cached value or None.
+        """
+        key = self.make_key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, text: str, value: Any):
+        """
+        Stores a value, evicting least recently used entries when a limit is exceeded.
+
+        :param text: Raw text.
+        :param value: Value to cache (NumPy arrays are stored read-only).
+        """
+        if isinstance(value, np.ndarray):
+            value.setflags(write=False)
+        size = self.size_of(value)
+        if self.max_bytes and size > self.max_bytes:
+            return
+
+        key = self.make_key(text)
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            while (self.max_entries and len(self._entries) > self.max_entries) or \
+                    (self.max_bytes and self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def get_or_compute(self, text: str, compute: Callable[[str], Any]) -> Any:
+        """
+        Returns the cached value of a text, computing and caching it on a miss.
+
+        :param text: Raw text.
+        :param compute: Function producing the value from the text.
+        :return: Cached or freshly computed value.
+        """
+        value = self.get(text)
+        if value is None:
+            value = compute(text)
+            self.put(text, value)
+        return value
+
+    def clear(self):
+        """ Removes all entries (counters are kept). """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Returns cache counters.
+
+        :return: Dictionary with size, hit/miss and eviction statistics.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: bytes):
+        """ Removes an entry; the caller must hold the lock. """
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
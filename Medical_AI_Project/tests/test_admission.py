@@ -0,0 +1,190 @@
+import asyncio
+import unittest
+from unittest import mock
+import httpx
+from interfaces.api import app as app_module
+from interfaces.api.admission import AdmissionController, AdmissionRejected, parse_lanes
+from tests.test_async_handlers import CASE, SlowUseCase
+
+
+async def hold(controller: AdmissionController, lane: str, seconds: float, order: list = None, deadline: float = None):
+    """ Занимает слот на заданное время и записывает порядок допуска. """
+    async with controller.slot(lane, deadline):
+        if order is not None:
+            order.append(lane)
+        await asyncio.sleep(seconds)
+
+
+class TestAdmissionController(unittest.TestCase):
+    """
+    Тесты контроля допуска.
+    """
+
+    def test_priority_lanes(self):
+        """
+        Освободившийся слот получает запрос из более приоритетной полосы, даже если он пришёл позже.
+        """
+        async def run():
+            controller = AdmissionController(1, parse_lanes("urgent:10,background:10"))
+            order = []
+            first = asyncio.create_task(hold(controller, "background", 0.05))
+            await asyncio.sleep(0.01)
+            background = asyncio.create_task(hold(controller, "background", 0.01, order))
+            await asyncio.sleep(0.01)
+            urgent = asyncio.create_task(hold(controller, "urgent", 0.01, order))
+            await asyncio.gather(first, background, urgent)
+            return order, controller.get_metrics()
+
+        order, metrics = asyncio.run(run())
+        self.assertEqual(order, ["urgent", "background"])
+        self.assertEqual(metrics["in_use"], 0)
+        self.assertEqual(metrics["lanes"]["background"]["admitted"], 2)
+        self.assertGreater(metrics["lanes"]["urgent"]["wait_p99_ms"], 0)
+
+    def test_default_lane(self):
+        """
+        Полоса по умолчанию: заданная явно, иначе routine, иначе средняя по приоритету; неизвестная — ошибка конфигурации.
+        """
+        self.assertEqual(AdmissionController(1, parse_lanes("urgent:1,routine:1,background:1")).default_lane, "routine")
+        self.assertEqual(AdmissionController(1, parse_lanes("high:1,normal:1,low:1")).default_lane, "normal")
+        self.assertEqual(AdmissionController(1, parse_lanes("only:1")).default_lane, "only")
+        self.assertEqual(AdmissionController(1, parse_lanes("urgent:1,routine:1"), default_lane="urgent").default_lane, "urgent")
+        with self.assertRaises(ValueError):
+            AdmissionController(1, parse_lanes("urgent:1,background:1"), default_lane="routine")
+
+    def test_full_queue_is_rejected_fast(self):
+        """
+        Запрос сверх размера очереди полосы сразу получает 429 с Retry-After.
+        """
+        async def run():
+            controller = AdmissionController(1, parse_lanes("routine:1"))
+            running = asyncio.create_task(hold(controller, "routine", 0.1))
+            await asyncio.sleep(0.01)
+            queued = asyncio.create_task(hold(controller, "routine", 0.01))
+            await asyncio.sleep(0.01)
+            with self.assertRaises(AdmissionRejected) as rejected:
+                await controller.acquire("routine")
+            await asyncio.gather(running, queued)
+            return rejected.exception, controller.get_metrics()
+
+        error, metrics = asyncio.run(run())
+        self.assertEqual(error.status_code, 429)
+        self.assertGreaterEqual(error.retry_after, 1)
+        self.assertEqual(metrics["lanes"]["routine"]["rejected"], 1)
+
+    def test_expired_deadline_leaves_queue(self):
+        """
+        Запрос, чей дедлайн истёк в очереди, снимается с неё с 503 и не занимает слот.
+        """
+        async def run():
+            controller = AdmissionController(1, parse_lanes("routine:10"))
+            order = []
+            running = asyncio.create_task(hold(controller, "routine", 0.1))
+            await asyncio.sleep(0.01)
+            with self.assertRaises(AdmissionRejected) as expired:
+                await hold(controller, "routine", 0.01, order, deadline=0.02)
+            await running
+            return expired.exception, order, controller.get_metrics()
+
+        error, order, metrics = asyncio.run(run())
+        self.assertEqual(error.status_code, 503)
+        self.assertEqual(order, [])
+        self.assertEqual((metrics["queued"], metrics["in_use"]), (0, 0))
+        self.assertEqual(metrics["lanes"]["routine"]["expired"], 1)
+
+    def test_cancelled_caller_leaves_queue(self):
+        """
+        Отменённый запрос (клиент ушёл) удаляется из очереди.
+        """
+        async def run():
+            controller = AdmissionController(1, parse_lanes("routine:10"))
+            running = asyncio.create_task(hold(controller, "routine", 0.05))
+            await asyncio.sleep(0.01)
+            waiting = asyncio.create_task(hold(controller, "routine", 0.01))
+            await asyncio.sleep(0.01)
+            waiting.cancel()
+            await asyncio.gather(running, waiting, return_exceptions=True)
+            return controller.get_metrics()
+
+        metrics = asyncio.run(run())
+        self.assertEqual((metrics["queued"], metrics["in_use"]), (0, 0))
+
+
+class TestDiagnosisAdmission(unittest.TestCase):
+    """
+    Эндпоинт /diagnosis отвечает 429 с Retry-After при переполнении очереди.
+    """
+
+    def test_overload_returns_429(self):
+        """
+        При одном слоте и очереди на один запрос третий запрос сразу получает 429.
+        """
+        app = app_module.app
+        self.addCleanup(setattr, app.state, "diagnose_use_case", None)
+        app.state.diagnose_use_case = SlowUseCase(0.3)
+        controller = AdmissionController(1, parse_lanes("urgent:1,routine:1"))
+
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                requests = []
+                for i in range(3):
+                    case = dict(CASE, symptoms=[f"symptom {i}"])
+                    requests.append(asyncio.create_task(client.post("/diagnosis", json=case)))
+                    await asyncio.sleep(0.02)
+                unknown = await client.post("/diagnosis", json=CASE, headers={"X-Priority": "vip"})
+                return await asyncio.gather(*requests), unknown
+
+        with mock.patch.object(app_module, "admission", controller):
+            responses, unknown = asyncio.run(run())
+
+        self.assertEqual([response.status_code for response in responses], [200, 200, 429])
+        self.assertGreaterEqual(int(responses[2].headers["Retry-After"]), 1)
+        self.assertEqual(unknown.status_code, 400)
+
+    def test_request_without_priority_uses_default_lane(self):
+        """
+        Запрос без X-Priority проходит в полосу по умолчанию, даже если полосы routine нет.
+        """
+        app = app_module.app
+        self.addCleanup(setattr, app.state, "diagnose_use_case", None)
+        app.state.diagnose_use_case = SlowUseCase(0.0)
+        controller = AdmissionController(1, parse_lanes("high:1,normal:1,low:1"))
+
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post("/diagnosis", json=CASE)
+
+        with mock.patch.object(app_module, "admission", controller):
+            response = asyncio.run(run())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(controller.get_metrics()["lanes"]["normal"]["admitted"], 1)
+
+    def test_duplicate_request_takes_its_own_lane(self):
+        """
+        Запрос, совпадающий с уже выполняющимся, проходит допуск в своей полосе, а не в полосе лидера.
+        """
+        app = app_module.app
+        self.addCleanup(setattr, app.state, "diagnose_use_case", None)
+        app.state.diagnose_use_case = SlowUseCase(0.3)
+        controller = AdmissionController(1, parse_lanes("urgent:1,background:0"))
+
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                leader = asyncio.create_task(client.post("/diagnosis", json=CASE, headers={"X-Priority": "urgent"}))
+                await asyncio.sleep(0.05)
+                follower = await client.post("/diagnosis", json=CASE, headers={"X-Priority": "background"})
+                return await leader, follower
+
+        with mock.patch.object(app_module, "admission", controller):
+            leader, follower = asyncio.run(run())
+
+        self.assertEqual((leader.status_code, follower.status_code), (200, 429))
+        self.assertEqual(controller.get_metrics()["lanes"]["background"]["rejected"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,11 @@
+import subprocess
+import sys
 import unittest
+from unittest import mock
 from fastapi.testclient import TestClient
+from interfaces.api import app as app_module
 from interfaces.api.app import app
+from modules.common.startup import ReadinessRegistry
 
 # uvicorn interfaces.api.app:app --host 0.0.0.0 --port 8000 --reload
 # это запуск апи
@@ -67,6 +72,65 @@ class TestApi(unittest.TestCase):
         unittest.main()
 
 
+class TestStartup(unittest.TestCase):
+    """
+    Tests for lazy startup, health and readiness endpoints
+    """
+
+    def setUp(self):
+        self.readiness = ReadinessRegistry(["ai_model", "nlp_model", "warmup"])
+        patcher = mock.patch.object(app_module, "readiness", self.readiness)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        app.state.diagnose_use_case = None
+        self.addCleanup(setattr, app.state, "diagnose_use_case", None)
+        self.client = TestClient(app)
+
+    def test_import_does_not_load_heavy_modules(self):
+        """
+        Importing the API must not import torch, transformers, sklearn or pymongo.
+        """
+        code = (
+            "import sys, interfaces.api.app; "
+            "print(sorted(m for m in ('torch', 'transformers', 'sklearn', 'pymongo') if m in sys.modules))"
+        )
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual(output.stdout.strip(), "[]")
+
+    def test_not_ready_while_models_load(self):
+        """
+        Liveness answers immediately, readiness and diagnosis report 503 until models are loaded.
+        """
+        self.assertEqual(self.client.get("/healthz").status_code, 200)
+
+        response = self.client.get("/readyz")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["components"]["nlp_model"]["status"], "pending")
+
+        response = self.client.post("/diagnosis", json={
+            "patient_id": 1, "full_name": "John Doe", "age": 35, "gender": "male", "symptoms": ["fever"]
+        })
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response.headers)
+
+    def test_ready_after_loading(self):
+        """
+        After the background loader finishes every component is ready and diagnoses are served.
+        """
+        with mock.patch.object(app_module, "NLP_MODEL_TYPE", "tfidf"):
+            app_module.load_models(app)
+
+        response = self.client.get("/readyz")
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertTrue(all(c["status"] == "ready" for c in report["components"].values()))
+
+        response = self.client.post("/diagnosis", json={
+            "patient_id": 1, "full_name": "John Doe", "age": 35, "gender": "male", "symptoms": ["fever"]
+        })
+        self.assertEqual(response.status_code, 200)
+
+
 # python -m unittest tests/test_api.py
 # Запуст юнит теста
 
@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+import httpx
+from infrastructure.database import mongo_client
+from interfaces.api import app as app_module
+from interfaces.api import main as main_module
+from modules.common.executors import BoundedExecutor
+from modules.common.single_flight import SingleFlight
+from modules.common.startup import ReadinessRegistry
+
+CASE = {"patient_id": 1, "full_name": "John Doe", "age": 35, "gender": "male", "symptoms": ["fever"]}
+SYMPTOMS = [["fever"], ["cough"], ["headache"], ["nausea"]]
+
+
+class SlowUseCase:
+    """ DiagnosePatient с блокирующим инференсом заданной длительности. """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.single_flight = SingleFlight("diagnosis")
+        self.cascade = None
+
+    @staticmethod
+    def flight_key(medical_case):
+        return tuple(medical_case.symptoms)
+
+    def execute(self, medical_case):
+        time.sleep(self.delay)
+        return {"patient_id": medical_case.patient_id, "diagnosis": "Flu", "confidence": 0.9}
+
+
+class SlowCollection:
+    """ Коллекция MongoDB с блокирующим find_one. """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def find_one(self, query, projection=None):
+        time.sleep(self.delay)
+        return {"patient_id": query["patient_id"], "full_name": "John Doe"}
+
+
+async def timed_get(client: httpx.AsyncClient, url: str):
+    start = time.perf_counter()
+    response = await client.get(url)
+    return response, time.perf_counter() - start
+
+
+class TestBoundedExecutor(unittest.TestCase):
+    """
+    Тесты пула для блокирующих вызовов.
+    """
+
+    def test_concurrency_is_bounded(self):
+        """
+        Одновременно выполняется не больше max_workers вызовов.
+        """
+        executor = BoundedExecutor("test", max_workers=2)
+        self.addCleanup(executor.shutdown)
+        lock = threading.Lock()
+        state = {"running": 0, "peak": 0}
+
+        def work(i):
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+            time.sleep(0.05)
+            with lock:
+                state["running"] -= 1
+            return i
+
+        async def run():
+            return await asyncio.gather(*(executor.run(work, i) for i in range(6)))
+
+        self.assertEqual(asyncio.run(run()), list(range(6)))
+        self.assertEqual(state["peak"], 2)
+        self.assertEqual(executor.get_metrics()["completed"], 6)
+
+
+class TestNonBlockingHandlers(unittest.TestCase):
+    """
+    Health и read эндпоинты отвечают быстро, пока выполняются медленные диагностики и запросы к БД.
+    """
+
+    def test_health_is_fast_while_diagnoses_run(self):
+        """
+        Пока четыре диагностики по 0.5 с выполняются в пуле инференса, /healthz и /readyz отвечают сразу.
+        """
+        app = app_module.app
+        self.addCleanup(setattr, app.state, "diagnose_use_case", None)
+        app.state.diagnose_use_case = SlowUseCase(0.5)
+        readiness = ReadinessRegistry(["ai_model"])
+        readiness.mark_ready("ai_model")
+
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                # Разные симптомы: одинаковые запросы объединил бы single-flight
+                diagnoses = [
+                    asyncio.create_task(client.post("/diagnosis", json=dict(CASE, patient_id=i, symptoms=symptoms)))
+                    for i, symptoms in enumerate(SYMPTOMS)
+                ]
+                await asyncio.sleep(0.05)
+                health = await timed_get(client, "/healthz")
+                ready = await timed_get(client, "/readyz")
+                in_flight = (await client.get("/metrics")).json()["inference_executor"]
+                return health, ready, in_flight, await asyncio.gather(*diagnoses)
+
+        with mock.patch.object(app_module, "readiness", readiness):
+            (health, health_latency), (ready, ready_latency), in_flight, diagnoses = asyncio.run(run())
+
+        self.assertEqual(health.status_code, 200)
+        self.assertEqual(ready.status_code, 200)
+        self.assertLess(health_latency, 0.2)
+        self.assertLess(ready_latency, 0.2)
+        self.assertGreater(in_flight["running"] + in_flight["queued"], 0)
+        self.assertTrue(all(response.status_code == 200 for response in diagnoses))
+        self.assertEqual([response.json()["patient_id"] for response in diagnoses], [0, 1, 2, 3])
+
+    def test_reads_do_not_block_event_loop(self):
+        """
+        Медленные запросы к MongoDB выполняются параллельно и не задерживают /healthz.
+        """
+        async def run():
+            transport = httpx.ASGITransport(app=main_module.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                start = time.perf_counter()
+                reads = [asyncio.create_task(client.get(f"/patients/{i}")) for i in range(4)]
+                await asyncio.sleep(0.05)
+                health = await timed_get(client, "/healthz")
+                responses = await asyncio.gather(*reads)
+                return health, responses, time.perf_counter() - start
+
+        with mock.patch.object(mongo_client, "patients_collection", SlowCollection(0.4), create=True):
+            (health, health_latency), responses, elapsed = asyncio.run(run())
+
+        self.assertEqual(health.status_code, 200)
+        self.assertLess(health_latency, 0.2)
+        self.assertEqual([response.json()["patient_id"] for response in responses], [0, 1, 2, 3])
+        self.assertLess(elapsed, 4 * 0.4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pymongo.errors import AutoReconnect, BulkWriteError
+from infrastructure.database.audit_sink import BufferedAuditSink, set_audit_sink
+from infrastructure.use_cases.log_operation import LogOperationUseCase
+
+
+class FakeCollection:
+    """
+    Коллекция MongoDB в памяти с insert_many; может падать, задерживать запись, отклонять часть документов
+    (нечётные позиции) или записывать пачку без подтверждения (writeConcernError).
+    """
+
+    def __init__(self, failures: int = 0, partial_failures: int = 0, write_concern_failures: int = 0):
+        self.documents = []
+        self.calls = []
+        self.failures = failures
+        self.partial_failures = partial_failures
+        self.write_concern_failures = write_concern_failures
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def insert_many(self, documents, ordered=True):
+        self.gate.wait()
+        if self.failures:
+            self.failures -= 1
+            raise AutoReconnect("connection lost")
+        self.calls.append(len(documents))
+        ids = {document["_id"] for document in self.documents}
+        errors = []
+        for index, document in enumerate(documents):
+            document.setdefault("_id", f"id-{id(document)}")
+            if document["_id"] in ids:
+                errors.append({"index": index, "code": 11000, "errmsg": "duplicate key"})
+            elif self.partial_failures and index % 2:
+                errors.append({"index": index, "code": 10107, "errmsg": "not primary"})
+            else:
+                self.documents.append(document)
+        if self.partial_failures:
+            self.partial_failures -= 1
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "writeConcernErrors": []})
+        if self.write_concern_failures:
+            self.write_concern_failures -= 1
+            raise BulkWriteError({"writeErrors": [], "writeConcernErrors": [{"code": 64, "errmsg": "timed out"}]})
+
+
+class TestBufferedAuditSink(unittest.TestCase):
+    """
+    Тесты буферизованного журнала операций.
+    """
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.spill_path = os.path.join(tmp_dir.name, "spill.jsonl")
+
+    def make_sink(self, collection, **options) -> BufferedAuditSink:
+        options.setdefault("flush_interval", 10)
+        sink = BufferedAuditSink(collection, retry_backoff=0.001, **options)
+        self.addCleanup(sink.close)
+        return sink
+
+    def test_batches_with_insert_many(self):
+        """
+        Записи собираются в пачки по batch_size.
+        """
+        collection = FakeCollection()
+        sink = self.make_sink(collection, batch_size=10)
+        for i in range(25):
+            sink.emit({"action": "Diagnosis", "details": str(i)})
+        self.assertTrue(sink.flush(timeout=5))
+        self.assertEqual(collection.calls, [10, 10, 5])
+        self.assertEqual([d["details"] for d in collection.documents], [str(i) for i in range(25)])
+
+    def test_flush_on_interval(self):
+        """
+        Неполная пачка записывается по истечении flush_interval.
+        """
+        collection = FakeCollection()
+        sink = self.make_sink(collection, flush_interval=0.05)
+        sink.emit({"action": "Login"})
+        time.sleep(0.3)
+        self.assertEqual(len(collection.documents), 1)
+
+    def test_drop_policy(self):
+        """
+        При переполнении политика drop отбрасывает самые старые записи и считает их.
+        """
+        collection = FakeCollection()
+        collection.gate.clear()
+        sink = self.make_sink(collection, capacity=5, batch_size=100, overflow="drop")
+        for i in range(8):
+            sink.emit({"details": str(i)})
+        self.assertEqual(sink.get_metrics()["dropped"], 3)
+        self.assertEqual(sink.get_metrics()["queue_depth"], 5)
+        collection.gate.set()
+        sink.flush(timeout=5)
+        self.assertEqual([d["details"] for d in collection.documents], ["3", "4", "5", "6", "7"])
+
+    def test_spill_policy(self):
+        """
+        При переполнении политика spill пишет записи в локальный файл.
+        """
+        collection = FakeCollection()
+        collection.gate.clear()
+        sink = self.make_sink(collection, capacity=2, batch_size=100, overflow="spill", spill_path=self.spill_path)
+        for i in range(5):
+            sink.emit({"details": str(i)})
+        with open(self.spill_path, encoding="utf-8") as f:
+            self.assertEqual([json.loads(line)["details"] for line in f], ["2", "3", "4"])
+        self.assertEqual(sink.get_metrics()["spilled"], 3)
+        collection.gate.set()
+
+    def test_block_policy(self):
+        """
+        Политика block ждёт освобождения места и ничего не теряет.
+        """
+        collection = FakeCollection()
+        sink = self.make_sink(collection, capacity=3, batch_size=3, overflow="block")
+        for i in range(20):
+            sink.emit({"details": str(i)})
+        sink.flush(timeout=5)
+        self.assertEqual(len(collection.documents), 20)
+        self.assertEqual(sink.get_metrics()["dropped"], 0)
+
+    def test_failed_batch_is_spilled(self):
+        """
+        Пачка, которую не удалось записать после повторов, сохраняется в spill-файл.
+        """
+        collection = FakeCollection(failures=10)
+        sink = self.make_sink(collection, max_retries=2, spill_path=self.spill_path)
+        sink.emit({"details": "lost"})
+        sink.flush(timeout=5)
+        with open(self.spill_path, encoding="utf-8") as f:
+            self.assertEqual(json.loads(f.readline())["details"], "lost")
+        self.assertEqual(sink.get_metrics()["retries"], 2)
+
+    def test_partial_failure_retries_failed_entries(self):
+        """
+        После частичной ошибки insert_many повторяются только отклонённые записи, без дубликатов.
+        """
+        collection = FakeCollection(partial_failures=1)
+        sink = self.make_sink(collection, spill_path=self.spill_path)
+        for i in range(4):
+            sink.emit({"details": str(i)})
+        sink.flush(timeout=5)
+        self.assertEqual(collection.calls, [4, 2])
+        self.assertEqual(sorted(document["details"] for document in collection.documents), ["0", "1", "2", "3"])
+        metrics = sink.get_metrics()
+        self.assertEqual((metrics["written"], metrics["spilled"]), (4, 0))
+        self.assertFalse(os.path.exists(self.spill_path))
+
+    def test_unacknowledged_batch_is_retried(self):
+        """
+        Пачка с writeConcernError не считается записанной; при повторе дубликаты ключа считаются записанными.
+        """
+        collection = FakeCollection(write_concern_failures=1)
+        sink = self.make_sink(collection, spill_path=self.spill_path)
+        for i in range(3):
+            sink.emit({"details": str(i)})
+        sink.flush(timeout=5)
+        self.assertEqual(collection.calls, [3, 3])
+        self.assertEqual(len(collection.documents), 3)
+        metrics = sink.get_metrics()
+        self.assertEqual((metrics["written"], metrics["retries"], metrics["spilled"]), (3, 1, 0))
+
+    def test_close_drains(self):
+        """
+        При остановке буфер записывается полностью.
+        """
+        collection = FakeCollection()
+        sink = BufferedAuditSink(collection, flush_interval=10, batch_size=2)
+        for i in range(5):
+            sink.emit({"details": str(i)})
+        sink.close()
+        self.assertEqual(len(collection.documents), 5)
+
+
+class TestLogOperationUseCase(unittest.TestCase):
+    """
+    LogOperationUseCase пишет журнал через буфер.
+    """
+
+    def test_execute_uses_sink(self):
+        """
+        execute не обращается к MongoDB напрямую, запись появляется после сброса буфера.
+        """
+        collection = FakeCollection()
+        sink = BufferedAuditSink(collection, flush_interval=10)
+        set_audit_sink("audit_logs_collection", sink)
+        self.addCleanup(set_audit_sink, "audit_logs_collection", None)
+
+        LogOperationUseCase().execute("Diagnosis", "Diagnosed patient 1")
+        self.assertEqual(collection.documents, [])
+        self.assertEqual(LogOperationUseCase.get_metrics()["queue_depth"], 1)
+
+        sink.flush(timeout=5)
+        self.assertEqual(collection.documents[0]["action"], "Diagnosis")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import torch
+
+from modules.common.quantization import load_or_quantize
+from modules.diagnostics.ai_diagnosis import AIDiagnosisFactory, TorchAIDiagnosis
+from modules.diagnostics.backends import TorchScriptAIDiagnosis, OnnxAIDiagnosis, QuantizedAIDiagnosis
+
+
+def make_inputs(count: int) -> list:
+    rng = np.random.default_rng(1)
+    return [
+        {
+            "age": int(rng.integers(1, 90)),
+            "gender": "female",
+            "symptoms_vector": rng.random(100).tolist(),
+            "chronic_conditions": [],
+            "medications": ["Metformin"],
+        }
+        for _ in range(count)
+    ]
+
+
+class TestOptimizedBackends(unittest.TestCase):
+    """
+    Unit tests for the TorchScript and ONNX Runtime diagnosis backends.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.model_path = os.path.join(self.tmp_dir.name, "diagnosis_model.pth")
+        torch.manual_seed(0)
+        self.eager_model = torch.nn.Sequential(
+            torch.nn.Linear(104, 32), torch.nn.ReLU(), torch.nn.Linear(32, 5)
+        ).eval()
+        torch.save(self.eager_model, self.model_path)
+
+        self.reference = TorchAIDiagnosis(self.model_path)
+        self.reference.model = self.eager_model
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def assert_same_predictions(self, model):
+        inputs = make_inputs(16)
+        for (diagnosis, confidence), (expected_diagnosis, expected_confidence) in zip(
+            model.predict_batch(inputs), self.reference.predict_batch(inputs)
+        ):
+            self.assertEqual(diagnosis, expected_diagnosis)
+            self.assertAlmostEqual(confidence, expected_confidence, places=4)
+
+    def test_torchscript_backend(self):
+        """
+        The TorchScript backend is exported once and matches the eager model.
+        """
+        model = TorchScriptAIDiagnosis(self.model_path, eager_model=self.eager_model, intra_op_threads=1)
+        self.assertTrue(os.path.exists(model.artifact_path))
+        self.assertTrue(model.check_parity()["passed"])
+        self.assert_same_predictions(model)
+
+        reloaded = TorchScriptAIDiagnosis(self.model_path)
+        self.assert_same_predictions(reloaded)
+
+    def test_artifact_is_reexported_when_weights_change(self):
+        """
+        New weights at model_path are exported again and parity-checked, instead of serving the old artifact.
+        """
+        TorchScriptAIDiagnosis(self.model_path, eager_model=self.eager_model)
+        self.assertIsNone(TorchScriptAIDiagnosis(self.model_path).eager_model)
+
+        torch.manual_seed(1)
+        self.eager_model = torch.nn.Sequential(
+            torch.nn.Linear(104, 32), torch.nn.ReLU(), torch.nn.Linear(32, 5)
+        ).eval()
+        torch.save(self.eager_model, self.model_path)
+        self.reference.model = self.eager_model
+
+        model = TorchScriptAIDiagnosis(self.model_path)
+        self.assertIsNotNone(model.eager_model)
+        self.assertTrue(model.check_parity()["passed"])
+        self.assert_same_predictions(model)
+
+    def test_interrupted_export_leaves_no_artifact(self):
+        """
+        A failing export leaves neither a partial artifact nor its temporary file, and the next start exports again.
+        """
+        def broken_export(model, eager_model, artifact_path):
+            with open(artifact_path, "wb") as f:
+                f.write(b"partial")
+            raise OSError("disk full")
+
+        with mock.patch.object(TorchScriptAIDiagnosis, "export", broken_export):
+            with self.assertRaises(OSError):
+                TorchScriptAIDiagnosis(self.model_path, eager_model=self.eager_model)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), ["diagnosis_model.pth"])
+
+        model = TorchScriptAIDiagnosis(self.model_path, eager_model=self.eager_model)
+        self.assert_same_predictions(model)
+        self.assertFalse([name for name in os.listdir(self.tmp_dir.name) if name.endswith(".tmp")])
+
+    def test_onnx_backend(self):
+        """
+        The ONNX Runtime backend is exported once and matches the eager model.
+        """
+        model = OnnxAIDiagnosis(self.model_path, eager_model=self.eager_model, intra_op_threads=1)
+        self.assertTrue(model.artifact_path.endswith(".onnx"))
+        self.assertTrue(model.check_parity()["passed"])
+        self.assert_same_predictions(model)
+
+    def test_factory_exports_from_model_path(self):
+        """
+        The factory loads the eager model from disk and exports it.
+        """
+        for model_type in ("torchscript", "onnx"):
+            model = AIDiagnosisFactory.get_model(model_type, self.model_path, intra_op_threads=1)
+            self.assert_same_predictions(model)
+            self.assertGreater(model.benchmark(batch_size=4, iterations=5)["rows_per_second"], 0)
+
+    def test_quantized_model_is_cached(self):
+        """
+        The int8 model is cached on disk per version of the weights and stays close to the fp32 model.
+        """
+        cache_dir = os.path.join(self.tmp_dir.name, "quantized")
+        model = QuantizedAIDiagnosis(self.model_path, eager_model=self.eager_model, quantized_cache_dir=cache_dir)
+        self.assertTrue(os.path.exists(model.quantized_path))
+
+        report = model.quantization_report(samples=64, iterations=2)
+        self.assertLess(report["int8_size_bytes"], report["fp32_size_bytes"])
+        self.assertGreater(report["mean_cosine_similarity"], 0.99)
+
+        cached = QuantizedAIDiagnosis(self.model_path, quantized_cache_dir=cache_dir)
+        self.assertIsNone(cached.eager_model)
+        inputs = make_inputs(8)
+        self.assertEqual(cached.predict_batch(inputs), model.predict_batch(inputs))
+
+        # New weights under the same file name get their own cache entry
+        torch.manual_seed(1)
+        torch.save(torch.nn.Sequential(torch.nn.Linear(104, 5)).eval(), self.model_path)
+        retrained = QuantizedAIDiagnosis(self.model_path, quantized_cache_dir=cache_dir)
+        self.assertNotEqual(retrained.quantized_path, model.quantized_path)
+        self.assertIsNotNone(retrained.eager_model)
+
+
+    def test_interrupted_quantized_save_leaves_no_cache(self):
+        """
+        A failing save of the int8 model leaves no cache entry, so the next start quantizes again.
+        """
+        cache_path = os.path.join(self.tmp_dir.name, "quantized", "model.int8.pt")
+
+        def broken_save(obj, path):
+            with open(path, "wb") as f:
+                f.write(b"partial")
+            raise OSError("disk full")
+
+        with mock.patch("modules.common.quantization.torch.save", broken_save):
+            with self.assertRaises(OSError):
+                load_or_quantize(cache_path, lambda: self.eager_model)
+        self.assertEqual(os.listdir(os.path.dirname(cache_path)), [])
+
+        quantized = load_or_quantize(cache_path, lambda: self.eager_model)
+        self.assertTrue(os.path.exists(cache_path))
+        self.assertEqual(type(load_or_quantize(cache_path, lambda: None)), type(quantized))
+
+
+if __name__ == "__main__":
+    unittest.main()
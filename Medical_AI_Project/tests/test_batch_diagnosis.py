@@ -0,0 +1,200 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+from interfaces.api import app as app_module
+from interfaces.api.admission import AdmissionController, parse_lanes
+from tests.test_inference_pool import make_case, make_use_case
+
+
+def request_item(patient_id: int, symptoms: list) -> dict:
+    return {"patient_id": patient_id, "full_name": "John Doe", "age": 30, "gender": "male", "symptoms": symptoms}
+
+
+class TestExecuteBatch(unittest.TestCase):
+    """
+    Тесты пакетной диагностики DiagnosePatient.execute_batch.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.use_case = make_use_case()
+
+    def test_matches_single_execution(self):
+        """
+        Пакетная диагностика совпадает с диагностикой по одному случаю.
+        """
+        cases = [make_case(i, [["fever"], ["cough", "nausea"], ["headache", "fatigue"]][i % 3]) for i in range(9)]
+        batch = self.use_case.execute_batch(cases)
+        for case, result in zip(cases, batch):
+            expected = self.use_case.execute(case)
+            self.assertEqual(result["patient_id"], expected["patient_id"])
+            self.assertEqual(result["diagnosis"], expected["diagnosis"])
+            self.assertAlmostEqual(result["confidence"], expected["confidence"], places=5)
+
+    def test_errors_are_reported_per_item(self):
+        """
+        Ошибка одного случая не ломает пакет: остальные диагностируются, для сбойного возвращается ошибка.
+        """
+        nlp_model = self.use_case.nlp_model
+        original = nlp_model.text_to_vector
+
+        def text_to_vector(text):
+            if text == "boom":
+                raise ValueError("bad symptoms")
+            return original(text)
+
+        with mock.patch.object(nlp_model, "text_to_vector", side_effect=text_to_vector):
+            results = self.use_case.execute_batch([make_case(1, ["fever"]), make_case(2, ["boom"]), make_case(3, ["cough"])])
+
+        self.assertEqual([result["patient_id"] for result in results], [1, 2, 3])
+        self.assertEqual(results[1]["error"], "bad symptoms")
+        self.assertIn("diagnosis", results[0])
+        self.assertIn("diagnosis", results[2])
+
+    def test_empty_batch(self):
+        """
+        Пустой пакет возвращает пустой список.
+        """
+        self.assertEqual(self.use_case.execute_batch([]), [])
+
+
+class TestBatchEndpoint(unittest.TestCase):
+    """
+    Тесты эндпоинта POST /diagnosis/batch.
+    """
+
+    def setUp(self):
+        app = app_module.app
+        self.use_case = make_use_case()
+        app.state.diagnose_use_case = self.use_case
+        self.addCleanup(setattr, app.state, "diagnose_use_case", None)
+        patcher = mock.patch.object(app_module, "BATCH_CHUNK_SIZE", 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = TestClient(app)
+
+    def read_rows(self, response) -> list:
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    def test_json_list(self):
+        """
+        JSON-массив обрабатывается частями, результаты возвращаются построчно в порядке запроса.
+        """
+        items = [request_item(i, ["fever", "cough"]) for i in range(5)]
+        items.insert(2, {"patient_id": 99, "full_name": "No Symptoms"})
+
+        with mock.patch.object(self.use_case, "execute_batch", wraps=self.use_case.execute_batch) as execute_batch:
+            rows = self.read_rows(self.client.post("/diagnosis/batch", json=items))
+
+        self.assertEqual(execute_batch.call_count, 3)
+        self.assertEqual([row["patient_id"] for row in rows], [0, 1, 99, 2, 3, 4])
+        self.assertEqual(rows[2]["index"], 2)
+        self.assertIn("error", rows[2])
+        self.assertEqual(set(rows[0]), {"patient_id", "diagnosis", "confidence"})
+
+    def test_ndjson_stream(self):
+        """
+        NDJSON разбирается построчно, невалидная строка даёт ошибку только для себя.
+        """
+        lines = [json.dumps(request_item(i, ["headache"])) for i in range(3)]
+        lines.insert(1, "{not json")
+        body = ("\n".join(lines) + "\n").encode()
+
+        rows = self.read_rows(self.client.post(
+            "/diagnosis/batch", content=body, headers={"Content-Type": "application/x-ndjson"}
+        ))
+
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1]["index"], 1)
+        self.assertTrue(rows[1]["error"].startswith("Invalid JSON"))
+        self.assertEqual([rows[i]["patient_id"] for i in (0, 2, 3)], [0, 1, 2])
+
+    def test_chunks_pass_background_admission(self):
+        """
+        Каждая часть пакета проходит допуск в фоновой полосе; при отказе её строки получают ошибку.
+        """
+        items = [request_item(i, ["fever"]) for i in range(5)]
+        controller = AdmissionController(1, parse_lanes("urgent:1,background:1"))
+        with mock.patch.object(app_module, "admission", controller):
+            rows = self.read_rows(self.client.post("/diagnosis/batch", json=items))
+        self.assertTrue(all("error" not in row for row in rows))
+        self.assertEqual(controller.get_metrics()["lanes"]["background"]["admitted"], 3)
+
+        with mock.patch.object(app_module, "admission", AdmissionController(0, parse_lanes("background:0"))):
+            rows = self.read_rows(self.client.post("/diagnosis/batch", json=items))
+        self.assertEqual([row["index"] for row in rows], list(range(5)))
+        self.assertTrue(all(row["error"] == "Queue of lane 'background' is full" for row in rows))
+
+    def test_json_list_is_parsed_incrementally(self):
+        """
+        JSON-массив разбирается по элементам из частей тела, разрезанных в любом месте.
+        """
+        items = [request_item(i, ["fever"]) for i in range(4)] + [{"patient_id": 7, "full_name": "Ünïcode"}]
+        body = json.dumps(items, ensure_ascii=False).encode()
+
+        async def stream():
+            for i in range(0, len(body), 3):
+                yield body[i:i + 3]
+
+        async def collect(chunks):
+            return [item async for item in app_module.read_json_array(b"", chunks)]
+
+        parsed = asyncio.run(collect(stream()))
+        self.assertEqual(parsed, [(item, None) for item in items])
+
+        rows = self.read_rows(self.client.post("/diagnosis/batch", json=[]))
+        self.assertEqual(rows, [])
+
+    def test_item_size_limit(self):
+        """
+        Слишком большой элемент массива или строка NDJSON не накапливаются в памяти, а дают ошибку.
+        """
+        big = request_item(1, ["fever"] * 50)
+        with mock.patch.object(app_module, "BATCH_MAX_ITEM_BYTES", 200):
+            rows = self.read_rows(self.client.post("/diagnosis/batch", json=[request_item(0, ["fever"]), big]))
+            self.assertEqual(rows[0]["patient_id"], 0)
+            self.assertEqual(rows[1], {"index": 1, "patient_id": None, "error": "Item exceeds 200 bytes"})
+
+            body = "\n".join(json.dumps(item) for item in (big, request_item(2, ["cough"]))).encode()
+            rows = self.read_rows(self.client.post(
+                "/diagnosis/batch", content=body, headers={"Content-Type": "application/x-ndjson"}
+            ))
+            self.assertEqual(rows[0]["error"], "Line exceeds 200 bytes")
+            self.assertEqual(rows[1]["patient_id"], 2)
+
+            async def chunked():
+                body = json.dumps([big] * 100).encode()
+                for i in range(0, len(body), 64):
+                    yield body[i:i + 64]
+
+            async def collect():
+                return [item async for item in app_module.read_json_array(b"", chunked())]
+
+            self.assertEqual(asyncio.run(collect()), [(None, "Item exceeds 200 bytes")])
+
+    def test_invalid_json_list_after_first_item(self):
+        """
+        Ошибка синтаксиса после первых элементов возвращается последней строкой, разобранные элементы диагностируются.
+        """
+        body = (json.dumps(request_item(0, ["fever"])) + ", {oops}]").encode()
+        rows = self.read_rows(self.client.post(
+            "/diagnosis/batch", content=b"[" + body, headers={"Content-Type": "application/json"}
+        ))
+        self.assertEqual(rows[0]["patient_id"], 0)
+        self.assertEqual(rows[1]["index"], 1)
+        self.assertTrue(rows[1]["error"].startswith("Invalid JSON"))
+
+    def test_invalid_json_list(self):
+        """
+        Повреждённый JSON-массив отклоняется целиком с кодом 400.
+        """
+        response = self.client.post("/diagnosis/batch", content=b"[{", headers={"Content-Type": "application/json"})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
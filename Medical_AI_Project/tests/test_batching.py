@@ -0,0 +1,161 @@
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+from modules.diagnostics.ai_diagnosis import TorchAIDiagnosis
+from modules.diagnostics.batching import MicroBatcher, BatchQueueFullError
+
+
+def make_model() -> TorchAIDiagnosis:
+    """ Builds a TorchAIDiagnosis backed by a small deterministic network. """
+    torch.manual_seed(0)
+    model = TorchAIDiagnosis("models/final/diagnosis_model.pth")
+    model.model = torch.nn.Linear(104, 5).eval()
+    return model
+
+
+def make_input(seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    return {
+        "age": int(rng.integers(1, 90)),
+        "gender": "male" if seed % 2 else "female",
+        "symptoms_vector": rng.random(100).tolist(),
+        "chronic_conditions": ["Diabetes"] * (seed % 3),
+        "medications": ["Metformin"] * (seed % 2),
+    }
+
+
+class TestPredictBatch(unittest.TestCase):
+    """
+    Unit tests for TorchAIDiagnosis.predict_batch.
+    """
+
+    def test_batch_matches_single_predictions(self):
+        """
+        A batched forward pass must give the same results as one call per input.
+        """
+        model = make_model()
+        inputs = [make_input(i) for i in range(8)]
+        batch_results = model.predict_batch(inputs)
+        for data, (diagnosis, confidence) in zip(inputs, batch_results):
+            expected_diagnosis, expected_confidence = model.predict(data)
+            self.assertEqual(diagnosis, expected_diagnosis)
+            self.assertAlmostEqual(confidence, expected_confidence, places=5)
+
+    def test_empty_batch(self):
+        """
+        An empty batch returns an empty result list.
+        """
+        self.assertEqual(make_model().predict_batch([]), [])
+
+
+class TestMicroBatcher(unittest.TestCase):
+    """
+    Unit tests for the background micro-batcher.
+    """
+
+    def test_concurrent_requests_are_grouped(self):
+        """
+        Concurrent callers share forward passes and each gets its own result.
+        """
+        model = make_model()
+        batcher = MicroBatcher(model, max_batch_size=16, max_wait_ms=20)
+        inputs = [make_input(i) for i in range(64)]
+        try:
+            with ThreadPoolExecutor(max_workers=32) as pool:
+                results = list(pool.map(batcher.predict, inputs))
+        finally:
+            batcher.close()
+
+        self.assertEqual(results, model.predict_batch(inputs))
+        metrics = batcher.get_metrics()
+        self.assertEqual(metrics["requests"], 64)
+        self.assertLess(metrics["batches"], 64)
+        self.assertLessEqual(metrics["largest_batch"], 16)
+
+    def test_queue_full_is_rejected(self):
+        """
+        Requests beyond max_queue_size are rejected instead of queued.
+        """
+        model = make_model()
+        release = threading.Event()
+        original = model.predict_batch
+        model.predict_batch = lambda batch: release.wait() and original(batch)
+
+        batcher = MicroBatcher(model, max_batch_size=1, max_wait_ms=0, max_queue_size=1)
+        try:
+            first = batcher.submit(make_input(0))
+            # Wait until the worker picked up the first request and blocks on it
+            while batcher.get_metrics()["queue_depth"]:
+                pass
+            second = batcher.submit(make_input(1))
+            with self.assertRaises(BatchQueueFullError):
+                batcher.submit(make_input(2))
+            release.set()
+            self.assertEqual(len(first.result(timeout=5)), 2)
+            self.assertEqual(len(second.result(timeout=5)), 2)
+        finally:
+            release.set()
+            batcher.close()
+        self.assertEqual(batcher.get_metrics()["rejected"], 1)
+
+    def test_close_drains_pending_requests(self):
+        """
+        Requests queued before close() are still answered.
+        """
+        batcher = MicroBatcher(make_model(), max_batch_size=4, max_wait_ms=50)
+        futures = [batcher.submit(make_input(i)) for i in range(10)]
+        batcher.close()
+        self.assertTrue(all(future.done() for future in futures))
+
+    def test_submit_racing_close_is_answered_or_rejected(self):
+        """
+        A request submitted concurrently with close() is either answered by the final drain or rejected.
+        """
+        batcher = MicroBatcher(make_model(), max_batch_size=4, max_wait_ms=1)
+        accepted, rejected = [], []
+        submitting = threading.Event()
+
+        def submit_until_closed(seed: int):
+            while True:
+                try:
+                    accepted.append(batcher.submit(make_input(seed)))
+                    submitting.set()
+                except BatchQueueFullError:
+                    continue
+                except RuntimeError:
+                    rejected.append(seed)
+                    return
+
+        threads = [threading.Thread(target=submit_until_closed, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        submitting.wait(timeout=5)
+        batcher.close()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        self.assertEqual(sorted(rejected), [0, 1, 2, 3])
+        self.assertTrue(all(future.done() and len(future.result()) == 2 for future in accepted))
+
+    def test_short_model_output_fails_missing_requests(self):
+        """
+        If the model returns fewer results than inputs, the unanswered requests fail instead of hanging.
+        """
+        model = make_model()
+        original = model.predict_batch
+        model.predict_batch = lambda batch: original(batch)[:-1]
+        batcher = MicroBatcher(model, max_batch_size=4, max_wait_ms=50)
+        futures = [batcher.submit(make_input(i)) for i in range(4)]
+        batcher.close()
+
+        self.assertEqual([len(future.result(timeout=5)) for future in futures[:3]], [2, 2, 2])
+        with self.assertRaises(RuntimeError):
+            futures[3].result(timeout=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from modules.diagnostics.ai_diagnosis import ERROR_DIAGNOSIS
+from modules.diagnostics.cascade import DiagnosisCascade, SoftmaxDiagnosisModel, create_cascade
+from modules.nlp.nlp_model import TfidfNLPModel
+from tests.test_inference_pool import make_case, make_use_case
+
+SYMPTOMS = ["fever", "cough", "headache", "fatigue", "nausea"]
+
+
+def make_cases(count: int, seed: int = 0) -> list:
+    random.seed(seed)
+    return [make_case(i, random.sample(SYMPTOMS, k=random.randint(1, 3))) for i in range(count)]
+
+
+def rule_label(case) -> str:
+    """ Deterministic labels that a linear model over TF-IDF can learn. """
+    if "fever" in case.symptoms:
+        return "Flu"
+    return "Common Cold" if "cough" in case.symptoms else "Hypertension Complications"
+
+
+class TestSoftmaxDiagnosisModel(unittest.TestCase):
+    """
+    Unit tests for the fast-tier classifier.
+    """
+
+    def setUp(self):
+        self.use_case = make_use_case()
+        cases = make_cases(300)
+        vectors = self.use_case.nlp_model.symptoms_to_vectors([case.symptoms for case in cases])
+        self.inputs = [self.use_case._model_input(case, vector) for case, vector in zip(cases, vectors)]
+        self.labels = [rule_label(case) for case in cases]
+
+    def test_fit_predict_and_reload(self):
+        """
+        The classifier learns the labels, returns normalized probabilities and survives a save/load roundtrip.
+        """
+        model = SoftmaxDiagnosisModel().fit(self.inputs, self.labels)
+        probabilities = model.predict_proba(self.inputs)
+        self.assertEqual(probabilities.shape, (300, 3))
+        np.testing.assert_allclose(probabilities.sum(axis=1), 1.0, atol=1e-5)
+
+        predictions = model.predict_batch(self.inputs)
+        accuracy = np.mean([diagnosis == label for (diagnosis, _), label in zip(predictions, self.labels)])
+        self.assertGreater(accuracy, 0.95)
+        self.assertEqual(model.predict(self.inputs[0]), predictions[0])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "final", "cascade_model.npz")
+            model.save(path)
+            self.assertEqual(SoftmaxDiagnosisModel(path).predict_batch(self.inputs), predictions)
+
+    def test_binary_labels(self):
+        """
+        With two classes the single logistic row is expanded into a two-class softmax.
+        """
+        labels = ["Flu" if label == "Flu" else "Common Cold" for label in self.labels]
+        model = SoftmaxDiagnosisModel().fit(self.inputs, labels)
+        self.assertEqual(model.classes, ["Common Cold", "Flu"])
+        predictions = model.predict_batch(self.inputs)
+        self.assertGreater(np.mean([diagnosis == label for (diagnosis, _), label in zip(predictions, labels)]), 0.95)
+
+    def test_unfitted_model_raises(self):
+        """
+        An unfitted model refuses to predict, so misconfiguration is not mistaken for a diagnosis.
+        """
+        with self.assertRaises(RuntimeError):
+            SoftmaxDiagnosisModel().predict(self.inputs[0])
+
+
+class TestDiagnosisCascade(unittest.TestCase):
+    """
+    Unit tests for the confidence-gated cascade in DiagnosePatient.
+    """
+
+    def setUp(self):
+        self.use_case = make_use_case()
+        self.cases = make_cases(40, seed=1)
+        train = make_cases(400, seed=2)
+        vectors = self.use_case.nlp_model.symptoms_to_vectors([case.symptoms for case in train])
+        inputs = [self.use_case._model_input(case, vector) for case, vector in zip(train, vectors)]
+        # Full model: a confident classifier of the rule labels (the random test network predicts a single class)
+        self.use_case.ai_model = SoftmaxDiagnosisModel().fit(inputs, [rule_label(case) for case in train], regularization=10.0)
+        # Fast tier mimics the full model on its own predictions (as the training CLI does), strongly regularized
+        labels = [diagnosis for diagnosis, _ in self.use_case._predict_batch(train)]
+        self.fast_model = SoftmaxDiagnosisModel().fit(inputs, labels, regularization=0.01)
+        self.full = self.use_case.execute_batch(self.cases)
+
+    def attach(self, threshold: float, shadow_rate: float = 0.0) -> DiagnosisCascade:
+        cascade = DiagnosisCascade(TfidfNLPModel(), self.fast_model, threshold=threshold, shadow_rate=shadow_rate)
+        self.use_case.cascade = cascade
+        return cascade
+
+    def test_confident_cases_skip_full_model(self):
+        """
+        With a zero threshold every case is answered by the fast tier and the full model is never called.
+        """
+        cascade = self.attach(threshold=0.0)
+        with mock.patch.object(self.use_case.ai_model, "predict_batch") as full_batch, \
+                mock.patch.object(self.use_case.ai_model, "predict") as full_single:
+            results = self.use_case.execute_batch(self.cases)
+            self.use_case.execute(self.cases[0])
+        full_batch.assert_not_called()
+        full_single.assert_not_called()
+
+        self.assertEqual(len(results), 40)
+        metrics = cascade.get_metrics()
+        self.assertEqual((metrics["requests"], metrics["fast_hits"], metrics["escalations"]), (41, 41, 0))
+        self.assertEqual(metrics["fast_hit_rate"], 1.0)
+        self.assertIsNone(metrics["agreement"])
+
+    def test_uncertain_cases_escalate(self):
+        """
+        Cases below the threshold get the full model's answer, and agreement is recorded for them.
+        """
+        cascade = self.attach(threshold=1.01)
+        results = self.use_case.execute_batch(self.cases)
+        for result, expected in zip(results, self.full):
+            self.assertEqual(result["diagnosis"], expected["diagnosis"])
+            self.assertAlmostEqual(result["confidence"], expected["confidence"], places=5)
+        self.assertEqual(self.use_case.execute(self.cases[0])["diagnosis"], self.full[0]["diagnosis"])
+
+        metrics = cascade.get_metrics()
+        self.assertEqual((metrics["escalations"], metrics["fast_hit_rate"]), (41, 0.0))
+        self.assertGreater(metrics["agreement"], 0.8)
+        self.assertEqual(sum(bucket["compared"] for bucket in metrics["agreement_by_confidence"].values()), 41)
+        self.assertGreater(metrics["avg_full_ms"], 0.0)
+
+    def test_mixed_threshold_and_shadow_sample(self):
+        """
+        Confident answers come from the fast tier even when shadow-checked; the rest come from the full model.
+        """
+        threshold = 0.6
+        cascade = self.attach(threshold=threshold, shadow_rate=1.0)
+        fast = self.fast_model.predict_batch([
+            self.use_case._model_input(case, vector)
+            for case, vector in zip(self.cases, TfidfNLPModel().symptoms_to_vectors([c.symptoms for c in self.cases]))
+        ])
+        results = self.use_case.execute_batch(self.cases)
+
+        for result, (diagnosis, confidence), full in zip(results, fast, self.full):
+            expected = diagnosis if confidence >= threshold else full["diagnosis"]
+            self.assertEqual(result["diagnosis"], expected)
+        metrics = cascade.get_metrics()
+        confident = sum(confidence >= threshold for _, confidence in fast)
+        self.assertEqual((metrics["fast_hits"], metrics["shadowed"]), (confident, confident))
+        self.assertEqual(sum(bucket["compared"] for bucket in metrics["agreement_by_confidence"].values()), 40)
+
+    def test_full_tier_errors_are_not_compared(self):
+        """
+        Failed full-tier answers are returned for escalated cases but never counted as disagreements.
+        """
+        cascade = self.attach(threshold=1.01)
+        with mock.patch.object(self.use_case.ai_model, "predict_batch", side_effect=lambda batch: [(ERROR_DIAGNOSIS, 0.0)] * len(batch)):
+            results = self.use_case.execute_batch(self.cases)
+        self.assertTrue(all(result["diagnosis"] == ERROR_DIAGNOSIS for result in results))
+
+        metrics = cascade.get_metrics()
+        self.assertEqual(metrics["escalations"], 40)
+        self.assertIsNone(metrics["agreement"])
+        self.assertEqual(sum(bucket["compared"] for bucket in metrics["agreement_by_confidence"].values()), 0)
+
+    def test_create_cascade(self):
+        """
+        The cascade is disabled by default and an unknown mode is a configuration error.
+        """
+        self.assertIsNone(create_cascade("off"))
+        with self.assertRaises(ValueError):
+            create_cascade("maybe")
+
+
+if __name__ == "__main__":
+    unittest.main()
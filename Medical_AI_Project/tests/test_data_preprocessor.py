@@ -0,0 +1,106 @@
+import random
+import unittest
+import pandas as pd
+import pyarrow as pa
+from core.use_cases.data_preprocessor import DataPreprocessor, OUTPUT_COLUMNS
+from data.raw.data_raw import DataRawGenerator
+
+EDGE_CASES = [
+    {
+        "patient_id": 1, "full_name": "   John DOE   ", "passport_id": "AB1234567", "phone_number": "1234567890",
+        "address": " 123 Main St,\tCity,\n Country  ", "email": "John.Doe@Example.Com", "age": 200, "gender": "Male",
+        "symptoms": ["fever", " headache"], "medical_history": " Diabetes  ", "last_visit": "2024-02-30",
+        "blood_type": "O+", "allergies": [" Penicillin "], "chronic_conditions": None, "preferred_language": "ENGLISH",
+    },
+    {
+        "patient_id": 2, "full_name": "", "passport_id": None, "phone_number": "12345", "address": "   ",
+        "email": "a b c", "age": 0, "gender": " FEMALE ", "symptoms": "cough", "last_visit": "2024-2-3",
+        "blood_type": None, "preferred_language": None,
+    },
+    {
+        "patient_id": 3, "full_name": "Ünïcode Name", "phone_number": "١٢٣٤٥٦٧٨٩٠", "age": -5,
+        "gender": "unknown", "last_visit": "0001-01-01", "study_notes": "  Case study.\v\vNotes ",
+    },
+    {
+        "patient_id": 4, "full_name": None, "phone_number": "+1234567890", "age": None, "gender": None,
+        "last_visit": "2024-02-03 ", "attending_physician": "Dr.  Smith",
+    },
+    {"patient_id": 5, "age": 120, "gender": "other", "last_visit": None, "phone_number": "123456789012345"},
+    {"full_name": "No Id", "age": 45.5, "blood_type": "A-"},
+]
+
+
+def expected_records(records: list) -> list:
+    """ The per-record path applied to the raw records (None values behave like absent keys). """
+    return [
+        DataPreprocessor.preprocess_medical_case({key: value for key, value in record.items() if value is not None})
+        for record in records
+    ]
+
+
+def typed(records: list) -> list:
+    """ Records with every value paired with its type, so that 1 and 1.0 do not compare equal. """
+    return [{key: (type(value), value) for key, value in record.items()} for record in records]
+
+
+class TestPreprocessBatch(unittest.TestCase):
+    """
+    Tests that the columnar DataPreprocessor.preprocess_batch matches preprocess_medical_case
+    """
+
+    def assert_matches_per_record(self, records: list, batch: pd.DataFrame = None):
+        batch = DataPreprocessor.preprocess_batch(pd.DataFrame(records)) if batch is None else batch
+        self.assertEqual(list(batch.columns), OUTPUT_COLUMNS)
+        self.assertEqual(typed(batch.to_dict("records")), typed(expected_records(records)))
+
+    def test_edge_cases(self):
+        """
+        Whitespace, unicode, empty strings, missing values, invalid ages, phones and dates.
+        """
+        self.assert_matches_per_record(EDGE_CASES)
+
+    def test_missing_values_keep_types(self):
+        """
+        Integer columns with missing values (float64 in pandas) give ints and "Unknown", as per record.
+        """
+        batch = DataPreprocessor.preprocess_batch(pd.DataFrame([{"patient_id": 1, "age": 45}, {"age": None}]))
+        self.assertEqual(typed(batch[["patient_id", "age"]].to_dict("records")), [
+            {"patient_id": (int, 1), "age": (int, 45)}, {"patient_id": (str, "Unknown"), "age": (int, -1)},
+        ])
+
+    def test_generated_cases(self):
+        """
+        Random raw cases from DataRawGenerator.
+        """
+        random.seed(0)
+        generator = DataRawGenerator()
+        self.assert_matches_per_record([generator.generate_random_case() for _ in range(500)])
+
+    def test_missing_columns(self):
+        """
+        Missing columns behave like absent dictionary keys.
+        """
+        frame = pd.DataFrame({"full_name": [" A ", None]})
+        batch = DataPreprocessor.preprocess_batch(frame)
+        self.assertEqual(batch.to_dict("records"), [DataPreprocessor.preprocess_medical_case({"full_name": " A "}),
+                                                    DataPreprocessor.preprocess_medical_case({})])
+
+    def test_arrow_table(self):
+        """
+        Arrow tables are accepted and list columns keep their values.
+        """
+        records = EDGE_CASES[:1] + EDGE_CASES[2:]
+        batch = DataPreprocessor.preprocess_batch(pa.Table.from_pandas(pd.DataFrame(records)))
+        self.assert_matches_per_record(records, batch)
+        self.assertEqual(batch.loc[0, "symptoms"], ["fever", " headache"])
+
+    def test_unsupported_type(self):
+        """
+        Only DataFrames and Arrow tables are supported.
+        """
+        with self.assertRaises(TypeError):
+            DataPreprocessor.preprocess_batch([{"patient_id": 1}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+import pandas as pd
+from data.raw.data_raw import DataRawGenerator
+from interfaces.cli.diagnose_pipeline import Checkpoint, FileSink, MongoSink, read_chunks, run_pipeline
+from tests.test_inference_pool import make_use_case
+
+
+class FakeCollection:
+    """ Коллекция MongoDB, запоминающая операции bulk_write. """
+
+    def __init__(self):
+        self.operations = []
+
+    def bulk_write(self, operations, ordered=True):
+        self.operations.extend(operations)
+
+
+class TestDiagnosePipeline(unittest.TestCase):
+    """
+    Тесты потокового конвейера диагностики.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        random.seed(0)
+        generator = DataRawGenerator()
+        cls.cases = [dict(generator.generate_random_case(), patient_id=i) for i in range(25)]
+        cls.use_case = make_use_case()
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_dir = tmp_dir.name
+        self.jsonl_path = os.path.join(self.tmp_dir, "cases.jsonl")
+        with open(self.jsonl_path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(case) + "\n" for case in self.cases)
+
+    def run_to_file(self, path: str, **options) -> list:
+        output_path = os.path.join(self.tmp_dir, "out.jsonl")
+        report = run_pipeline(path, self.use_case, FileSink(output_path), chunk_size=10, **options)
+        self.assertEqual(set(report["stages"]), {"read", "preprocess", "diagnose", "sink"})
+        with open(output_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_jsonl_to_file(self):
+        """
+        Все случаи диагностированы по порядку, статистика стадий заполнена.
+        """
+        results = self.run_to_file(self.jsonl_path)
+        self.assertEqual([result["patient_id"] for result in results], list(range(25)))
+        self.assertTrue(all("diagnosis" in result for result in results))
+
+    def test_formats_give_same_results(self):
+        """
+        CSV и Parquet дают те же диагнозы, что и JSONL.
+        """
+        expected = self.run_to_file(self.jsonl_path)
+        os.remove(os.path.join(self.tmp_dir, "out.jsonl"))
+
+        frame = pd.DataFrame(self.cases)
+        csv_frame = frame.copy()
+        for name in ("symptoms", "chatbot_interactions", "allergies", "chronic_conditions", "medications", "references"):
+            csv_frame[name] = csv_frame[name].map(json.dumps)
+        csv_path = os.path.join(self.tmp_dir, "cases.csv")
+        csv_frame.to_csv(csv_path, index=False)
+        parquet_path = os.path.join(self.tmp_dir, "cases.parquet")
+        frame.to_parquet(parquet_path)
+
+        for path in (csv_path, parquet_path):
+            results = self.run_to_file(path)
+            os.remove(os.path.join(self.tmp_dir, "out.jsonl"))
+            self.assertEqual([r["diagnosis"] for r in results], [r["diagnosis"] for r in expected], path)
+
+    def test_resume_from_checkpoint(self):
+        """
+        Повторный запуск продолжает с сохранённого смещения.
+        """
+        checkpoint = Checkpoint(os.path.join(self.tmp_dir, "checkpoint.json"))
+        checkpoint.save(10)
+        results = self.run_to_file(self.jsonl_path, checkpoint=checkpoint)
+        self.assertEqual([result["patient_id"] for result in results], list(range(10, 25)))
+        self.assertEqual(checkpoint.load(), 25)
+
+    def test_jsonl_blank_lines_are_skipped(self):
+        """
+        Пустые строки JSONL не становятся записями и не попадают в приёмник; смещение считается в строках файла.
+        """
+        with open(self.jsonl_path, "w", encoding="utf-8") as f:
+            for case in self.cases:
+                f.write(json.dumps(case) + "\n\n")
+            f.write("   \n")
+
+        chunks = list(read_chunks(self.jsonl_path, chunk_size=10))
+        self.assertEqual([len(frame) for _, frame in chunks], [10, 10, 5])
+        self.assertEqual([offset for offset, _ in chunks], [19, 39, 51])
+        resumed = list(read_chunks(self.jsonl_path, chunk_size=10, offset=39))
+        self.assertEqual(resumed[0][1]["patient_id"].tolist(), list(range(20, 25)))
+
+        collection = FakeCollection()
+        run_pipeline(self.jsonl_path, self.use_case, MongoSink(collection), chunk_size=10)
+        self.assertEqual([operation._filter["patient_id"] for operation in collection.operations], list(range(25)))
+
+    def test_parquet_offset(self):
+        """
+        Смещение внутри части Parquet пропускает только нужные строки.
+        """
+        parquet_path = os.path.join(self.tmp_dir, "cases.parquet")
+        pd.DataFrame(self.cases).to_parquet(parquet_path)
+        chunks = list(read_chunks(parquet_path, chunk_size=10, offset=13))
+        self.assertEqual([offset for offset, _ in chunks], [20, 25])
+        self.assertEqual(chunks[0][1].column("patient_id").to_pylist(), list(range(13, 20)))
+
+    def test_process_workers(self):
+        """
+        С пулами процессов результат совпадает с выполнением в одном процессе.
+        """
+        expected = self.run_to_file(self.jsonl_path)
+        os.remove(os.path.join(self.tmp_dir, "out.jsonl"))
+        results = self.run_to_file(self.jsonl_path, workers=2, max_in_flight=2)
+        self.assertEqual([r["diagnosis"] for r in results], [r["diagnosis"] for r in expected])
+
+    def test_mongo_sink(self):
+        """
+        Mongo-приёмник пишет по одному upsert на пациента.
+        """
+        collection = FakeCollection()
+        run_pipeline(self.jsonl_path, self.use_case, MongoSink(collection), chunk_size=10)
+        self.assertEqual(len(collection.operations), 25)
+        self.assertEqual(collection.operations[0]._filter, {"patient_id": 0})
+
+    def test_mongo_sink_versions(self):
+        """
+        С версиями upsert условный: документ с большей версией не перезаписывается.
+        """
+        collection = FakeCollection()
+        MongoSink(collection).write([{"patient_id": 1, "diagnosis": "Flu", "confidence": 0.9}], ["v2"])
+        operation = collection.operations[0]
+        self.assertEqual(operation._filter["$or"], [
+            {"stream_version": {"$lte": "v2"}}, {"stream_version": {"$exists": False}},
+        ])
+        self.assertEqual(operation._doc["$set"]["stream_version"], "v2")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,212 @@
+import unittest
+from unittest import mock
+from core.use_cases.diagnose_patient import DiagnosePatient
+from infrastructure.caching.diagnosis_cache import (
+    DiagnosisCache, RedisResultStore, default_model_version, diagnosis_cache_key,
+)
+from modules.diagnostics.ai_diagnosis import ERROR_DIAGNOSIS
+from modules.diagnostics.cascade import DiagnosisCascade, SoftmaxDiagnosisModel
+from modules.nlp.nlp_model import TfidfNLPModel
+from modules.nlp.symptom_embeddings import SymptomEmbeddingTable
+from tests.test_inference_pool import make_case, make_use_case
+
+
+class FakeStore:
+    """ Общее хранилище в памяти с get/put; может падать. """
+
+    def __init__(self, fail: bool = False):
+        self.values = {}
+        self.fail = fail
+
+    def get(self, key):
+        if self.fail:
+            raise ConnectionError("store is down")
+        return self.values.get(key)
+
+    def put(self, key, value):
+        if self.fail:
+            raise ConnectionError("store is down")
+        self.values[key] = value
+
+
+class FakeRedis:
+    """ Клиент Redis в памяти: get и set с ex. """
+
+    def __init__(self):
+        self.values = {}
+        self.expiry = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value.encode("utf-8")
+        self.expiry[key] = ex
+
+
+class TestDiagnosisCacheKey(unittest.TestCase):
+    """
+    Тесты канонического ключа кэша.
+    """
+
+    def test_key_ignores_identity_and_formatting(self):
+        """
+        Ключ не зависит от patient_id, регистра и порядка лекарств, но зависит от версии модели.
+        """
+        first = make_case(1, ["Fever ", "cough"])
+        second = make_case(1, ["fever", "COUGH"])
+        second.patient_id = 99
+        first.medications, second.medications = ["b", "a"], ["A", "B"]
+
+        self.assertEqual(diagnosis_cache_key(first, "v1"), diagnosis_cache_key(second, "v1"))
+        self.assertNotEqual(diagnosis_cache_key(first, "v1"), diagnosis_cache_key(first, "v2"))
+        self.assertNotEqual(diagnosis_cache_key(first, "v1"), diagnosis_cache_key(make_case(2, ["fever", "cough"]), "v1"))
+
+
+    def test_key_follows_model_inputs(self):
+        """
+        Дубликаты в списках меняют число заболеваний и лекарств на входе модели, значит и ключ; ключ
+        объединения одновременных запросов совпадает по смыслу с ключом кэша.
+        """
+        first, second = make_case(1, ["fever"]), make_case(1, ["fever"])
+        first.chronic_conditions, second.chronic_conditions = ["Diabetes"], ["Diabetes", "diabetes"]
+        self.assertNotEqual(diagnosis_cache_key(first, "v1"), diagnosis_cache_key(second, "v1"))
+        self.assertNotEqual(DiagnosePatient.flight_key(first), DiagnosePatient.flight_key(second))
+
+        second.chronic_conditions = ["Asthma"]
+        self.assertEqual(diagnosis_cache_key(first, "v1"), diagnosis_cache_key(second, "v1"))
+        self.assertEqual(DiagnosePatient.flight_key(first), DiagnosePatient.flight_key(second))
+
+    def test_model_version_covers_table_cascade_and_quantization(self):
+        """
+        Версия меняется при подключении таблицы симптомов, включении или переобучении каскада и квантовании.
+        """
+        nlp_model = TfidfNLPModel()
+        base = default_model_version("pytorch", "models/final/diagnosis_model.pth", nlp_model)
+        self.assertNotEqual(default_model_version("pytorch", "models/final/diagnosis_model.pth", nlp_model, quantized=True), base)
+
+        nlp_model.symptom_table = SymptomEmbeddingTable.build(nlp_model, ["fever", "cough"], source="tfidf")
+        with_table = default_model_version("pytorch", "models/final/diagnosis_model.pth", nlp_model)
+        self.assertNotEqual(with_table, base)
+        nlp_model.symptom_table = SymptomEmbeddingTable.build(nlp_model, ["fever", "cough", "rash"], source="tfidf")
+        self.assertNotEqual(default_model_version("pytorch", "models/final/diagnosis_model.pth", nlp_model), with_table)
+        nlp_model.symptom_table = None
+
+        cases = [make_case(i, [symptom]) for i, symptom in enumerate(["fever", "cough", "headache", "nausea"])]
+        inputs = [DiagnosePatient._model_input(case, nlp_model.symptoms_to_vector(case.symptoms)) for case in cases]
+        fast_model = SoftmaxDiagnosisModel().fit(inputs, ["Flu", "Flu", "Common Cold", "Common Cold"])
+        cascade = DiagnosisCascade(nlp_model, fast_model, threshold=0.9)
+        with_cascade = default_model_version("pytorch", "models/final/diagnosis_model.pth", nlp_model, cascade)
+        self.assertNotEqual(with_cascade, base)
+        cascade.ai_model = SoftmaxDiagnosisModel().fit(inputs, ["Flu", "Common Cold", "Flu", "Common Cold"])
+        self.assertNotEqual(default_model_version("pytorch", "models/final/diagnosis_model.pth", nlp_model, cascade), with_cascade)
+
+
+class TestDiagnosisCache(unittest.TestCase):
+    """
+    Тесты двухуровневого кэша результатов диагностики.
+    """
+
+    def test_execute_uses_cache(self):
+        """
+        Повторный запрос с теми же входными данными не вызывает модели и возвращает свой patient_id.
+        """
+        use_case = make_use_case()
+        use_case.result_cache = DiagnosisCache("v1", store=FakeStore())
+        first = use_case.execute(make_case(1, ["fever", "cough"]))
+
+        repeat = make_case(1, ["fever", "cough"])
+        repeat.patient_id = 42
+        with mock.patch.object(use_case.ai_model, "predict") as predict:
+            second = use_case.execute(repeat)
+        predict.assert_not_called()
+
+        self.assertEqual(second["patient_id"], 42)
+        self.assertEqual(second["diagnosis"], first["diagnosis"])
+        metrics = use_case.result_cache.get_metrics()
+        self.assertEqual((metrics["local_hits"], metrics["misses"]), (1, 1))
+        self.assertEqual(metrics["hit_ratio"], 0.5)
+        self.assertGreater(metrics["saved_ms"], 0)
+
+    def test_shared_store_fills_local_cache(self):
+        """
+        Результат, записанный другим процессом в общее хранилище, находится и попадает в LRU.
+        """
+        store = FakeStore()
+        DiagnosisCache("v1", store=store).put("key", "Flu", 0.9, 0.05)
+        cache = DiagnosisCache("v1", store=store)
+
+        self.assertEqual(cache.get("key")["diagnosis"], "Flu")
+        self.assertEqual(cache.get("key")["diagnosis"], "Flu")
+        metrics = cache.get_metrics()
+        self.assertEqual((metrics["store_hits"], metrics["local_hits"]), (1, 1))
+
+    def test_model_version_change_invalidates(self):
+        """
+        После смены версии модели старые результаты не используются.
+        """
+        use_case = make_use_case()
+        use_case.result_cache = DiagnosisCache("v1")
+        case = make_case(1, ["fever"])
+        use_case.execute(case)
+        use_case.result_cache.set_model_version("v2")
+        use_case.execute(case)
+        self.assertEqual(use_case.result_cache.get_metrics()["misses"], 2)
+
+    def test_store_errors_do_not_break_diagnosis(self):
+        """
+        Недоступное общее хранилище не мешает диагностике, ошибки считаются.
+        """
+        use_case = make_use_case()
+        use_case.result_cache = DiagnosisCache("v1", store=FakeStore(fail=True))
+        result = use_case.execute(make_case(1, ["fever"]))
+        self.assertIn("diagnosis", result)
+        self.assertEqual(use_case.result_cache.get_metrics()["store_errors"], 2)
+
+    def test_model_errors_are_not_cached(self):
+        """
+        Ошибка модели не попадает в кэш: после восстановления модели тот же запрос получает настоящий диагноз.
+        """
+        use_case = make_use_case()
+        store = FakeStore()
+        use_case.result_cache = DiagnosisCache("v1", store=store)
+        model = use_case.ai_model.model
+        cases = [make_case(1, ["fever"]), make_case(2, ["headache"])]
+
+        use_case.ai_model.model = None  # модель не загружена: predict возвращает ERROR_DIAGNOSIS
+        self.assertEqual(use_case.execute(cases[0])["diagnosis"], ERROR_DIAGNOSIS)
+        self.assertEqual([r["diagnosis"] for r in use_case.execute_batch(cases)], [ERROR_DIAGNOSIS] * 2)
+        self.assertEqual(len(use_case.result_cache.local), 0)
+        self.assertEqual(store.values, {})
+
+        use_case.ai_model.model = model
+        self.assertNotEqual(use_case.execute(cases[0])["diagnosis"], ERROR_DIAGNOSIS)
+        self.assertTrue(all(r["diagnosis"] != ERROR_DIAGNOSIS for r in use_case.execute_batch(cases)))
+
+    def test_batch_skips_cached_cases(self):
+        """
+        В пакетной диагностике в модель уходят только случаи, которых нет в кэше.
+        """
+        use_case = make_use_case()
+        use_case.result_cache = DiagnosisCache("v1")
+        expected = use_case.execute(make_case(1, ["fever"]))
+
+        with mock.patch.object(use_case.ai_model, "predict_batch", wraps=use_case.ai_model.predict_batch) as predict_batch:
+            results = use_case.execute_batch([make_case(1, ["fever"]), make_case(2, ["headache"])])
+        self.assertEqual(len(predict_batch.call_args[0][0]), 1)
+        self.assertEqual(results[0]["diagnosis"], expected["diagnosis"])
+        self.assertEqual(results[1]["patient_id"], 2)
+
+    def test_redis_store_roundtrip(self):
+        """
+        RedisResultStore хранит значения в JSON под префиксом.
+        """
+        store = RedisResultStore(client=FakeRedis())
+        store.put("abc", {"diagnosis": "Flu", "confidence": 0.9, "latency": 0.01})
+        self.assertEqual(store.client.expiry["diagnosis:abc"], store.ttl_seconds)
+        self.assertEqual(store.get("abc")["diagnosis"], "Flu")
+        self.assertIsNone(store.get("missing"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,244 @@
+import os
+import tempfile
+import threading
+import unittest
+from infrastructure.streams.diagnosis_stream import DiagnosisPublisher, HashRing, SQLiteStreamBackend, message_version
+from infrastructure.streams.worker import SQLiteResultSink, StreamWorker
+from tests.test_inference_pool import make_use_case
+
+CASE = {"patient_id": 1, "full_name": "John Doe", "age": 35, "gender": "male", "symptoms": ["fever", "cough"]}
+
+
+class FailingUseCase:
+    """ DiagnosePatient, который возвращает ошибку для заданного пациента. """
+
+    def __init__(self, failing_patient_id: int):
+        self.failing_patient_id = failing_patient_id
+
+    def execute_batch(self, medical_cases):
+        return [
+            {"patient_id": case.patient_id, "error": "Model failure"} if case.patient_id == self.failing_patient_id
+            else {"patient_id": case.patient_id, "diagnosis": "Flu", "confidence": 0.9}
+            for case in medical_cases
+        ]
+
+
+class FlakySink:
+    """ Приёмник, который падает при первых failures записях. """
+
+    def __init__(self, sink, failures: int):
+        self.sink = sink
+        self.failures = failures
+
+    def write(self, results, versions=None):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("sink unavailable")
+        self.sink.write(results, versions)
+
+
+class TestHashRing(unittest.TestCase):
+    """
+    Тесты консистентного хэширования.
+    """
+
+    def test_adding_node_moves_few_keys(self):
+        """
+        Ключи распределяются по всем узлам, а новый узел забирает примерно 1/N ключей.
+        """
+        ring = HashRing(["a", "b", "c"])
+        before = {key: ring.node_for(key) for key in range(3000)}
+        self.assertEqual(set(before.values()), {"a", "b", "c"})
+
+        ring.add("d")
+        moved = [key for key in before if ring.node_for(key) != before[key]]
+        self.assertTrue(all(ring.node_for(key) == "d" for key in moved))
+        self.assertLess(len(moved), 3000 * 0.4)
+
+        ring.remove("d")
+        self.assertEqual({key: ring.node_for(key) for key in range(3000)}, before)
+
+
+class TestSQLiteStreamBackend(unittest.TestCase):
+    """
+    Тесты локальной замены Redis Streams.
+    """
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.directory = tmp_dir.name
+        self.backend = SQLiteStreamBackend(os.path.join(self.directory, "streams.sqlite3"))
+
+    def test_consumer_groups(self):
+        """
+        Внутри группы сообщение получает один потребитель, каждая группа получает все сообщения.
+        """
+        for i in range(4):
+            self.backend.add("s", {"n": i})
+        self.backend.ensure_group("s", "g1")
+        self.backend.ensure_group("s", "g2")
+
+        first = self.backend.read_group("s", "g1", "c1", 3)
+        second = self.backend.read_group("s", "g1", "c2", 3)
+        self.assertEqual([p["n"] for _, p in first + second], [0, 1, 2, 3])
+        self.assertEqual(len(self.backend.read_group("s", "g2", "c1", 10)), 4)
+        self.assertEqual(self.backend.read_group("s", "g1", "c1", 10, block_ms=20), [])
+
+    def test_unacked_messages_are_redelivered(self):
+        """
+        Неподтверждённые сообщения упавшего потребителя забирает другой; подтверждённые — нет.
+        """
+        self.backend.ensure_group("s", "g")
+        ids = [self.backend.add("s", {"n": i}) for i in range(3)]
+        self.backend.read_group("s", "g", "dead", 3)
+        self.backend.ack("s", "g", ids[:1])
+        self.assertEqual(self.backend.pending_count("s", "g"), 2)
+
+        self.assertEqual(self.backend.claim_stale("s", "g", "alive", min_idle_ms=60000, count=10), [])
+        claimed = self.backend.claim_stale("s", "g", "alive", min_idle_ms=0, count=10)
+        self.assertEqual([message_id for message_id, _ in claimed], ids[1:])
+
+
+class TestStreamWorker(unittest.TestCase):
+    """
+    Тесты воркера потока диагностики.
+    """
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.stream_path = os.path.join(tmp_dir.name, "streams.sqlite3")
+        self.sink_path = os.path.join(tmp_dir.name, "results.sqlite3")
+
+    def test_redelivery_is_idempotent(self):
+        """
+        После падения воркера до ack сообщения обрабатываются повторно без дубликатов результатов.
+        """
+        backend = SQLiteStreamBackend(self.stream_path)
+        publisher = DiagnosisPublisher(backend)
+        for i in range(5):
+            publisher.publish(dict(CASE, patient_id=i))
+        sink = SQLiteResultSink(self.sink_path)
+        use_case = make_use_case()
+
+        crashed_backend = SQLiteStreamBackend(self.stream_path)
+        crashed_backend.ack = lambda *args: None  # падение между записью результатов и подтверждением
+        crashed = StreamWorker(crashed_backend, "diagnosis", "inference", "crashed", use_case, sink)
+        self.assertEqual(crashed.run_once(block_ms=0), 5)
+        self.assertEqual(backend.pending_count("diagnosis", "inference"), 5)
+
+        survivor = StreamWorker(backend, "diagnosis", "inference", "survivor", use_case, sink, claim_idle_ms=0)
+        self.assertEqual(survivor.drain(), 5)
+        self.assertEqual(sink.count(), 5)
+        self.assertEqual(backend.pending_count("diagnosis", "inference"), 0)
+
+    def test_older_message_does_not_overwrite_newer_result(self):
+        """
+        Запоздавшее (повторно доставленное) более старое сообщение не затирает результат более нового.
+        """
+        sink = SQLiteResultSink(self.sink_path)
+        newer = {"patient_id": 1, "diagnosis": "Flu", "confidence": 0.9}
+        older = {"patient_id": 1, "diagnosis": "Cold", "confidence": 0.5}
+        sink.write([newer], [message_version("1700000000000-1")])
+        sink.write([older], [message_version("1700000000000-0")])
+        self.assertEqual(sink.get(1)["diagnosis"], "Flu")
+
+        sink.write([older], [message_version("1700000000001-0")])
+        self.assertEqual(sink.get(1)["diagnosis"], "Cold")
+        self.assertLess(message_version("9"), message_version("10"))
+
+    def test_patient_affinity(self):
+        """
+        С кольцом узлов случаи одного пациента всегда попадают в поток одного узла.
+        """
+        backend = SQLiteStreamBackend(self.stream_path)
+        publisher = DiagnosisPublisher(backend, ring=HashRing(["node-a", "node-b"]))
+        streams = {publisher.stream_for(i) for i in range(100)}
+        self.assertEqual(streams, {"diagnosis:node-a", "diagnosis:node-b"})
+        self.assertEqual(publisher.stream_for(42), publisher.stream_for(42))
+
+    def test_failed_cases_are_retried_then_dead_lettered(self):
+        """
+        Случай с ошибкой не подтверждается и доставляется повторно; после max_deliveries доставок
+        он переносится в dead-letter, а некорректное сообщение — сразу.
+        """
+        backend = SQLiteStreamBackend(self.stream_path)
+        publisher = DiagnosisPublisher(backend)
+        for i in range(4):
+            publisher.publish(dict(CASE, patient_id=i))
+        backend.add("diagnosis", {"full_name": "No Patient Id"})
+        sink = SQLiteResultSink(self.sink_path)
+
+        worker = StreamWorker(backend, "diagnosis", "inference", "w", FailingUseCase(1), sink, max_deliveries=3)
+        self.assertEqual(worker.run_once(block_ms=0), 5)
+        self.assertEqual(sink.count(), 3)
+        self.assertEqual(backend.pending_count("diagnosis", "inference"), 1)
+        self.assertEqual((worker.processed, worker.retried, worker.dead_lettered), (4, 1, 1))
+
+        survivor = StreamWorker(
+            backend, "diagnosis", "inference", "survivor", FailingUseCase(1), sink, claim_idle_ms=0, max_deliveries=3
+        )
+        survivor.drain()
+        self.assertEqual(backend.pending_count("diagnosis", "inference"), 0)
+        self.assertEqual((survivor.processed, survivor.retried, survivor.dead_lettered), (1, 1, 1))
+
+        backend.ensure_group("diagnosis:dead", "audit")
+        dead = [payload for _, payload in backend.read_group("diagnosis:dead", "audit", "auditor", 10)]
+        self.assertEqual([entry["payload"].get("patient_id") for entry in dead], [None, 1])
+        self.assertEqual(dead[1]["error"], "Model failure")
+
+    def test_malformed_message_does_not_block_batch(self):
+        """
+        Сообщение с неверными типами (gender: null) уходит в dead-letter, остальные сообщения пачки записываются.
+        """
+        backend = SQLiteStreamBackend(self.stream_path)
+        publisher = DiagnosisPublisher(backend)
+        publisher.publish(dict(CASE, patient_id=0))
+        publisher.publish(dict(CASE, patient_id=1, gender=None))
+        publisher.publish(dict(CASE, patient_id=2))
+        sink = SQLiteResultSink(self.sink_path)
+
+        worker = StreamWorker(backend, "diagnosis", "inference", "w", make_use_case(), sink, claim_idle_ms=0)
+        self.assertEqual(worker.drain(), 3)
+        self.assertEqual(sink.count(), 2)
+        self.assertEqual(backend.pending_count("diagnosis", "inference"), 0)
+        self.assertEqual(worker.dead_lettered, 1)
+
+        backend.ensure_group("diagnosis:dead", "audit")
+        (_, dead), = backend.read_group("diagnosis:dead", "audit", "auditor", 10)
+        self.assertEqual(dead["payload"]["patient_id"], 1)
+        self.assertIn("Invalid message", dead["error"])
+
+    def test_run_survives_batch_errors(self):
+        """
+        Ошибка пачки не останавливает run(): сообщения остаются неподтверждёнными и обрабатываются после паузы.
+        """
+        backend = SQLiteStreamBackend(self.stream_path)
+        publisher = DiagnosisPublisher(backend)
+        for i in range(3):
+            publisher.publish(dict(CASE, patient_id=i))
+        sink = SQLiteResultSink(self.sink_path)
+        worker = StreamWorker(
+            backend, "diagnosis", "inference", "w", make_use_case(), FlakySink(sink, failures=2),
+            block_ms=10, claim_idle_ms=0, max_backoff=0.05,
+        )
+
+        stop = threading.Event()
+        thread = threading.Thread(target=worker.run, args=(stop,))
+        thread.start()
+        for _ in range(200):
+            if worker.processed == 3:
+                break
+            stop.wait(0.02)
+        stop.set()
+        thread.join(timeout=5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(worker.processed, 3)
+        self.assertEqual(sink.count(), 3)
+        self.assertEqual(backend.pending_count("diagnosis", "inference"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from modules.nlp.embedding_store import EmbeddingStore
+from modules.nlp.nlp_model import BertNLPModel, NLPModelFactory
+from modules.nlp.vector_cache import VectorCache
+from tests.test_nlp import save_tiny_bert
+
+
+def append_vectors(path: str, start: int, count: int):
+    """ Appends vectors from a separate process. """
+    store = EmbeddingStore(path, dimension=4, encoder_version="v1")
+    for i in range(start, start + count):
+        store.put(f"symptom {i}", np.full(4, i, dtype=np.float32))
+
+
+class TestEmbeddingStore(unittest.TestCase):
+    """
+    Unit tests for the memory-mapped embedding store.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "embeddings", "bert")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_put_and_get_without_copy(self):
+        """
+        Stored vectors are returned as read-only views of the memory map.
+        """
+        store = EmbeddingStore(self.path, dimension=4, encoder_version="v1")
+        store.put("Fever cough", np.arange(4))
+        vector = store.get(" fever  cough")
+        np.testing.assert_array_equal(vector, np.arange(4, dtype=np.float32))
+        self.assertIsInstance(vector.base, np.memmap)
+        self.assertFalse(vector.flags.writeable)
+        self.assertIsNone(store.get("headache"))
+
+    def test_reopen_keeps_vectors(self):
+        """
+        A new process (or restart) sees previously stored vectors.
+        """
+        store = EmbeddingStore(self.path, dimension=4, encoder_version="v1", dtype="float16")
+        for i in range(5):
+            store.put(f"symptom {i}", np.full(4, i))
+        store.put("symptom 0", np.full(4, 100))  # Already stored: ignored
+
+        reopened = EmbeddingStore(self.path, dimension=4, encoder_version="v1", dtype="float16")
+        self.assertEqual(len(reopened), 5)
+        np.testing.assert_array_equal(reopened.get("symptom 3"), np.full(4, 3, dtype=np.float16))
+        np.testing.assert_array_equal(reopened.get("symptom 0"), np.zeros(4, dtype=np.float16))
+
+    def test_refresh_keeps_mapping_until_file_grows(self):
+        """
+        Appends within the reserved rows reuse the existing memory map; it is replaced only when the file grows.
+        """
+        store = EmbeddingStore(self.path, dimension=4, encoder_version="v1")
+        store.put("symptom 0", np.zeros(4))
+        first = store.get("symptom 0")
+        mapping = store._vectors
+        for i in range(1, EmbeddingStore.GROWTH_ROWS):
+            store.put(f"symptom {i}", np.full(4, i))
+        self.assertIs(store._vectors, mapping)
+
+        store.put("one more", np.ones(4))
+        self.assertIsNot(store._vectors, mapping)
+        np.testing.assert_array_equal(store.get("one more"), np.ones(4, dtype=np.float32))
+        np.testing.assert_array_equal(first, np.zeros(4, dtype=np.float32))
+        self.assertEqual(len(store), EmbeddingStore.GROWTH_ROWS + 1)
+
+    def test_encoder_version_isolation(self):
+        """
+        Vectors of another encoder version are not returned.
+        """
+        EmbeddingStore(self.path, dimension=4, encoder_version="v1").put("fever", np.ones(4))
+        self.assertIsNone(EmbeddingStore(self.path, dimension=4, encoder_version="v2").get("fever"))
+
+    def test_dimension_mismatch_is_rejected(self):
+        """
+        Opening a store with another layout is an error.
+        """
+        EmbeddingStore(self.path, dimension=4, encoder_version="v1")
+        with self.assertRaises(ValueError):
+            EmbeddingStore(self.path, dimension=8, encoder_version="v1")
+
+    def test_concurrent_writer_processes(self):
+        """
+        Rows appended by several processes are all visible to a reader opened earlier.
+        """
+        reader = EmbeddingStore(self.path, dimension=4, encoder_version="v1")
+        processes = [
+            multiprocessing.Process(target=append_vectors, args=(self.path, n * 20, 20)) for n in range(3)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        for i in range(60):
+            np.testing.assert_array_equal(reader.get(f"symptom {i}"), np.full(4, i, dtype=np.float32))
+        self.assertEqual(len(reader), 60)
+
+
+class TestFactoryEmbeddingStore(unittest.TestCase):
+    """
+    NLPModelFactory opens a persistent store when EMBEDDING_STORE_DIR is set.
+    """
+
+    def test_store_from_setting(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with mock.patch.object(NLPModelFactory, "EMBEDDING_STORE_DIR", tmp_dir):
+                model = NLPModelFactory.get_model("tfidf", cache=VectorCache())
+                self.assertIsInstance(model.embedding_store, EmbeddingStore)
+                expected = model.text_to_vector("Fever and cough")
+
+                other = NLPModelFactory.get_model("tfidf", cache=VectorCache())
+                self.assertIn(other.preprocess_text("Fever and cough"), other.embedding_store)
+                np.testing.assert_allclose(other.text_to_vector("Fever and cough"), expected, rtol=1e-6)
+                self.assertIsNone(NLPModelFactory.get_model("hashing").__dict__.get("embedding_store"))
+
+            self.assertIsNone(NLPModelFactory.get_model("tfidf").embedding_store)
+
+
+class TestBertEmbeddingStore(unittest.TestCase):
+    """
+    BertNLPModel reads embeddings from the store before running the encoder.
+    """
+
+    def test_cold_model_reads_store(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            save_tiny_bert(tmp_dir)
+            path = os.path.join(tmp_dir, "store")
+            warm = BertNLPModel(model_name=tmp_dir, embedding_store=EmbeddingStore(path, 32, "tiny-bert"))
+            expected = warm.texts_to_vectors(["fever cough", "nausea"])
+
+            cold = BertNLPModel(
+                model_name=tmp_dir,
+                cache=VectorCache(),
+                embedding_store=EmbeddingStore(path, 32, "tiny-bert"),
+            )
+            cold._encode = lambda texts: self.fail(f"Encoder called for {texts}")
+            np.testing.assert_array_equal(cold.texts_to_vectors(["fever cough", "nausea"]), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import asyncio
+import os
+import signal
+import time
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+
+import torch
+
+from core.entities.medical_case import MedicalCase
+from core.use_cases.diagnose_patient import DiagnosePatient
+from interfaces.api.inference_pool import PreforkInferencePool
+from modules.diagnostics.ai_diagnosis import TorchAIDiagnosis
+from modules.nlp.nlp_model import TfidfNLPModel
+
+
+def make_use_case() -> DiagnosePatient:
+    """ DiagnosePatient with the committed TF-IDF vocabulary and a small deterministic network. """
+    torch.manual_seed(0)
+    ai_model = TorchAIDiagnosis("models/final/diagnosis_model.pth")
+    ai_model.model = torch.nn.Linear(104, 5).eval()
+    return DiagnosePatient(ai_model, TfidfNLPModel())
+
+
+def make_case(patient_id: int, symptoms: list) -> MedicalCase:
+    return MedicalCase(
+        patient_id=patient_id, full_name="John Doe", passport_id="N/A", phone_number="N/A",
+        address="N/A", email="N/A", age=30 + patient_id, gender="male", symptoms=symptoms,
+    )
+
+
+class TestPreforkInferencePool(unittest.TestCase):
+    """
+    Тесты пула процессов инференса.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.use_case = make_use_case()
+        cls.pool = PreforkInferencePool(cls.use_case, workers=2).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+
+    def test_workers_are_forked(self):
+        """
+        Рабочие процессы запущены сразу и отличаются от родителя.
+        """
+        self.assertEqual(len(self.pool.worker_pids), 2)
+        self.assertNotIn(os.getpid(), self.pool.worker_pids)
+
+    def test_results_match_in_process_execution(self):
+        """
+        Диагноз из рабочего процесса совпадает с диагнозом в родительском процессе.
+        """
+        cases = [make_case(i, [["fever"], ["cough", "nausea"], ["headache"]][i % 3]) for i in range(12)]
+        futures = [self.pool.submit(case) for case in cases]
+        for case, future in zip(cases, futures):
+            self.assertEqual(future.result(timeout=30), self.use_case.execute(case))
+
+    def test_async_execution(self):
+        """
+        Асинхронный вызов для обработчиков FastAPI.
+        """
+        async def run():
+            return await asyncio.gather(*(self.pool.execute_async(make_case(i, ["fever"])) for i in range(4)))
+
+        results = asyncio.run(run())
+        self.assertEqual([result["patient_id"] for result in results], [0, 1, 2, 3])
+
+    def test_memory_metrics(self):
+        """
+        Метрики содержат память каждого рабочего процесса.
+        """
+        metrics = self.pool.get_metrics()
+        self.assertEqual(set(metrics["worker_memory"]), set(self.pool.worker_pids))
+
+    def test_pool_restarts_after_worker_death(self):
+        """
+        После гибели рабочего процесса следующий запрос пересоздаёт пул, а не получает BrokenProcessPool.
+        """
+        pool = PreforkInferencePool(self.use_case, workers=1).start()
+        self.addCleanup(pool.shutdown)
+        case = make_case(1, ["fever"])
+        dead_pid = pool.worker_pids[0]
+        os.kill(dead_pid, signal.SIGKILL)
+
+        result = None
+        for _ in range(100):
+            try:
+                result = pool.execute(case)
+                break
+            except BrokenProcessPool:
+                time.sleep(0.05)  # Запрос ушёл в пул до того, как гибель процесса была обнаружена
+        self.assertEqual(result, self.use_case.execute(case))
+        self.assertEqual(pool.get_metrics()["restarts"], 1)
+        self.assertNotIn(dead_pid, pool.worker_pids)
+
+
+    def test_restart_does_not_block_callers(self):
+        """
+        Пул пересоздаётся в фоновом потоке: submit возвращается сразу, запросы ждут новый пул и выполняются в нём.
+        """
+        pool = PreforkInferencePool(self.use_case, workers=1).start()
+        self.addCleanup(pool.shutdown)
+        case = make_case(1, ["fever"])
+        spawn = pool._spawn
+
+        def slow_spawn():
+            time.sleep(0.5)
+            spawn()
+
+        pool._spawn = slow_spawn
+        os.kill(pool.worker_pids[0], signal.SIGKILL)
+        for _ in range(100):
+            if pool._restarting is not None:
+                break
+            try:
+                pool.execute(case)
+            except BrokenProcessPool:
+                pass
+            time.sleep(0.05)
+
+        started = time.perf_counter()
+        futures = [pool.submit(case) for _ in range(3)]
+        self.assertLess(time.perf_counter() - started, 0.3)
+        self.assertEqual([future.result(timeout=30) for future in futures], [self.use_case.execute(case)] * 3)
+        self.assertEqual(pool.get_metrics()["restarts"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
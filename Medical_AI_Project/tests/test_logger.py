@@ -0,0 +1,202 @@
+import glob
+import gzip
+import json
+import logging
+import os
+import tempfile
+import unittest
+from modules.common import logger as logger_module
+from modules.common.logger import CompressingRotatingFileHandler, JsonFormatter, Logger, Sampler
+
+
+class CountingStr:
+    """ Argument that counts how many times it was formatted. """
+
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "value"
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestLogger(unittest.TestCase):
+    """
+    Tests for the queue-based logging backend
+    """
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.log_dir = tmp_dir.name
+
+    def make_logger(self, name: str, **options) -> Logger:
+        logger = Logger(name, **options)
+        logger.logger.propagate = False
+        for handler in list(logger.logger.handlers):
+            logger.logger.removeHandler(handler)
+        return logger
+
+    def test_lazy_formatting_and_fields(self):
+        """
+        Arguments are not formatted for disabled levels; enabled records keep args and structured fields.
+        """
+        logger = self.make_logger("test.lazy")
+        handler = ListHandler()
+        logger.logger.addHandler(handler)
+        argument = CountingStr()
+
+        logger.debug("Disabled %s", argument)
+        logger.info("Diagnosis %s", argument, patient_id=7)
+
+        self.assertEqual(len(handler.records), 1)
+        self.assertEqual(argument.calls, 0)
+        self.assertEqual(handler.records[0].fields, {"patient_id": 7})
+        self.assertEqual(handler.records[0].getMessage(), "Diagnosis value")
+
+    def test_json_written_by_background_thread(self):
+        """
+        Records go through the queue to the per-logger file as JSON lines.
+        """
+        backend = logger_module._LogBackend(self.log_dir)
+        self.addCleanup(backend.stop)
+        logger = self.make_logger("test.json")
+        logger.logger.addHandler(backend.handler)
+
+        logger.info("Diagnosis %s (%.2f)", "Flu", 0.873, patient_id=42)
+        logger.error("Failed")
+        backend.stop()
+
+        with open(os.path.join(self.log_dir, "test.json.log"), encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual(entries[0]["message"], "Diagnosis Flu (0.87)")
+        self.assertEqual(entries[0]["patient_id"], 42)
+        self.assertEqual([e["level"] for e in entries], ["INFO", "ERROR"])
+
+    def test_forked_child_writes_its_own_file(self):
+        """
+        After fork the child writes logs/<name>.<pid>.log, so parent and child never rotate the same file.
+        """
+        backend = logger_module._LogBackend(self.log_dir)
+        self.addCleanup(backend.stop)
+        logger = self.make_logger("test.fork")
+        logger.logger.addHandler(backend.handler)
+        logger.info("parent before fork")
+        backend.stop()
+        backend.start()
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                backend.after_fork_in_child()
+                logger.info("child")
+                backend.stop()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        logger.info("parent after fork")
+        backend.stop()
+
+        def messages(filename: str) -> list:
+            with open(os.path.join(self.log_dir, filename), encoding="utf-8") as f:
+                return [json.loads(line)["message"] for line in f]
+
+        self.assertEqual(messages("test.fork.log"), ["parent before fork", "parent after fork"])
+        self.assertEqual(messages(f"test.fork.{pid}.log"), ["child"])
+
+    def test_rotation_compresses_old_files(self):
+        """
+        Size-based rotation gzip-compresses old files and keeps backup_count archives.
+        """
+        path = os.path.join(self.log_dir, "rotating.log")
+        handler = CompressingRotatingFileHandler(path, max_bytes=200, interval_seconds=0, backup_count=2)
+        handler.setFormatter(JsonFormatter())
+        self.addCleanup(handler.close)
+        logger = logging.getLogger("test.rotation")
+        logger.propagate = False
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+
+        for i in range(40):
+            logger.warning("message number %d", i)
+
+        archives = glob.glob(f"{path}.*.gz")
+        self.assertEqual(len(archives), 2)
+        self.assertLessEqual(os.path.getsize(path), 200)
+        with gzip.open(archives[0], "rt", encoding="utf-8") as f:
+            self.assertEqual(json.loads(f.readline())["level"], "WARNING")
+
+        # Each record is formatted once, the size check uses the stream position
+        argument = CountingStr()
+        logger.warning("formatted %s", argument)
+        self.assertEqual(argument.calls, 1)
+
+    def test_processes_share_rotating_file(self):
+        """
+        Separately started processes writing the same file lose no lines when one of them rotates it.
+        """
+        path = os.path.join(self.log_dir, "shared.log")
+
+        def write_lines(worker: int):
+            handler = CompressingRotatingFileHandler(path, max_bytes=500, interval_seconds=0, backup_count=1000)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            for i in range(300):
+                handler.handle(logging.makeLogRecord({"msg": f"{worker}-{i}"}))
+            handler.close()
+
+        pids = []
+        for worker in range(3):
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    write_lines(worker)
+                finally:
+                    os._exit(0)
+            pids.append(pid)
+        for pid in pids:
+            os.waitpid(pid, 0)
+
+        lines = []
+        for archive in glob.glob(f"{path}.*.gz"):
+            with gzip.open(archive, "rt", encoding="utf-8") as f:
+                lines.extend(f.read().splitlines())
+        with open(path, encoding="utf-8") as f:
+            lines.extend(f.read().splitlines())
+        self.assertGreater(len(glob.glob(f"{path}.*.gz")), 3)
+        self.assertEqual(sorted(lines), sorted(f"{worker}-{i}" for worker in range(3) for i in range(300)))
+
+    def test_rate_limit(self):
+        """
+        Rate limiting drops INFO records above the limit but never warnings.
+        """
+        sampler = Sampler(rate_limit=5)
+        allowed = sum(sampler.allow(logging.INFO) for _ in range(100))
+        self.assertLessEqual(allowed, 6)
+        self.assertGreaterEqual(sampler.suppressed, 94)
+        self.assertTrue(all(sampler.allow(logging.WARNING) for _ in range(10)))
+
+    def test_sampling(self):
+        """
+        A logger with sample_rate=0 suppresses INFO records and counts them.
+        """
+        logger = self.make_logger("test.sampling", sample_rate=0.0)
+        handler = ListHandler()
+        logger.logger.addHandler(handler)
+        for _ in range(10):
+            logger.info("frequent event")
+        logger.warning("important")
+        self.assertEqual([record.levelname for record in handler.records], ["WARNING"])
+        self.assertEqual(logger.get_suppressed(), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import unittest
+from unittest import mock
+from pymongo import MongoClient, ReadPreference
+from pymongo.monitoring import (
+    ConnectionCheckedInEvent,
+    ConnectionCheckedOutEvent,
+    ConnectionCheckOutFailedEvent,
+    ConnectionCheckOutFailedReason,
+    ConnectionCreatedEvent,
+)
+from infrastructure.database import mongo_client
+from infrastructure.database.migrations import MIGRATIONS_COLLECTION, run_migrations
+from infrastructure.database.pool_metrics import PoolMetricsListener
+
+ADDRESS = ("localhost", 27017)
+
+
+class FakeCollection:
+    """ Коллекция MongoDB в памяти: find, insert_one и create_index. """
+
+    def __init__(self):
+        self.documents = []
+        self.indexes = []
+
+    def find(self, query=None, projection=None):
+        return list(self.documents)
+
+    def insert_one(self, document):
+        self.documents.append(document)
+
+    def create_index(self, keys, **options):
+        self.indexes.append((keys, options))
+
+
+class FakeDb(dict):
+    """ База данных в памяти: коллекции создаются при первом обращении. """
+
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+
+class TestPoolMetricsListener(unittest.TestCase):
+    """
+    Тесты счётчиков пула соединений.
+    """
+
+    def test_checkout_and_wait_time(self):
+        """
+        Выдачи, возвраты, занятые соединения и время ожидания считаются по событиям пула.
+        """
+        listener = PoolMetricsListener()
+        listener.connection_created(ConnectionCreatedEvent(ADDRESS, 1))
+        listener.connection_checked_out(ConnectionCheckedOutEvent(ADDRESS, 1, 0.002))
+        listener.connection_checked_out(ConnectionCheckedOutEvent(ADDRESS, 2, 0.004))
+        listener.connection_checked_in(ConnectionCheckedInEvent(ADDRESS, 1))
+        listener.connection_check_out_failed(
+            ConnectionCheckOutFailedEvent(ADDRESS, ConnectionCheckOutFailedReason.TIMEOUT, 0.5)
+        )
+
+        metrics = listener.get_metrics()
+        self.assertEqual(metrics["checkouts"], 2)
+        self.assertEqual(metrics["checkins"], 1)
+        self.assertEqual(metrics["checkout_failures"], 1)
+        self.assertEqual(metrics["connections_created"], 1)
+        self.assertEqual(metrics["in_use"], 1)
+        self.assertEqual(metrics["max_in_use"], 2)
+        self.assertAlmostEqual(metrics["avg_wait_ms"], 3.0)
+        self.assertAlmostEqual(metrics["max_wait_ms"], 4.0)
+
+
+class TestMongoClientFactory(unittest.TestCase):
+    """
+    Тесты общей фабрики MongoClient.
+    """
+
+    def setUp(self):
+        patcher = mock.patch.multiple(mongo_client, _client=None, _pool_metrics=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_client_is_lazy_and_configured(self):
+        """
+        Клиент создаётся один раз, не подключается сразу и получает настройки пула из конфигурации.
+        """
+        self.assertEqual(mongo_client.get_pool_metrics(), {})
+        with mock.patch.multiple(
+            mongo_client, MONGO_MAX_POOL_SIZE=7, MONGO_READ_PREFERENCE="secondaryPreferred", MONGO_WAIT_QUEUE_TIMEOUT_MS=250
+        ):
+            client = mongo_client.get_client()
+            self.addCleanup(client.close)
+
+            self.assertIs(mongo_client.get_client(), client)
+            self.assertIsInstance(client, MongoClient)
+            self.assertEqual(client.options.pool_options.max_pool_size, 7)
+            self.assertEqual(client.options.pool_options.wait_queue_timeout, 0.25)
+            self.assertEqual(client.read_preference, ReadPreference.SECONDARY_PREFERRED)
+            self.assertEqual(client.write_concern.document, {"w": 1})
+            self.assertEqual(mongo_client.get_pool_metrics()["checkouts"], 0)
+            self.assertEqual(mongo_client.get_pool_metrics()["max_pool_size"], 7)
+
+
+class TestMigrations(unittest.TestCase):
+    """
+    Тесты миграций схемы.
+    """
+
+    def test_applies_pending_migrations_once(self):
+        """
+        Миграции применяются по порядку и записываются; повторный запуск ничего не делает.
+        """
+        db = FakeDb()
+        calls = []
+        migrations = [
+            (2, "second", lambda d: calls.append(2)),
+            (1, "first", lambda d: calls.append(1)),
+        ]
+
+        self.assertEqual(run_migrations(db, migrations), [1, 2])
+        self.assertEqual(run_migrations(db, migrations), [])
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual([doc["_id"] for doc in db[MIGRATIONS_COLLECTION].documents], [1, 2])
+
+    def test_default_migrations_create_patient_index(self):
+        """
+        Встроенные миграции создают уникальный индекс по patient_id.
+        """
+        db = FakeDb()
+        run_migrations(db)
+        self.assertIn(("patient_id", {"unique": True}), db[mongo_client.COLLECTIONS["patients_collection"]].indexes)
+
+
+if __name__ == "__main__":
+    unittest.main()
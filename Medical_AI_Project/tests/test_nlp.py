@@ -0,0 +1,330 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+import torch
+from scipy import sparse
+
+from modules.nlp.feature_hashing import TextHasher
+from modules.nlp.nlp_model import TfidfNLPModel, BertNLPModel, HashingNLPModel, NLPModelFactory
+from modules.nlp.tfidf_vocabulary import TfidfVocabulary
+from modules.nlp.vector_cache import VectorCache
+
+VOCABULARY = [
+    "[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]",
+    "fever", "cough", "headache", "fatigue", "nausea", "and", "shortness", "of", "breath", "pain",
+]
+
+CORPUS = [
+    "fever cough headache",
+    "fatigue nausea",
+    "cough fatigue Heart Disease",
+    "headache nausea Metformin",
+    "fever Asthma",
+]
+
+
+class TestTfidfNLPModel(unittest.TestCase):
+    """
+    Unit tests for the fit-once TF-IDF model.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.vocabulary_path = os.path.join(self.tmp_dir.name, "tfidf_vocabulary.npz")
+        self.model = TfidfNLPModel(vocabulary_path=self.vocabulary_path).fit(CORPUS)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_vectors_are_comparable_across_calls(self):
+        """
+        The same word maps to the same column regardless of the other words in the text.
+        """
+        fever = self.model.text_to_vector("fever")
+        fever_cough = self.model.text_to_vector("fever cough")
+        fever_columns = np.flatnonzero(fever)
+        self.assertEqual(len(fever_columns), 1)
+        self.assertGreater(fever_cough[fever_columns[0]], 0)
+        self.assertEqual(fever.shape, fever_cough.shape)
+
+    def test_saved_vocabulary_gives_identical_vectors(self):
+        """
+        A model loaded from disk transforms exactly like the fitted one.
+        """
+        self.model.save_vocabulary()
+        loaded = TfidfNLPModel(vocabulary_path=self.vocabulary_path)
+        texts = ["Fever, cough!", "nausea and fatigue", "unknown words only"]
+        np.testing.assert_allclose(
+            loaded.texts_to_matrix(texts).toarray(), self.model.texts_to_matrix(texts).toarray()
+        )
+
+    def test_texts_to_matrix_is_sparse(self):
+        """
+        Batched vectorization keeps a sparse matrix with a fixed dimension.
+        """
+        matrix = self.model.texts_to_matrix(["fever", "cough", "headache nausea"])
+        self.assertTrue(sparse.issparse(matrix))
+        self.assertEqual(matrix.shape, (3, 100))
+
+    def test_unfitted_model_raises(self):
+        """
+        Transforming with no fitted vocabulary is an explicit error.
+        """
+        model = TfidfNLPModel(vocabulary_path=os.path.join(self.tmp_dir.name, "missing.npz"))
+        with self.assertRaises(RuntimeError):
+            model.text_to_vector("fever")
+
+
+def save_tiny_bert(directory: str):
+    """
+    Saves a small randomly initialized BERT with its tokenizer, so tests run offline.
+    """
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    vocab_file = os.path.join(directory, "vocab.txt")
+    with open(vocab_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(VOCABULARY))
+    BertTokenizerFast(vocab_file=vocab_file).save_pretrained(directory)
+
+    torch.manual_seed(0)
+    config = BertConfig(
+        vocab_size=len(VOCABULARY), hidden_size=32, num_hidden_layers=2,
+        num_attention_heads=2, intermediate_size=64, max_position_embeddings=64,
+    )
+    BertModel(config).save_pretrained(directory)
+
+
+class TestBertNLPModel(unittest.TestCase):
+    """
+    Unit tests for batched BERT encoding (uses a tiny local BERT).
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        save_tiny_bert(cls.tmp_dir.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def setUp(self):
+        self.model = BertNLPModel(model_name=self.tmp_dir.name, batch_size=2)
+
+    def encode_unbatched(self, text: str) -> np.ndarray:
+        inputs = self.model.tokenizer(self.model.preprocess_text(text), return_tensors="pt")
+        with torch.no_grad():
+            return self.model.model(**inputs).last_hidden_state[0, 0].numpy()
+
+    def test_batched_vectors_match_single_encoding(self):
+        """
+        Length bucketing and padding do not change the embeddings, and rows keep input order.
+        """
+        texts = ["fever", "shortness of breath and pain", "cough headache", "nausea", "fatigue and fever"]
+        matrix = self.model.texts_to_vectors(texts)
+        self.assertEqual(matrix.shape, (len(texts), 32))
+        self.assertEqual(matrix.dtype, np.float32)
+        self.assertTrue(matrix.flags["C_CONTIGUOUS"])
+        for row, text in enumerate(texts):
+            np.testing.assert_allclose(matrix[row], self.encode_unbatched(text), atol=1e-5)
+
+    def test_duplicates_and_cache_skip_encoder(self):
+        """
+        Duplicate texts are encoded once and cached texts are not encoded again.
+        """
+        matrix = self.model.texts_to_vectors(["Fever", "fever", "cough"])
+        np.testing.assert_array_equal(matrix[0], matrix[1])
+        self.assertEqual(self.model.text_cache.get_metrics()["entries"], 2)
+
+        vector = self.model.text_to_vector("cough ")
+        np.testing.assert_array_equal(vector, matrix[2])
+        self.assertEqual(self.model.text_cache.get_metrics()["hits"], 1)
+
+    def test_quantized_encoder(self):
+        """
+        The int8 encoder is cached on disk and its embeddings stay close to fp32.
+        """
+        cache_dir = os.path.join(self.tmp_dir.name, "quantized")
+        model = BertNLPModel(model_name=self.tmp_dir.name, quantized=True, quantized_cache_dir=cache_dir)
+        self.assertTrue(os.path.exists(model.quantized_path))
+
+        report = model.quantization_report(["fever cough", "nausea and fatigue", "headache"], iterations=2)
+        self.assertLess(report["int8_size_bytes"], report["fp32_size_bytes"])
+        self.assertGreater(report["mean_cosine_similarity"], 0.9)
+
+        cached = BertNLPModel(model_name=self.tmp_dir.name, quantized=True, quantized_cache_dir=cache_dir)
+        np.testing.assert_allclose(cached.text_to_vector("fever"), model.text_to_vector("fever"), atol=1e-6)
+
+
+class TestTfidfVocabulary(unittest.TestCase):
+    """
+    Unit tests for the persisted TF-IDF vocabulary.
+    """
+
+    def test_roundtrip_keeps_terms_and_idf(self):
+        """
+        Terms and IDF weights survive save/load.
+        """
+        vocabulary = TfidfVocabulary(max_features=3).fit(CORPUS)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "vocabulary.npz")
+            vocabulary.save(path)
+            loaded = TfidfVocabulary.load(path)
+        self.assertEqual(loaded.terms, vocabulary.terms)
+        self.assertEqual(loaded.max_features, 3)
+        np.testing.assert_allclose(loaded.vectorizer.idf_, vocabulary.vectorizer.idf_)
+
+
+class TestHashingNLPModel(unittest.TestCase):
+    """
+    Unit tests for the stateless feature hashing model.
+    """
+
+    def test_counts_sublinear_tf_and_signs(self):
+        """
+        Without scaling a row holds token counts; sublinear TF and signed hashing change only the values.
+        """
+        text = "fever Fever, cough"
+        counts = TextHasher(ngram_range=(1, 1), signed=False, sublinear_tf=False, norm=None).transform([text])
+        self.assertEqual(counts.sum(), 3)
+        self.assertEqual(sorted(counts.data.tolist()), [1.0, 2.0])
+
+        sublinear = TextHasher(ngram_range=(1, 1), signed=False, sublinear_tf=True, norm=None).transform([text])
+        np.testing.assert_allclose(sorted(sublinear.data), [1.0, 1 + np.log(2)], rtol=1e-6)
+
+        signed = TextHasher(ngram_range=(1, 1), signed=True, sublinear_tf=False, norm=None).transform([text])
+        np.testing.assert_array_equal(np.abs(signed.toarray()), counts.toarray())
+
+    def test_bigrams_keep_word_order(self):
+        """
+        Bigrams distinguish word order, while unigram vectors are order independent.
+        """
+        unigrams = TextHasher(ngram_range=(1, 1)).transform(["fever cough", "cough fever"]).toarray()
+        np.testing.assert_allclose(unigrams[0], unigrams[1])
+        bigrams = TextHasher(ngram_range=(1, 2)).transform(["fever cough", "cough fever"]).toarray()
+        self.assertFalse(np.allclose(bigrams[0], bigrams[1]))
+
+    def test_batch_matches_single_texts(self):
+        """
+        Rows of a batch equal single-text vectors (n-grams never span two texts); empty texts give zero rows.
+        """
+        model = HashingNLPModel()
+        texts = ["shortness of breath", "fever", "", "chest pain and fever", "Fever!"]
+        matrix = model.texts_to_matrix(texts)
+        self.assertTrue(sparse.isspmatrix_csr(matrix))
+        self.assertEqual((matrix.shape, matrix.dtype), ((5, 100), np.float32))
+        for row, text in enumerate(texts):
+            np.testing.assert_allclose(matrix[row].toarray()[0], model.text_to_vector(text), atol=1e-6)
+        np.testing.assert_array_equal(matrix[2].toarray(), 0)
+        np.testing.assert_allclose(np.linalg.norm(matrix.toarray()[[0, 1, 3]], axis=1), 1.0, atol=1e-6)
+        np.testing.assert_allclose(model.text_to_vector("Fever!"), model.text_to_vector("fever"))
+
+    def test_hashes_are_stable_across_processes(self):
+        """
+        Vectors do not depend on the per-process string hash seed.
+        """
+        code = (
+            "import json; from modules.nlp.feature_hashing import TextHasher; "
+            "print(json.dumps(TextHasher().transform(['fever cough']).toarray()[0].tolist()))"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+            env=dict(os.environ, PYTHONHASHSEED="12345"),
+        ).stdout.strip().splitlines()[-1]
+        np.testing.assert_allclose(json.loads(output), HashingNLPModel().text_to_vector("fever cough"), atol=1e-6)
+
+    def test_factory_and_diagnosis_input(self):
+        """
+        The factory builds the model without fitting, with the dimension the diagnosis network expects.
+        """
+        model = NLPModelFactory.get_model("hashing")
+        self.assertIsInstance(model, HashingNLPModel)
+        self.assertEqual(model.dimension, 100)
+        self.assertEqual(model.symptoms_to_vectors([["fever", "cough"], ["nausea"]]).shape, (2, 100))
+
+
+class TestVectorCache(unittest.TestCase):
+    """
+    Unit tests for the bounded vector cache.
+    """
+
+    def test_normalized_keys_share_an_entry(self):
+        """
+        Case and whitespace differences hit the same entry.
+        """
+        cache = VectorCache()
+        cache.put("Fever  cough", np.ones(3))
+        self.assertIsNotNone(cache.get(" fever cough "))
+        self.assertEqual(cache.get_metrics()["hits"], 1)
+
+    def test_lru_eviction_by_entry_count(self):
+        """
+        The least recently used entry is evicted first.
+        """
+        cache = VectorCache(max_entries=2, max_bytes=0)
+        cache.put("a", np.zeros(1))
+        cache.put("b", np.zeros(1))
+        cache.get("a")
+        cache.put("c", np.zeros(1))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(cache.get_metrics()["evictions"], 1)
+
+    def test_byte_budget(self):
+        """
+        The total size of cached vectors stays within max_bytes.
+        """
+        cache = VectorCache(max_entries=0, max_bytes=8 * 100 * 3)
+        for i in range(10):
+            cache.put(f"text {i}", np.zeros(100))
+        self.assertEqual(len(cache), 3)
+        self.assertLessEqual(cache.get_metrics()["bytes"], 8 * 100 * 3)
+
+    def test_ttl_expiration(self):
+        """
+        Entries older than the TTL are treated as misses.
+        """
+        cache = VectorCache(ttl_seconds=0.05)
+        cache.put("fever", np.zeros(1))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("fever"))
+        self.assertEqual(cache.get_metrics()["expirations"], 1)
+
+    def test_concurrent_access(self):
+        """
+        Concurrent writers never exceed the entry limit.
+        """
+        cache = VectorCache(max_entries=50)
+
+        def writer(offset):
+            for i in range(500):
+                cache.put(f"text {offset} {i}", np.zeros(4))
+                cache.get(f"text {offset} {i // 2}")
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(cache), 50)
+
+    def test_tfidf_model_uses_cache(self):
+        """
+        Repeated texts are served from the model cache.
+        """
+        model = TfidfNLPModel(vocabulary_path="missing.npz", cache=VectorCache(max_entries=10)).fit(CORPUS)
+        first = model.text_to_vector("fever cough")
+        second = model.text_to_vector("Fever cough!")
+        self.assertIs(first, second)
+        self.assertEqual(model.text_cache.get_metrics()["hits"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from modules.common.single_flight import SingleFlight
+from tests.test_inference_pool import make_case, make_use_case
+
+
+class TestSingleFlight(unittest.TestCase):
+    """
+    Tests for request coalescing.
+    """
+
+    def test_threads_share_one_computation(self):
+        """
+        Concurrent callers with the same key get the leader's result and the function runs once.
+        """
+        flight = SingleFlight("test")
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return "result"
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: flight.do("key", compute), range(8)))
+
+        self.assertEqual(results, ["result"] * 8)
+        self.assertEqual(len(calls), 1)
+        metrics = flight.get_metrics()
+        self.assertEqual((metrics["executions"], metrics["deduplicated"], metrics["in_flight"]), (1, 7, 0))
+
+    def test_exception_reaches_all_callers(self):
+        """
+        An exception raised by the leader is re-raised for every waiting caller, and the key is released.
+        """
+        flight = SingleFlight()
+        started = threading.Event()
+
+        def fail():
+            started.set()
+            time.sleep(0.1)
+            raise ValueError("boom")
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            leader = executor.submit(flight.do, "key", fail)
+            started.wait()
+            follower = executor.submit(flight.do, "key", fail)
+            for future in (leader, follower):
+                with self.assertRaises(ValueError):
+                    future.result()
+        self.assertEqual(flight.do("key", lambda: "fresh"), "fresh")
+
+    def test_async_callers_share_one_task(self):
+        """
+        Coroutines with the same key await a single task; cancelling one caller does not cancel it for the others.
+        """
+        flight = SingleFlight()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return 42
+
+        async def run():
+            tasks = [asyncio.create_task(flight.do_async("key", compute)) for _ in range(5)]
+            await asyncio.sleep(0.01)
+            tasks[0].cancel()
+            return await asyncio.gather(*tasks[1:])
+
+        self.assertEqual(asyncio.run(run()), [42] * 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.get_metrics()["deduplicated"], 4)
+
+
+class TestDiagnosisCoalescing(unittest.TestCase):
+    """
+    Tests for coalescing in DiagnosePatient and the NLP vectorizers.
+    """
+
+    def test_identical_diagnoses_run_model_once(self):
+        """
+        Concurrent identical diagnoses run the model once and each result keeps its own patient_id.
+        """
+        use_case = make_use_case()
+        predict = use_case.ai_model.predict
+
+        def slow_predict(data):
+            time.sleep(0.2)
+            return predict(data)
+
+        with mock.patch.object(use_case.ai_model, "predict", side_effect=slow_predict) as patched:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                results = list(executor.map(use_case.execute, [make_case(1, ["fever", "cough"]) for _ in range(4)]))
+        self.assertEqual(patched.call_count, 1)
+        self.assertEqual(len({result["diagnosis"] for result in results}), 1)
+        self.assertEqual(use_case.single_flight.get_metrics()["deduplicated"], 3)
+
+    def test_tfidf_misses_are_coalesced(self):
+        """
+        Concurrent cache misses for the same text transform it once.
+        """
+        nlp_model = make_use_case().nlp_model
+        transform = nlp_model.vocabulary.transform
+
+        def slow_transform(texts):
+            time.sleep(0.2)
+            return transform(texts)
+
+        with mock.patch.object(nlp_model.vocabulary, "transform", side_effect=slow_transform) as patched:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                vectors = list(executor.map(nlp_model.text_to_vector, ["Fever and chills"] * 4))
+        self.assertEqual(patched.call_count, 1)
+        self.assertTrue(all((vector == vectors[0]).all() for vector in vectors))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from modules.nlp.nlp_model import BertNLPModel, TfidfNLPModel
+from modules.nlp.symptom_embeddings import SymptomEmbeddingTable
+from tests.test_inference_pool import make_case, make_use_case
+from tests.test_nlp import save_tiny_bert
+
+SYMPTOMS = ["fever", "cough", "headache", "nausea", "shortness of breath"]
+
+
+class TestSymptomEmbeddingTable(unittest.TestCase):
+    """
+    Unit tests for the per-symptom embedding table.
+    """
+
+    def setUp(self):
+        self.nlp_model = TfidfNLPModel()
+        self.table = SymptomEmbeddingTable.build(self.nlp_model, SYMPTOMS, source="tfidf")
+
+    def test_lookup_is_mean_of_symptom_vectors(self):
+        """
+        A known symptom list is encoded as the mean of the per-symptom vectors, without calling the model.
+        """
+        with mock.patch.object(self.nlp_model, "texts_to_vectors") as texts_to_vectors:
+            vector = self.table.encode(["Fever", " shortness  of breath"], fallback=self.nlp_model)
+        texts_to_vectors.assert_not_called()
+        expected = (self.nlp_model.text_to_vector("fever") + self.nlp_model.text_to_vector("shortness of breath")) / 2
+        np.testing.assert_allclose(vector, expected, atol=1e-6)
+        self.assertEqual(vector.dtype, np.float32)
+        np.testing.assert_array_equal(self.table.encode([]), np.zeros(self.table.dimension, dtype=np.float32))
+
+    def test_unknown_symptoms_use_fallback_once(self):
+        """
+        Out-of-vocabulary phrases of a batch are encoded by the fallback in one call, each phrase once.
+        """
+        symptom_lists = [["fever", "chest pain"], ["chest pain", "rash"], ["cough"], []]
+        with mock.patch.object(self.nlp_model, "texts_to_vectors", wraps=self.nlp_model.texts_to_vectors) as texts_to_vectors:
+            matrix = self.table.encode_batch(symptom_lists, fallback=self.nlp_model)
+        texts_to_vectors.assert_called_once_with(["chest pain", "rash"])
+
+        self.assertEqual(matrix.shape, (4, self.table.dimension))
+        for row, symptoms in enumerate(symptom_lists):
+            np.testing.assert_allclose(matrix[row], self.table.encode(symptoms, fallback=self.nlp_model), atol=1e-6)
+        np.testing.assert_allclose(matrix[2], self.nlp_model.text_to_vector("cough"), atol=1e-6)
+        np.testing.assert_array_equal(matrix[3], 0)
+
+        # Without a fallback unknown symptoms are skipped
+        np.testing.assert_allclose(self.table.encode(["fever", "chest pain"]), self.table.encode(["fever"]), atol=1e-6)
+
+    def test_save_and_load(self):
+        """
+        The table survives a float16 roundtrip with its vocabulary and source.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "final", "symptom_embeddings.npz")
+            self.table.save(path)
+            loaded = SymptomEmbeddingTable.load(path)
+        self.assertEqual((loaded.symptoms, loaded.source), (SYMPTOMS, "tfidf"))
+        self.assertEqual(loaded.vectors.dtype, np.float32)
+        np.testing.assert_allclose(loaded.vectors, self.table.vectors, atol=1e-3)
+
+
+class TestSymptomTableIntegration(unittest.TestCase):
+    """
+    Unit tests for NLP models and DiagnosePatient using the symptom table.
+    """
+
+    def test_diagnose_patient_uses_table(self):
+        """
+        With a table the use case encodes symptoms by lookup; single and batch results agree.
+        """
+        use_case = make_use_case()
+        use_case.nlp_model.symptom_table = SymptomEmbeddingTable.build(use_case.nlp_model, SYMPTOMS)
+        cases = [make_case(1, ["fever", "cough"]), make_case(2, ["headache", "chest pain"])]
+
+        with mock.patch.object(use_case.nlp_model, "text_to_vector") as text_to_vector:
+            single = use_case.execute(cases[0])
+        text_to_vector.assert_not_called()
+
+        batch = use_case.execute_batch(cases)
+        self.assertEqual(batch[0]["diagnosis"], single["diagnosis"])
+        self.assertAlmostEqual(batch[0]["confidence"], single["confidence"], places=5)
+        self.assertNotIn("error", batch[1])
+
+    def test_bert_loads_matching_table_only(self):
+        """
+        The table is opt-in; once configured, BertNLPModel loads it only if it was built from the same encoder.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            save_tiny_bert(tmp_dir)
+            path = os.path.join(tmp_dir, "symptom_embeddings.npz")
+            with mock.patch.object(BertNLPModel, "SYMPTOM_EMBEDDINGS_PATH", path):
+                self.assertIsNone(BertNLPModel(model_name=tmp_dir).symptom_table)
+
+                builder = BertNLPModel(model_name=tmp_dir)
+                SymptomEmbeddingTable.build(builder, SYMPTOMS, source=builder.embedding_source).save(path)
+                with mock.patch.object(BertNLPModel, "SYMPTOM_EMBEDDINGS_PATH", ""):
+                    self.assertIsNone(BertNLPModel(model_name=tmp_dir).symptom_table)
+                model = BertNLPModel(model_name=tmp_dir)
+                self.assertEqual(model.symptom_table.symptoms, SYMPTOMS)
+                with mock.patch.object(model, "_encode", wraps=model._encode) as encode:
+                    vector = model.symptoms_to_vector(["fever", "cough"])
+                encode.assert_not_called()
+                expected = builder.texts_to_vectors(["fever", "cough"]).mean(axis=0)
+                np.testing.assert_allclose(vector, expected, atol=1e-2)
+
+                SymptomEmbeddingTable.build(builder, SYMPTOMS, source="other-model:fp32").save(path)
+                self.assertIsNone(BertNLPModel(model_name=tmp_dir).symptom_table)
+
+
+if __name__ == "__main__":
+    unittest.main()
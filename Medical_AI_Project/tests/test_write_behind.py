@@ -0,0 +1,165 @@
+import threading
+import time
+import unittest
+from pymongo.errors import AutoReconnect, BulkWriteError
+from infrastructure.database.patient_repository import PatientRepository
+from infrastructure.database.write_behind import WriteBehindBuffer
+
+
+class FakeCollection:
+    """
+    Коллекция MongoDB в памяти: применяет upsert'ы из bulk_write, может падать заданное число раз
+    или применять пачку без подтверждения (writeConcernError).
+    """
+
+    def __init__(self, failures: int = 0, failing_keys=(), write_concern_failures: int = 0):
+        self.documents = {}
+        self.calls = []
+        self.failures = failures
+        self.failing_keys = set(failing_keys)
+        self.write_concern_failures = write_concern_failures
+        self.lock = threading.Lock()
+
+    def bulk_write(self, operations, ordered=True):
+        with self.lock:
+            self.calls.append(len(operations))
+            if self.failures:
+                self.failures -= 1
+                raise AutoReconnect("connection lost")
+            errors = []
+            for index, operation in enumerate(operations):
+                key = operation._filter["patient_id"]
+                if key in self.failing_keys:
+                    self.failing_keys.discard(key)
+                    errors.append({"index": index, "code": 11000, "errmsg": "duplicate key"})
+                    continue
+                self.documents.setdefault(key, {}).update(operation._doc["$set"])
+            if errors:
+                raise BulkWriteError({"writeErrors": errors})
+            if self.write_concern_failures:
+                self.write_concern_failures -= 1
+                raise BulkWriteError({"writeErrors": [], "writeConcernErrors": [{"code": 64, "errmsg": "timed out"}]})
+
+
+class TestWriteBehindBuffer(unittest.TestCase):
+    """
+    Тесты отложенной пакетной записи.
+    """
+
+    def make_buffer(self, collection, **options) -> WriteBehindBuffer:
+        options.setdefault("flush_interval", 10)
+        buffer = WriteBehindBuffer(collection, retry_backoff=0.001, **options)
+        self.addCleanup(buffer.close)
+        return buffer
+
+    def test_updates_are_coalesced(self):
+        """
+        Обновления одного patient_id внутри окна объединяются, последнее значение побеждает.
+        """
+        collection = FakeCollection()
+        buffer = self.make_buffer(collection)
+        for i in range(100):
+            buffer.enqueue(i % 10, {"diagnosis": f"D{i}", "confidence": i / 100})
+        self.assertTrue(buffer.flush(timeout=5))
+
+        self.assertEqual(collection.calls, [10])
+        self.assertEqual(collection.documents[3], {"diagnosis": "D93", "confidence": 0.93})
+        metrics = buffer.get_metrics()
+        self.assertEqual((metrics["enqueued"], metrics["coalesced"], metrics["written"]), (100, 90, 10))
+
+    def test_flush_on_size(self):
+        """
+        Пачка записывается, как только набирается max_batch_size документов.
+        """
+        collection = FakeCollection()
+        buffer = self.make_buffer(collection, max_batch_size=5)
+        for i in range(5):
+            buffer.enqueue(i, {"diagnosis": "Flu"})
+        time.sleep(0.2)
+        self.assertEqual(len(collection.documents), 5)
+
+    def test_flush_on_time(self):
+        """
+        Неполная пачка записывается по истечении flush_interval.
+        """
+        collection = FakeCollection()
+        buffer = self.make_buffer(collection, flush_interval=0.05)
+        buffer.enqueue(1, {"diagnosis": "Flu"})
+        time.sleep(0.3)
+        self.assertEqual(collection.documents, {1: {"diagnosis": "Flu"}})
+
+    def test_retry_with_backoff(self):
+        """
+        Временные ошибки повторяются, пока запись не пройдёт.
+        """
+        collection = FakeCollection(failures=2)
+        buffer = self.make_buffer(collection)
+        buffer.enqueue(1, {"diagnosis": "Flu"})
+        buffer.flush(timeout=5)
+        self.assertEqual(collection.documents, {1: {"diagnosis": "Flu"}})
+        self.assertEqual(buffer.get_metrics()["retries"], 2)
+
+    def test_only_failed_operations_are_retried(self):
+        """
+        При BulkWriteError повторяются только операции с ошибкой.
+        """
+        collection = FakeCollection(failing_keys=[2])
+        buffer = self.make_buffer(collection)
+        for i in range(4):
+            buffer.enqueue(i, {"diagnosis": "Flu"})
+        buffer.flush(timeout=5)
+        self.assertEqual(collection.calls, [4, 1])
+        self.assertEqual(sorted(collection.documents), [0, 1, 2, 3])
+
+    def test_write_concern_error_is_retried(self):
+        """
+        Пачка с writeConcernError не считается записанной и повторяется целиком.
+        """
+        collection = FakeCollection(write_concern_failures=1)
+        buffer = self.make_buffer(collection)
+        for i in range(3):
+            buffer.enqueue(i, {"diagnosis": "Flu"})
+        buffer.flush(timeout=5)
+        self.assertEqual(collection.calls, [3, 3])
+        metrics = buffer.get_metrics()
+        self.assertEqual((metrics["written"], metrics["retries"], metrics["failed"]), (3, 1, 0))
+
+    def test_close_drains_buffer(self):
+        """
+        При остановке буфер сбрасывается полностью.
+        """
+        collection = FakeCollection()
+        buffer = WriteBehindBuffer(collection, flush_interval=10)
+        for i in range(3):
+            buffer.enqueue(i, {"diagnosis": "Flu"})
+        buffer.close()
+        self.assertEqual(len(collection.documents), 3)
+        with self.assertRaises(RuntimeError):
+            buffer.enqueue(4, {"diagnosis": "Flu"})
+
+
+class TestPatientRepositoryWriteBehind(unittest.TestCase):
+    """
+    Тесты режима write_behind в PatientRepository.
+    """
+
+    def test_save_diagnosis_is_buffered(self):
+        """
+        save_diagnosis не ждёт MongoDB, диагнозы записываются пачкой.
+        """
+        collection = FakeCollection()
+        buffer = PatientRepository.configure_write_behind(collection=collection, flush_interval=10)
+        self.addCleanup(PatientRepository.configure_write_behind, enabled=False)
+
+        PatientRepository.save_diagnosis(1, "Flu", 0.8)
+        PatientRepository.save_diagnosis(1, "Cold", 0.6)
+        PatientRepository.save_diagnosis(2, "Flu", 0.9)
+        self.assertEqual(collection.documents, {})
+
+        buffer.flush(timeout=5)
+        self.assertEqual(collection.documents[1]["diagnosis"], "Cold")
+        self.assertEqual(collection.calls, [2])
+
+
+if __name__ == "__main__":
+    unittest.main()